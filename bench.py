@@ -0,0 +1,742 @@
+"""
+Benchmark scenarios for the catan game engine. Each scenario prints one line of
+space-separated key=value pairs, so results can be tracked over time, e.g.
+
+    $ python3 bench.py headless --games 500
+    scenario=headless games=500 seconds=0.61 games_per_second=819.7
+"""
+import argparse
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from catan import boardbuilder, evaluation, rules, states, topology
+from catan import agents as agent_actions
+from catan import statemachine as sm
+from catan.game import Game, Player
+from catan.features import FeatureExtractor
+from catan.headless import HeadlessEngine
+from catan.mcts import MCTS, playout_action
+from catan.opening import OpeningEvaluator
+from catan.openingbook import OpeningBook, SEARCH_DEPTH
+from catan.qlearning import QTable, QTrainer, evaluate_policy
+from catan.replay import ReplayBuffer
+from catan.selfplay import SelfPlayRunner
+from catan.snapshot import GameSnapshot
+
+SCENARIOS = dict()
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+def report(name, **results):
+    print(' '.join(['scenario={}'.format(name)] +
+                   ['{}={}'.format(k, round(v, 4) if isinstance(v, float) else v) for k, v in results.items()]))
+
+
+def agent_players():
+    return [Player(1, 'agent1', 'red'),
+            Player(2, 'agent2', 'blue'),
+            Player(3, 'agent1', 'orange'),
+            Player(4, 'agent2', 'green')]
+
+
+def human_players():
+    return [Player(1, 'ross', 'red'),
+            Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'),
+            Player(4, 'zach', 'green')]
+
+
+def play_session(game, turns, rng):
+    """
+    Drive a started game as a spectator would: pregame placements, then rolls, robber moves,
+    steals, dev card purchases and turn ends. Yields after each undoable action.
+    """
+    taken = set()
+    while game.state.is_in_pregame():
+        node = rng.choice([n for n in range(topology.NUM_NODES) if n not in taken and
+                           taken.isdisjoint(topology.NODE_NEIGHBOURS[n])])
+        taken.add(node)
+        game.place_settlement(topology.NODES[node])
+        yield
+        game.place_road(topology.EDGES[topology.NODE_EDGES[node, 0]])
+        yield
+    for _ in range(turns):
+        if not game.state.is_in_game():
+            return
+        roll = rng.randint(1, 6) + rng.randint(1, 6)
+        game.roll(roll)
+        yield
+        if roll == 7:
+            game.move_robber(rng.choice([t for t in topology.TILE_IDS if t != game.robber_tile]))
+            yield
+            victims = sorted(game.stealable_players(), key=lambda p: p.seat)
+            game.steal(rng.choice(victims) if victims else None)
+            yield
+        if game.rules.can_afford(game.cur_player_index(), rules.DEV_CARD):
+            game.buy_dev_card()
+            yield
+        game.end_turn()
+        yield
+
+
+@scenario
+def headless(args):
+    """Games per second of the headless engine on random boards."""
+    engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'})
+    start = time.perf_counter()
+    for _ in engine.play_many(args.games, agent_players(), seed=args.seed):
+        pass
+    seconds = time.perf_counter() - start
+    report('headless', games=args.games, seconds=seconds, games_per_second=args.games / seconds)
+
+
+@scenario
+def agents(args):
+    """Full games per second between agents, one game at a time and in lock-step batches."""
+    engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'}, turns='on', max_turns=1000)
+    games = max(1, args.games // 10)
+    start = time.perf_counter()
+    for _ in engine.play_many(games, agent_players(), seed=args.seed):
+        pass
+    seconds = time.perf_counter() - start
+    report('agents', mode='sequential', games=games, seconds=seconds, games_per_second=games / seconds)
+    start = time.perf_counter()
+    engine.play_batch(agent_players(), range(args.seed, args.seed + games))
+    seconds = time.perf_counter() - start
+    report('agents', mode='batch', games=games, seconds=seconds, games_per_second=games / seconds)
+
+
+@scenario
+def opening(args):
+    """Microseconds per opening decision of the vectorised evaluator, one position at a time and batched."""
+    random.seed(args.seed)
+    board = boardbuilder.build({'terrain': 'random', 'numbers': 'random'})
+    evaluator = OpeningEvaluator(*topology.tile_arrays(board.tiles), topology.port_arrays(board.ports))
+    buildings = np.zeros((args.games, 4, topology.NUM_NODES), dtype=np.int8)
+    players = np.arange(args.games) % 4
+    for b in range(args.games):
+        for node in random.sample(range(topology.NUM_NODES), b % 8):
+            buildings[b, random.randrange(4), node] = 1
+    start = time.perf_counter()
+    for b in range(args.games):
+        evaluator.best_placement(buildings[b], players[b])
+    single = time.perf_counter() - start
+    start = time.perf_counter()
+    evaluator.best_placements(buildings, players)
+    batched = time.perf_counter() - start
+    report('opening', positions=args.games, single_us=single / args.games * 1e6,
+           batched_us=batched / args.games * 1e6)
+
+
+@scenario
+def selfplay(args):
+    """Full games per second of the self-play runner as worker processes are added."""
+    counts = sorted({1, 2, 4, 8, multiprocessing.cpu_count()})
+    baseline = None
+    games = max(1, args.games // 10)
+    for processes in [c for c in counts if c <= multiprocessing.cpu_count()]:
+        runner = SelfPlayRunner(agent_players(), {'terrain': 'random', 'numbers': 'random'},
+                                processes=processes, chunk_size=max(1, games // (4 * processes)),
+                                turns='on', max_turns=1000)
+        start = time.perf_counter()
+        summary = runner.run(games * processes, seed=args.seed)
+        seconds = time.perf_counter() - start
+        rate = games * processes / seconds
+        baseline = baseline or rate
+        report('selfplay', processes=processes, games=games * processes, seconds=seconds,
+               games_per_second=rate, speedup=rate / baseline, efficiency=rate / baseline / processes,
+               mean_turns=sum(t * n for t, n in summary.turns.items()) / summary.games, draw_rate=summary.draw_rate())
+
+
+@scenario
+def openingbook(args):
+    """Offline search rate of the opening book, then pregame games per second with and without it."""
+    engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'})
+    seeds = range(args.seed, args.seed + args.games)
+    boards = [engine.new_game(seed).board for seed in seeds]
+    with OpeningBook(':memory:', capacity=args.games) as book:
+        start = time.perf_counter()
+        searched = book.populate(boards)
+        seconds = time.perf_counter() - start
+        report('openingbook', mode='populate', processes=multiprocessing.cpu_count(), depth=SEARCH_DEPTH, boards=searched,
+               seconds=seconds, boards_per_second=searched / seconds)
+        for mode in ('online', 'book'):
+            engine.opening_book = book if mode == 'book' else None
+            start = time.perf_counter()
+            for seed in seeds:
+                engine.play(agent_players(), seed=seed)
+            seconds = time.perf_counter() - start
+            report('openingbook', mode=mode, games=args.games, seconds=seconds,
+                   games_per_second=args.games / seconds, hits=book.hits, misses=book.misses)
+
+
+@scenario
+def evaluate(args):
+    """Microseconds per final position of end-of-game resource evaluation, one game at a time and batched."""
+    engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'})
+    game = engine.new_game(args.seed)
+    game.start(agent_players())
+    game.play_agent_turn()
+    positions = args.games * 10
+    start = time.perf_counter()
+    for _ in range(positions):
+        game.evaluate_final(game.board.player_to_pieces)
+    single = time.perf_counter() - start
+    rng = np.random.default_rng(args.seed)
+    buildings = rng.choice(np.array([0, 1, 2], dtype=np.int8), p=[0.85, 0.1, 0.05],
+                           size=(positions, 4, topology.NUM_NODES))
+    tile_resource = np.stack([topology.tile_arrays(engine.new_game(args.seed + g % args.games).board.tiles)[0]
+                              for g in range(positions)])
+    start = time.perf_counter()
+    evaluation.final_resources(buildings, evaluation.node_resources(tile_resource))
+    batched = time.perf_counter() - start
+    report('evaluate', positions=positions, single_us=single / positions * 1e6,
+           batched_us=batched / positions * 1e6)
+
+
+@scenario
+def players(args):
+    """Player objects allocated, and microseconds, per turn of full agent games."""
+    engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'}, turns='on', max_turns=1000)
+    games = max(1, args.games // 10)
+    allocated = [0]
+    init = Player.__init__
+
+    def counting_init(self, *init_args):
+        allocated[0] += 1
+        init(self, *init_args)
+
+    seats = agent_players()
+    Player.__init__ = counting_init
+    try:
+        start = time.perf_counter()
+        turns = sum(engine.play(seats, seed=args.seed + g).turns for g in range(games))
+        seconds = time.perf_counter() - start
+    finally:
+        Player.__init__ = init
+    report('players', games=games, turns=turns, allocations_per_turn=allocated[0] / turns,
+           us_per_turn=seconds / turns * 1e6)
+
+
+@scenario
+def undo(args):
+    """Memory and latency of delta undo (undolog) against whole-game snapshots over a long session."""
+    def session(mode):
+        random.seed(args.seed)
+        game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                    logging='buffer', undo=mode, turns='on')
+        game.start(human_players())
+        return game, play_session(game, args.turns, random.Random(args.seed))
+
+    for mode in ('on', 'snapshot'):
+        # memory is measured on a separate run, because tracing allocations slows them down
+        game, actions = session(mode)
+        tracemalloc.start()
+        for _ in actions:
+            pass
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        game, actions = session(mode)
+        start = time.perf_counter()
+        actions = sum(1 for _ in actions)
+        do_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        while game.undo_manager.can_undo():
+            game.undo()
+        undo_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        while game.undo_manager.can_redo():
+            game.redo()
+        redo_seconds = time.perf_counter() - start
+        report('undo', mode=mode, actions=actions, history_kb=memory / 1024,
+               do_us=do_seconds / actions * 1e6, undo_us=undo_seconds / actions * 1e6,
+               redo_us=redo_seconds / actions * 1e6)
+
+
+@scenario
+def snapshot(args):
+    """Clones per second of a mid-game position as a Game and as a GameSnapshot, and actions per second on snapshots."""
+    random.seed(args.seed)
+    rng = random.Random(args.seed)
+    game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                logging='off', undo='off', turns='on')
+    game.start(human_players())
+    position = GameSnapshot.from_game(game)
+    while position.turn < 40 and position.is_in_game():
+        position.play(rng.choice(position.legal_actions()), rng)
+    game = position.to_game(game)
+
+    clones = max(1, args.games // 2)
+    start = time.perf_counter()
+    for _ in range(clones):
+        game.copy()
+    seconds = time.perf_counter() - start
+    report('snapshot', mode='game_copy', clones=clones, clones_per_second=clones / seconds)
+    clones *= 100
+    start = time.perf_counter()
+    for _ in range(clones):
+        position.copy()
+    seconds = time.perf_counter() - start
+    report('snapshot', mode='snapshot_copy', clones=clones, clones_per_second=clones / seconds)
+
+    # random playouts: a copying apply per action, and in-place play on one copy per playout
+    for mode in ('apply', 'play'):
+        rng = random.Random(args.seed)
+        actions = 0
+        start = time.perf_counter()
+        for _ in range(max(1, args.games // 10)):
+            current = position.copy()
+            while current.is_in_game() and current.turn < position.turn + 200:
+                action = rng.choice(current.legal_actions())
+                if mode == 'apply':
+                    current = current.apply(action, rng)
+                else:
+                    current.play(action, rng)
+                actions += 1
+        seconds = time.perf_counter() - start
+        report('snapshot', mode=mode, actions=actions, actions_per_second=actions / seconds)
+
+
+@scenario
+def mcts(args):
+    """Playouts per second of Monte Carlo tree search from a mid-game position, in one process and root-parallel."""
+    random.seed(args.seed)
+    rng = random.Random(args.seed)
+    game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                logging='off', undo='off', turns='on')
+    game.start(human_players())
+    opening = position = GameSnapshot.from_game(game)
+    while position.turn < 40 or len(position.legal_actions()) < 3:
+        position.play(playout_action(position, rng), rng)
+
+    iterations = max(1, args.games * 5)
+    for processes in sorted({1, multiprocessing.cpu_count()}):
+        with MCTS(iterations=iterations, processes=processes, rng=random.Random(args.seed)) as search:
+            search.search(opening) # starts any worker processes
+            start = time.perf_counter()
+            search.search(position)
+            seconds = time.perf_counter() - start
+            report('mcts', processes=processes, playouts=search.playouts, seconds=seconds,
+                   playouts_per_second=search.playouts / seconds)
+
+
+@scenario
+def qlearning(args):
+    """Q-learning episodes per second, and the trained table's placements against the opening evaluator's."""
+    table = QTable()
+    for processes in sorted({1, multiprocessing.cpu_count()}):
+        stats = QTrainer(table, processes=processes).train(args.games * 10, seed=args.seed)
+        report('qlearning', processes=processes, episodes=stats['episodes'], seconds=stats['seconds'],
+               episodes_per_second=stats['episodes_per_second'], entries=stats['entries'])
+    report('qlearning', mode='evaluate', reward=evaluate_policy(table, args.games, seed=args.seed),
+           even=0.25)
+
+
+@scenario
+def features(args):
+    """Positions per second turned into model features, one at a time and in batches, from snapshots and from games."""
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    positions, games = list(), list()
+    for _ in range(256):
+        game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                    logging='off', undo='off', turns='on')
+        game.start(human_players())
+        position = GameSnapshot.from_game(game)
+        for _ in range(rng.randrange(300)):
+            if not position.is_in_game():
+                break
+            position.play(playout_action(position, rng), rng)
+        positions.append(position)
+        games.append(position.to_game(game))
+
+    repeats = max(1, args.games // 20)
+    for source, batch in (('snapshots', positions), ('games', games)):
+        for batch_size in (1, len(batch)):
+            extractor = FeatureExtractor(num_players=4, batch_size=batch_size)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                for i in range(0, len(batch), batch_size):
+                    extractor.extract(batch[i:i + batch_size])
+            seconds = time.perf_counter() - start
+            report('features', source=source, batch_size=batch_size, positions=repeats * len(batch),
+                   positions_per_second=repeats * len(batch) / seconds)
+
+
+def _replay_reader(path, batch_size, seconds):
+    buffer = ReplayBuffer.open(path)
+    rng = np.random.default_rng()
+    samples, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        buffer.sample(batch_size, rng)
+        samples += batch_size
+    return samples / seconds
+
+
+@scenario
+def replay(args):
+    """Appends and samples per second of a memory-mapped replay buffer of ten million transitions."""
+    capacity, feature_size, batch_size = 10 ** 7, FeatureExtractor(num_players=4).size, 256
+    directory = tempfile.mkdtemp()
+    path = directory + '/replay'
+    try:
+        buffer = ReplayBuffer.create(path, capacity, feature_size, dtype='float16')
+        rng = np.random.default_rng(args.seed)
+        states = rng.random((1024, feature_size)).astype(np.float16)
+        actions, rewards = rng.integers(0, 100, 1024), rng.random(1024)
+        appends = args.games * 100
+        start = time.perf_counter()
+        for _ in range(appends // 1024):
+            buffer.append(states, actions, rewards, states, rewards > 0.9)
+        seconds = time.perf_counter() - start
+        report('replay', mode='append', capacity=capacity, gigabytes=capacity * feature_size * 2 * 2 / 1e9,
+               transitions=buffer.count, transitions_per_second=buffer.count / seconds)
+
+        for mode in ('uniform', 'prioritised'):
+            sample = buffer.sample if mode == 'uniform' else buffer.sample_prioritised
+            batches = max(1, args.games)
+            start = time.perf_counter()
+            for _ in range(batches):
+                sample(batch_size, rng=rng)
+            seconds = time.perf_counter() - start
+            report('replay', mode=mode, batch_size=batch_size, samples_per_second=batches * batch_size / seconds)
+
+        processes = max(2, multiprocessing.cpu_count())
+        with multiprocessing.Pool(processes) as pool:
+            rates = pool.starmap(_replay_reader, [(path, batch_size, 1.0)] * processes)
+        report('replay', mode='readers', processes=processes, samples_per_second=sum(rates))
+    finally:
+        shutil.rmtree(directory)
+
+
+@scenario
+def statemachine(args):
+    """Every capability of the current state, queried through state objects and as one bitmask, and transitions of each."""
+    random.seed(args.seed)
+    game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                logging='off', undo='off', turns='on')
+    game.start(human_players())
+    game.state = states.GameStateDuringTurnAfterRoll(game)
+    names = ['can_' + name for name in sm.CAPABILITIES if name not in ('in_game', 'in_pregame')]
+    queries = args.games * 100
+
+    start = time.perf_counter()
+    for _ in range(queries):
+        state = game.state
+        [getattr(state, name)() for name in names]
+    seconds = time.perf_counter() - start
+    report('statemachine', mode='state_methods', queries=queries, queries_per_second=queries / seconds)
+    bits = [1 << i for i in range(len(names))]
+    start = time.perf_counter()
+    for _ in range(queries):
+        caps = game.capabilities()
+        [caps & bit for bit in bits]
+    seconds = time.perf_counter() - start
+    report('statemachine', mode='bitmask', queries=queries, queries_per_second=queries / seconds)
+
+    # a turn: roll, end turn
+    start = time.perf_counter()
+    for _ in range(queries):
+        game.set_state(states.GameStateDuringTurnAfterRoll(game))
+        game.set_state(states.GameStateBeginTurn(game))
+    seconds = time.perf_counter() - start
+    report('statemachine', mode='set_state', transitions=2 * queries, transitions_per_second=2 * queries / seconds)
+    machine = sm.StateMachine(sm.BEGIN_TURN)
+    start = time.perf_counter()
+    for _ in range(queries):
+        machine.fire(sm.ROLL)
+        machine.fire(sm.END_TURN)
+    seconds = time.perf_counter() - start
+    report('statemachine', mode='table', transitions=2 * queries, transitions_per_second=2 * queries / seconds)
+
+
+@scenario
+def actions(args):
+    """Legal action generation per second as agent tuples and as integer masks, along random games,
+    and the time to recompute the settlement and road masks from the rules arrays at each position."""
+    rng = random.Random(args.seed)
+    engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'}, turns='on', max_turns=100)
+    tuples = masks = placements = 0.0
+    positions = 0
+    for g in range(max(1, args.games // 20)):
+        game = engine.new_game(args.seed + g)
+        game.options['agent_turns'] = 'off'
+        game.start(human_players())
+        while game.state.is_in_game():
+            start = time.perf_counter()
+            agent_actions.legal_actions(game)
+            tuples += time.perf_counter() - start
+            start = time.perf_counter()
+            legal = game.legal_actions()
+            masks += time.perf_counter() - start
+            start = time.perf_counter()
+            game.rules.settlement_mask(game.cur_player_index())
+            game.rules.road_mask(game.cur_player_index())
+            placements += time.perf_counter() - start
+            game.apply_action(int(rng.choice(legal)))
+            positions += 1
+    report('actions', mode='tuples', positions=positions, positions_per_second=positions / tuples)
+    report('actions', mode='mask', positions=positions, positions_per_second=positions / masks,
+           microseconds=1e6 * masks / positions)
+    report('actions', mode='placement_masks', positions=positions, microseconds=1e6 * placements / positions)
+
+
+class _CountingObserver(object):
+    def __init__(self):
+        self.notifications = 0
+        self.coalesced = 0
+
+    def notify(self, observable):
+        self.notifications += 1
+        self.coalesced += observable.changes.count
+
+
+@scenario
+def notifications(args):
+    """Observer notifications per action, as delivered and as they would be without batching."""
+    rng = random.Random(args.seed)
+    engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'}, turns='on', max_turns=100)
+    observer = _CountingObserver()
+    actions = 0
+    start = time.perf_counter()
+    for g in range(max(1, args.games // 20)):
+        game = engine.new_game(args.seed + g)
+        game.options['agent_turns'] = 'off'
+        game.observers.add(observer)
+        game.start(human_players())
+        while game.state.is_in_game():
+            game.apply_action(int(rng.choice(game.legal_actions())))
+            actions += 1
+    seconds = time.perf_counter() - start
+    report('notifications', actions=actions, notifications=observer.notifications,
+           unbatched_notifications=observer.coalesced,
+           notifications_per_action=observer.notifications / actions, actions_per_second=actions / seconds)
+
+
+@scenario
+def events(args):
+    """Actions per second with no event subscribers, with a subscriber to every event type, and
+    with a slow subscriber on a background thread."""
+    from catan import events as game_events
+
+    handled = [0]
+
+    def slow(event):
+        time.sleep(0.001)
+        handled[0] += 1
+
+    for mode in ('none', 'all', 'slow_thread'):
+        rng = random.Random(args.seed)
+        engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'}, turns='on', max_turns=100)
+        actions = published = 0
+        seconds = 0.0
+        for g in range(max(1, args.games // 20)):
+            game = engine.new_game(args.seed + g)
+            game.options['agent_turns'] = 'off'
+            subscription = None
+            if mode == 'all':
+                subscription = game.events.subscribe(game_events.Event, maxlen=10 ** 6)
+            elif mode == 'slow_thread':
+                subscription = game.events.subscribe(game_events.Event, handler=slow, thread=True, maxlen=64)
+            start = time.perf_counter()
+            game.start(human_players())
+            while game.state.is_in_game():
+                game.apply_action(int(rng.choice(game.legal_actions())))
+                actions += 1
+            seconds += time.perf_counter() - start
+            if subscription is not None:
+                subscription.close(timeout=1)
+                published += len(subscription) + subscription.dropped
+        report('events', mode=mode, actions=actions, events=published + handled[0], actions_per_second=actions / seconds)
+
+
+@scenario
+def eventstream(args):
+    """Actions per second with and without an event stream, and positions rebuilt per second from it."""
+    streams = list()
+    for mode in ('off', 'on'):
+        rng = random.Random(args.seed)
+        engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'}, turns='on', max_turns=100)
+        actions = 0
+        seconds = 0.0
+        for g in range(max(1, args.games // 20)):
+            game = engine.new_game(args.seed + g)
+            game.options['agent_turns'] = 'off'
+            game.options['stream'] = mode
+            start = time.perf_counter()
+            game.start(human_players())
+            while game.state.is_in_game():
+                game.apply_action(int(rng.choice(game.legal_actions())))
+                actions += 1
+            seconds += time.perf_counter() - start
+            if game.stream is not None:
+                streams.append(game.stream)
+        report('eventstream', mode=mode, actions=actions, actions_per_second=actions / seconds)
+    rng = random.Random(args.seed)
+    rebuilds = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 1.0:
+        stream = rng.choice(streams)
+        stream.state_at(rng.randint(0, len(stream)))
+        rebuilds += 1
+    seconds = time.perf_counter() - start
+    report('eventstream', mode='rebuild', interval=streams[0].interval, rebuilds=rebuilds,
+           rebuilds_per_second=rebuilds / seconds, bytes_per_event=streams[0].events.itemsize)
+
+
+class _ThinkingAgent(agent_actions.BestAgent):
+    # BestAgent, slowed to stand in for a search
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def decide(self, game):
+        time.sleep(self.seconds)
+        return super(_ThinkingAgent, self).decide(game)
+
+
+@scenario
+def dispatch(args):
+    """Longest time the game's thread is held while agents which think for 5ms play, deciding
+    on it, in a worker thread, and in a worker thread with a 2ms deadline."""
+    from catan.dispatch import AgentDispatcher
+    for mode, deadline in (('sync', None), ('thread', None), ('deadline', 0.002)):
+        engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'}, turns='on', max_turns=20)
+        dispatcher = None if mode == 'sync' else AgentDispatcher(deadline=deadline)
+        held = 0.0
+        start = time.perf_counter()
+        for g in range(max(1, args.games // 50)):
+            game = engine.new_game(args.seed + g)
+            game.start(agent_players())
+            for player in game.players:
+                game.set_agent(player, _ThinkingAgent(0.005))
+            if dispatcher is not None:
+                dispatcher.attach(game)
+            call = time.perf_counter()
+            game.play_agent_turn()
+            held = max(held, time.perf_counter() - call)
+            while dispatcher is not None and dispatcher.pending(game):
+                call = time.perf_counter()
+                dispatcher.poll()
+                held = max(held, time.perf_counter() - call)
+                time.sleep(0.001)
+        seconds = time.perf_counter() - start
+        results = dict(held_ms=held * 1000, seconds=seconds)
+        if dispatcher is not None:
+            results.update(decisions=dispatcher.decisions, fallbacks=dispatcher.fallbacks)
+            dispatcher.shutdown()
+        report('dispatch', mode=mode, **results)
+
+
+@scenario
+def sandbox(args):
+    """Games per second driven in lock-step by BestAgent in process, and sandboxed in a worker
+    process with one request per step for every game, and the sandbox's latencies."""
+    from catan.sandbox import AgentSandbox
+    for mode in ('in_process', 'sandboxed'):
+        engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'}, turns='on', max_turns=50)
+        agent = agent_actions.BestAgent() if mode == 'in_process' else AgentSandbox('bestagent')
+        games = [engine.new_game(args.seed + g) for g in range(max(1, args.games // 10))]
+        for game in games:
+            game.start(human_players())
+            for player in game.players:
+                game.set_agent(player, agent)
+        start = time.perf_counter()
+        agent_actions.drive(games)
+        seconds = time.perf_counter() - start
+        results = dict(games=len(games), games_per_second=len(games) / seconds)
+        if mode == 'sandboxed':
+            stats = agent.stats()
+            agent.close()
+            results.update(requests=stats['requests'], fallbacks=stats['fallbacks'],
+                           decide_p50_ms=stats['decide']['p50_ms'], round_trip_p50_ms=stats['round_trip']['p50_ms'],
+                           round_trip_p95_ms=stats['round_trip']['p95_ms'])
+        report('sandbox', mode=mode, **results)
+
+
+@scenario
+def vectorsim(args):
+    """Games per second between random and greedy agents in the object engine, one game at a time,
+    and in the vectorised simulator, every game in lock-step."""
+    from catan.vectorsim import VectorSimulator
+    engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'}, turns='on', max_turns=1000)
+    games = max(1, args.games // 10)
+    start = time.perf_counter()
+    for _ in engine.play_many(games, agent_players(), seed=args.seed):
+        pass
+    seconds = time.perf_counter() - start
+    report('vectorsim', mode='engine', games=games, seconds=seconds, games_per_second=games / seconds)
+    games = args.games * 5
+    start = time.perf_counter()
+    sim = VectorSimulator.random_boards(games, max_turns=1000, seed=args.seed)
+    steps = sim.run(['random', 'greedy', 'random', 'greedy'])
+    seconds = time.perf_counter() - start
+    report('vectorsim', mode='vector', games=games, steps=steps, seconds=seconds, games_per_second=games / seconds,
+           greedy_wins=float(np.isin(sim.winners(), [1, 3]).mean()))
+
+
+@scenario
+def production(args):
+    """Positions per second through the production analytics: one at a time, in one batch, and
+    from the cache; and at-least-k probabilities over many turns for the batch."""
+    from catan import production as analytics
+    from catan.vectorsim import VectorSimulator
+    sim = VectorSimulator.random_boards(max(1, args.games * 5), max_turns=60, seed=args.seed)
+    sim.run(['greedy'] * 4)
+    positions = [sim.snapshot(k) for k in range(sim.num_games)]
+    start = time.perf_counter()
+    for position in positions:
+        analytics.ProductionAnalytics().position(position)
+    seconds = time.perf_counter() - start
+    report('production', mode='single', positions=len(positions), positions_per_second=len(positions) / seconds)
+    cache = analytics.ProductionAnalytics()
+    for mode in ('batch', 'cached'):
+        start = time.perf_counter()
+        cache.positions(positions)
+        seconds = time.perf_counter() - start
+        report('production', mode=mode, positions=len(positions), positions_per_second=len(positions) / seconds,
+               hits=cache.hits, misses=cache.misses)
+    per_roll = analytics.roll_production(sim.buildings, sim.tile_resource, sim.tile_number, sim.robber_tile)
+    start = time.perf_counter()
+    chance = analytics.at_least(per_roll, 4, args.turns)
+    seconds = time.perf_counter() - start
+    report('production', mode='at_least', positions=len(positions), k=4, turns=args.turns, seconds=seconds,
+           mean_probability=float(chance.mean()))
+
+
+@scenario
+def fuzz(args):
+    """Random legal and illegal actions and undos per second, with and without invariant checks."""
+    from catan.fuzz import Fuzzer
+    for check in (False, True):
+        result = Fuzzer(seed=args.seed, check=check).run(max(1, args.games // 20))
+        report('fuzz', mode='checked' if check else 'unchecked', actions=result.actions, rejected=result.rejected,
+               undos=result.undos, violations=len(result.violations), actions_per_second=result.actions_per_second)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark the catan game engine')
+    parser.add_argument('scenario', nargs='*', help='one or more of {}, default all'.format('|'.join(SCENARIOS)))
+    parser.add_argument('--games', type=int, default=200, help='games per scenario, default 200')
+    parser.add_argument('--turns', type=int, default=500, help='turns per long session, default 500')
+    parser.add_argument('--seed', type=int, default=0, help='base random seed, default 0')
+    args = parser.parse_args()
+
+    for name in args.scenario or SCENARIOS:
+        if name not in SCENARIOS:
+            parser.error('unknown scenario={}'.format(name))
+        SCENARIOS[name](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,26 @@ The main class is Game, which contains Players, a Board, and a CatanLog.
 
 See module boardbuilder for the mechanics of creating and modifying Board objects.
 
+See module catalogue for storing boards on disk, deduplicated by symmetry (see module symmetry).
+
+See module agents for the agents which play for players, and module headless for playing
+games between them without the GUI. Module openingbook keeps searched opening placements
+on disk for the agents to reuse. Module evaluation scores final positions, one game or many at once.
+Module snapshot copies game positions into compact arrays, for search, and module mcts searches them.
+Module qlearning learns opening placements with a Q-table, and module features turns batches of
+positions into fixed-shape arrays for models. Module replay stores training transitions in
+memory-mapped files. Module statemachine answers the capability queries of module states with bit tests,
+and module actions numbers every action, so legal actions can be given as a mask.
+Module notifications batches the notifications Game and Board send their observers, and module
+events publishes typed events to subscribers of each type. Module fuzz plays random legal and
+illegal actions and checks the game's invariants after each. Module eventstream records a game's
+actions as compact events, from which its position after any of them can be rebuilt. Module
+dispatch asks agents for their decisions in worker threads or processes, with deadlines, and
+module sandbox hosts an agent in a worker process of its own, restarted if it crashes or hangs.
+Module vectorsim plays many games at once in lock-step, with every game's position in NumPy arrays.
+Module production computes exact dice and production analytics: expected income and its variance,
+the chance of receiving at least k of a resource within T turns, and the effect of each robber placement.
+
 All classes in this module:
 - Game
 - Player
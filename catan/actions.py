@@ -0,0 +1,319 @@
+"""
+module actions provides a fixed integer action space, and the legal actions of a Game as
+integers or as a mask over that space.
+
+Every action the current player can make is one int:
+
+    PLACE_SETTLEMENT + node index   (54)
+    PLACE_ROAD + edge index         (72)
+    PLACE_CITY + node index         (54)
+    MOVE_ROBBER + tile id - 1       (19)
+    ROLL, END_TURN, BUY_DEV_CARD, PLAY_KNIGHT, PLAY_ROAD_BUILDER, PLAY_VICTORY_POINT
+    PLAY_MONOPOLY + resource index  (5)
+    PLAY_YEAR_OF_PLENTY + pair      (15, see YEAR_OF_PLENTY_PAIRS)
+    TRADE + 5 * give + get          (25, a bank or port trade of give for one get)
+    STEAL_NOBODY
+    STEAL + player index            (P)
+
+so the space has size(P) actions. Resources are indexed as in topology.RESOURCES.
+
+Legal actions are the same as agents.legal_actions. They are generated from the rules state's
+arrays (see RulesState#settlement_mask and #road_mask), which the game keeps up to date as pieces
+are placed, and from the state's capability bits (see module statemachine).
+
+The settlement and road masks are computed afresh from the buildings and roads arrays on each
+call, with a few numpy operations over 54 nodes and 72 edges, rather than kept as counters which
+each placement updates. Those arrays are shared as they are by undo (module undolog), by
+GameSnapshot's buffer and byte records, and by the vector simulator, and counters would have to
+be kept in step in all of them. bench.py actions measures what recomputing costs (mode
+placement_masks): about 20 microseconds a mask, where making an action costs over 100.
+
+e.g.
+    mask = actions.legal_mask(game)          # (size(P),) bool
+    legal = actions.legal_actions(game)      # int array, e.g. [199, 202]
+    game.apply_action(legal[0])
+
+Game has the same as methods: Game#legal_actions, Game#action_mask. Game#apply_action makes an
+int action through agents.apply.
+
+Ints convert to the action tuples of module agents with #decode and #encode, and to those
+of module snapshot, which use indexes, with #to_tuple and #from_tuple.
+"""
+import itertools
+
+import numpy as np
+
+from catan import rules, statemachine, topology
+from catan.board import PortType
+from catan.pieces import PieceType
+
+PLACE_SETTLEMENT = 0
+PLACE_ROAD = PLACE_SETTLEMENT + topology.NUM_NODES
+PLACE_CITY = PLACE_ROAD + topology.NUM_EDGES
+MOVE_ROBBER = PLACE_CITY + topology.NUM_NODES
+ROLL = MOVE_ROBBER + topology.NUM_TILES
+END_TURN = ROLL + 1
+BUY_DEV_CARD = END_TURN + 1
+PLAY_KNIGHT = BUY_DEV_CARD + 1
+PLAY_ROAD_BUILDER = PLAY_KNIGHT + 1
+PLAY_VICTORY_POINT = PLAY_ROAD_BUILDER + 1
+PLAY_MONOPOLY = PLAY_VICTORY_POINT + 1
+PLAY_YEAR_OF_PLENTY = PLAY_MONOPOLY + topology.NUM_RESOURCES
+YEAR_OF_PLENTY_PAIRS = list(itertools.combinations_with_replacement(range(topology.NUM_RESOURCES), 2))
+TRADE = PLAY_YEAR_OF_PLENTY + len(YEAR_OF_PLENTY_PAIRS)
+STEAL_NOBODY = TRADE + topology.NUM_RESOURCES ** 2
+STEAL = STEAL_NOBODY + 1
+
+_YEAR_OF_PLENTY_INDEX = {pair: i for i, pair in enumerate(YEAR_OF_PLENTY_PAIRS)}
+_SINGLE = {ROLL: 'roll', END_TURN: 'end_turn', BUY_DEV_CARD: 'buy_dev_card', PLAY_KNIGHT: 'play_knight',
+           PLAY_ROAD_BUILDER: 'play_road_builder', PLAY_VICTORY_POINT: 'play_victory_point'}
+_SINGLE_INDEX = {name: action for action, name in _SINGLE.items()}
+# trades of a resource for itself are never legal
+_SAME_RESOURCE = np.zeros((topology.NUM_RESOURCES, topology.NUM_RESOURCES), dtype=bool)
+np.fill_diagonal(_SAME_RESOURCE, True)
+# placing state -> (purchase, first action, stop, legal placements of player p)
+_PLACING = {
+    statemachine.PLACING_SETTLEMENT: (rules.SETTLEMENT, PLACE_SETTLEMENT, PLACE_ROAD, lambda r, p: r.settlement_mask(p)),
+    statemachine.PLACING_ROAD: (rules.ROAD, PLACE_ROAD, PLACE_CITY, lambda r, p: r.road_mask(p)),
+    statemachine.PLACING_CITY: (rules.CITY, PLACE_CITY, MOVE_ROBBER, lambda r, p: r.city_mask(p)),
+}
+
+
+def size(num_players):
+    """
+    :param num_players: int
+    :return: number of actions in the space
+    """
+    return STEAL + num_players
+
+
+###
+# Conversion
+###
+
+
+def to_tuple(action):
+    """
+    :param action: int
+    :return: action tuple with indexes, as GameSnapshot#legal_actions
+    """
+    action = int(action)
+    if action < PLACE_ROAD:
+        return 'place_settlement', action - PLACE_SETTLEMENT
+    if action < PLACE_CITY:
+        return 'place_road', action - PLACE_ROAD
+    if action < MOVE_ROBBER:
+        return 'place_city', action - PLACE_CITY
+    if action < ROLL:
+        return 'move_robber', action - MOVE_ROBBER + 1
+    if action in _SINGLE:
+        return _SINGLE[action],
+    if action < PLAY_YEAR_OF_PLENTY:
+        return 'play_monopoly', action - PLAY_MONOPOLY
+    if action < TRADE:
+        return ('play_year_of_plenty', ) + YEAR_OF_PLENTY_PAIRS[action - PLAY_YEAR_OF_PLENTY]
+    if action < STEAL_NOBODY:
+        return ('trade', ) + divmod(action - TRADE, topology.NUM_RESOURCES)
+    if action == STEAL_NOBODY:
+        return 'steal', None
+    return 'steal', action - STEAL
+
+
+def from_tuple(action):
+    """
+    Inverse of #to_tuple. A roll with a given total, e.g. ('roll', 8), is ROLL.
+
+    :param action: action tuple with indexes, as GameSnapshot#legal_actions
+    :return: int
+    """
+    name = action[0]
+    if name == 'place_settlement':
+        return PLACE_SETTLEMENT + action[1]
+    if name == 'place_road':
+        return PLACE_ROAD + action[1]
+    if name == 'place_city':
+        return PLACE_CITY + action[1]
+    if name == 'move_robber':
+        return MOVE_ROBBER + action[1] - 1
+    if name in _SINGLE_INDEX:
+        return _SINGLE_INDEX[name]
+    if name == 'play_monopoly':
+        return PLAY_MONOPOLY + action[1]
+    if name == 'play_year_of_plenty':
+        return PLAY_YEAR_OF_PLENTY + _YEAR_OF_PLENTY_INDEX[tuple(sorted(action[1:]))]
+    if name == 'trade':
+        return TRADE + action[1] * topology.NUM_RESOURCES + action[2]
+    if name == 'steal':
+        return STEAL_NOBODY if action[1] is None else STEAL + action[1]
+    raise ValueError('Unknown action={}'.format(action))
+
+
+def decode(game, action):
+    """
+    :param game: Game, whose current player makes the action
+    :param action: int
+    :return: action tuple, as agents.legal_actions
+    """
+    indexed = to_tuple(action)
+    name = indexed[0]
+    if name in ('place_settlement', 'place_city'):
+        return name, topology.NODES[indexed[1]]
+    if name == 'place_road':
+        return name, topology.EDGES[indexed[1]]
+    if name == 'steal':
+        return name, None if indexed[1] is None else game.players[indexed[1]]
+    if name == 'play_monopoly':
+        return name, topology.RESOURCES[indexed[1]]
+    if name == 'play_year_of_plenty':
+        return name, topology.RESOURCES[indexed[1]], topology.RESOURCES[indexed[2]]
+    if name == 'trade':
+        give = topology.RESOURCES[indexed[1]]
+        port_type, _ = trade_ratio(game, game.get_cur_player(), give)
+        return name, port_type, give, topology.RESOURCES[indexed[2]]
+    return indexed
+
+
+def encode(game, action):
+    """
+    Inverse of #decode.
+
+    :param game: Game
+    :param action: action tuple, as agents.legal_actions
+    :return: int
+    """
+    name = action[0]
+    if name in ('place_settlement', 'place_city'):
+        return from_tuple((name, topology.NODE_INDEX[action[1]]))
+    if name == 'place_road':
+        return from_tuple((name, topology.EDGE_INDEX[action[1]]))
+    if name == 'steal':
+        return from_tuple((name, None if action[1] is None else game.player_index(action[1])))
+    if name == 'play_monopoly':
+        return from_tuple((name, topology.RESOURCE_INDEX[action[1]]))
+    if name == 'play_year_of_plenty':
+        return from_tuple((name, topology.RESOURCE_INDEX[action[1]], topology.RESOURCE_INDEX[action[2]]))
+    if name == 'trade':
+        return from_tuple((name, topology.RESOURCE_INDEX[action[2]], topology.RESOURCE_INDEX[action[3]]))
+    return from_tuple(action)
+
+
+def describe(action):
+    """
+    :param action: int
+    :return: str, e.g. 'place_road 17'
+    """
+    return ' '.join(str(part) for part in to_tuple(action))
+
+
+###
+# Legal actions
+###
+
+
+def pending_node(game, player):
+    """
+    :return: node index of the player's newest settlement, whose pregame road is to be placed, or None
+    """
+    placed = [coord for coord, ptype in game.board.player_to_pieces.get(player, []) if ptype == PieceType.settlement]
+    return topology.NODE_INDEX[placed[-1]] if placed else None
+
+
+def trade_ratio(game, player, terrain):
+    """
+    :return: (PortType, int), the player's best port for trading terrain away, and its ratio
+    """
+    if game.player_has_port_type(player, PortType(terrain.value)):
+        return PortType(terrain.value), 2
+    if game.player_has_port_type(player, PortType.any3):
+        return PortType.any3, 3
+    return PortType.any4, 4
+
+
+def legal_mask(game):
+    """
+    The actions the current player may take, as agents.legal_actions.
+
+    :param game: Game
+    :return: (size(P),) bool
+    """
+    mask = np.zeros(size(len(game.players)), dtype=bool)
+    caps = game.capabilities()
+    if not caps & statemachine.IN_GAME:
+        return mask
+    r = game.rules
+    player = game.get_cur_player()
+    p = game.cur_player_index()
+
+    if caps & statemachine.IN_PREGAME:
+        if caps & statemachine.CAN_PLACE_SETTLEMENT:
+            mask[PLACE_SETTLEMENT:PLACE_ROAD] = r.settlement_mask(p, connected=False)
+        else:
+            node = pending_node(game, player)
+            if node is not None:
+                mask[PLACE_ROAD:PLACE_CITY] = r.road_mask(p, node)
+        return mask
+
+    state = statemachine.state_id(game.state)
+    if state == statemachine.PLACING_ROAD_BUILDER:
+        mask[PLACE_ROAD:PLACE_CITY] = r.road_mask(p)
+        return mask
+    if state in _PLACING:
+        # a piece chosen with Game#begin_placing, e.g. in the GUI, or by an action half undone
+        purchase, start, stop, pieces = _PLACING[state]
+        if r.affordable()[p, purchase]:
+            mask[start:stop] = pieces(r, p)
+        return mask
+    if caps & statemachine.CAN_MOVE_ROBBER:
+        mask[MOVE_ROBBER:ROLL] = True
+        if game.robber_tile is not None:
+            mask[MOVE_ROBBER + game.robber_tile - 1] = False
+        return mask
+    if caps & statemachine.CAN_STEAL:
+        victims = [game.player_index(victim) for victim in game.stealable_players()]
+        if victims:
+            mask[[STEAL + v for v in victims]] = True
+        else:
+            mask[STEAL_NOBODY] = True
+        return mask
+
+    playable = r.playable_dev_cards()[p] & game.dev_card_state.can_play_dev_card()
+    if caps & statemachine.CAN_ROLL:
+        mask[ROLL] = True
+        mask[PLAY_KNIGHT] = playable[rules.KNIGHT] and caps & statemachine.CAN_PLAY_KNIGHT
+        return mask
+
+    affordable = r.affordable()[p]
+    mask[END_TURN] = caps & statemachine.CAN_END_TURN
+    if caps & statemachine.CAN_BUY_SETTLEMENT and affordable[rules.SETTLEMENT]:
+        mask[PLACE_SETTLEMENT:PLACE_ROAD] = r.settlement_mask(p)
+    if caps & statemachine.CAN_BUY_CITY and affordable[rules.CITY]:
+        mask[PLACE_CITY:MOVE_ROBBER] = r.city_mask(p)
+    road_edges = None
+    if caps & statemachine.CAN_BUY_ROAD and affordable[rules.ROAD]:
+        road_edges = mask[PLACE_ROAD:PLACE_CITY] = r.road_mask(p)
+    mask[BUY_DEV_CARD] = caps & statemachine.CAN_BUY_DEV_CARD and affordable[rules.DEV_CARD]
+    if caps & statemachine.CAN_TRADE:
+        ratios = r.bank_ratios(p, game.port_access())
+        trades = (r.hands[p] >= ratios)[:, None] & (r.bank > 0)[None, :] & ~_SAME_RESOURCE
+        mask[TRADE:STEAL_NOBODY] = trades.ravel()
+    mask[PLAY_KNIGHT] = playable[rules.KNIGHT] and caps & statemachine.CAN_PLAY_KNIGHT
+    if playable[rules.MONOPOLY] and caps & statemachine.CAN_PLAY_MONOPOLY:
+        mask[PLAY_MONOPOLY:PLAY_YEAR_OF_PLENTY] = True
+    if playable[rules.YEAR_OF_PLENTY] and caps & statemachine.CAN_PLAY_YEAR_OF_PLENTY:
+        mask[PLAY_YEAR_OF_PLENTY:TRADE] = True
+    if (playable[rules.ROAD_BUILDER] and caps & statemachine.CAN_PLAY_ROAD_BUILDER
+            and r.supply[p, rules.ROAD] >= 2):
+        if road_edges is None:
+            road_edges = r.road_mask(p)
+        mask[PLAY_ROAD_BUILDER] = road_edges.any()
+    mask[PLAY_VICTORY_POINT] = playable[rules.VICTORY_POINT] and caps & statemachine.CAN_PLAY_VICTORY_POINT
+    return mask
+
+
+def legal_actions(game):
+    """
+    :param game: Game
+    :return: int array of the actions the current player may take, in increasing order
+    """
+    return np.flatnonzero(legal_mask(game))
+
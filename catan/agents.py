@@ -0,0 +1,552 @@
+"""
+module agents provides agents, which decide actions for players, and a registry of agents by name.
+
+An action is a tuple of a Game method name and its arguments, e.g.
+
+    ('roll', )
+    ('place_settlement', 0x67)
+    ('move_robber', 5)
+    ('steal', Player(2, 'josh', 'blue'))
+    ('trade', PortType.any4, Terrain.wood, Terrain.ore)   # 4 wood to the bank for 1 ore
+    ('play_year_of_plenty', Terrain.wheat, Terrain.ore)
+    ('end_turn', )
+
+Use #legal_actions to list the current player's actions and #apply to make one. Dice are rolled
+by #apply, so an agent only decides when to roll.
+
+Agents are registered by name with #register. A player whose name is a registered name is played
+by a new agent of that name, e.g. a player named 'agent2' by the agent registered as 'agent2',
+unless Game#set_agent gives it another. See Game#get_agent.
+
+Subclasses of Agent implement #decide, for one game, or #decide_batch, for many games at once.
+Use #drive to play many games in lock-step, with one #decide_batch call per agent per step.
+"""
+import itertools
+import logging
+import random
+
+import numpy as np
+
+import catan.actions
+import catan.states
+from catan import rules
+from catan import statemachine
+from catan import topology
+from catan import vectorsim
+from catan.board import Port
+from catan.mcts import MCTS
+from catan.pieces import PieceType
+from catan.qlearning import BoardFeatures, QTable, choose
+from catan.snapshot import GameSnapshot
+from catan.trading import CatanTrade
+
+_REGISTRY = dict()
+
+
+def register(*names):
+    """
+    Class decorator which registers an Agent subclass under one or more names.
+
+    e.g.
+        @register('randomagent', 'agent1')
+        class RandomAgent(Agent): ...
+    """
+    def decorator(cls):
+        for name in names:
+            if name in _REGISTRY:
+                raise ValueError('Agent name={} is already registered to {}'.format(name, _REGISTRY[name]))
+            _REGISTRY[name] = cls
+        return cls
+    return decorator
+
+
+def registered():
+    """
+    :return: dict name -> Agent subclass
+    """
+    return dict(_REGISTRY)
+
+
+def get(name):
+    """
+    :param name: registered name
+    :return: Agent subclass
+    """
+    if name not in _REGISTRY:
+        raise KeyError('No agent registered with name={}, registered={}'.format(name, sorted(_REGISTRY)))
+    return _REGISTRY[name]
+
+
+class Agent(object):
+    """
+    class Agent decides actions for the players it plays.
+
+    Subclasses must implement #decide or #decide_batch. Each defaults to the other.
+    """
+    def decide(self, game):
+        """
+        :param game: Game, whose current player this agent plays
+        :return: action, one of #legal_actions(game)
+        """
+        return self.decide_batch([game])[0]
+
+    def decide_batch(self, games):
+        """
+        Decide for many games at once. Override this to evaluate games in one vectorised call.
+
+        :param games: list(Game)
+        :return: list of actions, one per game
+        """
+        return [self.decide(game) for game in games]
+
+    def __repr__(self):
+        return '<{}>'.format(self.__class__.__name__)
+
+
+###
+# Legal actions
+###
+
+
+def settlement_nodes(game, player, connected=True):
+    """
+    Nodes where the player may build a settlement: empty, with no building on a neighbouring node,
+    and, if connected, touching one of the player's roads. See RulesState#settlement_mask.
+
+    :return: list of node coords
+    """
+    mask = game.rules.settlement_mask(game.player_index(player), connected)
+    return [topology.NODES[n] for n in np.flatnonzero(mask)]
+
+
+def road_edges(game, player):
+    """
+    Edges where the player may build a road. In the pregame, roads touch the player's newest
+    settlement. Otherwise they touch one of the player's buildings, or one of the player's roads
+    at a node without another player's building. See RulesState#road_mask.
+
+    :return: list of edge coords
+    """
+    if game.state.is_in_pregame():
+        node = catan.actions.pending_node(game, player)
+        if node is None:
+            return list()
+        mask = game.rules.road_mask(game.player_index(player), node)
+    else:
+        mask = game.rules.road_mask(game.player_index(player))
+    return [topology.EDGES[e] for e in np.flatnonzero(mask)]
+
+
+def city_nodes(game, player):
+    """
+    :return: list of node coords holding the player's settlements
+    """
+    return [coord for (_, coord), piece in game.board.pieces.items()
+            if piece.type == PieceType.settlement and piece.owner == player]
+
+
+def trade_action(game, trade):
+    """
+    :param game: Game
+    :param trade: CatanTrade, by the current player
+    :return: the trade as an action tuple, or None if it is not one of the actions, e.g. a trade with
+             another player, or with the bank at a worse ratio than the player's best
+    """
+    giving, getting = trade.giving(), trade.getting()
+    if not isinstance(trade.getter(), Port) or len(giving) != 1 or len(getting) != 1:
+        return None
+    (num, give), (num_getting, get) = giving[0], getting[0]
+    port_type, ratio = catan.actions.trade_ratio(game, game.get_cur_player(), give)
+    if num != ratio or num_getting != 1 or give == get:
+        return None
+    return 'trade', port_type, give, get
+
+
+def legal_actions(game):
+    """
+    The actions the current player may take.
+
+    :param game: Game, in game
+    :return: list of actions
+    """
+    state = game.state
+    caps = game.capabilities()
+    if not caps & statemachine.IN_GAME:
+        return list()
+    player = game.get_cur_player()
+    p = game.cur_player_index()
+
+    if caps & statemachine.IN_PREGAME:
+        if caps & statemachine.CAN_PLACE_SETTLEMENT:
+            return [('place_settlement', node) for node in settlement_nodes(game, player, connected=False)]
+        return [('place_road', edge) for edge in road_edges(game, player)]
+
+    if isinstance(state, catan.states.GameStatePlacingRoadBuilderPieces):
+        return [('place_road', edge) for edge in road_edges(game, player)]
+    if isinstance(state, catan.states.GameStatePlacingPiece):
+        # a piece chosen with Game#begin_placing, e.g. in the GUI, or by an action half undone
+        purchase = {PieceType.road: rules.ROAD, PieceType.settlement: rules.SETTLEMENT, PieceType.city: rules.CITY}
+        if not game.rules.affordable()[p][purchase[state.piece_type]]:
+            return list()
+        if state.piece_type == PieceType.road:
+            return [('place_road', edge) for edge in road_edges(game, player)]
+        if state.piece_type == PieceType.settlement:
+            return [('place_settlement', node) for node in settlement_nodes(game, player)]
+        return [('place_city', node) for node in city_nodes(game, player)]
+    if caps & statemachine.CAN_MOVE_ROBBER:
+        return [('move_robber', tile_id) for tile_id in topology.TILE_IDS if tile_id != game.robber_tile]
+    if caps & statemachine.CAN_STEAL:
+        victims = sorted(game.stealable_players(), key=lambda v: v.seat)
+        return [('steal', victim) for victim in victims] or [('steal', None)]
+
+    actions = list()
+    playable = game.rules.playable_dev_cards()[p] & game.dev_card_state.can_play_dev_card()
+    if caps & statemachine.CAN_ROLL:
+        actions.append(('roll', ))
+        if playable[rules.KNIGHT] and caps & statemachine.CAN_PLAY_KNIGHT:
+            actions.append(('play_knight', ))
+        return actions
+
+    affordable = game.rules.affordable()[p]
+    if caps & statemachine.CAN_END_TURN:
+        actions.append(('end_turn', ))
+    if caps & statemachine.CAN_BUY_SETTLEMENT and affordable[rules.SETTLEMENT]:
+        actions.extend(('place_settlement', node) for node in settlement_nodes(game, player))
+    if caps & statemachine.CAN_BUY_CITY and affordable[rules.CITY]:
+        actions.extend(('place_city', node) for node in city_nodes(game, player))
+    if caps & statemachine.CAN_BUY_ROAD and affordable[rules.ROAD]:
+        actions.extend(('place_road', edge) for edge in road_edges(game, player))
+    if caps & statemachine.CAN_BUY_DEV_CARD and affordable[rules.DEV_CARD]:
+        actions.append(('buy_dev_card', ))
+    if caps & statemachine.CAN_TRADE:
+        hand, bank = game.rules.hands[p], game.rules.bank
+        for give in topology.RESOURCES:
+            port_type, ratio = catan.actions.trade_ratio(game, player, give)
+            if hand[topology.RESOURCE_INDEX[give]] < ratio:
+                continue
+            actions.extend(('trade', port_type, give, get) for get in topology.RESOURCES
+                           if get != give and bank[topology.RESOURCE_INDEX[get]] > 0)
+    if playable[rules.KNIGHT] and caps & statemachine.CAN_PLAY_KNIGHT:
+        actions.append(('play_knight', ))
+    if playable[rules.MONOPOLY] and caps & statemachine.CAN_PLAY_MONOPOLY:
+        actions.extend(('play_monopoly', terrain) for terrain in topology.RESOURCES)
+    if playable[rules.YEAR_OF_PLENTY] and caps & statemachine.CAN_PLAY_YEAR_OF_PLENTY:
+        actions.extend(('play_year_of_plenty', t1, t2)
+                       for t1, t2 in itertools.combinations_with_replacement(topology.RESOURCES, 2))
+    if (playable[rules.ROAD_BUILDER] and caps & statemachine.CAN_PLAY_ROAD_BUILDER
+            and game.rules.supply[p, rules.ROAD] >= 2 and road_edges(game, player)):
+        actions.append(('play_road_builder', ))
+    if playable[rules.VICTORY_POINT] and caps & statemachine.CAN_PLAY_VICTORY_POINT:
+        actions.append(('play_victory_point', ))
+    return actions
+
+
+def apply(game, action, outcome=None):
+    """
+    Make an action for the current player. Observers are notified once, when it is done.
+    If the game has an event stream, the action is recorded in it, see module eventstream.
+
+    :param game: Game
+    :param action: action tuple, see #legal_actions
+    :param outcome: int, optional, the dice total of a roll, or the resource index taken by a steal.
+                    Drawn at random if not given.
+    """
+    name, args = action[0], action[1:]
+    state = game.state
+    stream = game.stream
+    if stream is not None:
+        index = stream.append(catan.actions.encode(game, action), game.cur_player_index())
+    try:
+        _apply(game, state, name, args, outcome)
+    except Exception:
+        if stream is not None:
+            stream.truncate(index)
+        raise
+    if stream is not None:
+        if name == 'roll':
+            outcome = game.last_roll
+        elif name == 'steal':
+            outcome = game.last_stolen
+        stream.commit(index, outcome)
+
+
+def _apply(game, state, name, args, outcome):
+    with game.batch(name):
+        if name in ('place_road', 'place_settlement', 'place_city') and not (
+                state.is_in_pregame() or isinstance(state, catan.states.GameStatePlacingPiece)):
+            game.begin_placing(PieceType(name[len('place_'):]))
+        if name == 'roll':
+            game.roll(outcome if outcome is not None else random.randint(1, 6) + random.randint(1, 6))
+        elif name == 'steal' and outcome is not None:
+            game.steal(args[0], outcome)
+        elif name == 'trade':
+            port_type, give, get = args
+            _, ratio = catan.actions.trade_ratio(game, game.get_cur_player(), give)
+            trade = CatanTrade(giver=game.get_cur_player(), getter=Port(1, 'OO', port_type))
+            trade.give(give, ratio)
+            trade.get(get)
+            game.trade(trade)
+        elif name == 'play_road_builder':
+            game.begin_road_builder()
+        else:
+            getattr(game, name)(*args)
+
+
+def drive(games):
+    """
+    Play many games in lock-step until no game is waiting on an agent. At each step, games are
+    grouped by the agent to move, and each agent decides for its group in one #decide_batch call.
+
+    :param games: list(Game), started
+    :return: number of steps taken
+    """
+    steps = 0
+    # the games' own agent turns are held off meanwhile, see Game#play_agent_turn
+    agent_turns = [game.options.get('agent_turns') for game in games]
+    for game in games:
+        game.options['agent_turns'] = 'off'
+    try:
+        while True:
+            waiting = dict()
+            for game in games:
+                if not game.state.is_in_game():
+                    continue
+                agent = game.get_agent(game.get_cur_player())
+                if agent is not None:
+                    waiting.setdefault(id(agent), (agent, list()))[1].append(game)
+            if not waiting:
+                return steps
+            for agent, group in waiting.values():
+                for game, action in zip(group, agent.decide_batch(group)):
+                    apply(game, action)
+            steps += 1
+    finally:
+        for game, previous in zip(games, agent_turns):
+            game.options['agent_turns'] = previous
+
+
+def stacked(games):
+    """
+    Stack the positions of many games in VectorSimulators, one for each number of players and
+    turn options among them, for agents which decide from arrays, see Agent#decide_batch.
+
+    :param games: list(Game), in game
+    :return: list of (list of indexes into games, VectorSimulator, its (n, actions.size(P)) legal mask)
+    """
+    groups = dict()
+    for k, game in enumerate(games):
+        position = GameSnapshot.from_game(game)
+        groups.setdefault((position.num_players, position.turns, position.max_turns), list()).append((k, position))
+    result = list()
+    for group in groups.values():
+        # seeded from module random, which agents' #decide draws from
+        sim = vectorsim.VectorSimulator.from_snapshots([position for _, position in group],
+                                                       seed=random.getrandbits(32))
+        mask = sim.legal_mask(np.arange(len(group)))
+        for row in np.flatnonzero(~mask.any(axis=1)):
+            raise IndexError('No legal action in game={}'.format(games[group[row][0]]))
+        result.append(([k for k, _ in group], sim, mask))
+    return result
+
+
+###
+# Agents
+###
+
+
+@register('randomagent', 'agent1')
+class RandomAgent(Agent):
+    """
+    class RandomAgent picks uniformly among the legal actions.
+    """
+    def __init__(self, rng=random):
+        """
+        :param rng: random.Random-like object
+        """
+        self.rng = rng
+
+    def decide(self, game):
+        return self.rng.choice(legal_actions(game))
+
+    def __getstate__(self):
+        # module random does not pickle; a copy in another process draws from that process's
+        return dict(self.__dict__, rng=None) if self.rng is random else self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.rng is None:
+            self.rng = random
+
+
+@register('bestagent', 'agent2')
+class BestAgent(Agent):
+    """
+    class BestAgent takes the best opening (see module opening), then plays greedily: cities, then
+    settlements, then dev cards, then roads when there is nowhere left to build a settlement.
+    Before ending its turn it trades surplus cards with the bank for cards its next purchase needs.
+    The robber goes where it blocks the most production of other players, and it steals from
+    whoever holds the most cards.
+    """
+    _PRIORITY = ['play_knight', 'roll', 'place_city', 'place_settlement', 'buy_dev_card',
+                 'play_victory_point', 'play_monopoly', 'play_year_of_plenty', 'play_road_builder',
+                 'place_road', 'trade', 'end_turn']
+
+    def decide(self, game):
+        if game.state.is_in_pregame():
+            if game.state.can_place_settlement():
+                node, _ = game.get_best_assignment(game.board.pieces)
+                return 'place_settlement', node
+            node = game.board.player_to_pieces[game.get_cur_player()][-1][0]
+            return 'place_road', game.get_best_road(game.board.pieces, node)
+        actions = legal_actions(game)
+        if actions[0][0] == 'move_robber':
+            return max(actions, key=lambda a: self._robber_score(game, a[1]))
+        if actions[0][0] == 'steal':
+            return max(actions, key=lambda a: -1 if a[1] is None else
+                       int(game.rules.hands[game.player_index(a[1])].sum()))
+        by_name = dict()
+        for action in actions:
+            by_name.setdefault(action[0], list()).append(action)
+        if 'play_knight' in by_name and not self._robber_on_own_tile(game):
+            del by_name['play_knight']
+        if 'place_road' in by_name and settlement_nodes(game, game.get_cur_player()):
+            # save brick and wood for a settlement while there is somewhere to build one
+            del by_name['place_road']
+        if 'trade' in by_name:
+            by_name['trade'] = self._useful_trades(game, by_name['trade'])
+            if not by_name['trade']:
+                del by_name['trade']
+        for name in self._PRIORITY:
+            if name in by_name:
+                logging.debug('{} chose {}'.format(self, name))
+                return random.choice(by_name[name])
+        return random.choice(actions)
+
+    def decide_batch(self, games):
+        """
+        Opening settlements off the opening book's line are chosen board by board, in one
+        OpeningEvaluator#best_placements call per board. After the opening, the games are
+        stacked (see #stacked) and vectorsim.greedy_policy decides for all of them from their
+        legal masks. Opening roads are decided one game at a time, as by #decide.
+        """
+        result = [None] * len(games)
+        boards, rest = dict(), list()
+        for k, game in enumerate(games):
+            if not game.state.is_in_pregame():
+                rest.append(k)
+                continue
+            line = game.opening_line()
+            placement = line.settlement(game.rules.buildings, game.cur_player_index()) if line else None
+            if not game.state.can_place_settlement() or placement is not None:
+                result[k] = self.decide(game)
+            else:
+                evaluator = game.opening_evaluator()
+                boards.setdefault(id(evaluator), (evaluator, list()))[1].append(k)
+        for evaluator, group in boards.values():
+            nodes = evaluator.best_placements(np.stack([games[k].rules.buildings for k in group]),
+                                              np.array([games[k].cur_player_index() for k in group]))
+            for k, node in zip(group, nodes):
+                result[k] = 'place_settlement', topology.NODES[node]
+        if rest:
+            for indexes, sim, mask in stacked([games[k] for k in rest]):
+                chosen = vectorsim.greedy_policy(sim, np.arange(len(indexes)), mask, sim.rng)
+                for i, action in zip(indexes, chosen):
+                    result[rest[i]] = catan.actions.decode(games[rest[i]], int(action))
+        return result
+
+    @staticmethod
+    def _useful_trades(game, trades):
+        """
+        Trades which get a card the next purchase lacks, for cards it does not need.
+        """
+        p = game.cur_player_index()
+        player = game.get_cur_player()
+        if city_nodes(game, player) and game.rules.supply[p, rules.CITY] > 0:
+            target = rules.CITY
+        elif settlement_nodes(game, player) and game.rules.supply[p, rules.SETTLEMENT] > 0:
+            target = rules.SETTLEMENT
+        else:
+            target = rules.DEV_CARD
+        hand, cost = game.rules.hands[p], rules.COSTS[target]
+        useful = list()
+        for action in trades:
+            _, _, give, get = action
+            _, ratio = catan.actions.trade_ratio(game, player, give)
+            g, r = topology.RESOURCE_INDEX[give], topology.RESOURCE_INDEX[get]
+            if hand[r] < cost[r] and hand[g] - ratio >= cost[g]:
+                useful.append(action)
+        return useful
+
+    @staticmethod
+    def _robber_score(game, tile_id):
+        p = game.cur_player_index()
+        touching = topology.NODE_TILES[:, tile_id - 1].astype(bool)
+        on_tile = game.rules.buildings[:, touching].sum(axis=1)
+        if on_tile[p]:
+            return -1.0
+        return float(on_tile.sum() * topology.DICE_PROBABILITY[game.rules.tile_number[tile_id - 1]])
+
+    @staticmethod
+    def _robber_on_own_tile(game):
+        if game.robber_tile is None:
+            return False
+        touching = topology.NODE_TILES[:, game.robber_tile - 1].astype(bool)
+        return bool(np.any(game.rules.buildings[game.cur_player_index(), touching]))
+
+
+@register('mctsagent')
+class MCTSAgent(Agent):
+    """
+    class MCTSAgent searches each decision with Monte Carlo tree search, see module mcts. Its
+    search keeps its tree between decisions. Decisions with a single legal action are not searched.
+
+    Opening placements are BestAgent's (see Game#get_best_assignment), which are better than
+    a search of a few hundred playouts over some fifty settlements can tell apart.
+    """
+    def __init__(self, iterations=200, seconds=None, processes=1, **options):
+        """
+        :param iterations: playouts per decision
+        :param seconds: time budget per decision, optional
+        :param processes: search processes
+        :param options: further mcts.MCTS options
+        """
+        self.search = MCTS(iterations=iterations, seconds=seconds, processes=processes, **options)
+
+    def decide(self, game):
+        if game.state.is_in_pregame():
+            return BestAgent().decide(game)
+        position = GameSnapshot.from_game(game)
+        return position.game_action(self.search.best_action(position), game)
+
+
+@register('qlearn')
+class QLearnAgent(Agent):
+    """
+    class QLearnAgent places its opening settlements by a Q-table trained with module qlearning,
+    and otherwise plays as BestAgent. Without a saved table, every placement looks alike to it.
+    """
+    TABLE_PATH = 'qtable.npz'
+    _tables = dict() # path -> QTable, shared by every agent in the process
+
+    def __init__(self, table=None):
+        """
+        :param table: qlearning.QTable, default the one saved at TABLE_PATH, if any
+        """
+        if table is None:
+            if self.TABLE_PATH not in QLearnAgent._tables:
+                try:
+                    QLearnAgent._tables[self.TABLE_PATH] = QTable.load(self.TABLE_PATH)
+                except FileNotFoundError:
+                    logging.debug('No Q-table at path={}, using an empty one'.format(self.TABLE_PATH))
+                    QLearnAgent._tables[self.TABLE_PATH] = QTable()
+            table = QLearnAgent._tables[self.TABLE_PATH]
+        self.table = table
+        self._board, self._features = None, None
+
+    def decide(self, game):
+        if not (game.state.is_in_pregame() and game.state.can_place_settlement()):
+            return BestAgent().decide(game)
+        if self._board is not game.board:
+            self._board, self._features = game.board, BoardFeatures.from_board(game.board)
+        node, _, _ = choose(self.table, self._features, game.rules.buildings, game.cur_player_index())
+        return 'place_settlement', topology.NODES[node]
@@ -2,11 +2,11 @@ import copy
 from enum import Enum
 import logging
 import hexgrid
-from catan import boardbuilder, states
+from catan import boardbuilder, events, notifications, states
 from catan.pieces import PieceType, Piece
 
 
-class Board(object):
+class Board(notifications.Observable):
     """
     class Board represents a catan board. It has tiles, ports, and pieces.
 
@@ -15,6 +15,13 @@ class Board(object):
     Use #place_piece, #move_piece, and #remove_piece to manage pieces on the board.
 
     Use #get_pieces to get all the pieces at a particular coordinate of the allowed types.
+
+    A Board has observers, as a Game does, see module notifications. Edits to tiles, numbers and
+    ports notify them of a BOARD change, and locking of a STATE change. A Board publishes
+    PiecePlaced and BoardReset events on its events bus, which its game shares, see module events.
+
+    While an undoable game action runs, journal is set to the game's undolog recording, and
+    changes to pieces and player_to_pieces are reported to it before they are made.
     """
     def __init__(self, board=None, terrain=None, numbers=None, ports=None, pieces=None, players=None):
         """
@@ -33,6 +40,8 @@ class Board(object):
         self.pieces = dict()
 
         self.player_to_pieces = {}
+        self.journal = None # set by undolog while recording
+        self.events = events.EventBus() # replaced by the game's, see Game
 
         self.resources_owned = {}
         self.pregame_coords = {}
@@ -64,6 +73,9 @@ class Board(object):
         for k, v in self.__dict__.items():
             if k == 'observers':
                 setattr(result, k, set(v))
+            elif k == 'journal':
+                # a copy is not recorded by the original's undo log, see module undolog
+                setattr(result, k, None)
             else:
                 setattr(result, k, copy.deepcopy(v, memo))
         return result
@@ -80,22 +92,16 @@ class Board(object):
         self.state.board = self
 
         self.pieces = board.pieces
+        self.player_to_pieces = board.player_to_pieces
         self.opts = board.opts
         self.observers = board.observers
 
         self.notify_observers()
 
-    def notify_observers(self):
-        for obs in self.observers:
-            obs.notify(self)
-
     def lock(self):
-        print('board.lock called and notifying observers')
         self.state = states.BoardStateLocked(self)
-        for port in self.ports.copy():
-            if port.type == PortType.none:
-                self.ports.remove(port)
-        self.notify_observers()
+        self.ports = [port for port in self.ports if port.type != PortType.none]
+        self.notify_observers(notifications.STATE)
 
     def unlock(self):
         self.state = states.BoardStateModifiable(self)
@@ -115,19 +121,20 @@ class Board(object):
         if players is not None:
             opts['players'] = players
         boardbuilder.reset(self, opts=opts)
+        self.events.publish(events.BoardReset)
 
     def can_place_piece(self, piece, coord):
         if piece.type == PieceType.road:
-            logging.warning('"Can place road" not yet implemented')
+            logging.debug('"Can place road" not yet implemented')
             return True
         elif piece.type == PieceType.settlement:
-            logging.warning('"Can place settlement" not yet implemented')
+            logging.debug('"Can place settlement" not yet implemented')
             return True
         elif piece.type == PieceType.city:
-            logging.warning('"Can place city" not yet implemented')
+            logging.debug('"Can place city" not yet implemented')
             return True
         elif piece.type == PieceType.robber:
-            logging.warning('"Can place robber" not yet implemented')
+            logging.debug('"Can place robber" not yet implemented')
             return True
         else:
             logging.debug('Can\'t place piece={} on coord={}'.format(
@@ -144,14 +151,15 @@ class Board(object):
             piece, hex(coord)
         ))
         hex_type = self._piece_type_to_hex_type(piece.type)
-        print('hex_type={}'.format(hex_type))
-        print('setting self.pieces[hex_type={0}, coord={1}] = piece={2}'.format(hex_type, coord, piece))
+        if self.journal is not None:
+            self.journal.record_item(self.pieces, (hex_type, coord))
+            self.journal.record_item(self.player_to_pieces, piece.owner)
         self.pieces[(hex_type, coord)] = piece
 
-        if piece.owner in self.player_to_pieces:
-            self.player_to_pieces[piece.owner].append((coord, piece.type))
-        else:
-            self.player_to_pieces[piece.owner] = [(coord, piece.type)]
+        # lists are replaced rather than appended to, so a journal's record of the old list stays valid
+        self.player_to_pieces[piece.owner] = self.player_to_pieces.get(piece.owner, []) + [(coord, piece.type)]
+        if piece.type != PieceType.robber:
+            self.events.publish(events.PiecePlaced, piece.type, coord, piece.owner)
 
     def move_piece(self, piece, from_coord, to_coord):
         from_index = (self._piece_type_to_hex_type(piece.type), from_coord)
@@ -163,6 +171,8 @@ class Board(object):
 
     def remove_piece(self, piece, coord):
         index = (self._piece_type_to_hex_type(piece.type), coord)
+        if self.journal is not None:
+            self.journal.record_item(self.pieces, index)
         try:
             self.pieces.pop(index)
             logging.debug('Removed piece={}'.format(index))
@@ -170,7 +180,6 @@ class Board(object):
             logging.critical('Attempted to remove piece={} which was NOT on the board'.format(index))
 
     def get_pieces(self, types=tuple(), coord=None):
-        print('get_pieces called')
         if coord is None:
             logging.critical('Attempted to get_piece with coord={}'.format(coord))
             return Piece(None, None)
@@ -221,7 +230,7 @@ class Board(object):
             tile.terrain = next_terrain
         else:
             logging.debug('Attempted to cycle terrain on tile={} on a locked board'.format(tile_id))
-        self.notify_observers()
+        self.notify_observers(notifications.BOARD)
 
     def cycle_hex_number(self, tile_id):
         if self.state.modifiable():
@@ -231,7 +240,7 @@ class Board(object):
             tile.number = next_hex_number
         else:
             logging.debug('Attempted to cycle number on tile={} on a locked board'.format(tile_id))
-        self.notify_observers()
+        self.notify_observers(notifications.BOARD)
 
     def cycle_port_type(self, tile_id, direction):
         if self.state.modifiable():
@@ -239,7 +248,7 @@ class Board(object):
             port.type = PortType.next_ui(port.type)
         else:
             logging.debug('Attempted to cycle port on coord=({},{}) on a locked board'.format(tile_id, direction))
-        self.notify_observers()
+        self.notify_observers(notifications.BOARD)
 
     def rotate_ports(self):
         """
@@ -249,7 +258,7 @@ class Board(object):
         for port in self.ports:
             port.tile_id = ((port.tile_id + 1) % len(hexgrid.coastal_tile_ids())) + 1
             port.direction = hexgrid.rotate_direction(hexgrid.EDGE, port.direction, ccw=True)
-        self.notify_observers()
+        self.notify_observers(notifications.BOARD)
 
     def set_terrain(self, terrain):
         self.tiles = [Tile(tile.tile_id, t, tile.number) for t, tile in zip(terrain, self.tiles)]
@@ -310,6 +319,14 @@ class Terrain(Enum):
         else:
             raise ValueError('Illegal Terrain short form {}'.format(char))
 
+    def short_form(self):
+        """
+        Inverse of #from_short_form.
+        """
+        if self == Terrain.wheat:
+            return 'h'
+        return self.value[0]
+
 
 class HexNumber(Enum):
     none = None
@@ -331,6 +348,22 @@ class HexNumber(Enum):
         else:
             return HexNumber(int(digit))
 
+    @property
+    def pips(self):
+        """
+        The number of ways two dice can roll this number, e.g. 5 for a six. None has none.
+        """
+        if self.value is None:
+            return 0
+        return 6 - abs(7 - self.value)
+
+    @property
+    def probability(self):
+        """
+        The probability of rolling this number on two dice in a turn, pips / 36.
+        """
+        return self.pips / 36
+
 
 class PortType(Enum):
     any4 = '4:1' # not used in UI, only used in trading
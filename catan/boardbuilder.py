@@ -21,7 +21,6 @@ import logging
 import pprint
 import random
 import hexgrid
-import catan.game
 import catan.states
 import catan.board
 import catan.pieces
@@ -44,7 +43,6 @@ def get_opts(opts):
     :param opts: dictionary mapping str->str.
     :return: dictionary mapping str->Opt. All possible keys are present.
     """
-    print('get_opts called with opts={}'.format(opts))
     defaults = {
         'board': None,
         'terrain': Opt.random,
@@ -70,18 +68,31 @@ def get_opts(opts):
         # pprint.pformat(defaults),
         # pprint.pformat(opts),
         # pprint.pformat(_opts)))
-    print('get_opts returning _opts={}'.format(_opts))
     return _opts
 
 
-def build(opts=None):
+def build(opts=None, catalogue=None, percentile=None):
     """
     Build a new board using the given options.
+
+    If a catalogue is given, the tiles and ports are drawn from it instead of being generated,
+    and the terrain, numbers, and ports options are ignored. See module catalogue.
+
     :param opts: dictionary mapping str->Opt
+    :param catalogue: catalogue.BoardCatalogue, optional
+    :param percentile: fairness percentile to draw from the catalogue, on [0,100], optional.
+                       If not given, the board is drawn uniformly from the catalogue.
     :return: the new board, Board
     """
-    print('build called with opts={0}, calling modify with opts and board={1}'.format(opts, catan.board.Board()))
     board = catan.board.Board()
+    if catalogue is not None:
+        entry = catalogue.draw(percentile=percentile)
+        opts = dict(opts or {})
+        opts['board'] = entry.board_string()
+        modify(board, opts)
+        board.opts['board'] = opts['board']
+        board.ports = entry.ports()
+        return board
     modify(board, opts)
     return board
 
@@ -90,7 +101,6 @@ def reset(board, opts=None):
     """
     Alias for #modify. Resets an existing board.
     """
-    print('reset called with board={0}, opts={1}, calling modify with opts'.format(board, opts))
     modify(board, opts)
     return None
 
@@ -102,21 +112,14 @@ def modify(board, opts=None):
     :param opts: dictionary mapping str->Opt
     :return: None
     """
-    print('modify called with board={0}, opts={1}'.format(board, opts))
-    print('calling get_opts with opts={}'.format(opts))
     opts = get_opts(opts)
     if opts['board'] is not None:
-        print('modify calling _read_tiles_from_string({})=board.tiles'.format(opts['board']))
         board.tiles = _read_tiles_from_string(opts['board'])
     else:
-        print('modify setting board.tiles=_generate_tiles({0}, {1})'.format(opts['terrain'], opts['numbers']))
         board.tiles = _generate_tiles(opts['terrain'], opts['numbers'])
-    print('modify calling _get_ports(opts[\'ports\']={})'.format(opts['ports']))
     board.ports = _get_ports(opts['ports'])
-    print('modify setting board.state=catan.states.BoardStateModifiable(board={})'.format(board))
     board.state = catan.states.BoardStateModifiable(board)
 
-    print('modify setting board.pieces=_get_pieces(board.tiles, board.ports, opts[players], opts[pieces])')
     board.pieces = _get_pieces(board.tiles, board.ports, opts['players'], opts['pieces'])
 
     
@@ -144,7 +147,6 @@ def _get_tiles(board=None, terrain=None, numbers=None):
     :param numbers_opts: Opt
     :return: list(Tile)
     """
-    print('_get_tiles called with board={0}, terrain={1}, numbers={2}'.format(board, terrain, numbers))
     if board is not None:
         # we have a board given, ignore the terrain and numbers opts and log warnings
         # if they were supplied
@@ -157,7 +159,6 @@ def _get_tiles(board=None, terrain=None, numbers=None):
 
 
 def _read_tiles_from_string(board_str):
-    print('_read_tiles_from_string called with board_str={}'.format(board_str))
     terrain = [catan.board.Terrain.from_short_form(char) for char in board_str.split(' ')
                if char in ('w', 'b', 'h', 's', 'o', 'd')]
     numbers = [catan.board.HexNumber.from_digit_or_none(num) for num in board_str.split(' ')
@@ -170,7 +171,6 @@ def _read_tiles_from_string(board_str):
 
 
 def _generate_tiles(terrain_opts, numbers_opts):
-    print('_generate_tiles called with terrain_opts={0}, numbers_opts={1}'.format(terrain_opts, numbers_opts))
     terrain = None
     numbers = None
 
@@ -249,8 +249,6 @@ def _generate_tiles(terrain_opts, numbers_opts):
     # convert each tuple to type Tile 
     tiles = [catan.board.Tile(i, t, n) for i, (t, n) in enumerate(tile_data, 1)]
 
-    print('returning tiles generated with opt.terrain=random, opt.numbers=random: {}'.format(tile_data))
-
     return tiles
 
 
@@ -267,7 +265,6 @@ def _get_ports(port_opts):
     :param port_opts: Opt
     :return: list(Port)
     """
-    print('_get_ports called with port_opts={}'.format(port_opts))
     if port_opts in [Opt.preset, Opt.debug]:
         _preset_ports = [(1, 'NW', catan.board.PortType.any3),
                          (2, 'W', catan.board.PortType.wood),
@@ -301,12 +298,11 @@ def _get_pieces(tiles, ports, players_opts, pieces_opts):
     :param pieces_opts: Opt
     :return: dictionary mapping (hexgrid.TYPE, coord:int) -> Piece
     """
-    print('_get_pieces called with tiles={0}, ports={1}, players_opts={2}, pieces_opts={3}'
-        .format(tiles, ports, players_opts, pieces_opts))
     if pieces_opts == Opt.empty:
         return dict()
     elif pieces_opts == Opt.debug:
-        players = catan.game.Game.get_debug_players()
+        from catan.game import Game
+        players = Game.get_debug_players()
         return {
             (hexgrid.NODE, 0x23): catan.pieces.Piece(catan.pieces.PieceType.settlement, players[0]),
             (hexgrid.EDGE, 0x22): catan.pieces.Piece(catan.pieces.PieceType.road, players[0]),
@@ -334,5 +330,4 @@ def _check_red_placement(tiles):
 
     Not yet implemented.
     """
-    print('_check_red_placement called with tiles={}'.format(tiles))
     logging.warning('"Check red placement" not yet implemented')
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""
+module catalogue provides a persistent, on-disk catalogue of boards.
+
+Boards are keyed by their canonical encoding (see module symmetry), so a board and any
+rotation or reflection of it share one entry. Each entry holds the board's fairness
+score, a dictionary of precomputed scores, and a dictionary of opening analyses.
+
+The catalogue is backed by a local SQLite file.
+
+e.g.
+    with BoardCatalogue('boards.db') as catalogue:
+        catalogue.add_many(boardbuilder.build() for _ in range(1000))
+        if board in catalogue:
+            entry = catalogue.get(board)
+        board = boardbuilder.build(catalogue=catalogue, percentile=90)
+
+Use #fairness to score a board. Higher is fairer.
+"""
+import json
+import logging
+import math
+import random
+import sqlite3
+
+import hexgrid
+
+import catan.board
+from catan import symmetry
+from catan.topology import pips
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS boards (
+    key TEXT PRIMARY KEY,
+    encoding TEXT NOT NULL,
+    fairness REAL NOT NULL,
+    scores TEXT NOT NULL DEFAULT '{}',
+    openings TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS boards_fairness ON boards (fairness);
+"""
+
+_RED_NUMBERS = (catan.board.HexNumber.six, catan.board.HexNumber.eight)
+
+
+def fairness(tiles):
+    """
+    Score how fair a board is. Higher is fairer, and the score is on (0,1].
+
+    A board is unfair when some resources are much more productive than others, or when
+    red numbers (6 and 8) sit next to each other. The imbalance is the standard deviation
+    of the average pips per tile of each resource, plus one for each pair of adjacent red
+    numbers.
+
+    :param tiles: list(catan.board.Tile)
+    :return: float
+    """
+    by_terrain = dict()
+    for tile in tiles:
+        if tile.terrain != catan.board.Terrain.desert:
+            by_terrain.setdefault(tile.terrain, list()).append(pips(tile.number))
+    averages = [sum(p) / len(p) for p in by_terrain.values()]
+    mean = sum(averages) / len(averages) if averages else 0
+    spread = math.sqrt(sum((a - mean) ** 2 for a in averages) / len(averages)) if averages else 0
+
+    reds = {tile.tile_id for tile in tiles if tile.number in _RED_NUMBERS}
+    red_pairs = 0
+    for tile_id in reds:
+        for direction in ('E', 'NE', 'SE'):
+            if hexgrid.tile_id_in_direction(tile_id, direction) in reds:
+                red_pairs += 1
+    return 1.0 / (1.0 + spread + red_pairs)
+
+
+class CatalogueEntry(object):
+    """
+    class CatalogueEntry represents a single board in the catalogue.
+
+    The board is stored in canonical form. Use #board_string and #ports to rebuild it.
+    """
+    def __init__(self, key, encoding, fairness, scores, openings):
+        self.key = key
+        self.encoding = encoding
+        self.fairness = fairness
+        self.scores = scores
+        self.openings = openings
+
+    def board_string(self):
+        """
+        The tiles as a short-form board string, e.g. 'w w h b s o ... 2 None 9 3 ...'.
+        See module boardbuilder.
+        """
+        return self.encoding.split('|')[0].strip()
+
+    def ports(self):
+        """
+        :return: list(catan.board.Port)
+        """
+        ports = list()
+        for port_str in self.encoding.split('|')[1].strip().split(') '):
+            if not port_str:
+                continue
+            type_str, location = port_str.rstrip(')').split('(')
+            tile_id, direction = location.split(' ')
+            ports.append(catan.board.Port(int(tile_id), direction, catan.board.PortType(type_str)))
+        return ports
+
+    def __repr__(self):
+        return '<CatalogueEntry key={}, fairness={:.3f}>'.format(self.key, self.fairness)
+
+
+class BoardCatalogue(object):
+    """
+    class BoardCatalogue stores boards on disk, deduplicated by canonical encoding.
+
+    Lookups accept either a Board or a key (see symmetry.canonical_hash).
+    """
+    def __init__(self, path='boards.db'):
+        """
+        :param path: SQLite file to use, created if it does not exist. ':memory:' is allowed.
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM boards').fetchone()[0]
+
+    def __contains__(self, board):
+        return self.get(board) is not None
+
+    def _row(self, board):
+        encoding, _ = symmetry.canonical_encoding(board)
+        return (symmetry.hash_encoding(encoding),
+                encoding,
+                fairness(board.tiles),
+                '{}',
+                '{}')
+
+    def add(self, board, scores=None, openings=None):
+        """
+        Add a board to the catalogue. If the board (or a symmetry of it) is already present,
+        the existing entry is kept and its scores and openings are updated with those given.
+
+        :param board: catan.board.Board
+        :param scores: dict str->number, optional
+        :param openings: dict, optional, must be JSON-serializable
+        :return: the board's key, str
+        """
+        row = self._row(board)
+        with self._conn:
+            self._conn.execute('INSERT OR IGNORE INTO boards VALUES (?, ?, ?, ?, ?)', row)
+        if scores or openings:
+            self.update(row[0], scores=scores, openings=openings)
+        return row[0]
+
+    def add_many(self, boards):
+        """
+        Bulk insert boards in a single transaction. Boards already present are skipped.
+
+        :param boards: iterable of catan.board.Board
+        :return: list of keys, in the order of the boards given
+        """
+        rows = [self._row(board) for board in boards]
+        with self._conn:
+            self._conn.executemany('INSERT OR IGNORE INTO boards VALUES (?, ?, ?, ?, ?)', rows)
+        logging.debug('Added {} boards to catalogue={}'.format(len(rows), self.path))
+        return [row[0] for row in rows]
+
+    def update(self, key, scores=None, openings=None):
+        """
+        Merge the given scores and openings into an existing entry.
+
+        :param key: str
+        """
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError('No board with key={} in catalogue={}'.format(key, self.path))
+        entry.scores.update(scores or {})
+        entry.openings.update(openings or {})
+        with self._conn:
+            self._conn.execute('UPDATE boards SET scores = ?, openings = ? WHERE key = ?',
+                               (json.dumps(entry.scores), json.dumps(entry.openings), key))
+
+    def get(self, board_or_key):
+        """
+        :param board_or_key: catan.board.Board, or a key
+        :return: CatalogueEntry, or None if not present
+        """
+        entries = self.get_many([board_or_key])
+        return entries[0]
+
+    def get_many(self, boards_or_keys):
+        """
+        Bulk lookup.
+
+        :param boards_or_keys: iterable of catan.board.Board or keys
+        :return: list of CatalogueEntry (or None where not present), in the order given
+        """
+        keys = [b if isinstance(b, str) else symmetry.canonical_hash(b) for b in boards_or_keys]
+        found = dict()
+        # sqlite limits the number of bound parameters per statement
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self._conn.execute(
+                'SELECT key, encoding, fairness, scores, openings FROM boards WHERE key IN ({})'.format(
+                    ','.join('?' * len(chunk))),
+                chunk)
+            for key, encoding, fair, scores, openings in rows:
+                found[key] = CatalogueEntry(key, encoding, fair, json.loads(scores), json.loads(openings))
+        return [found.get(key) for key in keys]
+
+    def draw(self, percentile=None, rng=random):
+        """
+        Draw a board from the catalogue.
+
+        With no percentile, the board is drawn uniformly. Otherwise it is the board at the given
+        fairness percentile, e.g. percentile=90 is fairer than 90% of the catalogue.
+
+        :param percentile: number on [0,100], optional
+        :param rng: random.Random-like object, used when drawing uniformly
+        :return: CatalogueEntry
+        """
+        count = len(self)
+        if count == 0:
+            raise ValueError('Cannot draw from empty catalogue={}'.format(self.path))
+        if percentile is None:
+            offset = rng.randrange(count)
+        else:
+            if not (0 <= percentile <= 100):
+                raise ValueError('Percentile must be on [0,100], was {}'.format(percentile))
+            offset = min(count - 1, int(count * percentile / 100))
+        key, encoding, fair, scores, openings = self._conn.execute(
+            'SELECT key, encoding, fairness, scores, openings FROM boards ORDER BY fairness, key LIMIT 1 OFFSET ?',
+            (offset, )).fetchone()
+        return CatalogueEntry(key, encoding, fair, json.loads(scores), json.loads(openings))
@@ -0,0 +1,224 @@
+"""
+module dispatch provides AgentDispatcher, which asks agents for their decisions off the game's
+thread, so a GUI stays responsive while an agent thinks.
+
+Without a dispatcher, Game#play_agent_turn calls each agent in turn and makes its action before
+returning, which holds up the tkinter thread for as long as the agents take. With one, the game
+asks the dispatcher for a decision and returns at once. The agent decides on its own copy of the
+position (see GameSnapshot#to_game), in a thread or process pool. The game's thread calls #poll
+from time to time, e.g. from tkinter's after loop, and the decisions which are done are made there.
+
+    dispatcher = dispatch.AgentDispatcher(deadline=5)
+    dispatcher.attach(game)
+    game.start(players)
+    game.play_agent_turn()
+    ...
+    dispatcher.poll()                   # on the game's thread, e.g. every 50ms
+
+Each decision has a deadline. A decision which is not done by its deadline is abandoned, and the
+fallback agent (default BestAgent, which decides in a few milliseconds) decides in its place, on
+the game's thread. Undoing or redoing while a decision is pending cancels it: its result, when it
+comes, is dropped. Python threads cannot be stopped, so an abandoned or cancelled decision runs on
+in its worker until the agent returns.
+
+A process pool needs agents which pickle, and each decision works on a fresh copy of the agent,
+so an agent which keeps state between decisions (e.g. MCTSAgent's tree) starts afresh each time.
+"""
+import concurrent.futures
+import logging
+import queue
+import time
+
+import catan.agents
+from catan import snapshot
+
+
+def _decide(agent, position, template):
+    # runs in a worker: the agent decides on a copy of the game, which it may change as it likes
+    return agent.decide(position.to_game(template))
+
+
+class Decision(object):
+    """
+    class Decision represents one agent decision for one game, from when it is asked for until
+    its action is made or it is dropped.
+    """
+    def __init__(self, game, agent, future, deadline):
+        """
+        :param game: Game
+        :param agent: Agent
+        :param future: concurrent.futures.Future of the action
+        :param deadline: time.monotonic() by which the action is wanted, or None
+        """
+        self.game = game
+        self.agent = agent
+        self.future = future
+        self.deadline = deadline
+        self.started = time.monotonic()
+
+    def __repr__(self):
+        return '<Decision agent={}, done={}, deadline={}>'.format(self.agent, self.future.done(), self.deadline)
+
+
+class AgentDispatcher(object):
+    """
+    class AgentDispatcher runs agents' decisions in an executor and makes their actions on the
+    game's thread, see module docstring. One dispatcher can serve many games; each game has at
+    most one decision pending.
+    """
+    def __init__(self, executor='thread', workers=1, deadline=None, fallback=None):
+        """
+        :param executor: (thread|process), or a concurrent.futures.Executor
+        :param workers: workers in the pool made for thread or process
+        :param deadline: seconds per decision, optional, default no deadline
+        :param fallback: Agent which decides when the deadline passes, default BestAgent
+        """
+        if executor == 'thread':
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='agents')
+        elif executor == 'process':
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        self.executor = executor
+        self.deadline = deadline
+        self.fallback = fallback or catan.agents.BestAgent()
+        self._done = queue.Queue() # Decision, put by the workers' done callbacks
+        self._pending = dict() # id(game) -> Decision; a decision no longer here is dropped when done
+        self._templates = dict() # id(game) -> snapshot.GameTemplate
+        self.decisions = 0 # actions made from agents' decisions
+        self.fallbacks = 0 # actions made by the fallback agent
+        self.cancelled = 0 # decisions cancelled or dropped
+
+    def attach(self, game):
+        """
+        Dispatch the game's agent decisions, see Game#play_agent_turn.
+
+        :param game: Game
+        """
+        game.dispatcher = self
+        game.observers.add(self)
+
+    def detach(self, game):
+        self.cancel(game)
+        game.dispatcher = None
+        game.observers.discard(self)
+        self._templates.pop(id(game), None)
+
+    def request(self, game):
+        """
+        Ask the current player's agent for a decision, unless one is pending. Called by
+        Game#play_agent_turn.
+
+        :param game: Game, whose current player is played by an agent
+        """
+        if id(game) in self._pending:
+            return
+        agent = game.get_agent(game.get_cur_player())
+        if id(game) not in self._templates or self._templates[id(game)].players != game.players:
+            self._templates[id(game)] = snapshot.GameTemplate(game)
+        future = self.executor.submit(_decide, agent, snapshot.GameSnapshot.from_game(game), self._templates[id(game)])
+        deadline = None if self.deadline is None else time.monotonic() + self.deadline
+        decision = Decision(game, agent, future, deadline)
+        self._pending[id(game)] = decision
+        future.add_done_callback(lambda f: self._done.put(decision))
+
+    def pending(self, game=None):
+        """
+        :param game: Game, optional
+        :return: whether a decision is pending for the game, or for any game
+        """
+        return id(game) in self._pending if game is not None else bool(self._pending)
+
+    def cancel(self, game):
+        """
+        Drop the game's pending decision, if any. Its result is ignored when it comes.
+
+        :param game: Game
+        """
+        decision = self._pending.pop(id(game), None)
+        if decision is not None:
+            decision.future.cancel()
+            self.cancelled += 1
+
+    def notify(self, observable):
+        # undo and redo change the position the pending decision was asked about
+        changes = observable.changes
+        if changes is None or not self.pending(observable):
+            return
+        if any(action in ('undo', 'redo', 'restore') for action in changes.actions):
+            logging.debug('Cancelling decision after {}'.format(changes.actions))
+            self.cancel(observable)
+            observable.play_agent_turn()
+
+    def poll(self, timeout=0):
+        """
+        Make the actions of the decisions which are done, and of the fallback agent for those past
+        their deadline. Call it on the game's thread.
+
+        :param timeout: seconds to wait for a decision if none is done, 0 to return at once
+        :return: number of actions made
+        """
+        done = list()
+        if timeout and self._pending and self._done.empty():
+            deadlines = [d.deadline for d in self._pending.values() if d.deadline is not None]
+            try:
+                done.append(self._done.get(timeout=max(0, min([timeout] + [d - time.monotonic() for d in deadlines]))))
+            except queue.Empty:
+                pass
+        while not self._done.empty():
+            done.append(self._done.get_nowait())
+        made = 0
+        for decision in done:
+            if self._pending.get(id(decision.game)) is not decision:
+                continue
+            del self._pending[id(decision.game)]
+            try:
+                action = decision.future.result()
+            except Exception:
+                logging.exception('Agent {} failed, using fallback'.format(decision.agent))
+                action = None
+            made += self._make(decision.game, action)
+        now = time.monotonic()
+        for decision in [d for d in self._pending.values() if d.deadline is not None and d.deadline <= now]:
+            logging.debug('Decision by {} passed its deadline, using fallback'.format(decision.agent))
+            self.cancel(decision.game)
+            made += self._make(decision.game, None)
+        return made
+
+    def _make(self, game, action):
+        # the game may have changed since the agent was asked, e.g. by a human's click
+        if action is not None and action in catan.agents.legal_actions(game):
+            self.decisions += 1
+        else:
+            action = self.fallback.decide(game)
+            self.fallbacks += 1
+        catan.agents.apply(game, action)
+        game.play_agent_turn()
+        return 1
+
+    def run(self, game, timeout=None):
+        """
+        Poll until no decision is pending for the game, e.g. to play agents against each other
+        without a GUI.
+
+        :param game: Game
+        :param timeout: seconds, optional
+        :return: number of actions made
+        """
+        made = 0
+        end = None if timeout is None else time.monotonic() + timeout
+        while self.pending(game) and (end is None or time.monotonic() < end):
+            made += self.poll(timeout=0.1)
+        return made
+
+    def shutdown(self, wait=False):
+        """
+        Cancel every pending decision and stop the workers.
+
+        :param wait: wait for running decisions to return
+        """
+        for decision in list(self._pending.values()):
+            self.cancel(decision.game)
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def __repr__(self):
+        return '<AgentDispatcher pending={}, decisions={}, fallbacks={}, cancelled={}>'.format(
+            len(self._pending), self.decisions, self.fallbacks, self.cancelled)
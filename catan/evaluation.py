@@ -0,0 +1,91 @@
+"""
+module evaluation provides end-of-game resource evaluation: how many resource tiles each
+player's buildings touch, by resource.
+
+Each board gets a node -> resource-count matrix once, from the node x tile incidence in module
+topology. A settlement counts each resource tile it touches once and a city counts it twice,
+which is exactly the value the rules state stores per node, so evaluating a position is one
+matrix product:
+
+    node_resources(rules.tile_resource)             # (54, 5)
+    final_resources(rules.buildings, per_node)      # (P, 5)
+
+The same product evaluates many games at once, for post-tournament analysis:
+
+    final_resources(buildings, per_node)            # (G, P, 54) and (G, 54, 5) -> (G, P, 5)
+"""
+import collections
+
+import numpy as np
+
+from catan import topology
+from catan.pieces import PieceType
+
+# names used in Game.player_to_resources, in the order of topology.RESOURCES
+RESOURCE_NAMES = ['Wood', 'Brick', 'Wheat', 'Sheep', 'Ore']
+
+# weight of each building type in the evaluation
+BUILDING_WEIGHTS = {PieceType.settlement: 1, PieceType.city: 2}
+
+_NODE_TILES = topology.NODE_TILES.astype(np.float32)
+
+
+def node_resources(tile_resource):
+    """
+    :param tile_resource: (..., 19, 5), see topology.tile_arrays
+    :return: (..., 54, 5) float32, the number of tiles of each resource each node touches.
+             Counts are small whole numbers, so float products are exact, and float matrix
+             products are much faster than integer ones.
+    """
+    return _NODE_TILES @ np.asarray(tile_resource, dtype=np.float32)
+
+
+def buildings_from_pieces(players, pieces):
+    """
+    :param players: list(Player), in the order of the rows
+    :param pieces: dict Player -> list((coord, PieceType)), see Board.player_to_pieces
+    :return: (P, 54) int8, weighted as BUILDING_WEIGHTS
+    """
+    buildings = np.zeros((len(players), topology.NUM_NODES), dtype=np.int8)
+    for p, player in enumerate(players):
+        for coord, piece_type in pieces.get(player, ()):
+            if piece_type in BUILDING_WEIGHTS:
+                # a city's node also lists the settlement it replaced
+                n = topology.NODE_INDEX[coord]
+                buildings[p, n] = max(buildings[p, n], BUILDING_WEIGHTS[piece_type])
+    return buildings
+
+
+def final_resources(buildings, per_node):
+    """
+    Resource tiles touched by each player's buildings, cities counted twice.
+
+    Leading dimensions broadcast, so many games evaluate in one call.
+
+    :param buildings: (..., P, 54), 1 for a settlement and 2 for a city
+    :param per_node: (..., 54, 5), see #node_resources
+    :return: (..., P, 5) int16
+    """
+    return (np.asarray(buildings, dtype=np.float32) @ per_node).astype(np.int16)
+
+
+def evaluate_games(games):
+    """
+    Evaluate the final positions of many started games at once.
+
+    :param games: list(Game), all with the same number of players
+    :return: (G, P, 5) int16
+    """
+    buildings = np.stack([game.rules.buildings for game in games])
+    per_node = node_resources(np.stack([game.rules.tile_resource for game in games]))
+    return final_resources(buildings, per_node)
+
+
+def as_counters(players, resources):
+    """
+    :param players: list(Player), in the order of the rows
+    :param resources: (P, 5), see #final_resources
+    :return: dict Player -> Counter of resource name -> count, zero counts omitted
+    """
+    return {player: collections.Counter({name: int(n) for name, n in zip(RESOURCE_NAMES, row) if n})
+            for player, row in zip(players, resources)}
@@ -0,0 +1,250 @@
+"""
+module events provides EventBus, which publishes typed events about a game to the subscribers of
+each event type.
+
+Event types, and their payloads:
+
+    PiecePlaced(piece_type, coord, player)      a road, settlement or city was placed
+    RobberMoved(tile_id, previous_tile_id, player)
+    StateChanged(state, previous, capabilities) state class names, and capability bits, see module statemachine
+    LogAppended(text)                           text appended to the game's catanlog
+    TurnEnded(player, turn)                     player ended turn number turn
+    BoardReset()                                the board was rebuilt by boardbuilder
+    ActionRecorded(index, action, outcome, player)
+                                                an action was done and recorded, see module eventstream
+
+Each Game has a bus, game.events, which its board shares. Subscribers say which event types they
+want, and events of other types are never made for them. A type with no subscribers costs one
+dict lookup to publish.
+
+Publishing never waits on a subscriber: each subscription has its own bounded queue, and
+publishing appends to it. A subscriber which falls behind loses its oldest events (see
+Subscription.dropped) rather than slowing the game. Subscribers take their events in one of three
+ways:
+
+    sub = game.events.subscribe(events.PiecePlaced, events.RobberMoved)
+    for event in sub.poll():                    # pull, e.g. from a GUI's event loop
+        ...
+
+    sub = game.events.subscribe(events.LogAppended, handler=on_log)
+    sub.dispatch()                              # call the handler for each pending event
+
+    sub = game.events.subscribe(events.TurnEnded, handler=on_turn, thread=True)
+                                                # the handler is called on a background thread
+
+    sub.close()
+
+Subscribing to Event subscribes to every event type.
+"""
+import collections
+import threading
+
+
+class Event(object):
+    """
+    class Event is the base of all event types. Subclasses list their payload in fields.
+    """
+    __slots__ = ()
+    fields = ()
+
+    def __init__(self, *values):
+        for field, value in zip(self.fields, values):
+            setattr(self, field, value)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, f) == getattr(other, f) for f in self.fields)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self), ) + tuple(getattr(self, f) for f in self.fields))
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__,
+                               ', '.join('{}={}'.format(f, getattr(self, f)) for f in self.fields))
+
+
+class PiecePlaced(Event):
+    __slots__ = fields = ('piece_type', 'coord', 'player')
+
+
+class RobberMoved(Event):
+    __slots__ = fields = ('tile_id', 'previous_tile_id', 'player')
+
+
+class StateChanged(Event):
+    __slots__ = fields = ('state', 'previous', 'capabilities')
+
+
+class LogAppended(Event):
+    __slots__ = fields = ('text', )
+
+
+class TurnEnded(Event):
+    __slots__ = fields = ('player', 'turn')
+
+
+class BoardReset(Event):
+    __slots__ = fields = ()
+
+
+class ActionRecorded(Event):
+    __slots__ = fields = ('index', 'action', 'outcome', 'player')
+
+
+EVENT_TYPES = (PiecePlaced, RobberMoved, StateChanged, LogAppended, TurnEnded, BoardReset, ActionRecorded)
+
+
+class Subscription(object):
+    """
+    class Subscription represents one subscriber's interest in some event types, and holds the
+    events published to it which it has not yet taken. Made by EventBus#subscribe.
+    """
+    def __init__(self, bus, types, handler=None, maxlen=1024, thread=False):
+        """
+        :param bus: EventBus
+        :param types: tuple of event types
+        :param handler: callable(event), optional, see #dispatch
+        :param maxlen: most events held; when full, the oldest is dropped
+        :param thread: call the handler on a background thread as events arrive
+        """
+        self.bus = bus
+        self.types = types
+        self.handler = handler
+        self.queue = collections.deque(maxlen=maxlen)
+        self.dropped = 0 # events lost because the queue was full
+        self.closed = False
+        self._wakeup = None
+        self._thread = None
+        if thread:
+            if handler is None:
+                raise ValueError('A threaded subscription needs a handler')
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='events-{}'.format(
+                '-'.join(t.__name__ for t in types)), daemon=True)
+            self._thread.start()
+
+    def put(self, event):
+        """
+        Called by the bus. Never blocks.
+        """
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(event)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def poll(self, limit=None):
+        """
+        Take pending events, oldest first.
+
+        :param limit: most events taken, optional
+        :return: list(Event)
+        """
+        events = list()
+        while self.queue and (limit is None or len(events) < limit):
+            events.append(self.queue.popleft())
+        return events
+
+    def dispatch(self, limit=None):
+        """
+        Take pending events, and call the handler with each.
+
+        :param limit: most events taken, optional
+        :return: number of events handled
+        """
+        events = self.poll(limit)
+        for event in events:
+            self.handler(event)
+        return len(events)
+
+    def _run(self):
+        while not self.closed:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if not self.closed:
+                self.dispatch()
+
+    def close(self, timeout=None):
+        """
+        Unsubscribe. A background thread finishes the event it is handling, and stops.
+
+        :param timeout: seconds to wait for the thread, optional
+        """
+        self.closed = True
+        self.bus.unsubscribe(self)
+        if self._thread is not None:
+            self._wakeup.set()
+            if self._thread is not threading.current_thread():
+                self._thread.join(timeout)
+
+    def __repr__(self):
+        return '<Subscription types={}, pending={}, dropped={}>'.format(
+            [t.__name__ for t in self.types], len(self.queue), self.dropped)
+
+
+class EventBus(object):
+    """
+    class EventBus publishes events to the subscriptions for their type, see module docstring.
+
+    Subscriptions are kept per type in tuples which are replaced, not changed, so publishing from
+    one thread while another subscribes is safe.
+    """
+    def __init__(self):
+        self._subscriptions = dict() # event type -> tuple(Subscription)
+
+    def subscribe(self, *types, handler=None, maxlen=1024, thread=False):
+        """
+        :param types: event types, or Event for all of them
+        :param handler: callable(event), optional, see Subscription#dispatch
+        :param maxlen: most events held for the subscriber
+        :param thread: call the handler on a background thread as events arrive
+        :return: Subscription
+        """
+        if not types or Event in types:
+            types = EVENT_TYPES
+        subscription = Subscription(self, tuple(types), handler=handler, maxlen=maxlen, thread=thread)
+        for event_type in subscription.types:
+            self._subscriptions[event_type] = self._subscriptions.get(event_type, ()) + (subscription, )
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for event_type in subscription.types:
+            remaining = tuple(s for s in self._subscriptions.get(event_type, ()) if s is not subscription)
+            if remaining:
+                self._subscriptions[event_type] = remaining
+            else:
+                self._subscriptions.pop(event_type, None)
+
+    def subscribed(self, event_type):
+        """
+        :return: whether any subscription wants events of the type. Check this before working out
+                 a payload which is costly.
+        """
+        return event_type in self._subscriptions
+
+    def publish(self, event_type, *payload):
+        """
+        Make an event and give it to the subscriptions for its type. The event is only made if
+        there are any.
+
+        :param event_type: Event subclass
+        :param payload: its fields, in order
+        """
+        subscriptions = self._subscriptions.get(event_type)
+        if not subscriptions:
+            return
+        event = event_type(*payload)
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def __deepcopy__(self, memo):
+        # a copied game or board publishes to the same subscribers, as it notifies the same observers
+        return self
+
+    def __repr__(self):
+        return '<EventBus subscribed={}>'.format(sorted(t.__name__ for t in self._subscriptions))
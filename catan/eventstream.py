@@ -0,0 +1,304 @@
+"""
+module eventstream provides EventStream, an append-only record of a game's actions from which its
+position after any action can be rebuilt.
+
+Each action is one event, a record of dtype EVENT, four bytes:
+
+    action      int, see module actions
+    outcome     the dice total of a roll, or the resource index taken by a steal, else NO_OUTCOME
+    player      index of the player who made it
+
+Dev card draws need no outcome: the stream starts from a GameSnapshot of the started game, which
+holds the deck order. The position after n events is a fold of the first n events over that
+start, with GameSnapshot#play. Every interval events the stream keeps another snapshot, and
+rebuilding a position folds forward from the nearest one before it, so it costs fewer than
+interval plays.
+
+Undo, replay, spectating and the log are all views of the one stream:
+
+    stream.state_at(n)          GameSnapshot after n events
+    stream.game_at(n)           a new Game there
+    stream.rewind(n)            undo: forget the events from n on, and return a new Game at n
+                                which records into the stream in place of the old one
+    stream.redo()               make the latest forgotten event again, in the recording game
+    stream.replay(start, stop)  each event, with the position after it
+    stream.since(n)             events from n on, as bytes; a spectator with a copy of the stream
+                                (see #save and #load) catches up with copy.extend(data)
+    stream.log_text(stop)       the catanlog of the events, written by replaying them in a Game
+
+Subscribers to events.ActionRecorded on the game's bus are told of each action when it is done.
+
+A Game started with option stream on records every action made through agents.apply, which is
+how agents, the GUI, Game#apply_action, the headless engines and the fuzzer act. Its Game#undo
+and Game#redo go through #rewind and #redo, so the game and the stream stay in step.
+"""
+import pickle
+
+import numpy as np
+
+import catan.actions
+import catan.agents
+from catan import events, snapshot
+
+EVENT = np.dtype([('action', np.int16), ('outcome', np.int8), ('player', np.int8)])
+NO_OUTCOME = -1
+PENDING = -2 # appended, and the action not yet done
+
+INTERVAL = 64
+
+
+def as_tuple(action, outcome):
+    """
+    :param action: int, see module actions
+    :param outcome: int, the event's outcome
+    :return: action tuple for GameSnapshot#play, with its dice or stolen resource given
+    """
+    result = catan.actions.to_tuple(action)
+    if result[0] == 'roll':
+        return 'roll', int(outcome)
+    if result[0] == 'steal':
+        return result + (None if outcome < 0 else int(outcome), )
+    return result
+
+
+class EventStream(object):
+    """
+    class EventStream represents the actions of one game, from its start, as an array of EVENT
+    records, with snapshots of the position every interval events. See module docstring.
+
+    The stream also serves as the template of GameSnapshot#to_game: it keeps a copy of the
+    board as it was at the start, the players and the game options.
+    """
+    def __init__(self, start, board, players, options, interval=INTERVAL):
+        """
+        :param start: GameSnapshot of the game when it started
+        :param board: Board the game started on, not shared with a game
+        :param players: list(Player)
+        :param options: dict, the game's options
+        :param interval: events between snapshots
+        """
+        self.board = board
+        self.players = list(players)
+        self.options = dict(options, stream='off')
+        self.interval = interval
+        self.game = None # Game recording into the stream, optional, see #begin
+        self._snapshots = {0: start} # event index -> GameSnapshot before that event
+        self._buffer = np.zeros(max(interval, 16), dtype=EVENT)
+        self._size = 0
+        self._published = 0 # events told to subscribers of events.ActionRecorded
+        self._undone = list() # events forgotten by #rewind, the next to redo last, see #redo
+
+    @classmethod
+    def begin(cls, game, interval=INTERVAL):
+        """
+        :param game: Game, just started
+        :param interval: events between snapshots
+        :return: EventStream, recording the game
+        """
+        template = snapshot.GameTemplate(game)
+        stream = cls(snapshot.GameSnapshot.from_game(game), template.board, template.players, template.options,
+                     interval)
+        stream.game = game
+        return stream
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def events(self):
+        """
+        :return: EVENT array of the events, a view which the next append may invalidate
+        """
+        return self._buffer[:self._size]
+
+    def append(self, action, player):
+        """
+        Record an action, before it is made. Its outcome is set by #commit when it is done.
+        Every interval events, the recording game's position is kept as a snapshot.
+
+        :param action: int, see module actions
+        :param player: int, index of the player making it
+        :return: int, index of the event
+        """
+        index = self._size
+        if index % self.interval == 0 and index not in self._snapshots and self.game is not None:
+            self._snapshots[index] = snapshot.GameSnapshot.from_game(self.game)
+        if index == len(self._buffer):
+            self._buffer = np.concatenate([self._buffer, np.zeros(max(index, 16), dtype=EVENT)])
+        self._buffer[index] = (action, PENDING, player)
+        self._size = index + 1
+        self._undone = list() # a new list, #redo holds the old one
+        return index
+
+    def commit(self, index, outcome=None):
+        """
+        Set the outcome of an event whose action is done, and tell subscribers of
+        events.ActionRecorded about the events which are done, in order. An agent's action made
+        inside another (e.g. the first agent turn, inside a human's end_turn) is told after it.
+
+        :param index: int, see #append
+        :param outcome: int, or None for NO_OUTCOME
+        """
+        self._buffer['outcome'][index] = NO_OUTCOME if outcome is None else outcome
+        bus = self.game.events if self.game is not None else None
+        while self._published < self._size and self._buffer[self._published]['outcome'] != PENDING:
+            if bus is not None and bus.subscribed(events.ActionRecorded):
+                action, outcome, player = self._buffer[self._published].tolist()
+                bus.publish(events.ActionRecorded, self._published, action, outcome, player)
+            self._published += 1
+
+    def truncate(self, n):
+        """
+        Forget the events from index n on, and the snapshots after n.
+
+        :param n: int, 0 <= n <= len(self)
+        """
+        if not 0 <= n <= self._size:
+            raise IndexError('Cannot truncate a stream of {} events to {}'.format(self._size, n))
+        self._size = n
+        self._published = min(self._published, n)
+        for index in [i for i in self._snapshots if i > n]:
+            del self._snapshots[index]
+
+    def since(self, n):
+        """
+        :param n: int, index of the first event wanted
+        :return: bytes, the events from n on, for #extend
+        """
+        return self._buffer[n:self._size].tobytes()
+
+    def extend(self, data):
+        """
+        Append events recorded elsewhere, e.g. a spectator's copy catching up with a game.
+
+        :param data: bytes from #since, or an EVENT array
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = np.frombuffer(data, dtype=EVENT)
+        for action, outcome, player in data.tolist():
+            self._buffer['outcome'][self.append(action, player)] = outcome
+        self._published = self._size
+
+    def state_at(self, n):
+        """
+        The position after the first n events, folded forward from the nearest snapshot before
+        it. Snapshots at the intervals passed on the way are kept.
+
+        :param n: int, 0 <= n <= len(self)
+        :return: GameSnapshot, independent of the stream
+        """
+        if not 0 <= n <= self._size:
+            raise IndexError('No position {} in a stream of {} events'.format(n, self._size))
+        base = n - n % self.interval
+        while base not in self._snapshots:
+            base -= self.interval
+        result = self._snapshots[base].copy()
+        for index in range(base, n):
+            if index % self.interval == 0 and index not in self._snapshots:
+                self._snapshots[index] = result.copy()
+            action, outcome, _ = self._buffer[index].tolist()
+            result.play(as_tuple(action, outcome))
+        return result
+
+    def game_at(self, n, logging='off'):
+        """
+        :param n: int, 0 <= n <= len(self)
+        :param logging: (on|off|buffer), see Game
+        :return: a new Game in the position after the first n events, see GameSnapshot#to_game
+        """
+        return self.state_at(n).to_game(self, logging=logging)
+
+    def rewind(self, n, logging='off'):
+        """
+        Undo to the position after n events. The events from n on are forgotten, until #redo
+        makes them again, and the game returned records into the stream from there, in place of
+        the game which recorded them.
+
+        :param n: int, 0 <= n <= len(self)
+        :param logging: (on|off|buffer), see Game
+        :return: Game
+        """
+        game = self.game_at(n, logging=logging)
+        self._undone.extend(self._buffer[n:self._size][::-1].tolist())
+        if self.game is not None:
+            game.agents = self.game.agents
+            game.events = game.board.events = self.game.events
+        game.options['stream'] = 'on'
+        game.stream = self
+        self.truncate(n)
+        self.game = game
+        return game
+
+    def can_redo(self):
+        return len(self._undone) > 0
+
+    def redo(self):
+        """
+        Make the latest event forgotten by #rewind again, with the same outcome, in the game
+        recording into the stream. Events can be redone until another action is recorded.
+        """
+        if not self._undone:
+            raise IndexError('No event to redo in {}'.format(self))
+        undone = self._undone
+        action, outcome, _ = undone.pop()
+        catan.agents.apply(self.game, catan.actions.decode(self.game, action), None if outcome < 0 else outcome)
+        self._undone = undone
+
+    def replay(self, start=0, stop=None):
+        """
+        Iterate the events from start to stop, each with the position after it. The same snapshot
+        is advanced at each step; copy it to keep it.
+
+        :param start: int, index of the first event
+        :param stop: int, index after the last event, optional, default all of them
+        :return: generator of (index, event, GameSnapshot)
+        """
+        stop = self._size if stop is None else stop
+        position = self.state_at(start)
+        for index in range(start, stop):
+            event = self._buffer[index]
+            position.play(as_tuple(event['action'], event['outcome']))
+            yield index, event, position
+
+    def log_text(self, stop=None):
+        """
+        Write the catanlog of the game up to stop, by replaying the events in a new Game. The
+        log's timestamps are those of the replay.
+
+        :param stop: int, index after the last event, optional, default all of them
+        :return: str
+        """
+        game = self.game_at(0, logging='buffer')
+        game.options['agent_turns'] = 'off' # the agents' actions are among the events
+        game.catanlog.log_game_start(game.players, [tile.terrain for tile in self.board.tiles],
+                                     [tile.number for tile in self.board.tiles], self.board.ports)
+        for action, outcome, _ in self._buffer[:self._size if stop is None else stop].tolist():
+            catan.agents.apply(game, catan.actions.decode(game, action), None if outcome < 0 else outcome)
+        return game.catanlog.dump()
+
+    def __getstate__(self):
+        state = dict(self.__dict__, game=None)
+        state['_buffer'] = self.events.copy()
+        return state
+
+    def save(self, path):
+        """
+        Save the stream, without the game recording into it.
+
+        :param path: file to write
+        """
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        """
+        :param path: file written by #save
+        :return: EventStream
+        """
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def __repr__(self):
+        return '<EventStream events={}, snapshots={}, interval={}>'.format(
+            self._size, len(self._snapshots), self.interval)
@@ -0,0 +1,149 @@
+"""
+module features provides fixed-shape model inputs for game positions, many positions at a time.
+
+Positions are Games or GameSnapshots (see module snapshot), all with the same number of players P.
+Player axes are rotated so that the current player comes first. For a batch of B positions:
+
+    tiles      (B, 19, 6)      terrain one-hot: the five resources, then desert
+    pips       (B, 19)         dots on each tile's number, 0 for none
+    robber     (B, 19)         one-hot on the robber's tile
+    ports      (B, 54, 6)      2:1 port per resource, then 3:1, per node
+    nodes      (B, P, 2, 54)   settlements, then cities, per player
+    roads      (B, P, 72)      roads per player
+    hands      (B, P, 5)       resource cards
+    dev_hands  (B, P, 5)       unplayed development cards
+    dev_played (B, P, 5)       played development cards
+    turn       (B, 16 + P)     state one-hot (see snapshot.STATES), has rolled, dev card played,
+                               turn number, pieces in the current player's supply, seat one-hot
+
+Every feature is a view into one preallocated (batch_size, size) float32 buffer, so a model can
+also take the whole row. Positions are gathered with one stack of their snapshot buffers, and each
+feature is then filled by array operations over the whole batch.
+
+e.g.
+    extractor = FeatureExtractor(num_players=4, batch_size=256)
+    features = extractor.extract(games)
+    features['nodes'].shape     # (len(games), 4, 2, 54)
+    extractor.rows(len(games))  # (len(games), extractor.size)
+"""
+import numpy as np
+
+from catan import rules, snapshot, topology
+
+
+def shapes(num_players):
+    """
+    :param num_players: int
+    :return: list of (name, shape of one position's feature), in buffer order
+    """
+    p = num_players
+    return [
+        ('tiles', (topology.NUM_TILES, topology.NUM_RESOURCES + 1)),
+        ('pips', (topology.NUM_TILES, )),
+        ('robber', (topology.NUM_TILES, )),
+        ('ports', (topology.NUM_NODES, topology.NUM_RESOURCES + 1)),
+        ('nodes', (p, 2, topology.NUM_NODES)),
+        ('roads', (p, topology.NUM_EDGES)),
+        ('hands', (p, topology.NUM_RESOURCES)),
+        ('dev_hands', (p, len(rules.DEV_CARDS))),
+        ('dev_played', (p, len(rules.DEV_CARDS))),
+        ('turn', (len(snapshot.STATES) + 3 + len(rules.PIECE_SUPPLY) + p, )),
+    ]
+
+
+class FeatureExtractor(object):
+    """
+    class FeatureExtractor fills a preallocated feature buffer from batches of positions.
+
+    Results are views into the extractor's buffer, and are overwritten by the next #extract.
+    """
+    def __init__(self, num_players=4, batch_size=256):
+        """
+        :param num_players: int
+        :param batch_size: most positions per #extract
+        """
+        self.num_players = num_players
+        self.batch_size = batch_size
+        self.size = sum(int(np.prod(shape)) for _, shape in shapes(num_players))
+        self.buffer = np.zeros((batch_size, self.size), dtype=np.float32)
+        self._columns = dict() # name -> (start, stop, shape)
+        start = 0
+        for name, shape in shapes(num_players):
+            stop = start + int(np.prod(shape))
+            self._columns[name] = (start, stop, shape)
+            start = stop
+        self._fields = {name: (start, stop, shape) for name, start, stop, shape in snapshot.layout(num_players)[1]}
+
+    def views(self, n):
+        """
+        :param n: number of positions
+        :return: dict name -> (n, ...) view into the buffer
+        """
+        return {name: self.buffer[:n, start:stop].reshape((n, ) + shape)
+                for name, (start, stop, shape) in self._columns.items()}
+
+    def rows(self, n):
+        """
+        :return: (n, size) the features of the latest #extract, one row per position
+        """
+        return self.buffer[:n]
+
+    def _field(self, data, name):
+        start, stop, shape = self._fields[name]
+        return data[:, start:stop].reshape((len(data), ) + shape)
+
+    def extract(self, positions):
+        """
+        :param positions: list of Game or GameSnapshot, at most batch_size
+        :return: dict name -> (len(positions), ...) float32 views, see module docstring
+        """
+        n = len(positions)
+        if n > self.batch_size:
+            raise ValueError('Batch of {} positions is larger than batch_size={}'.format(n, self.batch_size))
+        positions = [p if isinstance(p, snapshot.GameSnapshot) else snapshot.GameSnapshot.from_game(p)
+                     for p in positions]
+        out = self.views(n)
+        p = self.num_players
+
+        data = np.stack([position.data for position in positions])
+        tile_resource = np.stack([position.tile_resource for position in positions])
+        tile_number = np.stack([position.tile_number for position in positions])
+        port_access = np.stack([position.port_access for position in positions])
+        scalars = np.array([(position.cur, position.state, position.robber_tile or 0,
+                             position.last_roller == position.cur, position.dev_card_played, position.turn)
+                            for position in positions], dtype=np.int64).reshape(n, 6)
+        cur, state, robber, rolled, dev_played, turn = scalars.T
+
+        # rotate player axes to start at the current player
+        batch = np.arange(n)[:, None]
+        order = (cur[:, None] + np.arange(p)) % p
+
+        out['tiles'][:, :, :topology.NUM_RESOURCES] = tile_resource
+        out['tiles'][:, :, topology.NUM_RESOURCES] = tile_resource.sum(axis=2) == 0
+        out['pips'][:] = topology.DICE_PROBABILITY[tile_number] * 36
+        out['robber'][:] = np.arange(1, topology.NUM_TILES + 1) == robber[:, None]
+        out['ports'][:] = port_access
+
+        buildings = self._field(data, 'buildings')[batch, order]
+        out['nodes'][:, :, 0] = buildings == 1
+        out['nodes'][:, :, 1] = buildings == 2
+        roads = self._field(data, 'roads')
+        relative = np.where(roads >= 0, (roads - cur[:, None]) % p, -1)
+        out['roads'][:] = relative[:, None, :] == np.arange(p)[None, :, None]
+        out['hands'][:] = self._field(data, 'hands')[batch, order]
+        out['dev_hands'][:] = self._field(data, 'dev_hands')[batch, order]
+        out['dev_played'][:] = self._field(data, 'dev_played')[batch, order]
+
+        t = out['turn']
+        states = len(snapshot.STATES)
+        t[:, :states] = np.arange(states) == state[:, None]
+        t[:, states] = rolled
+        t[:, states + 1] = dev_played
+        t[:, states + 2] = turn
+        t[:, states + 3:states + 3 + len(rules.PIECE_SUPPLY)] = self._field(data, 'supply')[np.arange(n), cur]
+        t[:, states + 3 + len(rules.PIECE_SUPPLY):] = np.arange(p) == cur[:, None]
+        return out
+
+    def __repr__(self):
+        return '<FeatureExtractor num_players={}, batch_size={}, size={}>'.format(
+            self.num_players, self.batch_size, self.size)
@@ -0,0 +1,343 @@
+"""
+module fuzz provides a harness which plays random actions through Game, legal and illegal, and
+checks the game's invariants after every step.
+
+Each step is one of
+- a random legal action, see module actions
+- a random illegal action, which Game#apply_action must reject with ValueError, changing nothing
+- an undo, or an undo and a redo
+
+and after each, #check_invariants looks for
+- exactly one robber, on the game's robber tile
+- board pieces and Board.player_to_pieces agreeing with each other and with the rules state's
+  buildings and roads
+- state coherence: every can_do_xyz() of the state objects agreeing with the capability bits of
+  module statemachine, the board locked exactly while in game, and resources conserved
+
+The first violation in a game stops that game, and is reported with the seed and the actions
+which led to it, so it can be replayed with #replay.
+
+e.g.
+    report = Fuzzer(seed=1).run(games=50)
+    report.violations       # [] if all is well
+    report.actions_per_second
+
+or from the command line:
+    python -m catan.fuzz --games 50 --seed 1
+
+Runs with check=False measure the action path alone, for use as a performance regression
+benchmark, see bench.py fuzz.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import hexgrid
+
+import catan.actions
+from catan import boardbuilder, evaluation, rules, statemachine, topology
+from catan.game import Game, Player
+from catan.pieces import PieceType
+
+_PLAYERS = [(1, 'fuzz1', 'red'), (2, 'fuzz2', 'blue'), (3, 'fuzz3', 'orange'), (4, 'fuzz4', 'green')]
+
+# capability -> name of the state method which answers it
+_METHODS = {bit: ('is_' if name.startswith('in_') else 'can_') + name
+            for bit, name in ((1 << i, name) for i, name in enumerate(statemachine.CAPABILITIES))}
+
+_BOARD_TYPES = (PieceType.road, PieceType.settlement, PieceType.city)
+
+
+def check_invariants(game):
+    """
+    :param game: Game
+    :return: list of str, one per violated invariant, empty if none
+    """
+    violations = list()
+    state = game.state
+    if state.game is not game:
+        violations.append('state={} belongs to another game'.format(type(state).__name__))
+    if game.board.state.modifiable() == state.is_in_game():
+        violations.append('board modifiable={} while in game={}'.format(
+            game.board.state.modifiable(), state.is_in_game()))
+
+    # state objects and capability bits
+    try:
+        caps = statemachine.capabilities(game)
+    except KeyError:
+        violations.append('state={} has no state machine state'.format(type(state).__name__))
+        caps = None
+    if caps is not None:
+        for bit, method in _METHODS.items():
+            try:
+                can = bool(getattr(state, method)())
+            except Exception as e:
+                violations.append('{}.{}() raised {!r}'.format(type(state).__name__, method, e))
+                continue
+            if can != bool(caps & bit):
+                violations.append('{}.{}()={} but capability bit is {}'.format(
+                    type(state).__name__, method, can, bool(caps & bit)))
+    try:
+        game.dev_card_state.can_play_dev_card()
+    except Exception as e:
+        violations.append('{}.can_play_dev_card() raised {!r}'.format(type(game.dev_card_state).__name__, e))
+
+    if not state.is_in_game():
+        return violations
+
+    # the robber
+    robbers = [coord for (hex_type, coord), piece in game.board.pieces.items() if piece.type == PieceType.robber]
+    if len(robbers) != 1:
+        violations.append('{} robbers on the board'.format(len(robbers)))
+    elif hexgrid.tile_id_from_coord(robbers[0]) != game.robber_tile:
+        violations.append('robber on tile={} but robber_tile={}'.format(
+            hexgrid.tile_id_from_coord(robbers[0]), game.robber_tile))
+
+    # board pieces, player_to_pieces, and the rules state
+    on_board = {(coord, piece.type): piece.owner for (_, coord), piece in game.board.pieces.items()
+                if piece.type in _BOARD_TYPES}
+    for (coord, piece_type), owner in on_board.items():
+        if (coord, piece_type) not in game.board.player_to_pieces.get(owner, ()):
+            violations.append('{} at {} of {} missing from player_to_pieces'.format(
+                piece_type.value, hex(coord), owner))
+    for owner, pieces in game.board.player_to_pieces.items():
+        if owner is None:
+            continue
+        for coord, piece_type in pieces:
+            # a city's node also lists the settlement it replaced
+            if on_board.get((coord, piece_type)) != owner and not (
+                    piece_type == PieceType.settlement and on_board.get((coord, PieceType.city)) == owner):
+                violations.append('{} at {} of {} in player_to_pieces but not on the board'.format(
+                    piece_type.value, hex(coord), owner))
+    r = game.rules
+    buildings = evaluation.buildings_from_pieces(game.players, game.board.player_to_pieces)
+    if not np.array_equal(buildings, r.buildings):
+        violations.append('rules buildings differ from the board at nodes={}'.format(
+            sorted(set(np.nonzero(buildings != r.buildings)[1].tolist()))))
+    roads = np.full(topology.NUM_EDGES, -1)
+    for (coord, piece_type), owner in on_board.items():
+        if piece_type == PieceType.road:
+            roads[topology.EDGE_INDEX[coord]] = game.player_index(owner)
+    if not np.array_equal(roads, r.roads):
+        violations.append('rules roads differ from the board at edges={}'.format(
+            np.flatnonzero(roads != r.roads).tolist()))
+    for p in range(len(game.players)):
+        placed = [int((r.buildings[p] == 1).sum()), int((r.buildings[p] == 2).sum()), int((r.roads == p).sum())]
+        left = [r.supply[p, rules.SETTLEMENT], r.supply[p, rules.CITY], r.supply[p, rules.ROAD]]
+        full = [rules.PIECE_SUPPLY[rules.SETTLEMENT], rules.PIECE_SUPPLY[rules.CITY], rules.PIECE_SUPPLY[rules.ROAD]]
+        if [a + b for a, b in zip(placed, left)] != full:
+            violations.append('player={} pieces placed={} and in supply={} do not add up'.format(p, placed, left))
+
+    # resources
+    if (r.hands < 0).any() or (r.bank < 0).any():
+        violations.append('negative resources, hands={} bank={}'.format(r.hands.tolist(), r.bank.tolist()))
+    if ((r.hands.sum(axis=0) + r.bank) != rules.RESOURCES_PER_TYPE).any():
+        violations.append('resources not conserved, hands={} bank={}'.format(r.hands.tolist(), r.bank.tolist()))
+    if not len(game.legal_actions()):
+        violations.append('no legal actions in state={}'.format(type(state).__name__))
+    return violations
+
+
+def fingerprint(game):
+    """
+    What an action which is rejected must leave unchanged.
+
+    :return: hashable
+    """
+    r = game.rules
+    arrays = tuple(value.tobytes() for value in r.__dict__.values() if isinstance(value, np.ndarray)) \
+        if r is not None else ()
+    return (type(game.state), game.get_cur_player(), game.robber_tile, game.last_roll, game._cur_turn,
+            len(game.board.pieces), type(game.dev_card_state), arrays)
+
+
+class Violation(object):
+    """
+    class Violation represents invariants broken in one fuzzed game.
+
+    :param seed: seed of the game, see Fuzzer#play
+    :param step: number of steps made before the violation was found
+    :param history: list of steps made, see Fuzzer#play
+    :param messages: list of str, see #check_invariants
+    """
+    def __init__(self, seed, step, history, messages):
+        self.seed = seed
+        self.step = step
+        self.history = history
+        self.messages = messages
+
+    def __repr__(self):
+        return '<Violation seed={}, step={}, last={}, messages={}>'.format(
+            self.seed, self.step, self.history[-1:], self.messages)
+
+
+class FuzzReport(object):
+    """
+    class FuzzReport summarizes a fuzzing run.
+    """
+    def __init__(self):
+        self.games = 0
+        self.actions = 0 # legal actions made
+        self.rejected = 0 # illegal actions rejected
+        self.undos = 0
+        self.seconds = 0.0
+        self.violations = list()
+
+    @property
+    def steps(self):
+        return self.actions + self.rejected + self.undos
+
+    @property
+    def actions_per_second(self):
+        return self.steps / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return '<FuzzReport games={}, actions={}, rejected={}, undos={}, violations={}, actions_per_second={:.0f}>'.format(
+            self.games, self.actions, self.rejected, self.undos, len(self.violations), self.actions_per_second)
+
+
+class Fuzzer(object):
+    """
+    class Fuzzer plays random games of legal and illegal actions, see module docstring.
+    """
+    def __init__(self, board_opts=None, seed=0, illegal=0.2, undo=0.05, max_turns=100, check=True):
+        """
+        :param board_opts: dictionary mapping str->str, see boardbuilder.get_opts
+        :param seed: seed of the first game; game i is seeded seed + i
+        :param illegal: fraction of steps which try an illegal action
+        :param undo: fraction of steps which undo, and half of those redo as well
+        :param max_turns: turns per game
+        :param check: check invariants after every step, or only play
+        """
+        self.board_opts = board_opts or {'terrain': 'random', 'numbers': 'random'}
+        self.seed = seed
+        self.illegal = illegal
+        self.undo = undo
+        self.max_turns = max_turns
+        self.check = check
+
+    def new_game(self, seed):
+        random.seed(seed)
+        board = boardbuilder.build(dict(self.board_opts))
+        game = Game(board=board, logging='off', undo='on' if self.undo else 'off', turns='on',
+                    max_turns=self.max_turns)
+        game.start([Player(*player) for player in _PLAYERS])
+        return game
+
+    def play(self, seed, report):
+        """
+        Fuzz one game to its end, or to its first violation.
+
+        :param seed: int, seeds the board, the dice, and the choice of steps
+        :param report: FuzzReport, updated
+        :return: Violation or None
+        """
+        game = self.new_game(seed)
+        rng = random.Random(seed)
+        size = catan.actions.size(len(game.players))
+        history = list() # ('action', int), ('illegal', int), ('undo', ), ('redo', )
+        while game.state.is_in_game():
+            draw = rng.random()
+            if draw < self.undo and game.undo_manager.can_undo():
+                game.undo()
+                history.append(('undo', ))
+                report.undos += 1
+                if draw < self.undo / 2 and game.undo_manager.can_redo():
+                    game.redo()
+                    history.append(('redo', ))
+            elif draw < self.undo + self.illegal:
+                mask = game.action_mask()
+                illegal = np.flatnonzero(~mask)
+                action = int(illegal[rng.randrange(len(illegal))]) if len(illegal) else rng.randrange(size)
+                before = fingerprint(game)
+                try:
+                    game.apply_action(action)
+                    messages = ['illegal action={} ({}) was accepted'.format(action, catan.actions.describe(action))]
+                except ValueError:
+                    messages = list()
+                history.append(('illegal', action))
+                report.rejected += 1
+                if not messages and fingerprint(game) != before:
+                    messages = ['rejected action={} ({}) changed the game'.format(action, catan.actions.describe(action))]
+                if messages:
+                    return Violation(seed, len(history), history, messages)
+                continue
+            else:
+                legal = game.legal_actions()
+                action = int(legal[rng.randrange(len(legal))])
+                game.apply_action(action)
+                history.append(('action', action))
+                report.actions += 1
+            if self.check:
+                messages = check_invariants(game)
+                if messages:
+                    return Violation(seed, len(history), history, messages)
+        return None
+
+    def run(self, games=10, seconds=None):
+        """
+        :param games: number of games
+        :param seconds: stop starting new games after this long, optional
+        :return: FuzzReport
+        """
+        report = FuzzReport()
+        start = time.perf_counter()
+        for i in range(games):
+            violation = self.play(self.seed + i, report)
+            report.games += 1
+            if violation is not None:
+                report.violations.append(violation)
+            if seconds is not None and time.perf_counter() - start > seconds:
+                break
+        report.seconds = time.perf_counter() - start
+        return report
+
+    def replay(self, violation):
+        """
+        Replay the steps of a violation, checking invariants after each, to debug it.
+
+        :param violation: Violation
+        :return: (Game, list of str) the game after the failing step, and its violations
+        """
+        game = self.new_game(violation.seed)
+        messages = list()
+        for step in violation.history:
+            if step[0] == 'undo':
+                game.undo()
+            elif step[0] == 'redo':
+                game.redo()
+            else:
+                try:
+                    game.apply_action(step[1])
+                except ValueError:
+                    pass
+            messages = check_invariants(game)
+            if messages:
+                break
+        return game, messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='fuzz games with random legal and illegal actions')
+    parser.add_argument('--games', type=int, default=20, help='games to fuzz, default 20')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game, default 0')
+    parser.add_argument('--illegal', type=float, default=0.2, help='fraction of illegal actions, default 0.2')
+    parser.add_argument('--undo', type=float, default=0.05, help='fraction of undos, default 0.05')
+    parser.add_argument('--max-turns', type=int, default=100, help='turns per game, default 100')
+    parser.add_argument('--no-check', action='store_true', help='only play, to time the action path')
+    args = parser.parse_args()
+    fuzzer = Fuzzer(seed=args.seed, illegal=args.illegal, undo=args.undo, max_turns=args.max_turns,
+                    check=not args.no_check)
+    report = fuzzer.run(args.games)
+    print(report)
+    for violation in report.violations:
+        print(violation)
+        for message in violation.messages:
+            print('  {}'.format(message))
+    return 1 if report.violations else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -2,46 +2,95 @@ import copy
 import logging
 import random 
 
+import numpy as np
+
 import hexgrid
 import catanlog
 import undoredo 
 
+import catan.actions
+import catan.agents
 import catan.states
 import catan.board
+import catan.evaluation
+import catan.events
+import catan.eventstream
+import catan.notifications
 import catan.pieces
+import catan.opening
+import catan.rules
+import catan.statemachine
+import catan.topology
+import catan.undolog
 
 
-class Game(object):
+class Game(catan.notifications.Observable):
     """
     class Game represents a single game of catan. It has players, a board, and a log.
 
     A Game has observers. Observers register themselves by adding themselves to
     the Game's observers set. When the Game changes, it will notify all its observers,
-    who can then poll the game state and make changes accordingly.
+    who can then poll the game state and make changes accordingly. Each action notifies
+    once, and game.changes says what it changed, see module notifications.
 
     e.g. self.game.observers.add(self)
 
+    A Game has an event bus, shared with its board, which publishes typed events (pieces placed,
+    the robber moved, state changes, log text, turns ended) to subscribers of each type, see
+    module events.
+
+    e.g. subscription = self.game.events.subscribe(events.TurnEnded)
+
+    A Game started with option stream on records its actions in an event stream, from which its
+    position after any action can be rebuilt, see module eventstream.
+
+    e.g. earlier = self.game.stream.game_at(len(self.game.stream) - 1)
+
     A Game has state. When changing state, remember to pass the current game to the
     state's constructor. This allows the state to modify the game as appropriate in
     the current state.
 
     e.g. self.set_state(states.GameStateNotInGame(self))
+
+    A Game has agents. A player whose name is a registered agent name (see module agents) is
+    played by that agent, or an agent can be assigned with #set_agent.
+
+    e.g. self.set_agent(player, agents.RandomAgent())
     """
-    def __init__(self, players=None, board=None, logging='on', pregame='on', use_stdout=False):
+    def __init__(self, players=None, board=None, logging='on', pregame='on', use_stdout=False, undo='on',
+                 turns='off', max_turns=None, stream='off', agent_turns='on'):
         """
         Create a Game with the given options.
 
         :param players: list(Player)
         :param board: Board
-        :param logging: (on|off)
+        :param logging: (on|off|buffer), buffer keeps the log in memory and never writes it
         :param pregame: (on|off)
         :param use_stdout: bool (log to stdout?)
+        :param undo: (on|snapshot|off), on records what each action changes (see module undolog),
+                     snapshot copies the whole game before each action, off keeps no undo history
+        :param turns: (on|off), on plays regular turns after the pregame until a player has enough
+                      victory points to win, off ends the game when the pregame ends
+        :param max_turns: int, optional, with turns on the game also ends after this many turns
+        :param stream: (on|off), on records each action made through agents.apply in an event
+                       stream, see module eventstream
+        :param agent_turns: (on|off), on has the game ask its agents for their moves, see
+                            #play_agent_turn; off leaves the agents to be driven from outside, e.g.
+                            by agents.drive, or their actions to be replayed
         """
         # print('Init method for game hit')
         self.observers = set()
-        self.undo_manager = undoredo.UndoManager()
+        if undo == 'snapshot':
+            self.undo_manager = undoredo.UndoManager()
+        else:
+            self.undo_manager = catan.undolog.UndoLog(self)
         self.options = {
             'pregame': pregame,
+            'undo': undo,
+            'turns': turns,
+            'max_turns': max_turns,
+            'stream': stream,
+            'agent_turns': agent_turns,
         }
         self.players = players or list()
         self.board = board or catan.board.Board()
@@ -50,8 +99,11 @@ class Game(object):
         # catanlog: writing, reading
         if logging == 'on':
             self.catanlog = catanlog.CatanLog(use_stdout=use_stdout)
+        elif logging == 'buffer':
+            self.catanlog = catanlog.CatanLog(auto_flush=False)
         else:
             self.catanlog = catanlog.NoopCatanLog()
+        self.catanlog.on_append = self._log_appended
         # self.catanlog_reader = catanlog.Reader()
 
         self.state = None # set in #set_state
@@ -59,14 +111,26 @@ class Game(object):
         self._cur_player = None # set in #set_players
         self.last_roll = None # set in #roll
         self.last_player_to_roll = None # set in #roll
+        self.last_stolen = None # set in #steal, resource index taken or None
         self._cur_turn = 0 # incremented in #end_turn
         self.robber_tile = None # set in #move_robber
-        self.terrain_to_tiles = {} # set in #_terrain_to_tiles
+        self.rules = None # set in #start
+        self._opening_evaluator = None # set in #opening_evaluator
+        self.opening_book = None # openingbook.OpeningBook, optional, see #get_best_assignment
+        self._opening_line = None # set in #opening_line
+        self._node_resources = None # set in #start
+        self._port_access = None # set in #port_access
+        self.final_resources = None # set in #evaluate_final
         # self.resources_owned = {player: [] for player in self.players}
         # self.pregame_coords = {player: [] for player in self.players}
         self.player_to_resources = {}
+        self.agents = {} # Player -> Agent or None, see #get_agent
+        self.stream = None # eventstream.EventStream, set in #start with option stream on
+        self._driving_agents = False # set while #play_agent_turn drives the agents
+        self.dispatcher = None # dispatch.AgentDispatcher, optional, see #play_agent_turn
 
         self.board.observers.add(self)
+        self.events = self.board.events
 
         self.set_state(catan.states.GameStateNotInGame(self))
         self.set_dev_card_state(catan.states.DevCardNotPlayedState(self))
@@ -83,7 +147,7 @@ class Game(object):
                 setattr(result, k, set(v))
             elif k == 'state':
                 setattr(result, k, v)
-            elif k == 'undo_manager':
+            elif k in ('undo_manager', 'agents', 'opening_book', 'stream', 'dispatcher'):
                 setattr(result, k, v)
             else:
                 setattr(result, k, copy.deepcopy(v, memo))
@@ -91,28 +155,75 @@ class Game(object):
 
     def do(self, command: undoredo.Command):
         """
-        Does the command using the undo_manager's stack
+        Does the command using the undo_manager's stack.
+
+        If option 'undo' is off, the command is run directly and cannot be undone. A game with an
+        event stream also runs it directly: the stream is its undo history, see #undo.
+
+        The command runs in a batch, so observers are notified once when it is done.
         :param command: Command
         """
-        self.undo_manager.do(command)
-        self.notify_observers()
+        with self.batch(command.do_method.__name__):
+            if self.options.get('undo') == 'off' or self.stream is not None:
+                command.do_method(command.obj, *command.args)
+            else:
+                self.undo_manager.do(command)
+            self.notify_observers(catan.notifications.UNDO, catan.notifications.LOG)
 
+    @catan.notifications.batched
     def undo(self):
         """
         Rewind the game to the previous state.
+
+        A game with an event stream undoes its latest event, which the stream forgets, see
+        EventStream#rewind.
         """
-        self.undo_manager.undo()
+        if self.stream is not None:
+            self._rewind(len(self.stream) - 1)
+        else:
+            self.undo_manager.undo()
         self.notify_observers()
         # logging.debug('undo_manager undo stack={}'.format(self.undo_manager._undo_stack))
 
+    @catan.notifications.batched
     def redo(self):
         """
         Redo the latest undone command.
+
+        A game with an event stream makes its latest undone event again, see EventStream#redo.
         """
-        self.undo_manager.redo()
+        if self.stream is not None:
+            self.stream.redo()
+        else:
+            self.undo_manager.redo()
         self.notify_observers()
         # logging.debug('undo_manager redo stack={}'.format(self.undo_manager._redo_stack))
 
+    def can_undo(self):
+        if self.stream is not None:
+            return len(self.stream) > 0
+        return self.undo_manager.can_undo()
+
+    def can_redo(self):
+        if self.stream is not None:
+            return self.stream.can_redo()
+        return self.undo_manager.can_redo()
+
+    def _rewind(self, n):
+        """
+        Take the position after the first n events of the stream, which forgets the events from n
+        on, see EventStream#rewind. The game keeps its observers, log and options.
+
+        :param n: int, 0 <= n <= len(self.stream)
+        """
+        earlier = self.stream.rewind(n)
+        earlier.observers, earlier.board.observers = self.observers, self.board.observers
+        earlier.catanlog, earlier.options = self.catanlog, self.options
+        self.restore(earlier)
+        self._node_resources = earlier._node_resources
+        self._port_access = None
+        self.stream.game = self
+
     def copy(self):
         """
         Return a deep copy of this Game object. See Game.__deepcopy__ for the copy implementation.
@@ -120,6 +231,7 @@ class Game(object):
         """
         return copy.deepcopy(self)
 
+    @catan.notifications.batched
     def restore(self, game):
         """
         Restore this Game object to match the properties and state of the given Game object
@@ -137,26 +249,27 @@ class Game(object):
         self.state.game = self
 
         self.dev_card_state = game.dev_card_state
+        self.dev_card_state.game = self
 
         self._cur_player = game._cur_player
         self.last_roll = game.last_roll
         self.last_player_to_roll = game.last_player_to_roll
+        self.last_stolen = game.last_stolen
         self._cur_turn = game._cur_turn
         self.robber_tile = game.robber_tile
+        self.rules = game.rules
 
         self.notify_observers()
 
     # def read_from_file(self, file):
     #     self.catanlog_reader.use_file(file)
 
-    def notify(self, observable):
-        self.notify_observers()
+    def _log_appended(self, text):
+        self.events.publish(catan.events.LogAppended, text)
 
-    def notify_observers(self):
-        # print('game\'s notify_observers called')
-        for obs in self.observers.copy():
-            # print('calling .notify() on obs={}'.format(obs))
-            obs.notify(self)
+    def notify(self, observable):
+        if self.observers:
+            self.notify_observers(*observable.changes.kinds)
 
     def set_state(self, game_state):
         # print('set_state called with game_state={}'.format(game_state))
@@ -164,7 +277,6 @@ class Game(object):
         _old_board_state = self.board.state
         self.state = game_state
         if game_state.is_in_game():
-            print('set_state calling board.lock')
             self.board.lock()
         else:
             # print('5')
@@ -175,12 +287,54 @@ class Game(object):
             # type(self.board.state).__name__,
             # type(_old_board_state).__name__
         # ))
+        if self.events.subscribed(catan.events.StateChanged):
+            self.events.publish(catan.events.StateChanged, type(game_state).__name__,
+                                type(_old_state).__name__ if _old_state is not None else None, self.capabilities())
         # print('set_state calling notify_observers')
-        self.notify_observers()
+        self.notify_observers(catan.notifications.STATE)
 
     def set_dev_card_state(self, dev_state):
         self.dev_card_state = dev_state
-        self.notify_observers()
+        self.notify_observers(catan.notifications.DEV_CARD_STATE)
+
+    def capabilities(self):
+        """
+        Everything the current state can do, as bits. Test one with e.g.
+        game.capabilities() & statemachine.CAN_ROLL. See module statemachine.
+
+        :return: int
+        """
+        return catan.statemachine.capabilities(self)
+
+    def legal_actions(self):
+        """
+        The actions the current player may take, as ints, see module actions.
+
+        :return: int array
+        """
+        return catan.actions.legal_actions(self)
+
+    def action_mask(self):
+        """
+        :return: (actions.size(P),) bool, which actions the current player may take, see module actions
+        """
+        return catan.actions.legal_mask(self)
+
+    def apply_action(self, action, check=True):
+        """
+        Make an action for the current player, see agents.apply.
+
+        :param action: int, see module actions
+        :param check: raise ValueError if the action is not legal. Actions outside the action space,
+                      see actions.size, raise ValueError either way.
+        """
+        size = catan.actions.size(len(self.players))
+        if not 0 <= action < size:
+            raise ValueError('Action={} is outside the action space of size={}'.format(action, size))
+        if check and not catan.actions.legal_mask(self)[action]:
+            raise ValueError('Illegal action={} ({}) in state={}'.format(
+                action, catan.actions.describe(action), type(self.state).__name__))
+        catan.agents.apply(self, catan.actions.decode(self, action))
 
     @undoredo.undoable
     def start(self, players):
@@ -206,6 +360,11 @@ class Game(object):
             players = Game.get_debug_players()
         # print('-calling set_players({})'.format(players))
         self.set_players(players)
+        self.rules = catan.rules.RulesState(len(self.players), self.board.tiles)
+        self._node_resources = catan.evaluation.node_resources(self.rules.tile_resource)
+        self._opening_evaluator = None
+        self._opening_line = None
+        self._port_access = None
         if self.options.get('pregame') is None or self.options.get('pregame') == 'on':
             # logging.debug('Entering pregame, game options={}'.format(self.options))
             # print('-call set_state(catan.states.GameStatePreGamePlacingPiece(self, catan.pieces.PieceType.settlement))')
@@ -228,58 +387,31 @@ class Game(object):
                 # logging.debug('Found robber at coord={}, set robber_tile={}'.format(coord, self.robber_tile))
 
         self.catanlog.log_game_start(self.players, terrain, numbers, self.board.ports)
+        if self.options.get('stream') == 'on':
+            self.stream = catan.eventstream.EventStream.begin(self)
         self.notify_observers()
 
+    @catan.notifications.batched
     def end(self):
-        print('Game\'s end method called')
         self.catanlog.log_wins(self.get_cur_player())
-        print('final pieces = {}'.format(self.board.player_to_pieces))
+        logging.debug('final pieces = {}'.format(self.board.player_to_pieces))
         self.evaluate_final(self.board.player_to_pieces)
         self.set_state(catan.states.GameStateNotInGame(self))
-        self.notify_observers()
+        self.notify_observers(catan.notifications.LOG)
 
     def evaluate_final(self, pieces):
-        self.player_to_resources = {player: [] for player in pieces}
-
-        terrain_to_tiles = {}
-        vocab = {catan.board.Terrain.desert: 'Desert',
-        catan.board.Terrain.wheat: 'Wheat',
-        catan.board.Terrain.ore: 'Ore',
-        catan.board.Terrain.sheep: 'Sheep',
-        catan.board.Terrain.brick: 'Brick',
-        catan.board.Terrain.wood: 'Wood'}
-
-        for tile in self.board.tiles: 
-            print('tile={}'.format(tile))
-            if vocab[tile.terrain] in terrain_to_tiles:
-                print('tile.terrain={}'.format(tile.terrain))
-                print('vocab[tile.terrain]={}'.format(vocab[tile.terrain])) 
-                terrain_to_tiles[vocab[tile.terrain]].append(tile.tile_id)
-            else:
-                terrain_to_tiles[vocab[tile.terrain]] = [tile.tile_id]  
-        print('terrain_to_tiles={}'.format(terrain_to_tiles))
-
-        tile_id_to_terrain_type = {tile: [] for tile in hexgrid.legal_tile_ids()}
-        # for each terrain type
-        for terrain in terrain_to_tiles:
-            # for each tile
-            for tile in hexgrid.legal_tile_ids():
-                if tile in terrain_to_tiles[terrain]:
-                    tile_id_to_terrain_type[tile].append(terrain)
-
-        
-        # for each player 
-        for player in pieces:
-            # for each resource owned by the player 
-            for item in pieces[player]:
-                # if resource is a city 
-                if item[1] == catan.pieces.PieceType.settlement:
-                    coord = item[0]
-                    adjacent_tiles = hexgrid.adjacent_tiles_to_node(coord)
-                    for adj_tile in adjacent_tiles:
-                        self.player_to_resources[player].append(tile_id_to_terrain_type[adj_tile])
-
-        print(self.player_to_resources)
+        """
+        Count the resource tiles each player's buildings touch, cities twice. See module evaluation.
+
+        Sets final_resources, (P, 5) in the order of self.players, and player_to_resources,
+        dict Player -> Counter of resource name -> count.
+
+        :param pieces: dict Player -> list((coord, PieceType)), see Board.player_to_pieces
+        """
+        buildings = catan.evaluation.buildings_from_pieces(self.players, pieces)
+        self.final_resources = catan.evaluation.final_resources(buildings, self._node_resources)
+        self.player_to_resources = catan.evaluation.as_counters(self.players, self.final_resources)
+        logging.debug('player_to_resources={}'.format(self.player_to_resources))
 
     def reset(self):
         # print('Game\'s reset method called')
@@ -289,29 +421,62 @@ class Game(object):
 
         self.last_roll = None
         self.last_player_to_roll = None
+        self.last_stolen = None
         self._cur_player = None
         self._cur_turn = 0
+        self.rules = None
 
         self.notify_observers()
 
     def get_cur_player(self):
         # print('Game\'s get_cur_player method called when cur_player={}'.format(self._cur_player))
         if self._cur_player is None:
-            return Player(1, 'nobody', 'nobody')
-        else:
-            return Player(self._cur_player.seat, self._cur_player.name, self._cur_player.color)
+            return NOBODY
+        return self._cur_player
 
     def set_cur_player(self, player):
-        print('Game\'s set_cur_player method called with cur_player={}'.format(Player(player.seat, player.name, player.color)))
-        self._cur_player = Player(player.seat, player.name, player.color)
-        # print('self._cur_player={}'.format(Player(player.seat, player.name, player.color)))
+        self._cur_player = self.interned(player)
 
     def set_players(self, players):
+        """
+        Intern the players: each is copied with its index in self.players as its id. The players
+        given are not changed; one which already has that id is used as it is.
+
+        :param players: list(Player), in seat order
+        """
         # print('Game\'s set_players method called')
-        self.players = list(players)
+        self.players = [player if player.id == i else Player(player.seat, player.name, player.color, id=i)
+                        for i, player in enumerate(players)]
         # print('set_players calling set_cur_player({})'.format(self.players[0]))
         self.set_cur_player(self.players[0])
-        self.notify_observers()
+        self.notify_observers(catan.notifications.PLAYERS)
+
+    def interned(self, player):
+        """
+        This game's own object for a player, see #set_players. Players equal to none of this
+        game's players are returned as they are.
+
+        :param player: Player
+        :return: Player
+        """
+        if player.id is not None and player.id < len(self.players) and self.players[player.id] is player:
+            return player
+        for own in self.players:
+            if own == player:
+                return own
+        return player
+
+    def player_index(self, player):
+        """
+        The player's index in self.players, which indexes the arrays in self.rules.
+        """
+        return self.interned(player).id
+
+    def cur_player_index(self):
+        """
+        The current player's index in self.players, which indexes the arrays in self.rules.
+        """
+        return self._cur_player.id
 
     def cur_player_has_port_type(self, port_type):
         # print('Game\'s cur_player_has_port_type method called')
@@ -348,24 +513,35 @@ class Game(object):
         self.last_roll = roll
         self.last_player_to_roll = self.get_cur_player()
         if int(roll) == 7:
+            self.rules.discard_half()
             self.set_state(catan.states.GameStateMoveRobber(self))
         else:
+            self.rules.produce(roll, self.robber_tile)
             self.set_state(catan.states.GameStateDuringTurnAfterRoll(self))
 
     @undoredo.undoable
     def move_robber(self, tile):
         # print('\nGame\'s move_robber method called\n')
+        previous = self.robber_tile
         self.state.move_robber(tile)
+        self.events.publish(catan.events.RobberMoved, tile, previous, self.get_cur_player())
+        self.notify_observers(catan.notifications.PIECES)
 
     @undoredo.undoable
-    def steal(self, victim):
+    def steal(self, victim, resource=None):
+        """
+        :param victim: Player, or None to steal from nobody
+        :param resource: resource index to take, optional, chosen at random by count if not given
+        """
         # print('\nGame\'s steal method called\n')
+        self.last_stolen = None
         if victim is None:
-            victim = Player(1, 'nobody', 'nobody')
+            victim = NOBODY
+        elif victim in self.players:
+            self.last_stolen = self.rules.steal(self.cur_player_index(), self.player_index(victim), resource)
         self.state.steal(victim)
 
     def stealable_players(self):
-        print('\nGame\'s stealable_players method called\n')
         if self.robber_tile is None:
             return list()
         stealable = set()
@@ -376,13 +552,18 @@ class Game(object):
                 # logging.debug('found stealable player={}, cur={}'.format(pieces[0].owner, self.get_cur_player()))
                 stealable.add(pieces[0].owner)
         # print('stealable={}'.format(stealable))
-        if self.get_cur_player() in stealable:
-            # print('if cur_player is stealable, remove it from stealable')
-            stealable.remove(self.get_cur_player())
+        stealable.discard(self.get_cur_player())
         # logging.debug('stealable players={} at robber tile={}'.format(stealable, self.robber_tile))
         # print('stealable={}'.format(stealable))
         return stealable
 
+    # state.place_road calls this for each road of a road builder, see GameStatePlacingRoadBuilderPieces
+    def build_free_road(self, edge):
+        piece = catan.pieces.Piece(catan.pieces.PieceType.road, self.get_cur_player())
+        self.board.place_piece(piece, edge)
+        self.notify_observers(catan.notifications.PIECES)
+        self.rules.build(self.cur_player_index(), catan.rules.ROAD, free=True, edge=edge)
+
     @undoredo.undoable
     def begin_placing(self, piece_type):
         # print('\nGame\'s begin_placing method called with piece_type={}\n'.format(piece_type))
@@ -397,6 +578,8 @@ class Game(object):
         #self.assert_legal_road(edge)
         piece = catan.pieces.Piece(catan.pieces.PieceType.road, self.get_cur_player())
         self.board.place_piece(piece, edge)
+        self.notify_observers(catan.notifications.PIECES)
+        self.rules.build(self.cur_player_index(), catan.rules.ROAD, free=self.state.is_in_pregame(), edge=edge)
         self.catanlog.log_buys_road(self.get_cur_player(), hexgrid.location(hexgrid.EDGE, edge))
         if self.state.is_in_pregame():
             self.end_turn()
@@ -405,13 +588,17 @@ class Game(object):
 
     # @undoredo.undoable # state.place_settlement calls this, place_settlement is undoable
     def buy_settlement(self, node):
-        print('\nGame\'s buy_settlement method called with node={}\n'.format(node))
         #self.assert_legal_settlement(node)
         piece = catan.pieces.Piece(catan.pieces.PieceType.settlement, self.get_cur_player())
         # print('piece = {0} = catan.pieces.Piece({1}, {2})'.format(piece, catan.pieces.PieceType.settlement, self.get_cur_player()))
         # print('calling self.board.place_piece(piece={0}, node={1}'.format(piece, node))
 
         self.board.place_piece(piece, node)
+        self.notify_observers(catan.notifications.PIECES)
+        player = self.cur_player_index()
+        self.rules.build(player, catan.rules.SETTLEMENT, node, free=self.state.is_in_pregame())
+        if self.state.is_in_pregame() and self.rules.supply[player, catan.rules.SETTLEMENT] == catan.rules.PIECE_SUPPLY[catan.rules.SETTLEMENT] - 2:
+            self.rules.grant_starting_resources(player, node)
         self.catanlog.log_buys_settlement(self.get_cur_player(), hexgrid.location(hexgrid.NODE, node))
 
 
@@ -426,6 +613,8 @@ class Game(object):
         #self.assert_legal_city(node)
         piece = catan.pieces.Piece(catan.pieces.PieceType.city, self.get_cur_player())
         self.board.place_piece(piece, node)
+        self.notify_observers(catan.notifications.PIECES)
+        self.rules.build(self.cur_player_index(), catan.rules.CITY, node)
 
         # self.resources_owned[self._cur_player].append() 
         # self.pregame_coords[self._cur_player].append()
@@ -436,8 +625,9 @@ class Game(object):
     @undoredo.undoable
     def buy_dev_card(self):
         # print('\nGame\'s buy_dev_card method called\n')
+        self.rules.buy_dev_card(self.cur_player_index())
         self.catanlog.log_buys_dev_card(self.get_cur_player())
-        self.notify_observers()
+        self.notify_observers(catan.notifications.RESOURCES)
 
     @undoredo.undoable
     def place_road(self, edge_coord):
@@ -462,35 +652,53 @@ class Game(object):
         getting = trade.getting()
         if hasattr(trade.getter(), 'type') and trade.getter().type in catan.board.PortType:
             getter = trade.getter()
+            self.rules.trade_with_bank(self.player_index(giver),
+                                       catan.rules.resource_vector(giving),
+                                       catan.rules.resource_vector(getting))
             self.catanlog.log_trades_with_port(giver, giving, getter, getting)
             # logging.debug('trading {} to port={} to get={}'.format(giving, getter, getting))
         else:
             getter = trade.getter()
-            self.catanlog.log_trades_with_player(giver, giving, getter, getting)
+            self.rules.trade_with_player(self.player_index(giver), self.player_index(getter),
+                                         catan.rules.resource_vector(giving),
+                                         catan.rules.resource_vector(getting))
+            self.catanlog.log_trades_with_other_player(giver, giving, getter, getting)
             # logging.debug('trading {} to player={} to get={}'.format(giving, getter, getting))
-        self.notify_observers()
+        self.notify_observers(catan.notifications.RESOURCES)
 
     @undoredo.undoable
     def play_knight(self):
         # print('\nGame\'s play_knight method called\n')
+        self.rules.play_dev_card(self.cur_player_index(), catan.rules.KNIGHT)
         self.set_dev_card_state(catan.states.DevCardPlayedState(self))
         self.set_state(catan.states.GameStateMoveRobberUsingKnight(self))
 
     @undoredo.undoable
     def play_monopoly(self, resource):
         # print('\nGame\'s play_monopoly method called with resource={}\n'.format(resource))
+        self.rules.play_dev_card(self.cur_player_index(), catan.rules.MONOPOLY)
+        self.rules.monopoly(self.cur_player_index(), catan.topology.RESOURCE_INDEX[resource])
         self.catanlog.log_plays_monopoly(self.get_cur_player(), resource)
         self.set_dev_card_state(catan.states.DevCardPlayedState(self))
 
     @undoredo.undoable
     def play_year_of_plenty(self, resource1, resource2):
         # print('\nGame\'s play_year_of_plenty method called\n')
+        self.rules.play_dev_card(self.cur_player_index(), catan.rules.YEAR_OF_PLENTY)
+        self.rules.year_of_plenty(self.cur_player_index(),
+                                  catan.topology.RESOURCE_INDEX[resource1],
+                                  catan.topology.RESOURCE_INDEX[resource2])
         self.catanlog.log_plays_year_of_plenty(self.get_cur_player(), resource1, resource2)
         self.set_dev_card_state(catan.states.DevCardPlayedState(self))
 
+    @undoredo.undoable
+    def begin_road_builder(self):
+        self.set_state(catan.states.GameStatePlacingRoadBuilderPieces(self))
+
     @undoredo.undoable
     def play_road_builder(self, edge1, edge2):
         # print('\nGame\'s play_road_builder method called\n')
+        self.rules.play_dev_card(self.cur_player_index(), catan.rules.ROAD_BUILDER)
         self.catanlog.log_plays_road_builder(self.get_cur_player(),
                                                     hexgrid.location(hexgrid.EDGE, edge1),
                                                     hexgrid.location(hexgrid.EDGE, edge2))
@@ -499,25 +707,26 @@ class Game(object):
     @undoredo.undoable
     def play_victory_point(self):
         # print('\nGame\'s play_victory_point method called\n')
+        self.rules.play_dev_card(self.cur_player_index(), catan.rules.VICTORY_POINT)
         self.catanlog.log_plays_victory_point(self.get_cur_player())
         self.set_dev_card_state(catan.states.DevCardPlayedState(self))
 
     @undoredo.undoable
     def end_turn(self):
-        print('*******************************************************************************************************\
-*******************************************************************************************************\
-                        !!!!!!!!!!!!!!!!!!!!FINISHED TURN!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!                \
-*******************************************************************************************************\
-*******************************************************************************************************')      
-        print('\nGame\'s end_turn method called when cur_player={0}, next_player={1}\n'.format(self._cur_player, self.state.next_player))
+        logging.debug('end_turn called when cur_player={0}'.format(self._cur_player))
+        max_turns = self.options.get('max_turns')
+        if self.options.get('turns') == 'on' and (self.rules.winner() == self.cur_player_index() or
+                                                  max_turns is not None and self._cur_turn + 1 >= max_turns):
+            self.end()
+            return
         self.catanlog.log_ends_turn(self.get_cur_player())
+        self.events.publish(catan.events.TurnEnded, self.get_cur_player(), self._cur_turn)
+        self.rules.end_turn()
         # print('self.state.next_player()={}'.format(self.state.next_player()))
 
         self.set_cur_player(self.state.next_player())
         logging.debug('self.state is {}'.format(self.state))
         if self.state.can_end_game():
-            print('self.state.can_end_game={}'.format(self.state.can_end_game))
-            logging.debug('*****************************************')
             self.end()
 
         self._cur_turn += 1
@@ -525,59 +734,150 @@ class Game(object):
 
         self.set_dev_card_state(catan.states.DevCardNotPlayedState(self))
         if self.state.is_in_pregame():
-            print('self.state.is_in_pregame() == TRUE')
             self.set_state(catan.states.GameStatePreGamePlacingPiece(self, catan.pieces.PieceType.settlement))
-        else:
-            print('self.state.is_in_pregame() == False and setting state to GSBT')
-            self.end()
-            # self.set_state(catan.states.GameStateBeginTurn(self))
-
-        if 'agent1' in self._cur_player.name:
-            if self.state.is_in_pregame():
-                node, edge = self.get_random_assignment(self.board.pieces)
-                self.place_settlement(node)
-                self.place_road(edge)
-        elif 'agent2' in self._cur_player.name:
-            if self.state.is_in_pregame():
-                node, edge = self.get_best_assignment(self.board.pieces)
-                self.place_settlement(node)
-                self.place_road(edge)
+        elif self.state.is_in_game():
+            if self.options.get('turns') == 'on':
+                self.set_state(catan.states.GameStateBeginTurn(self))
+            else:
+                self.end()
+
+        self.play_agent_turn()
+
+    def get_agent(self, player):
+        """
+        The agent which plays for a player. Unless one was set with #set_agent, a player whose
+        name is registered in the agent registry is played by a new agent of that name, see
+        agents.register.
+
+        :param player: Player
+        :return: Agent, or None if the player is not played by an agent
+        """
+        if player not in self.agents:
+            registered = catan.agents.registered()
+            self.agents[player] = registered[player.name]() if player.name in registered else None
+        return self.agents[player]
+
+    def set_agent(self, player, agent):
+        """
+        :param player: Player
+        :param agent: Agent, or None for the player to be played by hand
+        """
+        self.agents[player] = agent
+
+    def play_agent_turn(self):
+        """
+        While the current player is played by an agent, ask the agent for an action and make it.
+        Returns when it is a human's turn, or when the game ends.
+
+        Called at the end of every turn. Call it once after #start as well, so that an agent
+        in the first seat makes its first move. Calls made while agents are already being
+        driven return immediately, so turns never nest, as do all calls with option agent_turns off.
+
+        With a dispatcher, the agent's decision is asked for and this returns at once; the
+        dispatcher makes the action when it is done, see module dispatch.
+        """
+        if self._driving_agents or self.options.get('agent_turns') == 'off':
+            return
+        if self.dispatcher is not None:
+            if self.state.is_in_game() and self.get_agent(self._cur_player) is not None:
+                self.dispatcher.request(self)
+            return
+        self._driving_agents = True
+        try:
+            while self.state.is_in_game():
+                agent = self.get_agent(self._cur_player)
+                if agent is None:
+                    break
+                catan.agents.apply(self, agent.decide(self))
+        finally:
+            self._driving_agents = False
 
     # def node_to_resources(self, node):
 
 
 
     def get_random_assignment(self, d):
-        assigned_nodes = {piece[1] for piece in d if piece[0] == 1}
-        free_nodes = hexgrid.legal_node_coords() - assigned_nodes
+        """
+        A random legal opening settlement for the current player, and a random road next to it.
 
-        assigned_edges = {piece[1] for piece in d if piece[0] == 0}
-        free_edges = hexgrid.legal_edge_coords() - assigned_edges
+        :param d: board pieces, dict (hex_type, coord) -> Piece
+        :return: (node coord, edge coord)
+        """
+        player = self.cur_player_index()
+        node = random.choice(list(np.flatnonzero(self.rules.settlement_mask(player, connected=False))))
+        edge = random.choice(list(np.flatnonzero(self.rules.road_mask(player, node))))
+        return catan.topology.NODES[node], catan.topology.EDGES[edge]
 
-        # random placement of both road and settlement 
-        return (random.sample(free_nodes, 1)[0], random.sample(free_edges, 1)[0])
+    def port_access(self):
+        """
+        Which nodes give access to which trade ratios on this game's board, built on first use after #start.
 
-    def get_best_assignment(self, d):
-        assigned_nodes = {piece[1] for piece in d if piece[0] == 1}
-        free_nodes = hexgrid.legal_node_coords() - assigned_nodes
-        node_choice = random.sample(free_nodes, 1)[0]
+        :return: (54, 6) bool, see topology.port_arrays
+        """
+        if self._port_access is None:
+            self._port_access = catan.topology.port_arrays(self.board.ports)
+        return self._port_access
 
-        # not building on the same hex 
-        if self._cur_player in self.board.player_to_pieces:
-            flag = True
-            while flag:
-                choice_adjacent = hexgrid.adjacent_tiles_to_node(node_choice)
+    def opening_evaluator(self):
+        """
+        The opening placement evaluator for this game's board, built on first use after #start.
 
-                past_choice = self.board.player_to_pieces[self._cur_player][0]
-                past_adjacent = hexgrid.adjacent_tiles_to_node(past_choice[0])
+        :return: opening.OpeningEvaluator
+        """
+        if self._opening_evaluator is None:
+            self._opening_evaluator = catan.opening.OpeningEvaluator.from_game(self)
+        return self._opening_evaluator
 
-                if set(choice_adjacent).isdisjoint(set(past_adjacent)):
-                    flag = False
-                else:
-                    node_choice = random.sample(free_nodes, 1)[0] 
+    def opening_line(self):
+        """
+        This game's line in its opening book, looked up on first use after #start.
 
-        # building road next to settlement 
-        return (node_choice, node_choice)
+        :return: openingbook.OpeningLine, or None if there is no book or the board is not in it
+        """
+        if self.opening_book is None:
+            return None
+        if self._opening_line is None:
+            self._opening_line = self.opening_book.line(self.board, len(self.players)) or False
+        return self._opening_line or None
+
+    @staticmethod
+    def _taken_edges(d):
+        return {catan.topology.EDGE_INDEX[coord] for (_, coord), piece in d.items()
+                if piece.type == catan.pieces.PieceType.road}
+
+    def get_best_assignment(self, d):
+        """
+        The best opening settlement for the current player, and the best road next to it.
+        The opening book is consulted first, see module openingbook, then the evaluator, see module opening.
+
+        :param d: board pieces, dict (hex_type, coord) -> Piece
+        :return: (node coord, edge coord)
+        """
+        player = self.cur_player_index()
+        line = self.opening_line()
+        placement = line.settlement(self.rules.buildings, player) if line else None
+        if placement is None:
+            placement = self.opening_evaluator().best_placement(self.rules.buildings, player, self._taken_edges(d))
+        node, edge = placement
+        return catan.topology.NODES[node], catan.topology.EDGES[edge]
+
+    def get_best_road(self, d, node_coord):
+        """
+        The best opening road next to the current player's newest settlement.
+        The opening book is consulted first, then the evaluator.
+
+        :param d: board pieces, dict (hex_type, coord) -> Piece
+        :param node_coord: the settlement's node coord
+        :return: edge coord
+        """
+        player = self.cur_player_index()
+        node = catan.topology.NODE_INDEX[node_coord]
+        taken_edges = self._taken_edges(d)
+        line = self.opening_line()
+        edge = line.road(self.rules.buildings, player, node, taken_edges) if line else None
+        if edge is None:
+            edge = self.opening_evaluator().best_road(self.rules.buildings, player, node, taken_edges)
+        return catan.topology.EDGES[edge]
 
     @classmethod
     def get_debug_players(cls):
@@ -591,11 +891,19 @@ class Game(object):
 class Player(object):
     """class Player represents a single player on the game board.
 
+    A game interns its players when it starts (see Game#set_players): each gets a small integer id,
+    its index in Game.players and in the arrays of Game.rules, and the game hands out that one object
+    wherever the player is needed. Hot paths then compare players by identity and index by id.
+    Players are not changed after construction.
+
     :param seat: integer, with 1 being top left, and increasing clockwise
     :param name: will be lowercased, spaces will be removed
     :param color: will be lowercased, spaces will be removed
+    :param id: index in Game.players, set by Game#set_players
     """
-    def __init__(self, seat, name, color):
+    __slots__ = ('seat', 'name', 'color', 'id')
+
+    def __init__(self, seat, name, color, id=None):
         # print('\nHitting Player init method\n')
         if not (1 <= seat <= 4):
             raise Exception("Seat must be on [1,4]")
@@ -603,19 +911,25 @@ class Player(object):
 
         self.name = name.lower().replace(' ', '')
         self.color = color.lower().replace(' ', '')
+        self.id = id
 
     def __eq__(self, other):
+        if other is self:
+            return True
         if other is None:
             return False
         if other.__class__ != Player:
             return False
-        return (self.color == other.color
-                and self.name == other.name
-                and self.seat == other.seat)
+        return (self.seat == other.seat
+                and self.color == other.color
+                and self.name == other.name)
 
     def __repr__(self):
         return '{} ({})'.format(self.color, self.name)
 
     def __hash__(self):
-        return sum(bytes(str(self), encoding='utf8'))
+        return hash((self.seat, self.name, self.color))
+
 
+# the current player before the game starts, and the victim of a steal from nobody
+NOBODY = Player(1, 'nobody', 'nobody')
@@ -0,0 +1,181 @@
+"""
+module headless provides an engine which plays whole games of catan between agents, with no GUI.
+
+Headless games have no observers, write no log files, and take no undo restore points.
+Nothing in this module imports tkinter or prints.
+
+Every player must be played by an agent, i.e. its name must be a registered agent name such as
+'agent1' or 'agent2'. See module agents.
+
+e.g.
+    engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'})
+    players = [Player(1, 'agent1', 'red'), Player(2, 'agent2', 'blue'), ...]
+    result = engine.play(players, seed=42)
+    result.winner                                   # None if no player reached the points to win
+
+Use #play_many to play a batch of games. It is the building block for batch simulation.
+Use #play_batch to play games in lock-step, so each agent decides for all of them at once.
+"""
+import random
+
+import catan.agents
+import catan.game
+from catan import boardbuilder
+
+
+class GameResult(object):
+    """
+    class GameResult summarizes one finished headless game.
+
+    :param players: list(Player), in seat order
+    :param pieces: dict Player -> list((coord, PieceType)), see Board.player_to_pieces
+    :param resources: dict Player -> Counter of resource name -> count, see Game#evaluate_final
+    :param victory_points: list of victory points, in seat order
+    :param turns: number of turns played, including the pregame
+    :param winner: Player who won, or None for a game which ended without a winner, e.g. after
+                   max_turns, or after the pregame with turns off
+    """
+    def __init__(self, players, pieces, resources, victory_points, turns, winner=None):
+        self.players = players
+        self.pieces = pieces
+        self.resources = resources
+        self.victory_points = victory_points
+        self.turns = turns
+        self.winner = winner
+
+    @property
+    def leader(self):
+        """
+        The player with the most victory points, then the most resources collected, whether or
+        not they won. Ties go to the lower seat.
+        """
+        return max(zip(self.players, self.victory_points),
+                   key=lambda pv: (pv[1], sum(self.resources.get(pv[0], {}).values()), -pv[0].seat))[0]
+
+    def as_dict(self):
+        """
+        A JSON-serializable summary, keyed by seat.
+        """
+        return {
+            'winner': self.winner.seat if self.winner is not None else None,
+            'leader': self.leader.seat,
+            'turns': self.turns,
+            'victory_points': {p.seat: vp for p, vp in zip(self.players, self.victory_points)},
+            'resources': {p.seat: dict(self.resources.get(p, {})) for p in self.players},
+        }
+
+    def __repr__(self):
+        return '<GameResult winner={}, turns={}>'.format(self.winner, self.turns)
+
+
+class HeadlessEngine(object):
+    """
+    class HeadlessEngine plays games between agents, building a new board for each game.
+
+    Boards are built with module boardbuilder, or drawn from a board catalogue if one is given.
+    """
+    def __init__(self, board_opts=None, catalogue=None, percentile=None, pregame='on', turns='off',
+                 max_turns=None, opening_book=None):
+        """
+        :param board_opts: dictionary mapping str->str, see boardbuilder.get_opts
+        :param catalogue: catalogue.BoardCatalogue to draw boards from, optional
+        :param percentile: fairness percentile to draw boards at, optional
+        :param pregame: (on|off)
+        :param turns: (on|off), see Game
+        :param max_turns: int, optional, see Game
+        :param opening_book: openingbook.OpeningBook for agents' opening placements, optional
+        """
+        self.board_opts = board_opts or dict()
+        self.catalogue = catalogue
+        self.percentile = percentile
+        self.pregame = pregame
+        self.turns = turns
+        self.max_turns = max_turns
+        self.opening_book = opening_book
+
+    def new_game(self, seed=None):
+        """
+        Build a board and a Game configured for headless play.
+
+        :param seed: seeds module random before building the board, optional
+        :return: Game
+        """
+        if seed is not None:
+            random.seed(seed)
+        board = boardbuilder.build(dict(self.board_opts), catalogue=self.catalogue, percentile=self.percentile)
+        game = catan.game.Game(board=board, logging='off', pregame=self.pregame, undo='off',
+                               turns=self.turns, max_turns=self.max_turns)
+        game.opening_book = self.opening_book
+        return game
+
+    def play(self, players, seed=None):
+        """
+        Play one game to completion.
+
+        :param players: list(Player), all of which must be agents
+        :param seed: seeds module random, optional
+        :return: GameResult
+        """
+        game = self.new_game(seed)
+        game.start(players)
+        game.play_agent_turn()
+        self._check_finished(game)
+        return self.result(game)
+
+    def play_batch(self, players, seeds):
+        """
+        Play one game per seed in lock-step, see agents.drive. Agents which implement
+        Agent#decide_batch decide for every waiting game in one call.
+
+        Each game's board is built from its seed, but the games share module random while they
+        are played, so results differ from #play with the same seeds.
+
+        :param players: list(Player), all of which must be agents
+        :param seeds: list of seeds, one per game
+        :return: list of GameResult, in the order of the seeds
+        """
+        # one agent per name, shared by every seat and game, so each decides for all of its games at once
+        by_name = {player.name: catan.agents.get(player.name)() for player in players}
+        shared = {player: by_name[player.name] for player in players}
+        games = list()
+        for seed in seeds:
+            game = self.new_game(seed)
+            game.agents.update(shared)
+            game.options['agent_turns'] = 'off'
+            game.start(players)
+            games.append(game)
+        catan.agents.drive(games)
+        for game in games:
+            self._check_finished(game)
+        return [self.result(game) for game in games]
+
+    @staticmethod
+    def _check_finished(game):
+        if game.state.is_in_game():
+            raise ValueError('Game stalled on turn={} waiting for non-agent player={}'.format(
+                game._cur_turn, game.get_cur_player()))
+
+    def play_many(self, n, players, seed=None):
+        """
+        Play n games. Game i is seeded with seed+i if a seed is given.
+
+        :return: generator of GameResult
+        """
+        for i in range(n):
+            yield self.play(players, seed=None if seed is None else seed + i)
+
+    @staticmethod
+    def result(game):
+        """
+        Summarize a finished game.
+
+        :param game: Game
+        :return: GameResult
+        """
+        winner = game.rules.winner()
+        return GameResult(list(game.players),
+                          dict(game.board.player_to_pieces),
+                          dict(game.player_to_resources),
+                          [int(vp) for vp in game.rules.victory_points()],
+                          game._cur_turn,
+                          game.players[winner] if winner is not None else None)
@@ -0,0 +1,348 @@
+"""
+module mcts provides a Monte Carlo tree search over game snapshots (see module snapshot).
+
+The search is UCT, with every player choosing for themselves (max^n): each node keeps, per legal
+action, the visits and the total reward of the player to move there. Rolls are chance nodes:
+the search does not choose a total, it draws one, keeping each total's share of visits close
+to its dice probability. Other randomness (steals) is drawn from the search's rng.
+
+Nodes live in a transposition table keyed by GameSnapshot#position_key, so positions reached by
+different orders of actions share their statistics, and a tree built for one move is reused for
+the next. The table is pruned to the nodes of the latest search when it grows past max_nodes.
+
+Playouts are greedy (see #playout_action): they build whenever they can, and never trade, so
+that the many trade actions do not crowd out the others. They stop after a few turns, and the
+position is scored by #evaluate.
+
+With processes > 1 the search is root-parallel: each process searches the same root with its
+own table and rng, and root visits and rewards are summed.
+
+e.g.
+    search = MCTS(iterations=500)
+    action = search.best_action(GameSnapshot.from_game(game))
+
+    # analyse saved positions, see snapshot.save
+    for position in snapshot.load('positions.pkl'):
+        print(search.analyse(position)[:3])
+
+The agent registered as 'mctsagent' (see module agents) plays with an MCTS.
+"""
+import argparse
+import logging
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from catan import rules, snapshot, topology
+
+# rolls 2..12 and their probabilities
+ROLLS = list(range(2, 13))
+_ROLL_PROBABILITY = topology.DICE_PROBABILITY[2:]
+
+# weight of expected resource cards per roll against victory points, see #evaluate
+PRODUCTION_WEIGHT = 2.0
+
+
+def evaluate(position):
+    """
+    Score a position for every player. A winner scores 1 and everyone else 0. Otherwise each
+    player scores their share of victory points plus weighted expected production per roll.
+
+    :param position: GameSnapshot
+    :return: (P,) float in [0, 1]
+    """
+    points = position.victory_points()
+    won = points >= rules.VICTORY_POINTS_TO_WIN
+    if won.any():
+        return won.astype(np.float64)
+    score = points + PRODUCTION_WEIGHT * (position.buildings @ node_production(position))
+    return score / max(float(score.sum()), 1e-9)
+
+
+# playout preference, first present wins; roads are taken half the time, so resources are saved
+_PLAYOUT_PRIORITY = ['roll', 'place_city', 'place_settlement', 'buy_dev_card', 'play_knight', 'play_victory_point',
+                     'play_monopoly', 'play_year_of_plenty', 'play_road_builder', 'place_road', 'end_turn']
+
+
+def node_production(position):
+    """
+    :return: (54,) expected resource cards per roll of a settlement on each node
+    """
+    tile_production = position.tile_resource.sum(axis=1) * topology.DICE_PROBABILITY[position.tile_number]
+    return topology.NODE_TILES @ tile_production
+
+
+def playout_action(position, rng, production=None):
+    """
+    A cheap greedy action: build what can be built, settlements on the most productive node,
+    anything else at random.
+
+    :param position: GameSnapshot, in game
+    :param rng: random.Random
+    :param production: see #node_production, optional
+    :return: action, see GameSnapshot#legal_actions
+    """
+    by_name = dict()
+    for action in position.legal_actions():
+        by_name.setdefault(action[0], list()).append(action)
+    for name in _PLAYOUT_PRIORITY:
+        if name not in by_name or name == 'place_road' and 'end_turn' in by_name and rng.random() < 0.5:
+            continue
+        if name == 'place_settlement':
+            production = node_production(position) if production is None else production
+            return max(by_name[name], key=lambda a: production[a[1]])
+        return rng.choice(by_name[name])
+    return rng.choice(by_name[rng.choice(list(by_name))])
+
+
+class Node(object):
+    """
+    class Node represents a position in the search: its legal actions, and each action's visits
+    and total reward for the player to move.
+    """
+    __slots__ = ('player', 'actions', 'visits', 'rewards', 'total', 'rolls', 'generation')
+
+    def __init__(self, position, generation):
+        self.player = position.cur
+        self.actions = position.legal_actions()
+        self.visits = np.zeros(len(self.actions))
+        self.rewards = np.zeros(len(self.actions))
+        self.total = 0
+        self.rolls = None # chance node visits per roll, (11,), if any action is a roll
+        self.generation = generation
+
+    def select(self, exploration):
+        """
+        :return: index of the action to search: an unvisited one, else the one with the best UCB
+        """
+        unvisited = np.flatnonzero(self.visits == 0)
+        if len(unvisited):
+            return int(unvisited[0])
+        ucb = self.rewards / self.visits + exploration * np.sqrt(math.log(self.total) / self.visits)
+        return int(np.argmax(ucb))
+
+    def roll(self):
+        """
+        Chance node: the total whose share of visits is furthest below its probability.
+
+        :return: int, 2..12
+        """
+        if self.rolls is None:
+            self.rolls = np.zeros(len(ROLLS))
+        r = int(np.argmax(_ROLL_PROBABILITY * (self.rolls.sum() + 1) - self.rolls))
+        self.rolls[r] += 1
+        return ROLLS[r]
+
+    def update(self, a, reward):
+        self.visits[a] += 1
+        self.rewards[a] += reward
+        self.total += 1
+
+    def stats(self):
+        """
+        :return: list of (action, visits, mean reward), most visited first
+        """
+        return sorted(((action, int(n), float(w / n) if n else 0.0)
+                       for action, n, w in zip(self.actions, self.visits, self.rewards)),
+                      key=lambda s: -s[1])
+
+
+class MCTS(object):
+    """
+    class MCTS searches game snapshots. It keeps its transposition table between searches, so
+    searching the positions of one game in turn reuses the tree.
+    """
+    def __init__(self, iterations=200, seconds=None, exploration=0.7, playout_turns=4, max_depth=200,
+                 max_nodes=200000, processes=1, rng=None):
+        """
+        :param iterations: playouts per search, or None to search for `seconds`
+        :param seconds: time budget per search, optional. The search stops at whichever budget runs out first.
+        :param exploration: UCB exploration constant
+        :param playout_turns: turns a playout plays before the position is scored
+        :param max_depth: most actions a single descent makes in the tree
+        :param max_nodes: table size above which it is pruned after a search
+        :param processes: search processes, see module docstring
+        :param rng: random.Random, optional
+        """
+        if iterations is None and seconds is None:
+            raise ValueError('MCTS needs an iteration or time budget')
+        self.iterations = iterations
+        self.seconds = seconds
+        self.exploration = exploration
+        self.playout_turns = playout_turns
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.processes = processes
+        self.rng = rng or random.Random()
+        self.table = dict() # position key -> Node
+        self.generation = 0
+        self.playouts = 0 # playouts in the latest search, summed over processes
+        self._pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _options(self):
+        return dict(iterations=self.iterations, seconds=self.seconds, exploration=self.exploration,
+                    playout_turns=self.playout_turns, max_depth=self.max_depth, max_nodes=self.max_nodes)
+
+    ###
+    # Search
+    ###
+
+    def _node(self, position):
+        key = position.position_key()
+        node = self.table.get(key)
+        if node is None:
+            node = self.table[key] = Node(position, self.generation)
+        node.generation = self.generation
+        return node
+
+    def _step(self, position, node, a):
+        action = node.actions[a]
+        if action == ('roll', ):
+            action = ('roll', node.roll())
+        position.play(action, self.rng)
+
+    def _iterate(self, root):
+        """
+        One descent from the root, one playout, and the update of every node on the path.
+        """
+        position = root.copy()
+        node = self._node(position)
+        path, seen = list(), {id(node)}
+        while position.is_in_game() and len(path) < self.max_depth:
+            a = node.select(self.exploration)
+            path.append((node, a))
+            self._step(position, node, a)
+            fresh = node.visits[a] == 0
+            if not position.is_in_game():
+                break
+            node = self._node(position)
+            if fresh or id(node) in seen:
+                break
+            seen.add(id(node))
+        reward = self._playout(position)
+        for node, a in path:
+            node.update(a, reward[node.player])
+
+    def _playout(self, position):
+        last_turn = position.turn + self.playout_turns
+        production = node_production(position)
+        while position.is_in_game() and position.turn < last_turn:
+            position.play(playout_action(position, self.rng, production), self.rng)
+        return evaluate(position)
+
+    def _search_here(self, root):
+        """
+        Search in this process.
+
+        :return: root Node
+        """
+        self.generation += 1
+        deadline = None if self.seconds is None else time.perf_counter() + self.seconds
+        node = self._node(root)
+        self.playouts = 0
+        while (self.iterations is None or self.playouts < self.iterations) and \
+                (deadline is None or time.perf_counter() < deadline):
+            self._iterate(root)
+            self.playouts += 1
+        if len(self.table) > self.max_nodes:
+            self.table = {key: n for key, n in self.table.items() if n.generation == self.generation}
+        return node
+
+    def search(self, root):
+        """
+        :param root: GameSnapshot, in game
+        :return: list of (action, visits, mean reward) at the root, most visited first
+        """
+        if self.processes <= 1:
+            return self._search_here(root).stats()
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(self._options(), ))
+        results = self._pool.map(_search_worker, [root] * self.processes, chunksize=1)
+        merged = dict()
+        self.playouts = 0
+        for stats, playouts in results:
+            self.playouts += playouts
+            for action, n, value in stats:
+                visits, rewards = merged.get(action, (0, 0.0))
+                merged[action] = (visits + n, rewards + n * value)
+        return sorted(((action, n, w / n if n else 0.0) for action, (n, w) in merged.items()),
+                      key=lambda s: -s[1])
+
+    def best_action(self, root):
+        """
+        :param root: GameSnapshot, in game
+        :return: the most visited action at the root, see GameSnapshot#legal_actions
+        """
+        actions = root.legal_actions()
+        if len(actions) == 1:
+            return actions[0]
+        stats = self.search(root)
+        logging.debug('MCTS playouts={}, best={}'.format(self.playouts, stats[:3]))
+        return stats[0][0]
+
+    def analyse(self, root):
+        """
+        Search a position, e.g. a saved one, see snapshot.load.
+
+        :param root: GameSnapshot, in game
+        :return: list of (action, visits, mean reward), most visited first
+        """
+        return self.search(root)
+
+    def __repr__(self):
+        return '<MCTS iterations={}, seconds={}, processes={}, nodes={}>'.format(
+            self.iterations, self.seconds, self.processes, len(self.table))
+
+
+_worker_search = None
+
+
+def _init_worker(options):
+    global _worker_search
+    _worker_search = MCTS(rng=random.Random(os.getpid() ^ int(time.time() * 1e6)), **options)
+
+
+def _search_worker(root):
+    """
+    Search the root in a worker process, keeping the worker's table for later searches.
+
+    :return: (root stats, playouts)
+    """
+    stats = _worker_search._search_here(root).stats()
+    return stats, _worker_search.playouts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='analyse saved positions, see snapshot.save')
+    parser.add_argument('path', help='file of saved positions')
+    parser.add_argument('--iterations', type=int, default=1000, help='playouts per position, default 1000')
+    parser.add_argument('--seconds', type=float, default=None, help='time budget per position, optional')
+    parser.add_argument('--processes', type=int, default=1, help='search processes, default 1')
+    parser.add_argument('--top', type=int, default=5, help='actions shown per position, default 5')
+    args = parser.parse_args()
+
+    with MCTS(iterations=args.iterations, seconds=args.seconds, processes=args.processes) as search:
+        for i, position in enumerate(snapshot.load(args.path)):
+            print('position={} {}'.format(i, position))
+            for action, visits, value in search.analyse(position)[:args.top]:
+                print('  {} visits={} value={:.3f}'.format(action, visits, value))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+module notifications provides Observable, the observer mechanism of Game and Board, and batching
+of its notifications.
+
+Observers register themselves by adding themselves to an observable's observers set, and are
+called with observer.notify(observable) when it changes. Each notification names the kinds of
+change it is for (see the constants below), and while the observers are called, observable.changes
+is a ChangeSummary of them.
+
+While a batch is open, notifications are collected rather than sent. When the outermost batch
+closes, the observers are notified once, with a summary of everything collected. Game runs each
+undoable action in a batch (see Game#do), so one action makes one notification however many
+times it changes state.
+
+e.g.
+    with game.batch():
+        game.set_state(...)
+        game.set_dev_card_state(...)
+    # observers were notified once, game.changes.kinds == {'state', 'dev_card_state'}
+
+    def notify(self, observable):
+        if notifications.LOG in observable.changes:
+            self.redraw()
+
+An observable with no observers returns from #Observable.notify_observers at once and collects
+nothing, so headless games pay for no notifications.
+"""
+
+# kinds of change
+STATE = 'state'  # the game's or board's state, and so what can be done
+DEV_CARD_STATE = 'dev_card_state'
+PLAYERS = 'players'
+PIECES = 'pieces'  # pieces placed, moved or removed, including the robber
+BOARD = 'board'  # tiles, numbers and ports
+RESOURCES = 'resources'  # hands, bank, and dev cards, see module rules
+LOG = 'log'
+UNDO = 'undo'  # the undo and redo history
+ALL = 'all'  # anything may have changed
+
+
+class ChangeSummary(object):
+    """
+    class ChangeSummary represents what changed for one notification: the kinds of change, how many
+    notifications were coalesced into it, and the names of the game actions which made them.
+    """
+    def __init__(self, kinds=(), count=0, actions=()):
+        self.kinds = set(kinds)
+        self.count = count
+        self.actions = list(actions)
+
+    def add(self, kinds):
+        self.kinds.update(kinds)
+        self.count += 1
+
+    def any(self, *kinds):
+        """
+        :return: whether any of the kinds changed
+        """
+        return ALL in self.kinds or not self.kinds.isdisjoint(kinds)
+
+    def __contains__(self, kind):
+        return kind in self.kinds or ALL in self.kinds
+
+    def __repr__(self):
+        return '<ChangeSummary kinds={}, count={}, actions={}>'.format(sorted(self.kinds), self.count, self.actions)
+
+
+class _NoBatch(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NO_BATCH = _NoBatch()
+
+
+class _Batch(object):
+    __slots__ = ('observable', 'action')
+
+    def __init__(self, observable, action):
+        self.observable = observable
+        self.action = action
+
+    def __enter__(self):
+        self.observable.begin_batch(self.action)
+        return self.observable
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.observable.end_batch()
+        return False
+
+
+def batched(method):
+    """
+    Decorator batched runs an Observable's method in a batch, see Observable#batch.
+    """
+    def batched_method(self, *args, **kwargs):
+        with self.batch(method.__name__):
+            return method(self, *args, **kwargs)
+    batched_method.__name__ = method.__name__
+    batched_method.__doc__ = method.__doc__
+    return batched_method
+
+
+class Observable(object):
+    """
+    class Observable notifies a set of observers of changes, see module docstring.
+
+    Subclasses set self.observers = set() in their constructor.
+    """
+    changes = None # ChangeSummary of the latest notification
+    _batch_depth = 0
+    _pending_changes = None # ChangeSummary collected by the open batch
+
+    def notify_observers(self, *kinds):
+        """
+        Notify the observers, or collect the change if a batch is open.
+
+        :param kinds: the kinds of change, default ALL
+        """
+        if not self.observers:
+            return
+        if self._batch_depth:
+            if self._pending_changes is None:
+                self._pending_changes = ChangeSummary()
+            self._pending_changes.add(kinds or (ALL, ))
+            return
+        self._emit(ChangeSummary(kinds or (ALL, ), count=1))
+
+    def batch(self, action=None):
+        """
+        Collect notifications until the returned context manager exits, then notify once.
+        Batches nest: only the outermost one notifies. With no observers, nothing is collected.
+
+        :param action: name of the action run in the batch, optional, listed in the summary
+        :return: context manager
+        """
+        if not self.observers:
+            return _NO_BATCH
+        return _Batch(self, action)
+
+    def begin_batch(self, action=None):
+        self._batch_depth += 1
+        if action is not None:
+            if self._pending_changes is None:
+                self._pending_changes = ChangeSummary()
+            self._pending_changes.actions.append(action)
+
+    def end_batch(self):
+        self._batch_depth -= 1
+        if self._batch_depth or self._pending_changes is None:
+            return
+        summary, self._pending_changes = self._pending_changes, None
+        if summary.count:
+            self._emit(summary)
+
+    def _emit(self, summary):
+        for obs in self.observers.copy():
+            # an observer may cause a notification of its own, so each one is handed the summary afresh
+            self.changes = summary
+            obs.notify(self)
+        self.changes = summary
@@ -0,0 +1,165 @@
+"""
+module opening provides a vectorised evaluator for opening (pregame) placements.
+
+Every node on the board is scored at once from the node x tile incidence in module topology:
+
+- production: expected resource cards per roll, the dice probability of each touching tile
+- diversity: the number of different resources the node produces
+- complement: production of resources the player does not produce yet
+- ports: 2:1 ports for resources the player would produce, and 3:1 ports
+
+Nodes which are taken, or next to a taken node, are never chosen. The best road for a settlement
+is the one leading towards the best node still open for a later settlement.
+
+e.g.
+    evaluator = OpeningEvaluator.from_game(game)
+    node, edge = evaluator.best_placement(game.rules.buildings, player=game.cur_player_index())
+"""
+import numpy as np
+
+from catan import topology
+
+# (54, 54) 1 where two nodes share an edge
+_ADJACENT = np.zeros((topology.NUM_NODES, topology.NUM_NODES), dtype=np.float64)
+_ADJACENT[topology.EDGE_NODES[:, 0], topology.EDGE_NODES[:, 1]] = 1
+_ADJACENT[topology.EDGE_NODES[:, 1], topology.EDGE_NODES[:, 0]] = 1
+
+WEIGHTS = {
+    'production': 1.0,
+    'diversity': 0.02,
+    'complement': 0.5,
+    'port2': 0.5,
+    'port3': 0.01,
+}
+
+
+class OpeningEvaluator(object):
+    """
+    class OpeningEvaluator scores opening placements on one board.
+
+    Per-board arrays are computed once, on construction. Scoring a placement is then a few
+    array operations over all 54 nodes.
+    """
+    def __init__(self, tile_resource, tile_number, port_access, weights=None):
+        """
+        :param tile_resource: (19, 5), see topology.tile_arrays
+        :param tile_number: (19,), see topology.tile_arrays
+        :param port_access: (54, 6), see topology.port_arrays
+        :param weights: dict, overrides for WEIGHTS, optional
+        """
+        self.weights = dict(WEIGHTS, **(weights or {}))
+        tile_probability = topology.DICE_PROBABILITY[tile_number]
+        # expected cards of each resource per roll, per node
+        self.production = topology.NODE_TILES @ (tile_resource * tile_probability[:, None])
+        self.diversity = (self.production > 0).sum(axis=1)
+        self.port2 = port_access[:, :topology.NUM_RESOURCES].astype(np.float64)
+        self.port3 = port_access[:, topology.NUM_RESOURCES]
+        self.base = (self.weights['production'] * self.production.sum(axis=1) +
+                     self.weights['diversity'] * self.diversity +
+                     self.weights['port3'] * self.port3 +
+                     self.weights['port2'] * (self.port2 * self.production).sum(axis=1))
+
+    @classmethod
+    def from_game(cls, game, weights=None):
+        """
+        :param game: Game, started, so that game.rules exists
+        """
+        return cls(game.rules.tile_resource, game.rules.tile_number,
+                   topology.port_arrays(game.board.ports), weights=weights)
+
+    @staticmethod
+    def open_nodes(buildings):
+        """
+        Nodes where a settlement may go in the pregame: not taken, and not next to a taken node.
+
+        :param buildings: (P, 54), see RulesState.buildings
+        :return: (54,) bool
+        """
+        taken = buildings.any(axis=0).astype(np.float64)
+        return (taken + _ADJACENT @ taken) == 0
+
+    def node_scores(self, buildings, player):
+        """
+        Score every node as the player's next settlement. Nodes which are not open score -inf.
+
+        :param buildings: (P, 54), see RulesState.buildings
+        :param player: player index
+        :return: (54,) float
+        """
+        own = (buildings[player] > 0) @ self.production
+        scores = (self.base +
+                  self.weights['complement'] * (self.production @ (own == 0)) +
+                  self.weights['port2'] * (self.port2 @ own))
+        scores[~self.open_nodes(buildings)] = -np.inf
+        return scores
+
+    def opening_value(self, nodes):
+        """
+        The value of a player's whole opening: each settlement scored as #node_scores scored it
+        when it was placed, whether or not it was open.
+
+        :param nodes: node indexes, in the order they were placed
+        :return: float
+        """
+        own = np.zeros(topology.NUM_RESOURCES)
+        value = 0.0
+        for node in nodes:
+            value += (self.base[node] +
+                      self.weights['complement'] * (self.production[node] @ (own == 0)) +
+                      self.weights['port2'] * (self.port2[node] @ own))
+            own += self.production[node]
+        return float(value)
+
+    def best_road(self, buildings, player, node, taken_edges=()):
+        """
+        The road from node towards the best node still open for a later settlement.
+
+        :param buildings: (P, 54), with the settlement at node already placed
+        :param node: node index
+        :param taken_edges: edge indexes which already hold a road
+        :return: edge index
+        """
+        scores = np.append(self.node_scores(buildings, player), -np.inf)
+        # NODE_EDGES and NODE_NEIGHBOURS line up: edge NODE_EDGES[n, i] leads to node NODE_NEIGHBOURS[n, i].
+        # -1 padding indexes the -inf sentinel.
+        edges, far = topology.NODE_EDGES[node], topology.NODE_NEIGHBOURS[node]
+        values = scores[topology.NODE_NEIGHBOURS[far]].max(axis=1)
+        free = [e >= 0 and e not in taken_edges for e in edges]
+        if not any(free):
+            raise ValueError('No free edge next to node={}'.format(topology.NODES[node]))
+        # a free edge leading nowhere still beats a taken one
+        values = np.where(free, np.maximum(values, -1e9), -np.inf)
+        return int(edges[int(np.argmax(values))])
+
+    def best_placement(self, buildings, player, taken_edges=()):
+        """
+        The best settlement for the player, and the best road next to it.
+
+        :param buildings: (P, 54), see RulesState.buildings
+        :param player: player index
+        :param taken_edges: edge indexes which already hold a road
+        :return: (node index, edge index)
+        """
+        node = int(np.argmax(self.node_scores(buildings, player)))
+        placed = buildings.copy()
+        placed[player, node] = 1
+        return node, self.best_road(placed, player, node, taken_edges)
+
+    def best_placements(self, buildings_batch, players):
+        """
+        Best settlements for many positions on this board at once.
+
+        :param buildings_batch: (B, P, 54)
+        :param players: (B,) player indexes
+        :return: (B,) node indexes
+        """
+        buildings_batch = np.asarray(buildings_batch)
+        batch = np.arange(len(players))
+        own_nodes = buildings_batch[batch, players] > 0
+        own = own_nodes.astype(np.float64) @ self.production
+        scores = (self.base[None, :] +
+                  self.weights['complement'] * ((own == 0) @ self.production.T) +
+                  self.weights['port2'] * (own @ self.port2.T))
+        taken = buildings_batch.any(axis=1).astype(np.float64)
+        scores[(taken + taken @ _ADJACENT) > 0] = -np.inf
+        return scores.argmax(axis=1)
@@ -0,0 +1,353 @@
+"""
+module openingbook provides a persistent book of opening (pregame) placements, keyed by board.
+
+The book holds one line per board and number of players: every pregame placement, in snake
+draft order, found by an offline search which is deeper than the online evaluator in module
+opening. Each candidate settlement is played out to the end of the draft, with every later
+placement chosen by a search one level shallower, down to greedy placements, and the candidate
+whose opening is worth most once the draft is over is chosen. See #search for the cost of depth.
+
+Lines are keyed by canonical board hash (see module symmetry) and stored in canonical
+coordinates, so a board and any rotation or reflection of it share one line. The book is
+backed by a local SQLite file, and the most recently used lines are held in memory, up to
+a fixed capacity.
+
+e.g.
+    with OpeningBook('openings.db') as book:
+        book.populate(boards, processes=4)
+        game = Game(board=board)
+        game.opening_book = book
+        game.start(players)
+
+Game#get_best_assignment consults the game's book before the online evaluator. A book
+placement is only used while the game has followed the book's line for that player, i.e.
+the settlement is still open, and the player's earlier placements were the book's.
+"""
+import collections
+import json
+import logging
+import multiprocessing
+import sqlite3
+
+import numpy as np
+
+from catan import symmetry, topology
+from catan.opening import OpeningEvaluator
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lines (
+    key TEXT PRIMARY KEY,
+    line TEXT NOT NULL
+);
+"""
+
+# candidate settlements searched at each placement, and levels of search, see #search
+SEARCH_WIDTH = 6
+SEARCH_DEPTH = 3
+
+
+def book_key(board, num_players):
+    """
+    :param board: catan.board.Board
+    :param num_players: int
+    :return: (key, symmetry) where symmetry maps the board onto its canonical form
+    """
+    encoding, s = symmetry.canonical_encoding(board)
+    return '{}/{}'.format(symmetry.hash_encoding(encoding), num_players), s
+
+
+def draft_order(num_players):
+    """
+    :return: player indexes in snake draft order, see states.GameStatePreGame
+    """
+    return list(range(num_players)) + list(reversed(range(num_players)))
+
+
+def _playout(evaluator, buildings, placed, order, step, depth, width):
+    """
+    Place the settlements of the draft from step to its end, each searched depth deep, see
+    #_choose, or on the best node by #OpeningEvaluator.node_scores at depth 0. Modifies
+    buildings and placed.
+    """
+    for step in range(step, len(order)):
+        player = order[step]
+        if depth > 0:
+            node = _choose(evaluator, buildings, placed, order, step, depth, width)
+        else:
+            node = int(np.argmax(evaluator.node_scores(buildings, player)))
+        buildings[player, node] = 1
+        placed[player].append(node)
+
+
+def _choose(evaluator, buildings, placed, order, step, depth, width):
+    """
+    The settlement for the placement at step: of the best `width` nodes by
+    #OpeningEvaluator.node_scores, the one whose opening is worth most to the placing player once
+    the rest of the draft is played out, with each later placement searched depth - 1 deep.
+
+    :param placed: dict of player index -> node indexes placed so far, in order
+    :return: node index
+    """
+    player = order[step]
+    scores = evaluator.node_scores(buildings, player)
+    candidates = [int(n) for n in np.argsort(-scores)[:width] if np.isfinite(scores[n])]
+    best, best_value = None, -np.inf
+    for node in candidates:
+        rollout = buildings.copy()
+        rollout[player, node] = 1
+        after = {p: nodes + [node] if p == player else list(nodes) for p, nodes in placed.items()}
+        _playout(evaluator, rollout, after, order, step + 1, depth - 1, width)
+        value = evaluator.opening_value(after[player])
+        if value > best_value:
+            best, best_value = node, value
+    return best
+
+
+def search(evaluator, num_players, width=SEARCH_WIDTH, depth=SEARCH_DEPTH):
+    """
+    Search a board's whole pregame.
+
+    At each placement, the best `width` nodes by #OpeningEvaluator.node_scores are each played
+    out to the end of the draft. In the playout, each later placement is itself chosen by a
+    search of depth - 1, down to greedy placements at depth 0. The node whose opening is worth
+    most to the placing player at the end of the draft is chosen, and its road is the
+    evaluator's best road. A depth of 1 plays every candidate out greedily; each level more
+    multiplies the work by about width times the placements left.
+
+    :param evaluator: opening.OpeningEvaluator
+    :param num_players: int
+    :param width: candidate nodes per placement
+    :param depth: levels of search, at least 1
+    :return: list of (player index, node index, edge index), in draft order
+    """
+    order = draft_order(num_players)
+    buildings = np.zeros((num_players, topology.NUM_NODES), dtype=np.int8)
+    placed = {player: list() for player in range(num_players)}
+    taken_edges = set()
+    line = list()
+    for step, player in enumerate(order):
+        best = _choose(evaluator, buildings, placed, order, step, depth, width)
+        buildings[player, best] = 1
+        placed[player].append(best)
+        edge = evaluator.best_road(buildings, player, best, taken_edges)
+        taken_edges.add(edge)
+        line.append((player, best, edge))
+    return line
+
+
+def _search_board(job):
+    """
+    Search one board in a worker process.
+
+    :param job: (key, symmetry, tile_resource, tile_number, port_access, num_players, width, depth)
+    :return: (key, line in canonical coordinates)
+    """
+    key, s, tile_resource, tile_number, port_access, num_players, width, depth = job
+    evaluator = OpeningEvaluator(tile_resource, tile_number, port_access)
+    nodes, edges = symmetry.node_map(s), symmetry.edge_map(s)
+    return key, [(player, nodes[topology.NODES[node]], edges[topology.EDGES[edge]])
+                 for player, node, edge in search(evaluator, num_players, width, depth)]
+
+
+class OpeningLine(object):
+    """
+    class OpeningLine represents a book line on one board: placements (player index, node index,
+    edge index) in draft order.
+    """
+    def __init__(self, placements):
+        self.placements = list(placements)
+        self._by_player = collections.defaultdict(list)
+        for player, node, edge in self.placements:
+            self._by_player[player].append((node, edge))
+
+    @classmethod
+    def from_coords(cls, coords, s=0):
+        """
+        :param coords: list of (player index, node coord, edge coord)
+        :param s: symmetry to apply to the coords
+        """
+        nodes, edges = symmetry.node_map(s), symmetry.edge_map(s)
+        return cls((player, topology.NODE_INDEX[nodes[node]], topology.EDGE_INDEX[edges[edge]])
+                   for player, node, edge in coords)
+
+    def _followed(self, buildings, player, count):
+        """
+        Whether the player's first `count` settlements are the book's.
+        """
+        book = self._by_player[player]
+        own = set(np.flatnonzero(buildings[player]))
+        return count <= len(book) and own == {node for node, _ in book[:count]}
+
+    def settlement(self, buildings, player):
+        """
+        The book's next settlement and road for the player.
+
+        :param buildings: (P, 54), see RulesState.buildings
+        :param player: player index
+        :return: (node index, edge index), or None if the game has left the book
+        """
+        count = int((buildings[player] > 0).sum())
+        if not self._followed(buildings, player, count) or count >= len(self._by_player[player]):
+            return None
+        node, edge = self._by_player[player][count]
+        if not OpeningEvaluator.open_nodes(buildings)[node]:
+            return None
+        return node, edge
+
+    def road(self, buildings, player, node, taken_edges=()):
+        """
+        The book's road for the settlement the player just placed at node.
+
+        :return: edge index, or None if the game has left the book
+        """
+        count = int((buildings[player] > 0).sum())
+        if not self._followed(buildings, player, count):
+            return None
+        book_node, edge = self._by_player[player][count - 1]
+        if book_node != node or edge in taken_edges:
+            return None
+        return edge
+
+    def __len__(self):
+        return len(self.placements)
+
+    def __repr__(self):
+        return '<OpeningLine placements={}>'.format(len(self))
+
+
+class OpeningBook(object):
+    """
+    class OpeningBook stores opening lines on disk, with the most recently used held in memory.
+
+    Boards which are not in the book are remembered as misses too, until a line is added for them.
+    """
+    def __init__(self, path='openings.db', capacity=1024):
+        """
+        :param path: SQLite file to use, created if it does not exist. ':memory:' is allowed.
+        :param capacity: most lines held in memory
+        """
+        self.path = path
+        self.capacity = capacity
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+        self._cache = collections.OrderedDict() # key -> list of coords in canonical form, or None
+        self.hits = 0 # lookups answered from memory
+        self.misses = 0 # lookups which read the file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM lines').fetchone()[0]
+
+    def __contains__(self, key):
+        """
+        Whether the book has a line for key, see #book_key. A plain lookup: it is not counted in
+        hits or misses, and does not change what is held in memory.
+        """
+        if key in self._cache:
+            return self._cache[key] is not None
+        return self._conn.execute('SELECT 1 FROM lines WHERE key = ?', (key, )).fetchone() is not None
+
+    def _remember(self, key, coords):
+        self._cache[key] = coords
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+
+    def _canonical(self, key):
+        """
+        :return: list of (player index, node coord, edge coord) in canonical form, or None
+        """
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        row = self._conn.execute('SELECT line FROM lines WHERE key = ?', (key, )).fetchone()
+        coords = [tuple(placement) for placement in json.loads(row[0])] if row else None
+        self._remember(key, coords)
+        return coords
+
+    def line(self, board, num_players):
+        """
+        :param board: catan.board.Board
+        :param num_players: int
+        :return: OpeningLine in the board's coordinates, or None if the board is not in the book
+        """
+        key, s = book_key(board, num_players)
+        coords = self._canonical(key)
+        if coords is None:
+            return None
+        return OpeningLine.from_coords(coords, symmetry.inverse(s))
+
+    def put(self, key, coords):
+        """
+        :param key: see #book_key
+        :param coords: list of (player index, node coord, edge coord) in canonical form
+        """
+        self.put_many([(key, coords)])
+
+    def put_many(self, lines):
+        """
+        Bulk insert lines in a single transaction, replacing any already present.
+
+        :param lines: iterable of (key, coords)
+        """
+        lines = list(lines)
+        with self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO lines VALUES (?, ?)',
+                                   [(key, json.dumps(coords)) for key, coords in lines])
+        for key, coords in lines:
+            if key in self._cache:
+                self._remember(key, [tuple(placement) for placement in coords])
+
+    def populate(self, boards, num_players=4, processes=None, width=SEARCH_WIDTH, depth=SEARCH_DEPTH,
+                 batch_size=100):
+        """
+        Search every board which is not yet in the book, across a pool of processes, and store
+        the lines as they come back.
+
+        :param boards: iterable of catan.board.Board
+        :param num_players: int
+        :param processes: number of worker processes, default the number of cpus. 1 searches in this process.
+        :param width: candidate nodes per placement, see #search
+        :param depth: levels of search, see #search
+        :param batch_size: lines written per transaction
+        :return: number of boards searched
+        """
+        jobs = dict()
+        for board in boards:
+            key, s = book_key(board, num_players)
+            if key in jobs or key in self:
+                continue
+            jobs[key] = (key, s, *topology.tile_arrays(board.tiles), topology.port_arrays(board.ports),
+                         num_players, width, depth)
+        processes = processes or multiprocessing.cpu_count()
+        if processes == 1:
+            results = map(_search_board, jobs.values())
+            self._store(results, batch_size)
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                self._store(pool.imap_unordered(_search_board, jobs.values(), chunksize=8), batch_size)
+        logging.debug('Searched {} boards into opening book={}'.format(len(jobs), self.path))
+        return len(jobs)
+
+    def _store(self, results, batch_size):
+        batch = list()
+        for result in results:
+            batch.append(result)
+            if len(batch) >= batch_size:
+                self.put_many(batch)
+                batch = list()
+        self.put_many(batch)
+
+    def __repr__(self):
+        return '<OpeningBook path={}, cached={}, hits={}, misses={}>'.format(
+            self.path, len(self._cache), self.hits, self.misses)
@@ -0,0 +1,266 @@
+"""
+module production provides exact dice and production analytics: what each player receives per
+turn on average, how much that varies, how likely they are to have received at least k cards of
+a resource within T turns, and what the robber changes on each tile it could move to.
+
+Nothing is sampled. Every figure comes from the distribution of the two-dice total
+(topology.DICE_PROBABILITY), the board's incidence (module topology) and the buildings on it.
+Production is as RulesState#production: one card per settlement and two per city for each tile
+of the number rolled which they touch, and nothing from the robber's tile. Bank shortages, and
+the discards and steals of a 7, are not counted.
+
+The functions take arrays with any leading dimensions, so players and boards are computed at
+once, e.g. one position, (P, 54) buildings, or many, (B, P, 54):
+
+    per_roll = roll_production(buildings, tile_resource, tile_number, robber_tile)   # (..., 13, P, 5)
+    mean, variance = income(per_roll)               # (..., P, 5) cards per turn
+    at_least(per_roll, k=2, turns=3)                # (..., P, 5) P(at least 2 of each resource in 3 turns)
+    robber_effects(buildings, tile_resource, tile_number, robber_tile)   # (..., 19, P, 5)
+
+Probabilities over several turns fold the per-turn distribution with itself by convolution. Only
+counts up to k matter, so distributions are kept on [0, k] with k standing for k or more, and T
+turns take about log2(T) convolutions.
+
+ProductionAnalytics keeps the analytics of recent positions, keyed by what production depends
+on: the board's tiles, the buildings and the robber. Positions which are not cached are computed
+together, as one batch:
+
+    analytics = ProductionAnalytics()
+    analytics.position(game).mean                   # Game or GameSnapshot
+    analytics.positions(snapshots)                  # list of PositionProduction
+"""
+import collections
+
+import numpy as np
+
+from catan import topology
+
+NUM_ROLLS = len(topology.DICE_PROBABILITY) # dice totals on [0, 12]
+
+_NODE_TILES = topology.NODE_TILES.astype(np.float32)
+_ROLLS = np.arange(NUM_ROLLS)
+_clamps = dict()
+
+
+def tile_weights(buildings, robber_tile=None):
+    """
+    :param buildings: (..., P, 54), 1 for a settlement, 2 for a city, see RulesState
+    :param robber_tile: tile id, or (...) int array of them, optional; 0 or None for no robber
+    :return: (..., P, 19) float32, the cards each player receives per production of each tile
+    """
+    weights = np.asarray(buildings, dtype=np.float32) @ _NODE_TILES
+    if robber_tile is not None:
+        robber_tile = np.asarray(robber_tile)
+        weights *= (np.arange(1, topology.NUM_TILES + 1) != robber_tile[..., None])[..., None, :]
+    return weights
+
+
+def roll_production(buildings, tile_resource, tile_number, robber_tile=None):
+    """
+    The cards each player receives for each dice total.
+
+    :param buildings: (..., P, 54), see RulesState
+    :param tile_resource: (..., 19, 5), see topology.tile_arrays
+    :param tile_number: (..., 19), see topology.tile_arrays
+    :param robber_tile: tile id, or (...) int array of them, optional
+    :return: (..., 13, P, 5) float32, indexed [dice total, player, resource]. Counts are whole numbers.
+    """
+    weights = tile_weights(buildings, robber_tile)
+    rolled = (np.asarray(tile_number)[..., None, :] == _ROLLS[:, None]).astype(np.float32)
+    # (..., 13, 19, 5): the resource of each tile which produces on each total
+    per_tile = rolled[..., :, :, None] * np.asarray(tile_resource, dtype=np.float32)[..., None, :, :]
+    return weights[..., None, :, :] @ per_tile
+
+
+def income(per_roll):
+    """
+    :param per_roll: (..., 13, P, 5), see #roll_production
+    :return: (mean, variance), each (..., P, 5): cards received per turn
+    """
+    probability = topology.DICE_PROBABILITY[:, None, None]
+    mean = (probability * per_roll).sum(axis=-3)
+    variance = (probability * per_roll ** 2).sum(axis=-3) - mean ** 2
+    return mean, np.maximum(variance, 0)
+
+
+def turn_distribution(per_roll, limit):
+    """
+    :param per_roll: (..., 13, P, 5), see #roll_production
+    :param limit: int, counts of limit or more are added up at limit
+    :return: (..., P, 5, limit + 1) float64, the probability of receiving each count in one turn
+    """
+    counts = np.minimum(per_roll, limit).astype(np.intp)
+    one_hot = counts[..., None] == np.arange(limit + 1)
+    return np.einsum('s,...sprc->...prc', topology.DICE_PROBABILITY, one_hot)
+
+
+def _clamp(size):
+    # (size * size, size): the one-hot of min(i + j, size - 1) for counts i and j
+    if size not in _clamps:
+        totals = np.minimum(np.add.outer(np.arange(size), np.arange(size)), size - 1)
+        _clamps[size] = (totals.ravel()[:, None] == np.arange(size)).astype(np.float64)
+    return _clamps[size]
+
+
+def convolve(first, second):
+    """
+    The distribution of the sum of two independent counts, each kept on [0, limit] as in
+    #turn_distribution.
+
+    :param first: (..., limit + 1)
+    :param second: (..., limit + 1)
+    :return: (..., limit + 1)
+    """
+    size = first.shape[-1]
+    outer = first[..., :, None] * second[..., None, :]
+    return outer.reshape(outer.shape[:-2] + (size * size, )) @ _clamp(size)
+
+
+def accumulate(distribution, turns):
+    """
+    :param distribution: (..., limit + 1), of a count received in one turn, see #turn_distribution
+    :param turns: int >= 0
+    :return: (..., limit + 1), of the count received in that many turns
+    """
+    result = np.zeros_like(distribution)
+    result[..., 0] = 1
+    power = distribution
+    while turns:
+        if turns & 1:
+            result = convolve(result, power)
+        turns >>= 1
+        if turns:
+            power = convolve(power, power)
+    return result
+
+
+def at_least(per_roll, k, turns):
+    """
+    :param per_roll: (..., 13, P, 5), see #roll_production
+    :param k: int, cards wanted
+    :param turns: int, turns to receive them in
+    :return: (..., P, 5), the probability that each player receives at least k cards of each
+             resource within the turns
+    """
+    if k <= 0:
+        return np.ones(per_roll.shape[:-3] + per_roll.shape[-2:])
+    return accumulate(turn_distribution(per_roll, k), turns)[..., k]
+
+
+def robber_effects(buildings, tile_resource, tile_number, robber_tile=None):
+    """
+    The change in each player's income per turn were the robber moved to each tile: what it
+    blocks there, less what it blocks where it is now.
+
+    :param buildings: (..., P, 54), see RulesState
+    :param tile_resource: (..., 19, 5), see topology.tile_arrays
+    :param tile_number: (..., 19), see topology.tile_arrays
+    :param robber_tile: tile id, or (...) int array of them, optional
+    :return: (..., 19, P, 5), indexed [tile id - 1, player, resource], in cards per turn
+    """
+    weights = tile_weights(buildings)
+    probability = topology.DICE_PROBABILITY[np.asarray(tile_number)]
+    # (..., 19, P, 5): the income from each tile, which the robber would block
+    blocked = np.swapaxes(weights * probability[..., None, :], -1, -2)[..., None] * \
+        np.asarray(tile_resource)[..., :, None, :]
+    if robber_tile is None:
+        return -blocked
+    robber_tile = np.asarray(robber_tile)
+    current = np.take_along_axis(blocked, np.maximum(robber_tile - 1, 0)[..., None, None, None], axis=-3)
+    return current * (robber_tile > 0)[..., None, None, None] - blocked
+
+
+class PositionProduction(object):
+    """
+    class PositionProduction represents the production analytics of one position: the cards each
+    player receives per dice total, and their mean and variance per turn.
+
+    :param per_roll: (13, P, 5), see #roll_production
+    :param mean: (P, 5)
+    :param variance: (P, 5)
+    :param robber_effects: (19, P, 5), see #robber_effects
+    """
+    def __init__(self, per_roll, mean, variance, robber_effects):
+        self.per_roll = per_roll
+        self.mean = mean
+        self.variance = variance
+        self.robber_effects = robber_effects
+        self._at_least = dict()
+
+    def at_least(self, k, turns):
+        """
+        :return: (P, 5), see #at_least. Kept for the next query with the same k and turns.
+        """
+        if (k, turns) not in self._at_least:
+            self._at_least[(k, turns)] = at_least(self.per_roll, k, turns)
+        return self._at_least[(k, turns)]
+
+    def __repr__(self):
+        return '<PositionProduction players={}, cards_per_turn={}>'.format(
+            len(self.mean), np.round(self.mean.sum(axis=1), 3).tolist())
+
+
+class ProductionAnalytics(object):
+    """
+    class ProductionAnalytics computes the production analytics of positions, and keeps those of
+    the most recently used, see module docstring.
+    """
+    def __init__(self, capacity=4096):
+        """
+        :param capacity: most positions kept
+        """
+        self.capacity = capacity
+        self._cache = collections.OrderedDict() # key -> PositionProduction
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(position):
+        """
+        :param position: Game or GameSnapshot
+        :return: what production depends on: the tiles, the buildings and the robber's tile
+        """
+        r = getattr(position, 'rules', position)
+        return (np.asarray(r.buildings, dtype=np.int8).tobytes(), position.robber_tile or 0,
+                np.asarray(r.tile_number, dtype=np.int8).tobytes(), np.asarray(r.tile_resource, dtype=np.int8).tobytes())
+
+    def position(self, position):
+        """
+        :param position: Game or GameSnapshot
+        :return: PositionProduction
+        """
+        return self.positions([position])[0]
+
+    def positions(self, positions):
+        """
+        :param positions: list of Game or GameSnapshot, with the same number of players
+        :return: list of PositionProduction, in the same order. Those not cached are computed in one batch.
+        """
+        keys = [self.key(position) for position in positions]
+        missing = collections.OrderedDict()
+        for key, position in zip(keys, positions):
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            elif key not in missing:
+                missing[key] = getattr(position, 'rules', position), position.robber_tile or 0
+                self.misses += 1
+        if missing:
+            states = [state for state, _ in missing.values()]
+            arrays = (np.stack([s.buildings for s in states]), np.stack([s.tile_resource for s in states]),
+                      np.stack([s.tile_number for s in states]), np.array([robber for _, robber in missing.values()]))
+            per_roll = roll_production(*arrays)
+            mean, variance = income(per_roll)
+            effects = robber_effects(*arrays)
+            for b, key in enumerate(missing):
+                self._cache[key] = PositionProduction(per_roll[b], mean[b], variance[b], effects[b])
+        result = [self._cache[key] for key in keys]
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+        return result
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __repr__(self):
+        return '<ProductionAnalytics cached={}, hits={}, misses={}>'.format(len(self._cache), self.hits, self.misses)
@@ -0,0 +1,409 @@
+"""
+module qlearning provides tabular Q-learning of opening (pregame) settlement placements.
+
+A placement is described by a few features, which are the same on every board:
+
+- whether it is the player's first or second settlement
+- the candidate node's pips, and how many resources it produces
+- how many resources it adds to the ones the player already produces
+- its port: none, 3:1, or 2:1 for a resource the player would or would not produce
+
+The features pack into one integer, which is hashed to a 64 bit key. Q-values live in
+a QTable: fixed-size arrays, open addressing with a short probe, and the least recently used entry
+of a full probe evicted, so memory is bounded however many keys training meets.
+
+An episode is one snake draft of settlements on a random board, every player choosing by the
+table, epsilon-greedily. Roads are left out, as they do not change which nodes are open. A
+player's reward, at the end of the draft, is their share of the opening value (see
+opening.OpeningEvaluator#opening_value) of every player's settlements.
+
+Training runs rounds: each worker process plays episodes against its own copy of the table, and
+sends back what it changed. The changes are averaged into the table, which goes out to the
+workers for the next round.
+
+e.g.
+    table = QTable()
+    trainer = QTrainer(table, processes=4)
+    stats = trainer.train(100000)
+    stats['episodes_per_second']
+    table.save('qtable.npz')
+
+The agent registered as 'qlearn' (see module agents), which plays the Qlearn player of
+Game.get_debug_players, places its opening settlements by a saved table.
+"""
+import logging
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+from catan import boardbuilder, topology
+from catan.opening import OpeningEvaluator
+from catan.openingbook import draft_order
+
+# codes per feature: settlement number, pips, resources produced, new resources, port class
+_SIZES = (2, 16, 4, 4, 4)
+
+def _mix(codes):
+    """
+    splitmix64 finalizer, vectorised. Never returns 0, which marks an empty QTable slot.
+
+    :param codes: array of int
+    :return: array of uint64
+    """
+    z = np.asarray(codes, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return z | np.uint64(1)
+
+
+class BoardFeatures(object):
+    """
+    class BoardFeatures holds the per-node features of one board, and encodes placements on it
+    as QTable keys.
+    """
+    def __init__(self, tile_resource, tile_number, port_access):
+        """
+        :param tile_resource: (19, 5), see topology.tile_arrays
+        :param tile_number: (19,), see topology.tile_arrays
+        :param port_access: (54, 6), see topology.port_arrays
+        """
+        self.evaluator = OpeningEvaluator(tile_resource, tile_number, port_access)
+        production = self.evaluator.production
+        self.pips = np.minimum(np.rint(production.sum(axis=1) * 36), _SIZES[1] - 1).astype(np.int64)
+        self.produces = production > 0
+        self.port2 = port_access[:, :topology.NUM_RESOURCES]
+        self.port3 = port_access[:, topology.NUM_RESOURCES]
+
+    @classmethod
+    def from_board(cls, board):
+        """
+        :param board: catan.board.Board
+        """
+        return cls(*topology.tile_arrays(board.tiles), topology.port_arrays(board.ports))
+
+    def codes(self, buildings, player, nodes):
+        """
+        Feature codes of placing the player's next settlement on each node.
+
+        :param buildings: (P, 54), see RulesState.buildings
+        :param player: player index
+        :param nodes: candidate node indexes
+        :return: (N,) int
+        """
+        own = buildings[player] > 0
+        produced = self.produces[own].any(axis=0)
+        produces = self.produces[nodes]
+        new = (produces & ~produced).sum(axis=1)
+        # port class: none, 3:1, 2:1 for another resource, 2:1 for a resource the player would produce
+        port2 = self.port2[nodes]
+        port = np.where(port2.any(axis=1), 2 + (port2 & (produces | produced)).any(axis=1), self.port3[nodes])
+        code = np.full(len(nodes), min(int(own.sum()), 1))
+        for feature, size in zip((self.pips[nodes], produces.sum(axis=1), new, port), _SIZES[1:]):
+            code = code * size + np.minimum(feature, size - 1)
+        return code
+
+    def keys(self, buildings, player, nodes):
+        """
+        :return: QTable keys, one per node, see #codes
+        """
+        return _mix(self.codes(buildings, player, nodes))
+
+
+class QTable(object):
+    """
+    class QTable holds Q-values by 64 bit key in fixed-size arrays.
+
+    A key lives in one of `probe` consecutive slots from its home slot. When they are all taken,
+    the least recently updated one is evicted. Keys which are not in the table have the initial value.
+    """
+    def __init__(self, capacity=1 << 16, probe=8, initial=0.5):
+        """
+        :param capacity: number of slots
+        :param probe: slots searched per key
+        :param initial: value of keys not in the table. Above any reward, it makes training
+                        try every action at least once.
+        """
+        self.capacity = capacity
+        self.probe = probe
+        self.initial = initial
+        self.keys = np.zeros(capacity, dtype=np.uint64) # 0 marks an empty slot
+        self.values = np.zeros(capacity, dtype=np.float32)
+        self.updates = np.zeros(capacity, dtype=np.uint32)
+        self.stamps = np.zeros(capacity, dtype=np.uint64) # clock at the latest update
+        self.clock = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return int(np.count_nonzero(self.keys))
+
+    def _slots(self, keys):
+        """
+        :return: (N, probe) candidate slots per key
+        """
+        home = (np.asarray(keys, dtype=np.uint64) % np.uint64(self.capacity)).astype(np.int64)
+        return (home[:, None] + np.arange(self.probe)) % self.capacity
+
+    def get(self, keys):
+        """
+        :param keys: (N,) uint64
+        :return: (N,) float32, the initial value for keys not in the table
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        slots = self._slots(keys)
+        found = self.keys[slots] == keys[:, None]
+        values = np.where(found.any(axis=1), np.where(found, self.values[slots], 0).sum(axis=1), self.initial)
+        return values.astype(np.float32)
+
+    def _slot(self, key):
+        """
+        The slot for a key: its own, else an empty one, else the least recently updated, evicted.
+        """
+        slots = self._slots(np.array([key], dtype=np.uint64))[0]
+        held = self.keys[slots]
+        match = np.flatnonzero(held == key)
+        if len(match):
+            return int(slots[match[0]])
+        empty = np.flatnonzero(held == 0)
+        if len(empty):
+            slot = int(slots[empty[0]])
+        else:
+            slot = int(slots[np.argmin(self.stamps[slots])])
+            self.evictions += 1
+        self.keys[slot] = key
+        self.values[slot] = self.initial
+        self.updates[slot] = 0
+        return slot
+
+    def update(self, key, target, alpha):
+        """
+        Move a key's value towards target.
+
+        :param key: uint64
+        :param target: float
+        :param alpha: learning rate
+        """
+        slot = self._slot(np.uint64(key))
+        self.values[slot] += alpha * (target - self.values[slot])
+        self.updates[slot] += 1
+        self.clock += 1
+        self.stamps[slot] = self.clock
+
+    def merge(self, keys, deltas, counts):
+        """
+        Add worker changes, see #QTrainer. Each key's value moves by the mean of the deltas sent for it.
+
+        :param keys: (N,) uint64, may repeat
+        :param deltas: (N,) value changes
+        :param counts: (N,) updates behind each change
+        """
+        unique, inverse = np.unique(np.asarray(keys, dtype=np.uint64), return_inverse=True)
+        delta = np.bincount(inverse, weights=deltas) / np.bincount(inverse)
+        updates = np.bincount(inverse, weights=counts)
+        for key, d, n in zip(unique, delta, updates):
+            slot = self._slot(key)
+            self.values[slot] += d
+            self.updates[slot] += int(n)
+            self.clock += 1
+            self.stamps[slot] = self.clock
+
+    def copy(self):
+        result = object.__new__(QTable)
+        for k, v in self.__dict__.items():
+            setattr(result, k, v.copy() if isinstance(v, np.ndarray) else v)
+        return result
+
+    def save(self, path):
+        np.savez(path, keys=self.keys, values=self.values, updates=self.updates, stamps=self.stamps,
+                 meta=np.array([self.probe, self.clock, self.evictions], dtype=np.uint64),
+                 initial=np.array(self.initial))
+
+    @classmethod
+    def load(cls, path):
+        """
+        :param path: file written by #save
+        """
+        with np.load(path) as data:
+            result = cls(capacity=len(data['keys']), probe=int(data['meta'][0]), initial=float(data['initial']))
+            result.keys, result.values = data['keys'], data['values']
+            result.updates, result.stamps = data['updates'], data['stamps']
+            result.clock, result.evictions = int(data['meta'][1]), int(data['meta'][2])
+        return result
+
+    def __repr__(self):
+        return '<QTable entries={}/{}, evictions={}>'.format(len(self), self.capacity, self.evictions)
+
+
+def choose(table, features, buildings, player, epsilon=0.0, rng=random):
+    """
+    Choose a settlement epsilon-greedily by the table.
+
+    :param table: QTable
+    :param features: BoardFeatures
+    :param buildings: (P, 54), see RulesState.buildings
+    :param player: player index
+    :param epsilon: chance of a random open node
+    :param rng: random.Random-like object
+    :return: (node index, key of the placement, best value among the open nodes)
+    """
+    nodes = np.flatnonzero(OpeningEvaluator.open_nodes(buildings))
+    keys = features.keys(buildings, player, nodes)
+    values = table.get(keys)
+    best = int(np.argmax(values))
+    i = rng.randrange(len(nodes)) if rng.random() < epsilon else best
+    return int(nodes[i]), keys[i], float(values[best])
+
+
+def play_episode(table, features, num_players=4, epsilon=0.1, alpha=0.1, gamma=1.0, rng=random, learn=True):
+    """
+    Play one draft on a board, every player choosing by the table, and learn from it.
+
+    :param table: QTable, updated in place if learn
+    :param features: BoardFeatures of the board
+    :return: (P,) rewards, see module docstring
+    """
+    buildings = np.zeros((num_players, topology.NUM_NODES), dtype=np.int8)
+    placed = {player: list() for player in range(num_players)}
+    pending = dict() # player -> key of their latest placement, waiting for its target
+    for player in draft_order(num_players):
+        node, key, best = choose(table, features, buildings, player, epsilon, rng)
+        if learn and player in pending:
+            # the target of the previous placement is the value of this decision
+            table.update(pending[player], gamma * best, alpha)
+        pending[player] = key
+        buildings[player, node] = 1
+        placed[player].append(node)
+    values = np.array([features.evaluator.opening_value(placed[player]) for player in range(num_players)])
+    rewards = values / max(float(values.sum()), 1e-9)
+    if learn:
+        for player, key in pending.items():
+            table.update(key, rewards[player], alpha)
+    return rewards
+
+
+def random_board_features(board_opts=None):
+    """
+    :param board_opts: see boardbuilder.get_opts, default random terrain and numbers
+    :return: BoardFeatures of a new board
+    """
+    return BoardFeatures.from_board(boardbuilder.build(dict(board_opts or {'terrain': 'random', 'numbers': 'random'})))
+
+
+# set in each worker process by _init_worker
+_worker_options = None
+
+
+def _init_worker(options):
+    global _worker_options
+    _worker_options = options
+    random.seed(multiprocessing.current_process().pid)
+
+
+def _train_chunk(job):
+    """
+    Train on a copy of the table in a worker process.
+
+    :param job: (table, seed, episodes)
+    :return: (keys, deltas, counts) of the slots the chunk changed
+    """
+    table, seed, episodes = job
+    return _train(table, seed, episodes, **_worker_options)
+
+
+def _train(table, seed, episodes, num_players, epsilon, alpha, gamma, board_opts):
+    before_keys, before_values, before_updates = table.keys.copy(), table.values.copy(), table.updates.copy()
+    rng = random.Random(seed)
+    random.seed(seed)
+    for _ in range(episodes):
+        play_episode(table, random_board_features(board_opts), num_players, epsilon, alpha, gamma, rng)
+    changed = np.flatnonzero(table.updates != np.where(table.keys == before_keys, before_updates, 0))
+    kept = table.keys[changed] == before_keys[changed]
+    deltas = table.values[changed] - np.where(kept, before_values[changed], table.initial)
+    counts = table.updates[changed] - np.where(kept, before_updates[changed], 0)
+    return table.keys[changed], deltas, counts
+
+
+class QTrainer(object):
+    """
+    class QTrainer trains a QTable on episodes across a pool of processes, merging their changes
+    into the table after every round.
+    """
+    def __init__(self, table, num_players=4, epsilon=0.1, alpha=0.1, gamma=1.0, board_opts=None,
+                 processes=None, merge_every=200):
+        """
+        :param table: QTable, trained in place
+        :param num_players: int
+        :param epsilon: exploration rate
+        :param alpha: learning rate
+        :param gamma: discount between a player's placements
+        :param board_opts: see boardbuilder.get_opts, default random terrain and numbers
+        :param processes: number of worker processes, default the number of cpus. 1 trains in this process.
+        :param merge_every: episodes each worker plays between merges
+        """
+        self.table = table
+        self.options = dict(num_players=num_players, epsilon=epsilon, alpha=alpha, gamma=gamma,
+                            board_opts=board_opts)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.merge_every = merge_every
+        self.episodes = 0
+
+    def train(self, episodes, seed=0):
+        """
+        :param episodes: episodes to play, rounded up to whole rounds
+        :param seed: seeds round r of worker w with seed + episodes played so far + w
+        :return: dict of episodes, seconds, episodes_per_second, entries, evictions
+        """
+        start = time.perf_counter()
+        played = 0
+        pool = multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(self.options, )) \
+            if self.processes > 1 else None
+        try:
+            while played < episodes:
+                jobs = [(self.table, seed + self.episodes + w, self.merge_every) for w in range(self.processes)]
+                if pool is None:
+                    results = [_train(self.table.copy(), s, n, **self.options) for _, s, n in jobs]
+                else:
+                    results = pool.map(_train_chunk, jobs, chunksize=1)
+                for keys, deltas, counts in results:
+                    self.table.merge(keys, deltas, counts)
+                self.episodes += self.merge_every * self.processes
+                played += self.merge_every * self.processes
+                logging.debug('Trained episodes={}, table={}'.format(self.episodes, self.table))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        seconds = time.perf_counter() - start
+        return {
+            'episodes': played,
+            'seconds': seconds,
+            'episodes_per_second': played / seconds,
+            'entries': len(self.table),
+            'evictions': self.table.evictions,
+        }
+
+
+def evaluate_policy(table, episodes=100, num_players=4, board_opts=None, seed=0):
+    """
+    The table's greedy placements in the first seat against OpeningEvaluator's greedy placements in the others.
+
+    :return: mean reward of the first seat, 1/num_players is even
+    """
+    random.seed(seed)
+    rewards = list()
+    for _ in range(episodes):
+        features = random_board_features(board_opts)
+        buildings = np.zeros((num_players, topology.NUM_NODES), dtype=np.int8)
+        placed = {player: list() for player in range(num_players)}
+        for player in draft_order(num_players):
+            if player == 0:
+                node, _, _ = choose(table, features, buildings, player)
+            else:
+                node = int(np.argmax(features.evaluator.node_scores(buildings, player)))
+            buildings[player, node] = 1
+            placed[player].append(node)
+        values = np.array([features.evaluator.opening_value(placed[player]) for player in range(num_players)])
+        rewards.append(values[0] / values.sum())
+    return float(np.mean(rewards))
@@ -0,0 +1,287 @@
+"""
+module replay provides an experience replay buffer backed by memory-mapped files.
+
+Each transition is a fixed-size record: state features (see module features), action, reward,
+next state features, and whether the episode ended. Records live in one file per field under a
+directory, so the buffer can hold tens of millions of transitions, which the operating system
+pages in and out as they are sampled, instead of holding them in RAM:
+
+    meta.json       sizes and dtypes, written once
+    header.dat      appended count, guard and largest priority, see _HEADER
+    states.dat      (capacity, feature_size)
+    next_states.dat (capacity, feature_size)
+    actions.dat     (capacity, )
+    rewards.dat     (capacity, )
+    dones.dat       (capacity, )
+    tree.dat        sum tree of priorities, see #ReplayBuffer.sample_prioritised
+
+The buffer is a ring: once full, each append overwrites the oldest record.
+
+One process writes: it appends, and updates priorities. It writes records first, then their
+priorities, and then publishes the new count in the header, so readers never see a count ahead
+of its records. Any number of processes may open the buffer read-only and sample it without
+locks. Readers only sample the newest capacity - guard records: the guard slots ahead of the
+writer, which the next append overwrites, are never sampled, and their priorities are zeroed.
+Appends are split into batches of at most guard records. A reader which is slower than the
+writer rereads the count after reading a batch, and samples again if the writer could have
+reached any of its records meanwhile.
+
+e.g.
+    buffer = ReplayBuffer.create('replay', capacity=10 ** 7, feature_size=extractor.size)
+    buffer.append(states, actions, rewards, next_states, dones)
+
+    # in any process
+    buffer = ReplayBuffer.open('replay')
+    batch = buffer.sample(256)
+    batch = buffer.sample_prioritised(256, beta=0.4)
+    buffer.update_priorities(batch['slots'], errors)  # in the writer
+"""
+import json
+import os
+
+import numpy as np
+
+_HEADER = np.dtype([('count', '<i8'), ('guard', '<i8'), ('max_priority', '<f8')])
+
+# field -> (dtype, per-record shape given feature_size)
+_FIELDS = {
+    'states': (None, lambda f: (f, )),
+    'next_states': (None, lambda f: (f, )),
+    'actions': ('<i4', lambda f: ()),
+    'rewards': ('<f4', lambda f: ()),
+    'dones': ('u1', lambda f: ()),
+}
+
+
+class ReplayBuffer(object):
+    """
+    class ReplayBuffer stores transitions in memory-mapped files, see module docstring.
+
+    Create a new buffer with #create, open an existing one with #open.
+    """
+    def __init__(self, path, writable=False):
+        """
+        :param path: directory of an existing buffer
+        :param writable: whether this process is the buffer's writer
+        """
+        self.path = path
+        self.writable = writable
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.capacity = self.meta['capacity']
+        self.feature_size = self.meta['feature_size']
+        self.alpha = self.meta['alpha']
+        self._leaves = self.meta['leaves']
+        mode = 'r+' if writable else 'r'
+        self.header = np.memmap(os.path.join(path, 'header.dat'), dtype=_HEADER, mode=mode, shape=(1, ))
+        self.fields = {name: self._map(name, dtype or self.meta['dtype'], shape(self.feature_size), mode)
+                       for name, (dtype, shape) in _FIELDS.items()}
+        self.tree = self._map('tree', '<f8', (), mode, length=2 * self._leaves)
+
+    def _map(self, name, dtype, shape, mode, length=None):
+        return np.memmap(os.path.join(self.path, name + '.dat'), dtype=dtype, mode=mode,
+                         shape=(length or self.capacity, ) + shape)
+
+    @classmethod
+    def create(cls, path, capacity, feature_size, dtype='float32', alpha=0.6, guard=1024):
+        """
+        Create an empty buffer, and open it as its writer. Files are created sparse, so disk
+        space is only taken as records are written.
+
+        :param path: directory to create
+        :param capacity: most records held
+        :param feature_size: length of a state's features, e.g. features.FeatureExtractor.size
+        :param dtype: dtype of the state features, e.g. float16 to halve their size
+        :param alpha: priority exponent, 0 samples uniformly
+        :param guard: slots ahead of the writer never sampled, and the largest append batch. At most capacity / 2.
+        :return: ReplayBuffer
+        """
+        if 2 * guard > capacity:
+            raise ValueError('guard={} must be at most half of capacity={}'.format(guard, capacity))
+        os.makedirs(path)
+        leaves = 1 << max(0, int(capacity - 1).bit_length())
+        meta = {'capacity': capacity, 'feature_size': feature_size, 'dtype': np.dtype(dtype).str,
+                'alpha': alpha, 'leaves': leaves}
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        header = np.memmap(os.path.join(path, 'header.dat'), dtype=_HEADER, mode='w+', shape=(1, ))
+        header['guard'] = guard
+        header['max_priority'] = 1.0
+        header.flush()
+        for name, (field_dtype, shape) in _FIELDS.items():
+            np.memmap(os.path.join(path, name + '.dat'), dtype=field_dtype or meta['dtype'], mode='w+',
+                      shape=(capacity, ) + shape(feature_size)).flush()
+        np.memmap(os.path.join(path, 'tree.dat'), dtype='<f8', mode='w+', shape=(2 * leaves, )).flush()
+        return cls(path, writable=True)
+
+    @classmethod
+    def open(cls, path, writable=False):
+        """
+        :param path: directory of a buffer made by #create
+        :param writable: open as the buffer's writer. Only one process may.
+        """
+        return cls(path, writable=writable)
+
+    def flush(self):
+        for array in list(self.fields.values()) + [self.tree, self.header]:
+            array.flush()
+
+    ###
+    # Queries
+    ###
+
+    @property
+    def count(self):
+        """Transitions appended since creation, including overwritten ones."""
+        return int(self.header['count'][0])
+
+    @property
+    def guard(self):
+        return int(self.header['guard'][0])
+
+    def __len__(self):
+        """Transitions which may be sampled."""
+        return min(self.count, self.capacity - self.guard)
+
+    def _window(self):
+        """
+        :return: (first, stop) transition numbers which may be sampled
+        """
+        count = self.count
+        return count - min(count, self.capacity - self.guard), count
+
+    def _gather(self, slots, stop):
+        """
+        Read the records in slots, as of count stop.
+
+        :return: batch dict, or None if the writer may have overwritten one of them while they were read
+        """
+        batch = {name: np.asarray(array[slots]) for name, array in self.fields.items()}
+        batch['slots'] = slots
+        # the writer starts on the guard slots ahead of a count once it publishes that count
+        numbers = stop - 1 - (stop - 1 - slots) % self.capacity
+        if numbers.min() < self.count + self.guard - self.capacity:
+            return None
+        return batch
+
+    def sample(self, batch_size, rng=np.random):
+        """
+        Sample transitions uniformly.
+
+        :param batch_size: int
+        :param rng: numpy random Generator or RandomState
+        :return: dict field -> (batch_size, ...) arrays, and 'slots', the sampled slots
+        """
+        batch = None
+        while batch is None:
+            first, stop = self._window()
+            if stop == first:
+                raise ValueError('Replay buffer at path={} is empty'.format(self.path))
+            numbers = first + (rng.random(batch_size) * (stop - first)).astype(np.int64)
+            batch = self._gather(np.sort(numbers % self.capacity), stop)
+        return batch
+
+    def sample_prioritised(self, batch_size, beta=0.4, rng=np.random):
+        """
+        Sample transitions in proportion to their priority. The sum tree is descended for the
+        whole batch at once, one level at a time, from stratified points along the total.
+
+        :param batch_size: int
+        :param beta: importance sampling exponent
+        :param rng: numpy random Generator or RandomState
+        :return: as #sample, and 'weights', (batch_size,) importance sampling weights, largest 1
+        """
+        batch = None
+        while batch is None:
+            stop = self.count
+            total = self.tree[1]
+            if total <= 0:
+                raise ValueError('Replay buffer at path={} is empty'.format(self.path))
+            points = (np.arange(batch_size) + rng.random(batch_size)) / batch_size * total
+            nodes = np.ones(batch_size, dtype=np.int64)
+            while nodes[0] < self._leaves:
+                left = self.tree[2 * nodes]
+                right = (points > left) | (left <= 0)
+                points = np.where(right, points - left, points)
+                nodes = 2 * nodes + right
+            slots = nodes - self._leaves
+            # a descent through sums the writer is changing can end in the padding past capacity
+            if slots.max() < self.capacity:
+                batch = self._gather(slots, stop)
+        probabilities = self.tree[nodes] / total
+        weights = (max(len(self), 1) * np.maximum(probabilities, 1e-12)) ** -beta
+        batch['weights'] = (weights / weights.max()).astype(np.float32)
+        return batch
+
+    ###
+    # Writing
+    ###
+
+    def _set_priorities(self, slots, priorities):
+        """
+        Set leaves and update their ancestors, a level at a time.
+        """
+        nodes = slots + self._leaves
+        self.tree[nodes] = priorities
+        nodes = np.unique(nodes // 2)
+        while len(nodes) and nodes[-1] >= 1:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            if nodes[0] == 1:
+                break
+            nodes = np.unique(nodes // 2)
+
+    def append(self, states, actions, rewards, next_states, dones, priorities=None):
+        """
+        Append transitions. Batches larger than guard are appended in parts.
+
+        :param states: (N, feature_size)
+        :param actions: (N,) int, e.g. an action index
+        :param rewards: (N,)
+        :param next_states: (N, feature_size)
+        :param dones: (N,) bool
+        :param priorities: (N,) optional, default the largest priority so far
+        """
+        if not self.writable:
+            raise ValueError('Replay buffer at path={} is open read-only'.format(self.path))
+        values = {'states': states, 'actions': actions, 'rewards': rewards, 'next_states': next_states,
+                  'dones': dones}
+        n = len(actions)
+        guard = self.guard
+        for start in range(0, n, guard):
+            stop = min(n, start + guard)
+            count = self.count
+            slots = (count + np.arange(stop - start)) % self.capacity
+            for name, array in self.fields.items():
+                array[slots] = np.asarray(values[name])[start:stop]
+            if priorities is None:
+                part = np.full(stop - start, self.header['max_priority'][0])
+            else:
+                part = (np.abs(np.asarray(priorities[start:stop], dtype=np.float64)) + 1e-6) ** self.alpha
+                self.header['max_priority'] = max(self.header['max_priority'][0], part.max())
+            # the guard slots ahead are overwritten next, so they stop being sampled now
+            ahead = (count + (stop - start) + np.arange(guard)) % self.capacity
+            self._set_priorities(np.concatenate([slots, ahead]),
+                                 np.concatenate([part, np.zeros(guard)]))
+            self.header['count'] = count + stop - start
+
+    def update_priorities(self, slots, errors):
+        """
+        Set priorities from new errors, e.g. TD errors of a sampled batch. Writer only.
+
+        :param slots: (N,) slots, as returned by #sample
+        :param errors: (N,)
+        """
+        if not self.writable:
+            raise ValueError('Replay buffer at path={} is open read-only'.format(self.path))
+        first, stop = self._window()
+        # slots which left the window since they were sampled keep their zero priority
+        age = (stop - 1 - np.asarray(slots)) % self.capacity
+        live = age < stop - first
+        priorities = (np.abs(np.asarray(errors, dtype=np.float64)) + 1e-6) ** self.alpha
+        self._set_priorities(np.asarray(slots)[live], priorities[live])
+        if live.any():
+            self.header['max_priority'] = max(self.header['max_priority'][0], priorities[live].max())
+
+    def __repr__(self):
+        return '<ReplayBuffer path={}, count={}, capacity={}, feature_size={}>'.format(
+            self.path, self.count, self.capacity, self.feature_size)
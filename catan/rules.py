@@ -0,0 +1,432 @@
+"""
+module rules provides an array-backed model of the catan rules state: what each player holds,
+what is left in the bank, and the development card deck.
+
+The Game owns a RulesState (Game.rules) and updates it as actions happen. The board's
+pieces remain the source of truth for what is where; the rules state keeps the per-player
+counts which the board does not.
+
+Players are indexed by their position in Game.players. Resources are indexed as in
+topology.RESOURCES. Purchases are indexed as in PURCHASES, and their costs are the rows
+of COSTS, so affordability for every player and every purchase is one comparison:
+
+    rules.affordable()           # (num_players, 4) bool
+    rules.affordable()[p, CITY]  # can player p buy a city?
+
+Transfers never take more than the giver has, so the total number of each resource in
+hands and bank is always 19. This keeps the state consistent when spectating a real game,
+where some cards change hands unseen.
+
+Longest road is not tracked.
+"""
+import logging
+import random
+
+import numpy as np
+
+from catan import topology
+
+ROAD, SETTLEMENT, CITY, DEV_CARD = range(4)
+PURCHASES = ['road', 'settlement', 'city', 'dev_card']
+
+# rows are purchases, columns are resources: wood, brick, wheat, sheep, ore
+COSTS = np.array([
+    [1, 1, 0, 0, 0],  # road
+    [1, 1, 1, 1, 0],  # settlement
+    [0, 0, 2, 0, 3],  # city
+    [0, 0, 1, 1, 1],  # dev card
+], dtype=np.int16)
+
+KNIGHT, MONOPOLY, YEAR_OF_PLENTY, ROAD_BUILDER, VICTORY_POINT = range(5)
+DEV_CARDS = ['knight', 'monopoly', 'year_of_plenty', 'road_builder', 'victory_point']
+DEV_DECK_COUNTS = [14, 2, 2, 2, 5]
+
+RESOURCES_PER_TYPE = 19
+# pieces each player starts with: roads, settlements, cities
+PIECE_SUPPLY = [15, 5, 4]
+VICTORY_POINTS_TO_WIN = 10
+LARGEST_ARMY_MIN = 3
+DISCARD_LIMIT = 7
+
+
+class RulesState(object):
+    """
+    class RulesState holds the hands, bank, development cards, and buildings of a game in NumPy arrays.
+
+    Arrays:
+    - hands: (P, 5) resource counts per player
+    - bank: (5,) resource counts in the bank
+    - deck: (25,) development cards in draw order, deck[deck_top:] are still to be drawn
+    - dev_hands: (P, 5) unplayed development cards per player
+    - dev_new: (P, 5) development cards bought this turn, which can't be played yet
+    - dev_played: (P, 5) played development cards per player
+    - buildings: (P, 54) 1 for a settlement, 2 for a city, per node
+    - supply: (P, 3) roads, settlements, and cities left to build
+    - roads: (72,) owner index per edge, -1 for none
+    """
+    def __init__(self, num_players, tiles=None):
+        """
+        :param num_players: int
+        :param tiles: list(Tile), the board's tiles, used for production
+        """
+        self.num_players = num_players
+        self.hands = np.zeros((num_players, topology.NUM_RESOURCES), dtype=np.int16)
+        self.bank = np.full(topology.NUM_RESOURCES, RESOURCES_PER_TYPE, dtype=np.int16)
+
+        deck = [card for card, count in enumerate(DEV_DECK_COUNTS) for _ in range(count)]
+        random.shuffle(deck)
+        self.deck = np.array(deck, dtype=np.int8)
+        self.deck_top = 0
+        self.dev_hands = np.zeros((num_players, len(DEV_CARDS)), dtype=np.int16)
+        self.dev_new = np.zeros((num_players, len(DEV_CARDS)), dtype=np.int16)
+        self.dev_played = np.zeros((num_players, len(DEV_CARDS)), dtype=np.int16)
+        self.largest_army = -1
+
+        self.buildings = np.zeros((num_players, topology.NUM_NODES), dtype=np.int8)
+        self.supply = np.tile(np.array(PIECE_SUPPLY, dtype=np.int16), (num_players, 1))
+        self.roads = np.full(topology.NUM_EDGES, -1, dtype=np.int8)
+
+        self.tile_resource, self.tile_number = topology.tile_arrays(tiles or list())
+
+    def copy(self):
+        """
+        Return an independent copy. Every array is copied, so the cost does not depend on game length.
+        """
+        result = object.__new__(RulesState)
+        for k, v in self.__dict__.items():
+            setattr(result, k, v.copy() if isinstance(v, np.ndarray) else v)
+        return result
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    ###
+    # Queries
+    ###
+
+    def affordable(self):
+        """
+        Which purchases each player can make right now, considering resources, pieces left,
+        and cards left in the deck.
+
+        :return: (P, 4) bool, indexed [player, purchase]
+        """
+        can_pay = (self.hands[:, None, :] >= COSTS[None, :, :]).all(axis=2)
+        in_stock = np.empty_like(can_pay)
+        in_stock[:, :DEV_CARD] = self.supply > 0
+        in_stock[:, DEV_CARD] = self.deck_top < len(self.deck)
+        return can_pay & in_stock
+
+    def can_afford(self, player, purchase):
+        """
+        :param player: player index
+        :param purchase: one of ROAD, SETTLEMENT, CITY, DEV_CARD
+        :return: bool
+        """
+        return bool(self.affordable()[player, purchase])
+
+    def playable_dev_cards(self):
+        """
+        :return: (P, 5) bool, indexed [player, dev card], True if the player holds the card and
+                 did not buy it this turn
+        """
+        return (self.dev_hands - self.dev_new) > 0
+
+    def victory_points(self):
+        """
+        Victory points per player: buildings, played victory point cards, and largest army.
+        :return: (P,) int
+        """
+        vp = self.buildings.sum(axis=1, dtype=np.int16) + self.dev_played[:, VICTORY_POINT]
+        if self.largest_army >= 0:
+            vp[self.largest_army] += 2
+        return vp
+
+    def army_sizes(self):
+        """
+        :return: (P,) knights played per player
+        """
+        return self.dev_played[:, KNIGHT]
+
+    def winner(self):
+        """
+        :return: index of a player with enough victory points to win, or None
+        """
+        vp = self.victory_points()
+        best = int(np.argmax(vp))
+        if vp[best] >= VICTORY_POINTS_TO_WIN:
+            return best
+        return None
+
+    def settlement_mask(self, player, connected=True):
+        """
+        Nodes where a player may build a settlement: empty, with no building on a neighbouring
+        node, and, if connected, touching one of the player's roads.
+
+        :param player: player index
+        :param connected: False for pregame settlements
+        :return: (54,) bool
+        """
+        occupied = np.append(self.buildings.any(axis=0), False)
+        nodes = ~(occupied[:-1] | occupied[topology.NODE_NEIGHBOURS].any(axis=1))
+        if connected:
+            own_roads = np.append(self.roads == player, False)
+            nodes &= own_roads[topology.NODE_EDGES].any(axis=1)
+        return nodes
+
+    def road_mask(self, player, node=None):
+        """
+        Edges where a player may build a road: touching one of the player's buildings, or one of
+        the player's roads at a node without another player's building.
+
+        :param player: player index
+        :param node: node index, optional. Only edges touching this node, e.g. a pregame settlement's.
+        :return: (72,) bool
+        """
+        free = self.roads < 0
+        if node is not None:
+            edges = np.zeros(topology.NUM_EDGES, dtype=bool)
+            touching = topology.NODE_EDGES[node]
+            touching = touching[touching >= 0]
+            edges[touching] = free[touching]
+            return edges
+        own_buildings = self.buildings[player] > 0
+        occupied = self.buildings.any(axis=0)
+        own_roads = np.append(self.roads == player, False)
+        reachable = own_buildings | (~occupied & own_roads[topology.NODE_EDGES].any(axis=1))
+        return free & reachable[topology.EDGE_NODES].any(axis=1)
+
+    def city_mask(self, player):
+        """
+        :param player: player index
+        :return: (54,) bool, nodes holding the player's settlements
+        """
+        return self.buildings[player] == 1
+
+    def bank_ratios(self, player, port_access):
+        """
+        :param player: player index
+        :param port_access: (54, 6) bool, see topology.port_arrays
+        :return: (5,) int, the player's best bank trade ratio per resource given
+        """
+        access = port_access[self.buildings[player] > 0].any(axis=0)
+        return np.where(access[:topology.NUM_RESOURCES], 2, 3 if access[topology.NUM_RESOURCES] else 4)
+
+    def production(self, roll, robber_tile=None):
+        """
+        Resources each player would receive for a roll, before bank limits.
+
+        :param roll: dice sum, int
+        :param robber_tile: tile id the robber is on, optional
+        :return: (P, 5) int
+        """
+        active = self.tile_number == int(roll)
+        if robber_tile is not None:
+            active[robber_tile - 1] = False
+        per_node = topology.NODE_TILES[:, active].astype(np.int16) @ self.tile_resource[active].astype(np.int16)
+        return self.buildings.astype(np.int16) @ per_node
+
+    ###
+    # Updates
+    ###
+
+    def _transfer(self, source, dest, amounts):
+        """
+        Move up to amounts from source to dest, in place. Never takes more than source holds.
+        :return: the amounts actually moved
+        """
+        moved = np.minimum(source, amounts).astype(np.int16)
+        if (moved < amounts).any():
+            logging.debug('Short transfer, wanted={} moved={}'.format(amounts, moved))
+        source -= moved
+        dest += moved
+        return moved
+
+    def produce(self, roll, robber_tile=None):
+        """
+        Pay out a roll. If the bank can't cover a resource and more than one player is owed it,
+        nobody receives it. If only one player is owed it, they receive what is left.
+
+        :return: (P, 5) resources received
+        """
+        owed = self.production(roll, robber_tile)
+        total = owed.sum(axis=0)
+        claimants = (owed > 0).sum(axis=0)
+        short = total > self.bank
+        owed[:, short & (claimants > 1)] = 0
+        owed = np.minimum(owed, self.bank)
+        self.hands += owed
+        self.bank -= owed.sum(axis=0, dtype=np.int16)
+        return owed
+
+    def discard_half(self):
+        """
+        Players holding more than DISCARD_LIMIT cards discard half, rounded down, to the bank.
+        Cards are discarded from the largest pile first.
+
+        :return: (P, 5) resources discarded
+        """
+        discarded = np.zeros_like(self.hands)
+        for player in np.nonzero(self.hands.sum(axis=1) > DISCARD_LIMIT)[0]:
+            for _ in range(int(self.hands[player].sum()) // 2):
+                r = int(np.argmax(self.hands[player] - discarded[player]))
+                discarded[player, r] += 1
+        self.hands -= discarded
+        self.bank += discarded.sum(axis=0, dtype=np.int16)
+        return discarded
+
+    def pay(self, player, purchase):
+        """
+        Pay for a purchase, hand to bank.
+        """
+        self._transfer(self.hands[player], self.bank, COSTS[purchase])
+
+    def build(self, player, purchase, node=None, free=False, edge=None):
+        """
+        Record a road, settlement, or city, paying for it unless free.
+
+        :param player: player index
+        :param purchase: ROAD, SETTLEMENT or CITY
+        :param node: node coord, required for settlements and cities
+        :param free: True for pregame placements and road builder roads
+        :param edge: edge coord of a road, optional. Recorded in roads if given.
+        """
+        if not free:
+            self.pay(player, purchase)
+        self.supply[player, purchase] -= 1
+        if purchase == ROAD and edge is not None:
+            self.roads[topology.EDGE_INDEX[edge]] = player
+        elif purchase == SETTLEMENT:
+            self.buildings[player, topology.NODE_INDEX[node]] = 1
+        elif purchase == CITY:
+            self.buildings[player, topology.NODE_INDEX[node]] = 2
+            self.supply[player, SETTLEMENT] += 1
+
+    def unbuild(self, player, purchase, node=None, edge=None):
+        """
+        Inverse of a free #build.
+        """
+        self.supply[player, purchase] += 1
+        if purchase == ROAD and edge is not None:
+            self.roads[topology.EDGE_INDEX[edge]] = -1
+        elif purchase == SETTLEMENT:
+            self.buildings[player, topology.NODE_INDEX[node]] = 0
+        elif purchase == CITY:
+            self.buildings[player, topology.NODE_INDEX[node]] = 1
+            self.supply[player, SETTLEMENT] -= 1
+
+    def grant_starting_resources(self, player, node):
+        """
+        After the second pregame settlement, the player takes one of each resource next to it.
+        """
+        wanted = topology.NODE_TILES[topology.NODE_INDEX[node]].astype(np.int16) @ self.tile_resource.astype(np.int16)
+        self._transfer(self.bank, self.hands[player], wanted)
+
+    def buy_dev_card(self, player):
+        """
+        Pay for and draw a development card.
+
+        :return: the card drawn, or None if the deck is empty
+        """
+        if self.deck_top >= len(self.deck):
+            logging.warning('Attempted to buy a dev card from an empty deck')
+            return None
+        self.pay(player, DEV_CARD)
+        card = int(self.deck[self.deck_top])
+        self.deck_top += 1
+        self.dev_hands[player, card] += 1
+        self.dev_new[player, card] += 1
+        return card
+
+    def play_dev_card(self, player, card):
+        """
+        Play a development card. Knights update the largest army.
+
+        The card is taken from the player's hand if they hold it. When spectating, cards bought
+        unseen are allowed, so the play is recorded either way.
+        """
+        if self.dev_hands[player, card] > 0:
+            self.dev_hands[player, card] -= 1
+        self.dev_played[player, card] += 1
+        if card == KNIGHT:
+            army = self.dev_played[player, KNIGHT]
+            holder = self.largest_army
+            if army >= LARGEST_ARMY_MIN and (holder < 0 or army > self.dev_played[holder, KNIGHT]):
+                self.largest_army = player
+
+    def monopoly(self, player, resource):
+        """
+        Take every card of the resource from the other players.
+
+        :param resource: resource index
+        :return: number of cards taken
+        """
+        taken = 0
+        for other in range(self.num_players):
+            if other != player:
+                taken += int(self.hands[other, resource])
+                self.hands[player, resource] += self.hands[other, resource]
+                self.hands[other, resource] = 0
+        return taken
+
+    def year_of_plenty(self, player, resource1, resource2):
+        """
+        Take two resources from the bank.
+        """
+        wanted = np.zeros(topology.NUM_RESOURCES, dtype=np.int16)
+        wanted[resource1] += 1
+        wanted[resource2] += 1
+        self._transfer(self.bank, self.hands[player], wanted)
+
+    def steal(self, thief, victim, resource=None):
+        """
+        Move one card from victim to thief. The card is chosen at random by count unless given.
+
+        :return: resource index stolen, or None if the victim has no cards
+        """
+        hand = self.hands[victim]
+        total = int(hand.sum())
+        if total == 0:
+            return None
+        if resource is None:
+            pick = random.randrange(total)
+            resource = int(np.searchsorted(np.cumsum(hand), pick, side='right'))
+        if hand[resource] == 0:
+            return None
+        self.hands[victim, resource] -= 1
+        self.hands[thief, resource] += 1
+        return resource
+
+    def trade_with_bank(self, player, giving, getting):
+        """
+        Trade with the bank or a port.
+
+        :param giving: (5,) resources from player to bank
+        :param getting: (5,) resources from bank to player
+        """
+        self._transfer(self.hands[player], self.bank, np.asarray(giving, dtype=np.int16))
+        self._transfer(self.bank, self.hands[player], np.asarray(getting, dtype=np.int16))
+
+    def trade_with_player(self, player, other, giving, getting):
+        """
+        :param giving: (5,) resources from player to other
+        :param getting: (5,) resources from other to player
+        """
+        self._transfer(self.hands[player], self.hands[other], np.asarray(giving, dtype=np.int16))
+        self._transfer(self.hands[other], self.hands[player], np.asarray(getting, dtype=np.int16))
+
+    def end_turn(self):
+        """
+        Cards bought this turn become playable.
+        """
+        self.dev_new[:] = 0
+
+
+def resource_vector(counted):
+    """
+    Convert [(num, Terrain), ...] as returned by CatanTrade.giving() to a (5,) vector.
+    """
+    vector = np.zeros(topology.NUM_RESOURCES, dtype=np.int16)
+    for num, terrain in counted:
+        vector[topology.RESOURCE_INDEX[terrain]] += num
+    return vector
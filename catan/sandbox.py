@@ -0,0 +1,326 @@
+"""
+module sandbox provides AgentSandbox, an agent which runs another agent in a worker process of its
+own, so an agent which leaks memory, hangs or crashes cannot take down the games it plays in.
+
+An AgentSandbox is an Agent, and is used as one:
+
+    sandbox = sandbox.AgentSandbox('agent2', memory=2 ** 30, timeout=5)
+    game.set_agent(player, sandbox)
+    agents.drive(games)                     # one request per step for all the games it plays
+    print(sandbox.stats())
+    sandbox.close()
+
+The worker and the game's process talk over a pipe, in binary messages. The first byte of each is
+its kind:
+
+    BOARD   key (uint32), then a GameTemplate and an empty GameSnapshot of the game's board,
+            pickled. Sent once per game, before its first decision.
+    DECIDE  count (uint16), then per game: key (uint32) and the position, see
+            GameSnapshot#to_bytes. One message carries a decision for every game in a batch, and
+            the worker decides them with one call to the agent's decide_batch.
+    ACTIONS count (uint16), microseconds the agent took (uint32), then an int16 action per game,
+            see module actions, or -1 where the agent failed. The worker's reply to DECIDE.
+    END     key (uint32): the game is over, and the worker forgets its board.
+    STOP    the worker returns.
+
+Limits: the worker's address space is capped at memory bytes, so a leaking agent fails with
+MemoryError rather than exhausting the machine, and the worker ends with it. A reply which takes
+longer than timeout seconds counts as a hang. A hung or crashed worker is killed and started again,
+and is also started afresh after max_requests requests, to reclaim what a slow leak holds.
+
+Where the agent fails, hangs, crashes or returns an illegal action, the fallback agent (default
+BestAgent) decides in the game's process instead, so the games always go on.
+
+Latency statistics are kept for each sandbox: the agent's own time per request as the worker
+measures it, and the round trip as the game's process sees it, see #AgentSandbox.stats.
+"""
+import collections
+import logging
+import multiprocessing
+import pickle
+import struct
+import time
+import weakref
+
+import numpy as np
+
+import catan.actions
+import catan.agents
+from catan import snapshot
+
+BOARD, DECIDE, ACTIONS, END, STOP = range(1, 6)
+
+_KIND = struct.Struct('<B')
+_KEY = struct.Struct('<BI')
+_COUNT = struct.Struct('<BH')
+_ITEM = struct.Struct('<I')
+_ACTIONS = struct.Struct('<BHI')
+
+
+def _serve(conn, agent, memory):
+    """
+    The worker process: reply to requests until told to stop, or until the pipe closes.
+    """
+    if memory is not None:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    if isinstance(agent, str):
+        agent = catan.agents.get(agent)()
+    boards = dict() # key -> (GameTemplate, GameSnapshot with the board's constants)
+    while True:
+        try:
+            message = conn.recv_bytes()
+        except EOFError:
+            return
+        kind = message[0]
+        if kind == BOARD:
+            _, key = _KEY.unpack_from(message)
+            boards[key] = pickle.loads(message[_KEY.size:])
+        elif kind == END:
+            _, key = _KEY.unpack_from(message)
+            boards.pop(key, None)
+        elif kind == DECIDE:
+            conn.send_bytes(_decide(agent, boards, message))
+        elif kind == STOP:
+            return
+
+
+def _decide(agent, boards, message):
+    _, count = _COUNT.unpack_from(message)
+    offset = _COUNT.size
+    games = list()
+    for _ in range(count):
+        key, = _ITEM.unpack_from(message, offset)
+        offset += _ITEM.size
+        template, blank = boards[key]
+        size = snapshot.GameSnapshot.wire_size(blank.num_players)
+        games.append(blank.from_bytes(message[offset:offset + size]).to_game(template))
+        offset += size
+    start = time.perf_counter()
+    try:
+        decided = agent.decide_batch(games)
+    except MemoryError:
+        raise # the worker ends, and its restart frees what the agent holds
+    except Exception:
+        # one game's failure should not cost the others their decisions
+        decided = list()
+        for game in games:
+            try:
+                decided.append(agent.decide(game))
+            except MemoryError:
+                raise
+            except Exception:
+                logging.exception('Agent {} failed'.format(agent))
+                decided.append(None)
+    micros = int((time.perf_counter() - start) * 1e6)
+    actions = np.array([_encode(agent, game, action) for game, action in zip(games, decided)], dtype=np.int16)
+    return _ACTIONS.pack(ACTIONS, count, min(micros, 2 ** 32 - 1)) + actions.tobytes()
+
+
+def _encode(agent, game, action):
+    """
+    :return: the action's int, see module actions, or -1 where the agent gave none, or one which
+             does not encode, e.g. a node which is not on the board
+    """
+    if action is None:
+        return -1
+    try:
+        return catan.actions.encode(game, action)
+    except (KeyError, IndexError, TypeError, ValueError):
+        logging.warning('Agent {} gave action={}, which does not encode'.format(agent, action))
+        return -1
+
+
+class LatencyStats(object):
+    """
+    class LatencyStats represents a series of latencies: their count, mean and maximum, and
+    percentiles of the most recent ones.
+    """
+    def __init__(self, recent=1024):
+        """
+        :param recent: latencies kept for percentiles
+        """
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = collections.deque(maxlen=recent)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self):
+        """
+        :return: dict of count, and mean_ms, p50_ms, p95_ms and max_ms
+        """
+        recent = np.array(self.recent) * 1000 if self.recent else np.zeros(1)
+        return {
+            'count': self.count,
+            'mean_ms': 1000 * self.total / max(self.count, 1),
+            'p50_ms': float(np.percentile(recent, 50)),
+            'p95_ms': float(np.percentile(recent, 95)),
+            'max_ms': 1000 * self.max,
+        }
+
+
+class AgentSandbox(catan.agents.Agent):
+    """
+    class AgentSandbox plays as another agent, which runs in a worker process, see module
+    docstring.
+    """
+    def __init__(self, agent, memory=None, timeout=10.0, max_requests=None, fallback=None):
+        """
+        :param agent: Agent, which pickles, or the name of a registered agent, see agents.register
+        :param memory: bytes of address space the worker may use, optional
+        :param timeout: seconds to wait for a reply before the worker counts as hung
+        :param max_requests: requests after which the worker is started afresh, optional
+        :param fallback: Agent which decides where the agent does not, default BestAgent
+        """
+        self.agent = agent
+        self.memory = memory
+        self.timeout = timeout
+        self.max_requests = max_requests
+        self.fallback = fallback or catan.agents.BestAgent()
+        self.decide_latency = LatencyStats() # the agent's time per request, measured in the worker
+        self.round_trip_latency = LatencyStats() # per request, measured here
+        self.requests = 0
+        self.fallbacks = 0
+        self.restarts = 0 # after crashes, hangs and max_requests
+        self.crashes = 0
+        self.hangs = 0
+        self._process = None
+        self._conn = None
+        self._served = 0 # requests made of the current worker
+        self._keys = weakref.WeakKeyDictionary() # Game -> key, for the games the worker has the board of
+        self._next_key = 0
+        self._ended = list() # keys of games which have been collected, for END messages
+
+    def start(self):
+        """
+        Start the worker. Called on the first decision, if not before.
+        """
+        context = multiprocessing.get_context()
+        self._conn, child = context.Pipe()
+        self._process = context.Process(target=_serve, args=(child, self.agent, self.memory), daemon=True,
+                                        name='sandbox-{}'.format(self.agent))
+        self._process.start()
+        child.close()
+        self._served = 0
+        self._keys = weakref.WeakKeyDictionary()
+
+    def close(self):
+        """
+        Stop the worker, killing it if it does not stop at once.
+        """
+        if self._process is None:
+            return
+        try:
+            self._conn.send_bytes(_KIND.pack(STOP))
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(1)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._conn.close()
+        self._process, self._conn = None, None
+
+    def restart(self):
+        self.close()
+        self.restarts += 1
+        self.start()
+
+    def decide(self, game):
+        return self.decide_batch([game])[0]
+
+    def decide_batch(self, games):
+        """
+        Decide for many games with one request to the worker.
+
+        :param games: list(Game)
+        :return: list of action tuples, see agents.legal_actions
+        """
+        if self._process is None:
+            self.start()
+        elif self.max_requests is not None and self._served >= self.max_requests:
+            self.restart()
+        actions = self._request(games)
+        result = list()
+        for game, action in zip(games, actions):
+            mask = catan.actions.legal_mask(game)
+            if action is not None and 0 <= action < len(mask) and mask[action]:
+                result.append(catan.actions.decode(game, action))
+            else:
+                self.fallbacks += 1
+                result.append(self.fallback.decide(game))
+        return result
+
+    def _key(self, game):
+        # send the board of a game the worker has not seen, and tell it of games which are gone
+        # emptied in place: the finalizers append to this list
+        while self._ended:
+            self._conn.send_bytes(_KEY.pack(END, self._ended.pop()))
+        key = self._keys.get(game)
+        if key is None:
+            key = self._keys[game] = self._next_key
+            self._next_key = (self._next_key + 1) % 2 ** 32
+            weakref.finalize(game, self._ended.append, key)
+            blank = snapshot.GameSnapshot(len(game.players), game.rules.tile_resource, game.rules.tile_number,
+                                          game.port_access(), turns=game.options.get('turns') == 'on',
+                                          max_turns=game.options.get('max_turns'))
+            self._conn.send_bytes(_KEY.pack(BOARD, key) + pickle.dumps((snapshot.GameTemplate(game), blank),
+                                                                       protocol=pickle.HIGHEST_PROTOCOL))
+        return key
+
+    def _request(self, games):
+        """
+        :return: list of action ints, or None for each game if the worker crashed or hung
+        """
+        start = time.perf_counter()
+        try:
+            parts = [_COUNT.pack(DECIDE, len(games))]
+            for game in games:
+                parts.append(_ITEM.pack(self._key(game)))
+                parts.append(snapshot.GameSnapshot.from_game(game).to_bytes())
+            self._conn.send_bytes(b''.join(parts))
+            if not self._conn.poll(self.timeout):
+                logging.warning('Sandboxed agent {} hung, restarting it'.format(self.agent))
+                self.hangs += 1
+                self.restart()
+                return [None] * len(games)
+            reply = self._conn.recv_bytes()
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            logging.warning('Sandboxed agent {} crashed (exit code {}), restarting it'.format(
+                self.agent, self._process.exitcode))
+            self.crashes += 1
+            self.restart()
+            return [None] * len(games)
+        self.round_trip_latency.add(time.perf_counter() - start)
+        self.requests += 1
+        self._served += 1
+        _, count, micros = _ACTIONS.unpack_from(reply)
+        self.decide_latency.add(micros / 1e6)
+        return np.frombuffer(reply, dtype=np.int16, offset=_ACTIONS.size, count=count).tolist()
+
+    def stats(self):
+        """
+        :return: dict, the sandbox's counts, and summaries of its latencies, see LatencyStats#summary
+        """
+        return {
+            'agent': str(self.agent),
+            'requests': self.requests,
+            'fallbacks': self.fallbacks,
+            'restarts': self.restarts,
+            'crashes': self.crashes,
+            'hangs': self.hangs,
+            'decide': self.decide_latency.summary(),
+            'round_trip': self.round_trip_latency.summary(),
+        }
+
+    def __getstate__(self):
+        raise TypeError('An AgentSandbox holds a worker process, and does not pickle')
+
+    def __repr__(self):
+        return '<AgentSandbox agent={}, requests={}, restarts={}>'.format(self.agent, self.requests, self.restarts)
@@ -0,0 +1,219 @@
+"""
+module selfplay provides a runner which plays many headless games between agents across a pool of processes.
+
+Games are split into chunks of consecutive game numbers. Each worker process plays whole chunks
+with its own HeadlessEngine, and game i is always seeded with seed+i, so results do not depend
+on the number of processes or on the order chunks finish in.
+
+Per-game stats are appended to a JSON-lines file as each chunk comes back, and the summary
+(win and draw counts, and victory point distributions) is aggregated chunk by chunk. At most a
+few chunks per worker are submitted to the pool and not yet returned, so neither the parent nor
+the workers hold more than a few chunks of work or results at once, however many games are played.
+
+e.g.
+    runner = SelfPlayRunner(players, board_opts={'terrain': 'random', 'numbers': 'random'}, processes=4)
+    summary = runner.run(10000, seed=0, out_path='selfplay.jsonl')
+    summary.win_rates()
+"""
+import collections
+import itertools
+import json
+import logging
+import multiprocessing
+import queue
+import random
+import time
+
+from catan.headless import HeadlessEngine
+from catan.openingbook import OpeningBook
+
+# each worker is replaced after this many chunks, which bounds memory lost to any leak in a worker
+_CHUNKS_PER_WORKER = 100
+# chunks submitted to the pool and not yet returned, per worker process
+_CHUNKS_IN_FLIGHT = 2
+
+# set in each worker process by _init_worker
+_engine = None
+_players = None
+
+
+def _init_worker(board_opts, pregame, players, opening_book=None, turns='on', max_turns=None):
+    global _engine, _players
+    book = OpeningBook(opening_book) if opening_book else None
+    _engine = HeadlessEngine(board_opts, pregame=pregame, turns=turns, max_turns=max_turns, opening_book=book)
+    _players = players
+
+
+def _play_chunk(chunk):
+    """
+    Play one chunk of games in a worker process.
+
+    :param chunk: (seed, start, stop), plays games start..stop-1
+    :return: list of per-game stat dicts
+    """
+    seed, start, stop = chunk
+    # games reseed module random themselves; this covers anything drawn outside them, and depends
+    # only on the chunk, not on the worker which plays it
+    random.seed(seed + start)
+    stats = list()
+    for i in range(start, stop):
+        began = time.perf_counter()
+        result = _engine.play(_players, seed=seed + i)
+        game_stats = result.as_dict()
+        game_stats['game'] = i
+        game_stats['seconds'] = round(time.perf_counter() - began, 6)
+        stats.append(game_stats)
+    return stats
+
+
+class SelfPlaySummary(object):
+    """
+    class SelfPlaySummary aggregates per-game stats without keeping them. Games which ended
+    without a winner, see GameResult#winner, are counted as draws, and in no player's wins.
+
+    :param seats: list of seats, in seat order
+    """
+    def __init__(self, seats):
+        self.seats = list(seats)
+        self.games = 0
+        self.wins = collections.Counter()
+        self.draws = 0
+        self.victory_points = {seat: collections.Counter() for seat in self.seats}
+        self.turns = collections.Counter()
+        self.seconds = 0.0
+
+    def add(self, game_stats):
+        """
+        :param game_stats: dict, see GameResult#as_dict
+        """
+        self.games += 1
+        if game_stats['winner'] is None:
+            self.draws += 1
+        else:
+            self.wins[game_stats['winner']] += 1
+        for seat, vp in game_stats['victory_points'].items():
+            self.victory_points[int(seat)][vp] += 1
+        self.turns[game_stats['turns']] += 1
+        self.seconds += game_stats.get('seconds', 0.0)
+
+    def win_rates(self):
+        """
+        :return: dict seat -> fraction of games won. With draws, these add up to less than 1.
+        """
+        return {seat: self.wins[seat] / self.games if self.games else 0.0 for seat in self.seats}
+
+    def draw_rate(self):
+        """
+        :return: fraction of games which ended without a winner
+        """
+        return self.draws / self.games if self.games else 0.0
+
+    def mean_victory_points(self):
+        """
+        :return: dict seat -> mean victory points at the end of the game
+        """
+        means = dict()
+        for seat, counts in self.victory_points.items():
+            total = sum(counts.values())
+            means[seat] = sum(vp * n for vp, n in counts.items()) / total if total else 0.0
+        return means
+
+    def as_dict(self):
+        return {
+            'games': self.games,
+            'wins': {seat: self.wins[seat] for seat in self.seats},
+            'draws': self.draws,
+            'victory_points': {seat: dict(sorted(counts.items())) for seat, counts in self.victory_points.items()},
+            'turns': dict(sorted(self.turns.items())),
+        }
+
+    def __repr__(self):
+        return '<SelfPlaySummary games={}, wins={}, draws={}>'.format(self.games, dict(self.wins), self.draws)
+
+
+class SelfPlayRunner(object):
+    """
+    class SelfPlayRunner fans self-play games out across a process pool.
+
+    Every player must be an agent, see module headless.
+    """
+    def __init__(self, players, board_opts=None, pregame='on', processes=None, chunk_size=50, opening_book=None,
+                 turns='on', max_turns=1000):
+        """
+        :param players: list(Player), all of which must be agents
+        :param board_opts: dictionary mapping str->str, see boardbuilder.get_opts
+        :param pregame: (on|off)
+        :param processes: number of worker processes, default the number of cpus. 1 plays in this process.
+        :param chunk_size: games per chunk
+        :param opening_book: path to an opening book file, optional, opened by each worker, see module openingbook
+        :param turns: (on|off), whether regular turns are played after the pregame, see Game. With off,
+                      every game ends after the pregame.
+        :param max_turns: int, turns after which a game ends without a winner, optional, see Game
+        """
+        self.players = list(players)
+        self.board_opts = board_opts or dict()
+        self.pregame = pregame
+        self.processes = processes or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.opening_book = opening_book
+        self.turns = turns
+        self.max_turns = max_turns
+
+    def _chunks(self, n, seed):
+        for start in range(0, n, self.chunk_size):
+            yield seed, start, min(n, start + self.chunk_size)
+
+    def _results(self, n, seed):
+        """
+        :return: generator of lists of per-game stat dicts, one list per chunk, in completion order
+        """
+        init_args = (self.board_opts, self.pregame, self.players, self.opening_book, self.turns, self.max_turns)
+        if self.processes == 1:
+            _init_worker(*init_args)
+            for chunk in self._chunks(n, seed):
+                yield _play_chunk(chunk)
+            return
+        # Pool#imap_unordered would take every chunk from the generator at once, so chunks are
+        # submitted a few at a time, each as another returns
+        chunks = self._chunks(n, seed)
+        done = queue.Queue() # (True, stats) or (False, exception), put by the pool's result thread
+        with multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=init_args,
+                                  maxtasksperchild=_CHUNKS_PER_WORKER) as pool:
+            in_flight = 0
+            while True:
+                for chunk in itertools.islice(chunks, self.processes * _CHUNKS_IN_FLIGHT - in_flight):
+                    pool.apply_async(_play_chunk, (chunk, ), callback=lambda stats: done.put((True, stats)),
+                                     error_callback=lambda error: done.put((False, error)))
+                    in_flight += 1
+                if not in_flight:
+                    break
+                ok, stats = done.get()
+                in_flight -= 1
+                if not ok:
+                    raise stats
+                yield stats
+
+    def run(self, n, seed=0, out_path=None):
+        """
+        Play n games.
+
+        :param n: number of games
+        :param seed: base seed, game i is seeded with seed+i
+        :param out_path: file to append per-game stats to as JSON lines, optional
+        :return: SelfPlaySummary
+        """
+        summary = SelfPlaySummary(p.seat for p in self.players)
+        out = open(out_path, 'a') if out_path else None
+        try:
+            for stats in self._results(n, seed):
+                for game_stats in stats:
+                    summary.add(game_stats)
+                if out:
+                    out.writelines(json.dumps(game_stats) + '\n' for game_stats in stats)
+                    out.flush()
+        finally:
+            if out:
+                out.close()
+        logging.debug('Played {} self-play games on {} processes, wins={}, draws={}'.format(
+            summary.games, self.processes, dict(summary.wins), summary.draws))
+        return summary
@@ -0,0 +1,670 @@
+"""
+module snapshot provides GameSnapshot, a compact copy of a game position for search.
+
+A Game carries a board of Piece objects, state objects which point back at the game, a log,
+observers, and an undo history, so copying one is slow, and a copy shares its state object
+with the original. A GameSnapshot holds only what decides the rest of the game:
+
+- the rules state arrays (hands, bank, deck, dev cards, buildings, supply, roads), see module rules
+- the robber's tile, the current player, the turn index, and who rolled last
+- an integer state id (see STATES), whether a dev card was played this turn, and
+  road builder progress
+
+All arrays are views into one flat int16 buffer, so #copy is a single buffer copy, and its cost
+depends only on the number of players. Board constants (tile arrays and port access) are shared
+between copies.
+
+Snapshots are mutable. #apply leaves the snapshot as it is and returns a new one with the action
+made. #play makes the action in place, changing the snapshot, for rollouts which own their copy;
+take a #copy first of a snapshot which others hold.
+
+Actions are tuples as in module agents, with indexes in place of coords and objects:
+
+    ('place_settlement', node index)
+    ('place_road', edge index)
+    ('move_robber', tile id)
+    ('steal', player index or None)
+    ('steal', 1, 3)         # or with the resource index taken given, None if the victim had none
+    ('roll', )              # dice are drawn from the rng given to #play
+    ('roll', 8)             # or given, e.g. by a search which enumerates dice outcomes
+    ('trade', give resource index, get resource index)
+    ('play_monopoly', resource index)
+
+e.g.
+    snapshot = GameSnapshot.from_game(game)
+    child = snapshot.apply(snapshot.legal_actions()[0])
+    game = child.to_game(game)
+
+Positions can be saved to a file with #save, and read back with #load. #GameSnapshot.to_bytes
+packs a position into a fixed-size record for another process, which reads it with #from_bytes.
+"""
+import copy
+import itertools
+import pickle
+import random
+import struct
+
+import numpy as np
+
+import hexgrid
+
+import catan.states
+from catan import evaluation, events, rules, topology
+from catan.board import PortType
+from catan.pieces import Piece, PieceType
+
+NOT_IN_GAME, PREGAME_SETTLEMENT, PREGAME_ROAD, BEGIN_TURN, DURING_TURN, MOVE_ROBBER, \
+    MOVE_ROBBER_KNIGHT, STEAL, STEAL_KNIGHT, ROAD_BUILDER = range(10)
+STATES = ['not_in_game', 'pregame_settlement', 'pregame_road', 'begin_turn', 'during_turn', 'move_robber',
+          'move_robber_knight', 'steal', 'steal_knight', 'road_builder']
+
+# nodes touching each tile, by tile index
+TILE_NODES = [np.flatnonzero(topology.NODE_TILES[:, t]) for t in range(topology.NUM_TILES)]
+
+_YEAR_OF_PLENTY_PAIRS = list(itertools.combinations_with_replacement(range(topology.NUM_RESOURCES), 2))
+
+# python attributes which are part of the position, beside the arrays
+_SCALARS = ('state', 'cur', 'turn', 'robber_tile', 'deck_top', 'largest_army', 'last_roller',
+            'dev_card_played', 'road_builder_roads', 'pending_node', 'last_roll')
+
+# the python attributes in #GameSnapshot.to_bytes, -1 for None: state, cur, turn, robber_tile,
+# deck_top, largest_army, last_roller, dev_card_played, last_roll, pending_node, two road builder roads
+_WIRE = struct.Struct('<bbibbbb?bhhh')
+
+_layouts = dict()
+
+
+def layout(num_players):
+    """
+    :return: (size, list of (name, start, stop, shape)) of the flat buffer for num_players
+    """
+    if num_players not in _layouts:
+        fields = [
+            ('hands', (num_players, topology.NUM_RESOURCES)),
+            ('bank', (topology.NUM_RESOURCES, )),
+            ('deck', (sum(rules.DEV_DECK_COUNTS), )),
+            ('dev_hands', (num_players, len(rules.DEV_CARDS))),
+            ('dev_new', (num_players, len(rules.DEV_CARDS))),
+            ('dev_played', (num_players, len(rules.DEV_CARDS))),
+            ('buildings', (num_players, topology.NUM_NODES)),
+            ('supply', (num_players, len(rules.PIECE_SUPPLY))),
+            ('roads', (topology.NUM_EDGES, )),
+        ]
+        views, start = list(), 0
+        for name, shape in fields:
+            stop = start + int(np.prod(shape))
+            views.append((name, start, stop, shape))
+            start = stop
+        _layouts[num_players] = (start, views)
+    return _layouts[num_players]
+
+
+def state_id(game):
+    """
+    The snapshot state id of a game's state. A piece being placed in game (after
+    Game#begin_placing) counts as during the turn.
+
+    :param game: Game
+    :return: int, one of the ids in STATES
+    """
+    state = game.state
+    if not state.is_in_game():
+        return NOT_IN_GAME
+    if state.is_in_pregame():
+        return PREGAME_SETTLEMENT if state.can_place_settlement() else PREGAME_ROAD
+    if isinstance(state, catan.states.GameStatePlacingRoadBuilderPieces):
+        return ROAD_BUILDER
+    if isinstance(state, catan.states.GameStateMoveRobberUsingKnight):
+        return MOVE_ROBBER_KNIGHT
+    if isinstance(state, catan.states.GameStateMoveRobber):
+        return MOVE_ROBBER
+    if isinstance(state, catan.states.GameStateStealUsingKnight):
+        return STEAL_KNIGHT
+    if isinstance(state, catan.states.GameStateSteal):
+        return STEAL
+    if isinstance(state, catan.states.GameStateBeginTurn):
+        return BEGIN_TURN
+    return DURING_TURN
+
+
+def game_state(game, state, road_builder_edges=()):
+    """
+    A new Game state object for a snapshot state id. Inverse of #state_id.
+
+    :param game: Game
+    :param state: int, one of the ids in STATES
+    :param road_builder_edges: edge coords already placed with a road builder
+    :return: GameState
+    """
+    if state == NOT_IN_GAME:
+        return catan.states.GameStateNotInGame(game)
+    if state == PREGAME_SETTLEMENT:
+        return catan.states.GameStatePreGamePlacingPiece(game, PieceType.settlement)
+    if state == PREGAME_ROAD:
+        return catan.states.GameStatePreGamePlacingPiece(game, PieceType.road)
+    if state == ROAD_BUILDER:
+        result = catan.states.GameStatePlacingRoadBuilderPieces(game)
+        result.edges = list(road_builder_edges)
+        return result
+    return {
+        BEGIN_TURN: catan.states.GameStateBeginTurn,
+        DURING_TURN: catan.states.GameStateDuringTurnAfterRoll,
+        MOVE_ROBBER: catan.states.GameStateMoveRobber,
+        MOVE_ROBBER_KNIGHT: catan.states.GameStateMoveRobberUsingKnight,
+        STEAL: catan.states.GameStateSteal,
+        STEAL_KNIGHT: catan.states.GameStateStealUsingKnight,
+    }[state](game)
+
+
+class GameTemplate(object):
+    """
+    class GameTemplate holds what #GameSnapshot.to_game takes from a game, which stays the same
+    through it: a copy of the board, which notifies nobody, the players and the options. Unlike
+    a Game, it pickles, e.g. to rebuild positions in another process.
+    """
+    def __init__(self, game):
+        """
+        :param game: Game, started
+        """
+        self.board = copy.deepcopy(game.board)
+        self.board.observers = set()
+        self.board.events = events.EventBus()
+        self.players = list(game.players)
+        self.options = dict(game.options, stream='off')
+
+
+class GameSnapshot(rules.RulesState):
+    """
+    class GameSnapshot represents a game position as arrays, and plays actions on it by the same
+    rules as Game. It is a RulesState, so every rules query and update applies to it directly.
+    """
+    def __init__(self, num_players, tile_resource, tile_number, port_access, turns=True, max_turns=None):
+        """
+        An empty position, not in game. Use #from_game to snapshot a game.
+
+        :param num_players: int
+        :param tile_resource: (19, 5), see topology.tile_arrays
+        :param tile_number: (19,), see topology.tile_arrays
+        :param port_access: (54, 6), see topology.port_arrays
+        :param turns: bool, whether regular turns are played after the pregame, see Game
+        :param max_turns: int, optional, see Game
+        """
+        self.num_players = num_players
+        self.tile_resource = tile_resource
+        self.tile_number = tile_number
+        self.port_access = port_access
+        self.turns = turns
+        self.max_turns = max_turns
+        self._bind(np.zeros(layout(num_players)[0], dtype=np.int16))
+        self.roads[:] = -1
+        self.state = NOT_IN_GAME
+        self.cur = 0
+        self.turn = 0
+        self.robber_tile = None
+        self.deck_top = 0
+        self.largest_army = -1
+        self.last_roller = -1
+        self.dev_card_played = False
+        self.road_builder_roads = list() # edge indexes placed with the road builder being played
+        self.pending_node = -1 # node of the settlement whose pregame road is to be placed
+        self.last_roll = None
+
+    def _bind(self, data):
+        self.data = data
+        for name, start, stop, shape in layout(self.num_players)[1]:
+            setattr(self, name, data[start:stop].reshape(shape))
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        :param game: Game, started
+        :return: GameSnapshot of the game's position
+        """
+        state = state_id(game)
+        result = cls(len(game.players), game.rules.tile_resource, game.rules.tile_number,
+                     game.port_access(),
+                     turns=game.options.get('turns') == 'on', max_turns=game.options.get('max_turns'))
+        for name, _, _, _ in layout(result.num_players)[1]:
+            getattr(result, name)[:] = getattr(game.rules, name)
+        result.state = state
+        result.cur = game.cur_player_index()
+        result.turn = game._cur_turn
+        result.robber_tile = game.robber_tile
+        result.deck_top = game.rules.deck_top
+        result.largest_army = int(game.rules.largest_army)
+        if game.last_player_to_roll is not None and game.last_player_to_roll in game.players:
+            result.last_roller = game.player_index(game.last_player_to_roll)
+        result.dev_card_played = not game.dev_card_state.can_play_dev_card()
+        if state == ROAD_BUILDER:
+            result.road_builder_roads = [topology.EDGE_INDEX[edge] for edge in game.state.edges]
+        if state == PREGAME_ROAD:
+            settlements = [coord for coord, ptype in game.board.player_to_pieces.get(game.get_cur_player(), [])
+                           if ptype == PieceType.settlement]
+            result.pending_node = topology.NODE_INDEX[settlements[-1]]
+        result.last_roll = game.last_roll
+        return result
+
+    def to_game(self, template, logging='off'):
+        """
+        A new Game in this position, on a copy of the template's board, with the template's players
+        and options. The new game has no log history and no undo history.
+
+        :param template: Game this snapshot was taken from, or one with the same board and players
+        :param logging: (on|off|buffer), see Game
+        :return: Game
+        """
+        from catan.game import Game
+        board = copy.deepcopy(template.board)
+        board.observers = set()
+        board.events = events.EventBus()
+        options = template.options
+        game = Game(board=board, logging=logging, pregame=options.get('pregame'), undo=options.get('undo'),
+                    turns=options.get('turns'), max_turns=options.get('max_turns'))
+        game.set_players(template.players)
+        players = game.players
+
+        board.pieces = dict()
+        board.player_to_pieces = dict()
+        pending = None
+        for p, n in zip(*np.nonzero(self.buildings)):
+            coord = topology.NODES[n]
+            piece_type = PieceType.city if self.buildings[p, n] == 2 else PieceType.settlement
+            board.pieces[(hexgrid.NODE, coord)] = Piece(piece_type, players[p])
+            # a city's node also lists the settlement it replaced
+            entries = [(coord, PieceType.settlement)] + ([(coord, PieceType.city)] if piece_type == PieceType.city else [])
+            if n == self.pending_node:
+                pending = players[p], entries
+            else:
+                board.player_to_pieces[players[p]] = board.player_to_pieces.get(players[p], []) + entries
+        for e in np.flatnonzero(self.roads >= 0):
+            owner = players[self.roads[e]]
+            board.pieces[(hexgrid.EDGE, topology.EDGES[e])] = Piece(PieceType.road, owner)
+            board.player_to_pieces[owner] = board.player_to_pieces.get(owner, []) + [(topology.EDGES[e], PieceType.road)]
+        if pending is not None:
+            # the pregame road goes by the newest settlement, the last one listed
+            owner, entries = pending
+            board.player_to_pieces[owner] = board.player_to_pieces.get(owner, []) + entries
+        if self.robber_tile is not None:
+            board.pieces[(hexgrid.TILE, hexgrid.tile_id_to_coord(self.robber_tile))] = game.robber
+
+        game.rules = self.rules_state()
+        game._node_resources = evaluation.node_resources(game.rules.tile_resource)
+        game._cur_player = players[self.cur]
+        game._cur_turn = self.turn
+        game.robber_tile = self.robber_tile
+        game.last_roll = self.last_roll
+        game.last_player_to_roll = players[self.last_roller] if self.last_roller >= 0 else None
+        if self.dev_card_played:
+            game.set_dev_card_state(catan.states.DevCardPlayedState(game))
+        game.set_state(game_state(game, self.state, [topology.EDGES[e] for e in self.road_builder_roads]))
+        return game
+
+    def rules_state(self):
+        """
+        :return: an independent RulesState in this position, with the dtypes Game uses
+        """
+        result = object.__new__(rules.RulesState)
+        result.num_players = self.num_players
+        for name, _, _, _ in layout(self.num_players)[1]:
+            setattr(result, name, getattr(self, name).copy())
+        result.deck = result.deck.astype(np.int8)
+        result.buildings = result.buildings.astype(np.int8)
+        result.roads = result.roads.astype(np.int8)
+        result.deck_top = self.deck_top
+        result.largest_army = self.largest_army
+        result.tile_resource, result.tile_number = self.tile_resource, self.tile_number
+        return result
+
+    def copy(self):
+        """
+        :return: an independent GameSnapshot, made with one buffer copy
+        """
+        result = object.__new__(GameSnapshot)
+        result.__dict__.update(self.__dict__)
+        result._bind(self.data.copy())
+        return result
+
+    def __getstate__(self):
+        # the arrays are views into data, and are bound again on unpickling
+        views = {name for name, _, _, _ in layout(self.num_players)[1]}
+        return {k: v for k, v in self.__dict__.items() if k not in views}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._bind(self.data)
+
+    def to_bytes(self):
+        """
+        The position without the board constants, in a fixed number of bytes for the number of
+        players, see #from_bytes.
+
+        :return: bytes
+        """
+        roads = list(self.road_builder_roads) + [-1, -1]
+        return _WIRE.pack(self.state, self.cur, self.turn, -1 if self.robber_tile is None else self.robber_tile,
+                          self.deck_top, self.largest_army, self.last_roller, self.dev_card_played,
+                          -1 if self.last_roll is None else self.last_roll, self.pending_node,
+                          roads[0], roads[1]) + self.data.tobytes()
+
+    @staticmethod
+    def wire_size(num_players):
+        """
+        :return: int, bytes in #to_bytes for num_players
+        """
+        return _WIRE.size + 2 * layout(num_players)[0]
+
+    def from_bytes(self, data):
+        """
+        A new position on this one's board, read from #to_bytes.
+
+        :param data: bytes-like, of #wire_size
+        :return: GameSnapshot
+        """
+        result = object.__new__(GameSnapshot)
+        result.__dict__.update(self.__dict__)
+        result._bind(np.frombuffer(data, dtype=np.int16, offset=_WIRE.size).copy())
+        (result.state, result.cur, result.turn, robber_tile, result.deck_top, result.largest_army, result.last_roller,
+         result.dev_card_played, last_roll, result.pending_node, road1, road2) = _WIRE.unpack_from(data)
+        result.robber_tile = None if robber_tile < 0 else robber_tile
+        result.last_roll = None if last_roll < 0 else last_roll
+        result.road_builder_roads = [e for e in (road1, road2) if e >= 0]
+        return result
+
+    def position_key(self):
+        """
+        A key which is equal for equal positions, e.g. for a transposition table.
+
+        :return: int
+        """
+        return hash((self.data.tobytes(), self.state, self.cur, self.robber_tile, self.deck_top,
+                     self.largest_army, self.last_roller == self.cur, self.dev_card_played,
+                     tuple(self.road_builder_roads), self.pending_node))
+
+    ###
+    # Queries
+    ###
+
+    def is_in_game(self):
+        return self.state != NOT_IN_GAME
+
+    def has_rolled(self):
+        return self.last_roller == self.cur
+
+    def settlement_nodes(self, connected=True):
+        """
+        Nodes where the current player may build a settlement, see RulesState#settlement_mask.
+
+        :return: (54,) bool
+        """
+        return self.settlement_mask(self.cur, connected)
+
+    def road_edges(self):
+        """
+        Edges where the current player may build a road, see RulesState#road_mask.
+
+        :return: (72,) bool
+        """
+        return self.road_mask(self.cur, self.pending_node if self.state == PREGAME_ROAD else None)
+
+    def trade_ratios(self):
+        """
+        :return: (5,) int, the current player's best bank trade ratio per resource given
+        """
+        return self.bank_ratios(self.cur, self.port_access)
+
+    def victims(self):
+        """
+        :return: indexes of the players the current player may steal from, in seat order
+        """
+        if self.robber_tile is None:
+            return list()
+        nodes = TILE_NODES[self.robber_tile - 1]
+        return [p for p in np.flatnonzero(self.buildings[:, nodes].any(axis=1)) if p != self.cur]
+
+    def legal_actions(self):
+        """
+        The actions the current player may take: the same as agents.legal_actions, and in the
+        same order, except that cities are listed by node index.
+
+        :return: list of actions
+        """
+        state, p = self.state, self.cur
+        if state == NOT_IN_GAME:
+            return list()
+        if state == PREGAME_SETTLEMENT:
+            return [('place_settlement', int(n)) for n in np.flatnonzero(self.settlement_nodes(connected=False))]
+        if state in (PREGAME_ROAD, ROAD_BUILDER):
+            return [('place_road', int(e)) for e in np.flatnonzero(self.road_edges())]
+        if state in (MOVE_ROBBER, MOVE_ROBBER_KNIGHT):
+            return [('move_robber', tile_id) for tile_id in topology.TILE_IDS if tile_id != self.robber_tile]
+        if state in (STEAL, STEAL_KNIGHT):
+            return [('steal', int(v)) for v in self.victims()] or [('steal', None)]
+
+        actions = list()
+        playable = (self.dev_hands[p] - self.dev_new[p] > 0) & (not self.dev_card_played)
+        if not self.has_rolled():
+            actions.append(('roll', ))
+            if playable[rules.KNIGHT]:
+                actions.append(('play_knight', ))
+            return actions
+
+        affordable = self.affordable()[p]
+        actions.append(('end_turn', ))
+        if affordable[rules.SETTLEMENT]:
+            actions.extend(('place_settlement', int(n)) for n in np.flatnonzero(self.settlement_nodes()))
+        if affordable[rules.CITY]:
+            actions.extend(('place_city', int(n)) for n in np.flatnonzero(self.buildings[p] == 1))
+        road_edges = None
+        if affordable[rules.ROAD]:
+            road_edges = np.flatnonzero(self.road_edges())
+            actions.extend(('place_road', int(e)) for e in road_edges)
+        if affordable[rules.DEV_CARD]:
+            actions.append(('buy_dev_card', ))
+        ratios = self.trade_ratios()
+        for give in np.flatnonzero(self.hands[p] >= ratios):
+            actions.extend(('trade', int(give), int(get)) for get in np.flatnonzero(self.bank > 0) if get != give)
+        if playable[rules.KNIGHT]:
+            actions.append(('play_knight', ))
+        if playable[rules.MONOPOLY]:
+            actions.extend(('play_monopoly', r) for r in range(topology.NUM_RESOURCES))
+        if playable[rules.YEAR_OF_PLENTY]:
+            actions.extend(('play_year_of_plenty', r1, r2) for r1, r2 in _YEAR_OF_PLENTY_PAIRS)
+        if playable[rules.ROAD_BUILDER] and self.supply[p, rules.ROAD] >= 2:
+            if road_edges is None:
+                road_edges = np.flatnonzero(self.road_edges())
+            if len(road_edges):
+                actions.append(('play_road_builder', ))
+        if playable[rules.VICTORY_POINT]:
+            actions.append(('play_victory_point', ))
+        return actions
+
+    ###
+    # Actions
+    ###
+
+    def apply(self, action, rng=random):
+        """
+        :param action: action tuple, see #legal_actions
+        :param rng: random.Random-like object, for dice and steals
+        :return: a new GameSnapshot with the action made
+        """
+        result = self.copy()
+        result.play(action, rng)
+        return result
+
+    def play(self, action, rng=random):
+        """
+        Make an action in place. Actions are not checked for legality.
+
+        :param action: action tuple, see #legal_actions
+        :param rng: random.Random-like object, for dice and steals
+        """
+        name, p = action[0], self.cur
+        if name == 'place_settlement':
+            pregame = self.state == PREGAME_SETTLEMENT
+            self.build(p, rules.SETTLEMENT, topology.NODES[action[1]], free=pregame)
+            if pregame:
+                if self.supply[p, rules.SETTLEMENT] == rules.PIECE_SUPPLY[rules.SETTLEMENT] - 2:
+                    self.grant_starting_resources(p, topology.NODES[action[1]])
+                self.pending_node = action[1]
+                self.state = PREGAME_ROAD
+            else:
+                self.state = DURING_TURN
+        elif name == 'place_road':
+            self.roads[action[1]] = p
+            if self.state == PREGAME_ROAD:
+                self.build(p, rules.ROAD, free=True)
+                self.pending_node = -1
+                self._end_turn()
+            elif self.state == ROAD_BUILDER:
+                self.build(p, rules.ROAD, free=True)
+                self.road_builder_roads = self.road_builder_roads + [action[1]]
+                if len(self.road_builder_roads) == 2:
+                    self.play_dev_card(p, rules.ROAD_BUILDER)
+                    self.dev_card_played = True
+                    self.road_builder_roads = list()
+                    self.state = DURING_TURN
+            else:
+                self.build(p, rules.ROAD)
+                self.state = DURING_TURN
+        elif name == 'place_city':
+            self.build(p, rules.CITY, topology.NODES[action[1]])
+            self.state = DURING_TURN
+        elif name == 'roll':
+            roll = action[1] if len(action) > 1 else rng.randint(1, 6) + rng.randint(1, 6)
+            self.last_roll = roll
+            self.last_roller = p
+            if roll == 7:
+                self.discard_half()
+                self.state = MOVE_ROBBER
+            else:
+                self.produce(roll, self.robber_tile)
+                self.state = DURING_TURN
+        elif name == 'move_robber':
+            self.robber_tile = action[1]
+            self.state = STEAL_KNIGHT if self.state == MOVE_ROBBER_KNIGHT else STEAL
+        elif name == 'steal':
+            if len(action) > 2:
+                if action[2] is not None:
+                    self.steal(p, action[1], action[2])
+            elif action[1] is not None:
+                self._steal(p, action[1], rng)
+            self.state = DURING_TURN
+        elif name == 'buy_dev_card':
+            self.buy_dev_card(p)
+        elif name == 'trade':
+            giving = np.zeros(topology.NUM_RESOURCES, dtype=np.int16)
+            getting = np.zeros(topology.NUM_RESOURCES, dtype=np.int16)
+            giving[action[1]] = self.trade_ratios()[action[1]]
+            getting[action[2]] = 1
+            self.trade_with_bank(p, giving, getting)
+        elif name == 'play_knight':
+            self.play_dev_card(p, rules.KNIGHT)
+            self.dev_card_played = True
+            self.state = MOVE_ROBBER_KNIGHT
+        elif name == 'play_monopoly':
+            self.play_dev_card(p, rules.MONOPOLY)
+            self.monopoly(p, action[1])
+            self.dev_card_played = True
+        elif name == 'play_year_of_plenty':
+            self.play_dev_card(p, rules.YEAR_OF_PLENTY)
+            self.year_of_plenty(p, action[1], action[2])
+            self.dev_card_played = True
+        elif name == 'play_road_builder':
+            self.road_builder_roads = list()
+            self.state = ROAD_BUILDER
+        elif name == 'play_victory_point':
+            self.play_dev_card(p, rules.VICTORY_POINT)
+            self.dev_card_played = True
+        elif name == 'end_turn':
+            self._end_turn()
+        else:
+            raise ValueError('Unknown action={}'.format(action))
+
+    def _steal(self, thief, victim, rng):
+        hand = self.hands[victim]
+        total = int(hand.sum())
+        if total:
+            pick = rng.randrange(total)
+            self.steal(thief, victim, int(np.searchsorted(np.cumsum(hand), pick, side='right')))
+
+    def _end_turn(self):
+        """
+        As Game#end_turn.
+        """
+        if self.turns and (self.winner() == self.cur or
+                           self.max_turns is not None and self.turn + 1 >= self.max_turns):
+            self.state = NOT_IN_GAME
+            return
+        self.end_turn()
+        n, following = self.num_players, self.turn + 1
+        pregame = self.state in (PREGAME_SETTLEMENT, PREGAME_ROAD)
+        if pregame and following < 2 * n:
+            # snake draft
+            self.cur = following if following < n else 2 * n - 1 - following
+        else:
+            self.cur = following % n
+            if pregame:
+                pregame = False
+                self.state = BEGIN_TURN if self.turns else NOT_IN_GAME
+        self.turn = following
+        self.dev_card_played = False
+        if pregame:
+            self.state = PREGAME_SETTLEMENT
+        elif self.state != NOT_IN_GAME:
+            self.state = BEGIN_TURN if self.turns else NOT_IN_GAME
+
+    ###
+    # Conversion
+    ###
+
+    def game_action(self, action, game):
+        """
+        The action in the form module agents makes on a Game, see agents.apply.
+
+        :param action: action tuple, see #legal_actions
+        :param game: Game in this position
+        :return: action tuple
+        """
+        name = action[0]
+        if name in ('place_settlement', 'place_city'):
+            return name, topology.NODES[action[1]]
+        if name == 'place_road':
+            return name, topology.EDGES[action[1]]
+        if name == 'steal':
+            return name, None if action[1] is None else game.players[action[1]]
+        if name == 'roll':
+            return name,
+        if name == 'trade':
+            give = topology.RESOURCES[action[1]]
+            ratio = self.trade_ratios()[action[1]]
+            port_type = {2: PortType(give.value), 3: PortType.any3, 4: PortType.any4}[int(ratio)]
+            return name, port_type, give, topology.RESOURCES[action[2]]
+        if name == 'play_monopoly':
+            return name, topology.RESOURCES[action[1]]
+        if name == 'play_year_of_plenty':
+            return name, topology.RESOURCES[action[1]], topology.RESOURCES[action[2]]
+        return action
+
+    def __repr__(self):
+        return '<GameSnapshot state={}, turn={}, cur={}>'.format(STATES[self.state], self.turn, self.cur)
+
+
+def save(path, snapshots):
+    """
+    Save positions, e.g. for later analysis, see module mcts.
+
+    :param path: file to write
+    :param snapshots: list(GameSnapshot)
+    """
+    with open(path, 'wb') as f:
+        pickle.dump(list(snapshots), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load(path):
+    """
+    :param path: file written by #save
+    :return: list(GameSnapshot)
+    """
+    with open(path, 'rb') as f:
+        return pickle.load(f)
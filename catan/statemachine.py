@@ -0,0 +1,321 @@
+"""
+module statemachine provides a table-driven game state machine, an alternative to the state
+classes of module states.
+
+Each game state is a small int, and each capability (see states, can_do_xyz()) is one bit. The
+capabilities of every state are precomputed into #MASKS, one int per state and turn flags
+(whether the current player has rolled, and whether they have played a dev card), so asking
+whether a state can do something is one bit test, and all its capabilities are read at once:
+
+    caps = game.capabilities()
+    if caps & statemachine.CAN_ROLL:
+        ...
+    statemachine.names(caps)  # ['roll', 'play_knight', 'play_victory_point', 'in_game']
+
+Transitions come from #TRANSITIONS, (state, event) -> state. Events are named after the Game
+methods which cause them. Game itself still moves between the state objects of module states,
+whose every move is one of TRANSITIONS. #StateMachine follows a game through its events without
+allocating state objects or notifying anyone, e.g. for searches and simulations:
+
+    machine = StateMachine()
+    machine.fire(START_PREGAME)
+    machine.fire(PLACE_SETTLEMENT)
+    machine.can(CAN_PLACE_ROAD)  # True
+
+Masks match the can_do_xyz() methods of the corresponding classes in module states, quirks
+included: e.g. GameStateMoveRobber does not override can_play_year_of_plenty().
+"""
+import catan.pieces
+import catan.states
+
+# states
+(NOT_IN_GAME, NOT_IN_GAME_MOVING_ROBBER,
+ PREGAME_PLACE_SETTLEMENT, PREGAME_PLACE_ROAD,
+ PREGAME_PLACING_SETTLEMENT, PREGAME_PLACING_ROAD, PREGAME_PLACING_CITY,
+ BEGIN_TURN, MOVING_ROBBER, MOVING_ROBBER_KNIGHT, STEALING, STEALING_KNIGHT, DURING_TURN,
+ PLACING_SETTLEMENT, PLACING_ROAD, PLACING_CITY, PLACING_ROAD_BUILDER) = range(17)
+STATES = ['not_in_game', 'not_in_game_moving_robber',
+          'pregame_place_settlement', 'pregame_place_road',
+          'pregame_placing_settlement', 'pregame_placing_road', 'pregame_placing_city',
+          'begin_turn', 'moving_robber', 'moving_robber_knight', 'stealing', 'stealing_knight', 'during_turn',
+          'placing_settlement', 'placing_road', 'placing_city', 'placing_road_builder']
+
+# capabilities, one bit each, in the order of CAPABILITIES
+CAPABILITIES = ['roll', 'move_robber', 'steal', 'buy_road', 'buy_settlement', 'buy_city', 'buy_dev_card',
+                'trade', 'place_road', 'place_settlement', 'place_city', 'play_knight', 'play_monopoly',
+                'play_year_of_plenty', 'play_road_builder', 'play_victory_point', 'end_turn',
+                'in_game', 'in_pregame']
+(CAN_ROLL, CAN_MOVE_ROBBER, CAN_STEAL, CAN_BUY_ROAD, CAN_BUY_SETTLEMENT, CAN_BUY_CITY, CAN_BUY_DEV_CARD,
+ CAN_TRADE, CAN_PLACE_ROAD, CAN_PLACE_SETTLEMENT, CAN_PLACE_CITY, CAN_PLAY_KNIGHT, CAN_PLAY_MONOPOLY,
+ CAN_PLAY_YEAR_OF_PLENTY, CAN_PLAY_ROAD_BUILDER, CAN_PLAY_VICTORY_POINT, CAN_END_TURN,
+ IN_GAME, IN_PREGAME) = (1 << i for i in range(len(CAPABILITIES)))
+
+# turn flags
+ROLLED = 1
+DEV_CARD_PLAYED = 2
+_FLAGS = 4
+
+# events
+(START, START_PREGAME, BEGIN_MOVING_ROBBER, ROLL, ROLL_SEVEN, MOVE_ROBBER, STEAL,
+ BEGIN_PLACING_SETTLEMENT, BEGIN_PLACING_ROAD, BEGIN_PLACING_CITY,
+ PLACE_SETTLEMENT, PLACE_ROAD, PLACE_CITY, BUY_DEV_CARD, TRADE,
+ PLAY_KNIGHT, PLAY_MONOPOLY, PLAY_YEAR_OF_PLENTY, PLAY_VICTORY_POINT,
+ BEGIN_ROAD_BUILDER, PLAY_ROAD_BUILDER, END_TURN, END_PREGAME, END) = range(24)
+EVENTS = ['start', 'start_pregame', 'begin_moving_robber', 'roll', 'roll_seven', 'move_robber', 'steal',
+          'begin_placing_settlement', 'begin_placing_road', 'begin_placing_city',
+          'place_settlement', 'place_road', 'place_city', 'buy_dev_card', 'trade',
+          'play_knight', 'play_monopoly', 'play_year_of_plenty', 'play_victory_point',
+          'begin_road_builder', 'play_road_builder', 'end_turn', 'end_pregame', 'end']
+
+# when a capability holds, per state
+_ALWAYS, _IF_ROLLED, _UNLESS_ROLLED, _IF_DEV, _IF_ROLLED_DEV = range(5)
+
+# as states.GameStateInGame
+_IN_GAME = {
+    IN_GAME: _ALWAYS,
+    CAN_ROLL: _UNLESS_ROLLED,
+    CAN_BUY_ROAD: _IF_ROLLED,
+    CAN_BUY_SETTLEMENT: _IF_ROLLED,
+    CAN_BUY_CITY: _IF_ROLLED,
+    CAN_BUY_DEV_CARD: _IF_ROLLED,
+    CAN_TRADE: _IF_ROLLED,
+    CAN_PLAY_KNIGHT: _IF_DEV,
+    CAN_PLAY_MONOPOLY: _IF_ROLLED_DEV,
+    CAN_PLAY_YEAR_OF_PLENTY: _IF_ROLLED_DEV,
+    CAN_PLAY_ROAD_BUILDER: _IF_ROLLED_DEV,
+    CAN_PLAY_VICTORY_POINT: _ALWAYS,
+}
+# as states.GameStatePreGame
+_PREGAME = {IN_GAME: _ALWAYS, IN_PREGAME: _ALWAYS, CAN_PLAY_YEAR_OF_PLENTY: _IF_ROLLED_DEV}
+# as states.GameStateMoveRobber and GameStateSteal
+_ROBBER = {IN_GAME: _ALWAYS, CAN_PLAY_YEAR_OF_PLENTY: _IF_ROLLED_DEV, CAN_PLAY_VICTORY_POINT: _ALWAYS}
+# as states.GameStatePlacingPiece
+_PLACING = {IN_GAME: _ALWAYS, CAN_ROLL: _UNLESS_ROLLED, CAN_PLAY_YEAR_OF_PLENTY: _IF_ROLLED_DEV,
+            CAN_PLAY_VICTORY_POINT: _ALWAYS}
+
+_CONDITIONS = {
+    NOT_IN_GAME: {},
+    NOT_IN_GAME_MOVING_ROBBER: {CAN_MOVE_ROBBER: _ALWAYS},
+    PREGAME_PLACE_SETTLEMENT: {**_PREGAME, CAN_BUY_SETTLEMENT: _ALWAYS},
+    PREGAME_PLACE_ROAD: {**_PREGAME, CAN_BUY_ROAD: _ALWAYS},
+    PREGAME_PLACING_SETTLEMENT: {**_PREGAME, CAN_PLACE_SETTLEMENT: _ALWAYS},
+    PREGAME_PLACING_ROAD: {**_PREGAME, CAN_PLACE_ROAD: _ALWAYS},
+    PREGAME_PLACING_CITY: {**_PREGAME, CAN_PLACE_CITY: _ALWAYS},
+    BEGIN_TURN: _IN_GAME,
+    MOVING_ROBBER: {**_ROBBER, CAN_MOVE_ROBBER: _ALWAYS},
+    MOVING_ROBBER_KNIGHT: {**_ROBBER, CAN_MOVE_ROBBER: _ALWAYS},
+    STEALING: {**_ROBBER, CAN_STEAL: _ALWAYS},
+    STEALING_KNIGHT: {**_ROBBER, CAN_STEAL: _ALWAYS},
+    DURING_TURN: {**_IN_GAME, CAN_END_TURN: _ALWAYS},
+    PLACING_SETTLEMENT: {**_PLACING, CAN_PLACE_SETTLEMENT: _ALWAYS},
+    PLACING_ROAD: {**_PLACING, CAN_PLACE_ROAD: _ALWAYS},
+    PLACING_CITY: {**_PLACING, CAN_PLACE_CITY: _ALWAYS},
+    PLACING_ROAD_BUILDER: {**_PLACING, CAN_PLACE_ROAD: _ALWAYS},
+}
+
+
+def _holds(condition, flags):
+    rolled = bool(flags & ROLLED)
+    dev = not flags & DEV_CARD_PLAYED
+    return (condition == _ALWAYS or
+            condition == _IF_ROLLED and rolled or
+            condition == _UNLESS_ROLLED and not rolled or
+            condition == _IF_DEV and dev or
+            condition == _IF_ROLLED_DEV and rolled and dev)
+
+
+# capabilities, indexed by state * 4 + turn flags
+MASKS = [sum(bit for bit, condition in _CONDITIONS[state].items() if _holds(condition, flags))
+         for state in range(len(STATES)) for flags in range(_FLAGS)]
+
+_PREGAME_STATES = (PREGAME_PLACE_SETTLEMENT, PREGAME_PLACE_ROAD,
+                   PREGAME_PLACING_SETTLEMENT, PREGAME_PLACING_ROAD, PREGAME_PLACING_CITY)
+_TURN_STATES = (BEGIN_TURN, MOVING_ROBBER, MOVING_ROBBER_KNIGHT, STEALING, STEALING_KNIGHT, DURING_TURN,
+                PLACING_SETTLEMENT, PLACING_ROAD, PLACING_CITY, PLACING_ROAD_BUILDER)
+_BEGIN_PLACING = ((BEGIN_PLACING_SETTLEMENT, PLACING_SETTLEMENT, PREGAME_PLACING_SETTLEMENT),
+                  (BEGIN_PLACING_ROAD, PLACING_ROAD, PREGAME_PLACING_ROAD),
+                  (BEGIN_PLACING_CITY, PLACING_CITY, PREGAME_PLACING_CITY))
+
+# (state, event) -> state, as the Game methods named by the events
+_TRANSITIONS = {
+    (NOT_IN_GAME, START): BEGIN_TURN,
+    (NOT_IN_GAME, START_PREGAME): PREGAME_PLACING_SETTLEMENT,
+    (NOT_IN_GAME, BEGIN_MOVING_ROBBER): NOT_IN_GAME_MOVING_ROBBER,
+    (NOT_IN_GAME_MOVING_ROBBER, MOVE_ROBBER): NOT_IN_GAME,
+    (PREGAME_PLACING_SETTLEMENT, PLACE_SETTLEMENT): PREGAME_PLACING_ROAD,
+    (PREGAME_PLACING_ROAD, PLACE_ROAD): PREGAME_PLACING_SETTLEMENT,
+    (PREGAME_PLACING_ROAD, END_PREGAME): BEGIN_TURN,
+    (BEGIN_TURN, ROLL): DURING_TURN,
+    (BEGIN_TURN, ROLL_SEVEN): MOVING_ROBBER,
+    (BEGIN_TURN, PLAY_KNIGHT): MOVING_ROBBER_KNIGHT,
+    (MOVING_ROBBER, MOVE_ROBBER): STEALING,
+    (MOVING_ROBBER_KNIGHT, MOVE_ROBBER): STEALING_KNIGHT,
+    (STEALING, STEAL): DURING_TURN,
+    (STEALING_KNIGHT, STEAL): DURING_TURN,
+    # after a knight before the roll
+    (DURING_TURN, ROLL): DURING_TURN,
+    (DURING_TURN, ROLL_SEVEN): MOVING_ROBBER,
+    (DURING_TURN, PLAY_KNIGHT): MOVING_ROBBER_KNIGHT,
+    (DURING_TURN, BEGIN_ROAD_BUILDER): PLACING_ROAD_BUILDER,
+    (DURING_TURN, END_TURN): BEGIN_TURN,
+    (PLACING_SETTLEMENT, PLACE_SETTLEMENT): DURING_TURN,
+    (PLACING_ROAD, PLACE_ROAD): DURING_TURN,
+    (PLACING_CITY, PLACE_CITY): DURING_TURN,
+    (PLACING_ROAD_BUILDER, PLACE_ROAD): PLACING_ROAD_BUILDER,
+    (PLACING_ROAD_BUILDER, PLAY_ROAD_BUILDER): DURING_TURN,
+}
+for _event, _placing, _pregame_placing in _BEGIN_PLACING:
+    for _state in _PREGAME_STATES:
+        _TRANSITIONS[_state, _event] = _pregame_placing
+    for _state in (DURING_TURN, PLACING_SETTLEMENT, PLACING_ROAD, PLACING_CITY):
+        _TRANSITIONS[_state, _event] = _placing
+# buying without placing, e.g. by agents
+for _event in (PLACE_SETTLEMENT, PLACE_ROAD, PLACE_CITY, BUY_DEV_CARD, TRADE,
+               PLAY_MONOPOLY, PLAY_YEAR_OF_PLENTY, PLAY_VICTORY_POINT):
+    _TRANSITIONS[DURING_TURN, _event] = DURING_TURN
+for _state in (BEGIN_TURN, DURING_TURN):
+    _TRANSITIONS[_state, PLAY_VICTORY_POINT] = _state
+for _state in _PREGAME_STATES + _TURN_STATES:
+    _TRANSITIONS[_state, END] = NOT_IN_GAME
+
+# next state, indexed by state * len(EVENTS) + event, -1 if the event is illegal in the state
+TRANSITIONS = [_TRANSITIONS.get((state, event), -1) for state in range(len(STATES)) for event in range(len(EVENTS))]
+
+# turn flags each event sets and clears
+_SETS = {ROLL: ROLLED, ROLL_SEVEN: ROLLED, PLAY_KNIGHT: DEV_CARD_PLAYED, PLAY_MONOPOLY: DEV_CARD_PLAYED,
+         PLAY_YEAR_OF_PLENTY: DEV_CARD_PLAYED, PLAY_VICTORY_POINT: DEV_CARD_PLAYED,
+         PLAY_ROAD_BUILDER: DEV_CARD_PLAYED}
+_CLEARS = {START: ROLLED | DEV_CARD_PLAYED, START_PREGAME: ROLLED | DEV_CARD_PLAYED,
+           END_TURN: ROLLED | DEV_CARD_PLAYED, END_PREGAME: ROLLED | DEV_CARD_PLAYED}
+SETS = [_SETS.get(event, 0) for event in range(len(EVENTS))]
+CLEARS = [_CLEARS.get(event, 0) for event in range(len(EVENTS))]
+
+
+def names(mask):
+    """
+    :param mask: int, capability bits
+    :return: list of capability names, see CAPABILITIES
+    """
+    return [name for i, name in enumerate(CAPABILITIES) if mask >> i & 1]
+
+
+_STATE_TYPES = {
+    catan.states.GameStateNotInGame: NOT_IN_GAME,
+    catan.states.GameStateNotInGameMoveRobber: NOT_IN_GAME_MOVING_ROBBER,
+    catan.states.GameStatePreGamePlaceSettlement: PREGAME_PLACE_SETTLEMENT,
+    catan.states.GameStatePreGamePlaceRoad: PREGAME_PLACE_ROAD,
+    catan.states.GameStateBeginTurn: BEGIN_TURN,
+    catan.states.GameStateMoveRobber: MOVING_ROBBER,
+    catan.states.GameStateMoveRobberUsingKnight: MOVING_ROBBER_KNIGHT,
+    catan.states.GameStateSteal: STEALING,
+    catan.states.GameStateStealUsingKnight: STEALING_KNIGHT,
+    catan.states.GameStateDuringTurnAfterRoll: DURING_TURN,
+    catan.states.GameStatePlacingRoadBuilderPieces: PLACING_ROAD_BUILDER,
+}
+_PIECE_STATES = {
+    catan.states.GameStatePreGamePlacingPiece: {
+        catan.pieces.PieceType.settlement: PREGAME_PLACING_SETTLEMENT,
+        catan.pieces.PieceType.road: PREGAME_PLACING_ROAD,
+        catan.pieces.PieceType.city: PREGAME_PLACING_CITY,
+    },
+    catan.states.GameStatePlacingPiece: {
+        catan.pieces.PieceType.settlement: PLACING_SETTLEMENT,
+        catan.pieces.PieceType.road: PLACING_ROAD,
+        catan.pieces.PieceType.city: PLACING_CITY,
+    },
+}
+
+
+def state_id(game_state):
+    """
+    :param game_state: states.GameState
+    :return: int, the corresponding state, see STATES
+    """
+    state = _STATE_TYPES.get(type(game_state))
+    if state is None:
+        state = _PIECE_STATES[type(game_state)][game_state.piece_type]
+    return state
+
+
+def turn_flags(game):
+    """
+    :param game: Game
+    :return: int, ROLLED and DEV_CARD_PLAYED bits of the game's current turn
+    """
+    flags = 0
+    if game.last_player_to_roll is not None and game.last_player_to_roll == game.get_cur_player():
+        flags |= ROLLED
+    if game.dev_card_state is not None and not game.dev_card_state.can_play_dev_card():
+        flags |= DEV_CARD_PLAYED
+    return flags
+
+
+def capabilities(game):
+    """
+    :param game: Game
+    :return: int, capability bits of the game's current state, see CAPABILITIES
+    """
+    return MASKS[state_id(game.state) * _FLAGS + turn_flags(game)]
+
+
+class StateMachine(object):
+    """
+    class StateMachine represents a game's state as ints: the state, see STATES, and the turn
+    flags. Events move it along TRANSITIONS.
+    """
+    __slots__ = ('state', 'flags', 'mask')
+
+    def __init__(self, state=NOT_IN_GAME, flags=0):
+        """
+        :param state: int, see STATES
+        :param flags: int, ROLLED and DEV_CARD_PLAYED bits
+        """
+        self.state = state
+        self.flags = flags
+        self.mask = MASKS[state * _FLAGS + flags]
+
+    @classmethod
+    def from_game(cls, game):
+        return cls(state_id(game.state), turn_flags(game))
+
+    def can(self, capability):
+        """
+        :param capability: int, a capability bit, e.g. CAN_ROLL
+        :return: Boolean
+        """
+        return self.mask & capability != 0
+
+    def next_state(self, event):
+        """
+        :param event: int, see EVENTS
+        :return: int, the state the event leads to, -1 if it is illegal here
+        """
+        return TRANSITIONS[self.state * len(EVENTS) + event]
+
+    def fire(self, event):
+        """
+        Move along the transition of an event.
+
+        :param event: int, see EVENTS
+        :return: int, the new state
+        """
+        state = TRANSITIONS[self.state * len(EVENTS) + event]
+        if state < 0:
+            raise ValueError('Illegal event={} in state={}'.format(EVENTS[event], STATES[self.state]))
+        self.state = state
+        self.flags = (self.flags & ~CLEARS[event]) | SETS[event]
+        self.mask = MASKS[state * _FLAGS + self.flags]
+        return state
+
+    def copy(self):
+        return StateMachine(self.state, self.flags)
+
+    def __eq__(self, other):
+        return isinstance(other, StateMachine) and (self.state, self.flags) == (other.state, other.flags)
+
+    def __hash__(self):
+        return hash((self.state, self.flags))
+
+    def __repr__(self):
+        return '<StateMachine state={}, flags={}, capabilities={}>'.format(
+            STATES[self.state], self.flags, names(self.mask))
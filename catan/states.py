@@ -19,11 +19,11 @@ e.g.
     # class Game
     def steal(self, victim):
         if victim is None:
-            victim = Player(1, 'nobody', 'nobody')
+            victim = NOBODY
         self.state.steal(victim)
     # class GameStateSteal
     def steal(self, victim):
-        self.game.catanlog.log_robber(
+        self.game.catanlog.log_moves_robber_and_steals(
             self.game.get_cur_player(),
             self.game.robber_tile,
             victim
@@ -49,7 +49,14 @@ e.g.
     else:
         tradingUI.hide()
 
-Any new state capabilities must be named like can_do_xyz() and must return True or False.
+Capabilities can also be read all at once, as bits, see module statemachine.
+
+e.g.
+    if game.capabilities() & statemachine.CAN_TRADE:
+        tradingUI.show()
+
+Any new state capabilities must be named like can_do_xyz() and must return True or False,
+and be added to the tables of module statemachine.
 When a GameState subclass doesn't implement can_do_xyz2(), the method call will be caught in
 GameState.__getattr__. The method call will be ignored and None will be returned instead.
 
@@ -58,9 +65,15 @@ If the method does not look like can_do_xyz(), it will be logged.
 """
 import logging
 import hexgrid
+import catan.notifications
 import catan.pieces
 
 
+def _return_none(*args):
+    """Stands in for methods a GameState doesn't have, see GameState.__getattr__"""
+    return None
+
+
 class GameState(object):
     """
     class GameState is the base game state. All game states inherit from GameState.
@@ -86,12 +99,10 @@ class GameState(object):
 
         source: http://stackoverflow.com/a/2405617/1817465
         """
-        def method(*args):
-            return None
         if 'can_' not in name:
             # can_do_xyz methods are ok to return None if not implemented
             logging.debug('Method {0} not found'.format(name))
-        return method
+        return _return_none
 
     def is_in_game(self):
         """
@@ -196,8 +207,7 @@ class GameStateInGame(GameState):
 
         :return Player
         """
-        print('next_player method in GSIG')
-        logging.warning('turn={}, players={}'.format(
+        logging.debug('turn={}, players={}'.format(
             self.game._cur_turn,
             self.game.players
         ))
@@ -359,7 +369,7 @@ class GameStateInGame(GameState):
 
         :return Boolean
         """
-        raise NotImplemented()
+        raise NotImplementedError()
 
 
 class GameStatePreGame(GameStateInGame):
@@ -389,15 +399,15 @@ class GameStatePreGame(GameStateInGame):
 
     def next_player(self):
         # print('*****\next_player in GSPreGame\n*****')
-        snake = self.game.players.copy()
-        snake += list(reversed(snake))
-        try:
-            # print('****************************\nnext player={}\n*******************************'
-                # .format(snake[self.game._cur_turn + 1]))
-            return snake[self.game._cur_turn + 1]
-        except IndexError:
-            self.game.set_state(GameStateBeginTurn(self.game))
-            return self.game.state.next_player()
+        # snake draft: seats in order, then in reverse
+        players = self.game.players
+        turn = self.game._cur_turn + 1
+        if turn < len(players):
+            return players[turn]
+        if turn < 2 * len(players):
+            return players[2 * len(players) - 1 - turn]
+        self.game.set_state(GameStateBeginTurn(self.game))
+        return self.game.state.next_player()
 
     def begin_turn(self):
         # print('*****\nbegin_turn in GSPreGame\n*****')
@@ -424,10 +434,10 @@ class GameStatePreGame(GameStateInGame):
         return False
 
     def can_buy_road(self):
-        raise NotImplemented()
+        raise NotImplementedError()
 
     def can_buy_settlement(self):
-        raise NotImplemented()
+        raise NotImplementedError()
 
     def can_buy_city(self):
         """No cities in the pregame"""
@@ -542,7 +552,10 @@ class GameStateBeginTurn(GameStateInGame):
         return False
 
     def can_end_game(self):
-        return True
+        """
+        Unless the game plays regular turns, it ends when the pregame ends.
+        """
+        return self.game.options.get('turns') != 'on'
 
 
 class GameStateMoveRobber(GameStateInGame):
@@ -627,7 +640,7 @@ class GameStateSteal(GameStateInGame):
         return True
 
     def steal(self, victim):
-        self.game.catanlog.log_robber(
+        self.game.catanlog.log_moves_robber_and_steals(
             self.game.get_cur_player(),
             hexgrid.location(hexgrid.TILE, self.game.robber_tile),
             victim
@@ -791,9 +804,8 @@ class GameStatePlacingRoadBuilderPieces(GameStatePlacingPiece):
                 self.__class__.__name__,
                 self.piece_type
             ))
-        piece = catan.pieces.Piece(catan.pieces.PieceType.road, self.game.get_cur_player())
-        self.game.board.place_piece(piece, edge)
-        self.edges.append(edge)
+        self.game.build_free_road(edge)
+        self.edges = self.edges + [edge]
         if len(self.edges) == 2:
             self.game.play_road_builder(self.edges[0], self.edges[1])
             self.game.set_state(GameStateDuringTurnAfterRoll(self.game))
@@ -804,7 +816,7 @@ class DevCardPlayabilityState(object):
         self.game = game
 
     def can_play_dev_card(self):
-        raise NotImplemented()
+        raise NotImplementedError()
 
 
 class DevCardNotPlayedState(DevCardPlayabilityState):
@@ -822,7 +834,7 @@ class BoardState(object):
         self.board = board
 
     def modifiable(self):
-        raise NotImplemented()
+        raise NotImplementedError()
 
 
 class BoardStateModifiable(BoardState):
@@ -0,0 +1,199 @@
+"""
+module symmetry provides the twelve symmetries of the catan board, and a canonical board encoding.
+
+The standard board is a hexagon of hexagons, so it is unchanged by six rotations and
+by a reflection, giving twelve symmetries in total. Two boards which differ only by
+one of those symmetries play identically, so anything which is expensive to compute
+per board (scores, opening analyses) should be keyed by the canonical encoding.
+
+A symmetry is identified by an integer on [0,12). Symmetry 0 is the identity.
+Symmetry s reflects the board if s >= 6, then rotates it (s % 6) ticks counter-clockwise.
+
+Use #canonical_encoding to get the canonical string for a board, and the symmetry
+which maps the board onto it.
+
+Use #canonical_hash for a short, fixed-length key derived from the canonical encoding.
+
+Use #tile_map, #node_map, #edge_map and #direction_map to map locations between a board
+and its canonical form.
+"""
+import hashlib
+import hexgrid
+
+NUM_SYMMETRIES = 12
+
+# Tile coordinate of the centre tile, which every symmetry leaves in place.
+_CENTRE = 0x77
+
+_edge_reflection = {
+    'NW': 'SW', 'SW': 'NW',
+    'NE': 'SE', 'SE': 'NE',
+    'E': 'E', 'W': 'W',
+}
+
+_node_reflection = {
+    'N': 'S', 'S': 'N',
+    'NE': 'SE', 'SE': 'NE',
+    'NW': 'SW', 'SW': 'NW',
+}
+
+
+def _transform_tile_coord(coord, symmetry):
+    """
+    Tile coordinates are spaced two apart on each hex digit. Relative to the centre tile,
+    (a, b) = (dx/2, dy/2) counts steps to the SE and to the NE. In that basis a reflection
+    swaps a and b, and one counter-clockwise rotation maps (a, b) to (a - b, a).
+    """
+    a = (hexgrid.hex_digit(coord, 1) - hexgrid.hex_digit(_CENTRE, 1)) // 2
+    b = (hexgrid.hex_digit(coord, 2) - hexgrid.hex_digit(_CENTRE, 2)) // 2
+    if symmetry >= 6:
+        a, b = b, a
+    for _ in range(symmetry % 6):
+        a, b = a - b, a
+    return hexgrid.coord_from_hex_digits(hexgrid.hex_digit(_CENTRE, 1) + 2*a,
+                                         hexgrid.hex_digit(_CENTRE, 2) + 2*b)
+
+
+def _transform_direction(hexgrid_type, direction, symmetry):
+    if symmetry >= 6:
+        if hexgrid_type == hexgrid.NODE:
+            direction = _node_reflection[direction]
+        else:
+            direction = _edge_reflection[direction]
+    for _ in range(symmetry % 6):
+        direction = hexgrid.rotate_direction(hexgrid_type, direction, ccw=True)
+    return direction
+
+
+def _location_of(hexgrid_type, coord):
+    """
+    Return any (tile_id, direction) pair which names the given node or edge coordinate.
+    """
+    for tile_id in sorted(hexgrid.legal_tile_ids()):
+        offset = coord - hexgrid.tile_id_to_coord(tile_id)
+        if hexgrid_type == hexgrid.NODE and offset in hexgrid._tile_node_offsets:
+            return tile_id, hexgrid._tile_node_offsets[offset]
+        if hexgrid_type == hexgrid.EDGE and offset in hexgrid._tile_edge_offsets:
+            return tile_id, hexgrid._tile_edge_offsets[offset]
+    raise ValueError('No tile touches coord={}'.format(hex(coord)))
+
+
+def _build_maps():
+    tile_maps, node_maps, edge_maps = list(), list(), list()
+    for symmetry in range(NUM_SYMMETRIES):
+        tile_maps.append({
+            tile_id: hexgrid.tile_id_from_coord(_transform_tile_coord(hexgrid.tile_id_to_coord(tile_id), symmetry))
+            for tile_id in hexgrid.legal_tile_ids()
+        })
+        nodes = dict()
+        for node in hexgrid.legal_node_coords():
+            tile_id, direction = _location_of(hexgrid.NODE, node)
+            nodes[node] = hexgrid.node_coord_in_direction(
+                tile_maps[symmetry][tile_id],
+                _transform_direction(hexgrid.NODE, direction, symmetry))
+        node_maps.append(nodes)
+        edges = dict()
+        for edge in hexgrid.legal_edge_coords():
+            tile_id, direction = _location_of(hexgrid.EDGE, edge)
+            edges[edge] = hexgrid.edge_coord_in_direction(
+                tile_maps[symmetry][tile_id],
+                _transform_direction(hexgrid.EDGE, direction, symmetry))
+        edge_maps.append(edges)
+    return tile_maps, node_maps, edge_maps
+
+
+_tile_maps, _node_maps, _edge_maps = _build_maps()
+
+
+def tile_map(symmetry):
+    """
+    :param symmetry: int on [0,12)
+    :return: dict mapping tile_id -> tile_id under the symmetry
+    """
+    return _tile_maps[symmetry]
+
+
+def node_map(symmetry):
+    """
+    :param symmetry: int on [0,12)
+    :return: dict mapping node coord -> node coord under the symmetry
+    """
+    return _node_maps[symmetry]
+
+
+def edge_map(symmetry):
+    """
+    :param symmetry: int on [0,12)
+    :return: dict mapping edge coord -> edge coord under the symmetry
+    """
+    return _edge_maps[symmetry]
+
+
+def direction_map(hexgrid_type, direction, symmetry):
+    """
+    :param hexgrid_type: hexgrid.NODE or hexgrid.EDGE
+    :param direction: direction, str
+    :param symmetry: int on [0,12)
+    :return: the direction after applying the symmetry, str
+    """
+    return _transform_direction(hexgrid_type, direction, symmetry)
+
+
+def inverse(symmetry):
+    """
+    Return the symmetry which undoes the given symmetry.
+    """
+    if symmetry >= 6:
+        return symmetry
+    return (6 - symmetry) % 6
+
+
+def encode(tiles, ports, symmetry=0):
+    """
+    Encode a board as a string, after applying the given symmetry.
+
+    The encoding is the short-form board string accepted by boardbuilder (terrain codes, then
+    numbers, in tile id order), followed by a '|' and the ports sorted by tile id and direction.
+
+    :param tiles: list(catan.board.Tile)
+    :param ports: list(catan.board.Port)
+    :param symmetry: int on [0,12)
+    :return: str
+    """
+    tiles_by_id = {_tile_maps[symmetry][tile.tile_id]: tile for tile in tiles}
+    ordered = [tiles_by_id[tile_id] for tile_id in sorted(tiles_by_id)]
+    port_strs = sorted('{}({} {})'.format(port.type.value,
+                                          _tile_maps[symmetry][port.tile_id],
+                                          _transform_direction(hexgrid.EDGE, port.direction, symmetry))
+                       for port in ports
+                       if port.type.value != 'none')
+    return '{} {} | {}'.format(' '.join(tile.terrain.short_form() for tile in ordered),
+                               ' '.join(str(tile.number.value) for tile in ordered),
+                               ' '.join(port_strs))
+
+
+def canonical_encoding(board):
+    """
+    Return the lexicographically smallest encoding of the board over all twelve symmetries.
+
+    :param board: catan.board.Board
+    :return: (encoding, symmetry) where symmetry maps the board onto its canonical form
+    """
+    encodings = [(encode(board.tiles, board.ports, symmetry), symmetry)
+                 for symmetry in range(NUM_SYMMETRIES)]
+    return min(encodings)
+
+
+def canonical_hash(board):
+    """
+    Return a short key for the board which is equal for all boards with the same canonical encoding.
+
+    :param board: catan.board.Board
+    :return: hex digest, str
+    """
+    encoding, _ = canonical_encoding(board)
+    return hash_encoding(encoding)
+
+
+def hash_encoding(encoding):
+    return hashlib.sha1(encoding.encode('utf8')).hexdigest()[:16]
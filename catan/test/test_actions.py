@@ -0,0 +1,66 @@
+import random
+import unittest
+
+import numpy as np
+
+from catan import actions, agents, boardbuilder
+from catan.game import Game, Player
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+def _game(seed, undo='off'):
+    random.seed(seed)
+    game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}), logging='off',
+                undo=undo, turns='on', max_turns=80)
+    game.start(_players())
+    return game
+
+
+class TestActions(unittest.TestCase):
+
+    def test_tuples_round_trip(self):
+        for action in range(actions.size(4)):
+            self.assertEqual(actions.from_tuple(actions.to_tuple(action)), action)
+
+    def test_mask_is_agents_legal_actions(self):
+        for seed in range(3):
+            game = _game(seed)
+            rng = random.Random(seed)
+            while game.state.is_in_game():
+                legal = game.legal_actions()
+                self.assertEqual(sorted(actions.encode(game, a) for a in agents.legal_actions(game)), legal.tolist())
+                for action in legal:
+                    self.assertEqual(actions.encode(game, actions.decode(game, action)), action)
+                game.apply_action(int(legal[rng.randrange(len(legal))]))
+
+    def test_mask_after_undo(self):
+        game = _game(4, undo='on')
+        rng = random.Random(4)
+        masks = list()
+        while game.state.is_in_game() and len(masks) < 300:
+            masks.append(game.action_mask())
+            legal = game.legal_actions()
+            done = len(game.undo_manager._undo_stack)
+            game.apply_action(int(legal[rng.randrange(len(legal))]))
+            masks[-1] = (masks[-1], len(game.undo_manager._undo_stack) - done)
+        for mask, commands in reversed(masks):
+            for _ in range(commands):
+                game.undo()
+            np.testing.assert_array_equal(game.action_mask(), mask)
+
+    def test_apply_action_rejects(self):
+        game = _game(5)
+        illegal = np.flatnonzero(~game.action_mask())[0]
+        for action in (illegal, -1, actions.size(4), actions.size(4) + 100):
+            with self.assertRaises(ValueError):
+                game.apply_action(int(action))
+        with self.assertRaises(ValueError):
+            game.apply_action(-1, check=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
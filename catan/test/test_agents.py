@@ -0,0 +1,93 @@
+import random
+import unittest
+
+from catan import agents, boardbuilder
+from catan.game import Game, Player
+
+
+def _players(*names):
+    return [Player(seat, name, color) for seat, name, color in zip(range(1, 5), names, ('red', 'blue', 'orange', 'green'))]
+
+
+def _game(seed, players, max_turns=200):
+    random.seed(seed)
+    game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}), logging='off', undo='off',
+                turns='on', max_turns=max_turns, agent_turns='off')
+    game.start(players)
+    return game
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_names(self):
+        self.assertIs(agents.get('agent1'), agents.RandomAgent)
+        self.assertIs(agents.get('agent2'), agents.BestAgent)
+        self.assertTrue({'randomagent', 'bestagent', 'mctsagent', 'qlearn'} <= set(agents.registered()))
+        with self.assertRaises(KeyError):
+            agents.get('nobody')
+        with self.assertRaises(ValueError):
+            agents.register('agent1')(agents.BestAgent)
+
+    def test_players_are_played_by_their_name(self):
+        game = _game(0, _players('agent1', 'agent2', 'ross', 'xagent1'))
+        played = [game.get_agent(player) for player in game.players]
+        self.assertIsInstance(played[0], agents.RandomAgent)
+        self.assertIsInstance(played[1], agents.BestAgent)
+        self.assertEqual(played[2:], [None, None])
+        self.assertIs(game.get_agent(game.players[0]), played[0])
+        game.set_agent(game.players[2], agents.BestAgent())
+        self.assertIsInstance(game.get_agent(game.players[2]), agents.BestAgent)
+        game.set_agent(game.players[0], None)
+        self.assertIsNone(game.get_agent(game.players[0]))
+
+
+class TestDrive(unittest.TestCase):
+
+    def test_drive_plays_every_game_out(self):
+        players = _players('agent1', 'agent2', 'agent1', 'agent2')
+        games = [_game(seed, players) for seed in range(6)]
+        for game in games:
+            game.options['agent_turns'] = 'on'
+        self.assertGreater(agents.drive(games), 100)
+        self.assertEqual([game.state.is_in_game() for game in games], [False] * 6)
+        self.assertEqual([game.options['agent_turns'] for game in games], ['on'] * 6)
+
+    def test_drive_stops_at_a_human(self):
+        game = _game(0, _players('ross', 'agent2', 'agent1', 'agent2'))
+        self.assertEqual(agents.drive([game]), 0)
+        self.assertEqual(game.cur_player_index(), 0)
+
+
+class TestDecideBatch(unittest.TestCase):
+
+    def test_best_agent_batch_decides_as_one_by_one(self):
+        players = _players('ross', 'josh', 'yuri', 'zach')
+        games = [_game(seed, players) for seed in range(8)]
+        agent = agents.BestAgent()
+        rng = random.Random(0)
+        decisions = 0
+        while True:
+            playing = [game for game in games if game.state.is_in_game() and agents.legal_actions(game)]
+            if not playing:
+                break
+            for game, action in zip(playing, agent.decide_batch(playing)):
+                self.assertIn(action, agents.legal_actions(game))
+                one = agent.decide(game)
+                # the same kind of action, and the same opening settlement, which is not drawn at random
+                self.assertEqual(action[0], one[0])
+                if game.state.is_in_pregame() and action[0] == 'place_settlement':
+                    self.assertEqual(action, one)
+                agents.apply(game, action if rng.random() < 0.7 else rng.choice(agents.legal_actions(game)))
+                decisions += 1
+        self.assertGreater(decisions, 1000)
+
+    def test_default_batch_is_one_by_one(self):
+        games = [_game(seed, _players('ross', 'josh', 'yuri', 'zach')) for seed in range(3)]
+        agent = agents.RandomAgent(random.Random(1))
+        one_by_one = agents.RandomAgent(random.Random(1))
+        expected = [one_by_one.decide(game) for game in games]
+        self.assertEqual(agent.decide_batch(games), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import random
+import tempfile
+import unittest
+
+from catan import boardbuilder, symmetry
+from catan.catalogue import BoardCatalogue, CatalogueEntry, fairness
+
+
+def transformed(board, s):
+    """
+    :return: a new Board, the board under symmetry s
+    """
+    entry = CatalogueEntry(None, symmetry.encode(board.tiles, board.ports, s), 0, dict(), dict())
+    result = boardbuilder.build({'board': entry.board_string()})
+    result.ports = entry.ports()
+    return result
+
+
+class TestSymmetry(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(3)
+        self.board = boardbuilder.build({'terrain': 'random', 'numbers': 'random'})
+
+    def test_canonical_form_under_every_symmetry(self):
+        encoding, s = symmetry.canonical_encoding(self.board)
+        self.assertEqual(encoding, symmetry.encode(self.board.tiles, self.board.ports, s))
+        for t in range(symmetry.NUM_SYMMETRIES):
+            other = transformed(self.board, t)
+            self.assertEqual(symmetry.canonical_encoding(other)[0], encoding, 'symmetry {}'.format(t))
+            self.assertEqual(symmetry.canonical_hash(other), symmetry.canonical_hash(self.board))
+            self.assertAlmostEqual(fairness(other.tiles), fairness(self.board.tiles))
+
+    def test_maps_are_bijections_with_inverses(self):
+        for s in range(symmetry.NUM_SYMMETRIES):
+            for get in (symmetry.tile_map, symmetry.node_map, symmetry.edge_map):
+                forward, backward = get(s), get(symmetry.inverse(s))
+                self.assertEqual(sorted(forward.values()), sorted(forward))
+                self.assertEqual({k: backward[v] for k, v in forward.items()}, {k: k for k in forward})
+
+    def test_distinct_boards_differ(self):
+        random.seed(4)
+        other = boardbuilder.build({'terrain': 'random', 'numbers': 'random'})
+        self.assertNotEqual(symmetry.canonical_hash(other), symmetry.canonical_hash(self.board))
+
+
+class TestCatalogue(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(5)
+        self.boards = [boardbuilder.build({'terrain': 'random', 'numbers': 'random'}) for _ in range(5)]
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_round_trip(self):
+        with BoardCatalogue(self.path) as catalogue:
+            keys = catalogue.add_many(self.boards)
+            key = catalogue.add(transformed(self.boards[0], 7), scores={'pips': 58})
+            self.assertEqual(key, keys[0])
+            self.assertEqual(catalogue.add_many(transformed(board, 11) for board in self.boards), keys)
+            self.assertEqual(len(catalogue), 5)
+        with BoardCatalogue(self.path) as catalogue:
+            self.assertEqual(len(catalogue), 5)
+            for board, key in zip(self.boards, keys):
+                self.assertIn(board, catalogue)
+                entry = catalogue.get(key)
+                rebuilt = boardbuilder.build({'board': entry.board_string()})
+                rebuilt.ports = entry.ports()
+                self.assertEqual(symmetry.canonical_encoding(rebuilt)[0], entry.encoding)
+                self.assertEqual(symmetry.canonical_hash(rebuilt), key)
+                self.assertAlmostEqual(entry.fairness, fairness(board.tiles))
+            self.assertEqual(catalogue.get(self.boards[0]).scores, {'pips': 58})
+
+    def test_draw_by_fairness(self):
+        with BoardCatalogue(':memory:') as catalogue:
+            with self.assertRaises(ValueError):
+                catalogue.draw()
+            catalogue.add_many(self.boards)
+            ordered = sorted(fairness(board.tiles) for board in self.boards)
+            self.assertAlmostEqual(catalogue.draw(percentile=0).fairness, ordered[0])
+            self.assertAlmostEqual(catalogue.draw(percentile=100).fairness, ordered[-1])
+            with self.assertRaises(ValueError):
+                catalogue.draw(percentile=101)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import random
+import threading
+import unittest
+
+from catan import agents, boardbuilder
+from catan.dispatch import AgentDispatcher
+from catan.game import Game, Player
+
+
+class BlockedAgent(agents.Agent):
+    """
+    Decides as BestAgent once released.
+    """
+    def __init__(self, release):
+        self.release = release
+        self.asked = 0
+
+    def decide(self, game):
+        self.asked += 1
+        self.release.wait(10)
+        return agents.BestAgent().decide(game)
+
+
+def _game(players, **options):
+    random.seed(0)
+    game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}), logging='off',
+                turns='on', **options)
+    game.set_players(players)
+    return game
+
+
+class TestDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.dispatcher = AgentDispatcher(deadline=None)
+
+    def tearDown(self):
+        self.release.set()
+        self.dispatcher.shutdown(wait=True)
+
+    def test_agents_play_a_game_out(self):
+        game = _game([Player(1, 'agent1', 'red'), Player(2, 'agent2', 'blue'), Player(3, 'agent1', 'orange')],
+                     undo='off', max_turns=30)
+        self.dispatcher.attach(game)
+        game.start(game.players)
+        game.play_agent_turn()
+        self.assertTrue(self.dispatcher.pending(game))
+        made = self.dispatcher.run(game, timeout=60)
+        self.assertFalse(game.state.is_in_game())
+        self.assertEqual(made, self.dispatcher.decisions)
+        self.assertGreater(made, 30)
+        self.assertEqual(self.dispatcher.fallbacks, 0)
+
+    def test_fallback_after_the_deadline(self):
+        self.dispatcher.deadline = 0.05
+        game = _game([Player(1, 'ross', 'red'), Player(2, 'josh', 'blue')], undo='off', max_turns=10)
+        blocked = BlockedAgent(self.release)
+        game.set_agent(game.players[0], blocked)
+        self.dispatcher.attach(game)
+        game.start(game.players)
+        game.play_agent_turn()
+        self.assertTrue(self.dispatcher.pending(game))
+        self.assertEqual(self.dispatcher.poll(timeout=5), 1)
+        self.assertEqual((self.dispatcher.fallbacks, self.dispatcher.decisions, self.dispatcher.cancelled), (1, 0, 1))
+        # the fallback placed the first settlement, and the blocked agent is asked for the road
+        self.assertTrue(game.state.is_in_pregame())
+        self.assertTrue(self.dispatcher.pending(game))
+        self.release.set()
+        self.dispatcher.run(game, timeout=10)
+        self.assertEqual(self.dispatcher.decisions, 1)
+        self.assertEqual(blocked.asked, 2)
+        self.assertEqual(game.get_cur_player(), game.players[1])
+
+    def test_undo_cancels_the_pending_decision(self):
+        game = _game([Player(1, 'ross', 'red'), Player(2, 'josh', 'blue')], undo='on', max_turns=10)
+        game.set_agent(game.players[1], BlockedAgent(self.release))
+        self.dispatcher.attach(game)
+        game.start(game.players)
+        for _ in range(2):
+            agents.apply(game, agents.BestAgent().decide(game))
+        self.assertEqual(game.get_cur_player(), game.players[1])
+        self.assertTrue(self.dispatcher.pending(game))
+        game.undo()
+        self.assertEqual(game.get_cur_player(), game.players[0])
+        self.assertFalse(self.dispatcher.pending(game))
+        self.assertEqual(self.dispatcher.cancelled, 1)
+        # the abandoned decision's result is dropped when it comes
+        self.release.set()
+        self.dispatcher.executor.shutdown(wait=True)
+        self.assertEqual(self.dispatcher.poll(), 0)
+        self.assertEqual(self.dispatcher.decisions + self.dispatcher.fallbacks, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
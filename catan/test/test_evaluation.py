@@ -0,0 +1,74 @@
+import collections
+import random
+import unittest
+
+import numpy as np
+
+import hexgrid
+from catan import boardbuilder, evaluation, topology
+from catan.game import Game, Player
+from catan.pieces import PieceType
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+class TestEvaluation(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(2)
+        self.board = boardbuilder.build({'terrain': 'random', 'numbers': 'random'})
+        self.per_node = evaluation.node_resources(topology.tile_arrays(self.board.tiles)[0])
+
+    def touching(self, node):
+        """
+        :return: Counter of resource name -> tiles touching the node, looked up tile by tile
+        """
+        counts = collections.Counter()
+        for tile in self.board.tiles:
+            if tile.terrain in topology.RESOURCES and node in hexgrid.nodes_touching_tile(tile.tile_id):
+                counts[evaluation.RESOURCE_NAMES[topology.RESOURCE_INDEX[tile.terrain]]] += 1
+        return counts
+
+    def test_city_scores_double(self):
+        players = _players()
+        node = next(n for n in topology.NODES if len(self.touching(n)) == 3)
+        for piece_type, weight in ((PieceType.settlement, 1), (PieceType.city, 2)):
+            pieces = {players[0]: [(node, PieceType.settlement)]}
+            if piece_type == PieceType.city:
+                # a city's node also lists the settlement it replaced
+                pieces[players[0]].append((node, PieceType.city))
+            buildings = evaluation.buildings_from_pieces(players, pieces)
+            counters = evaluation.as_counters(players, evaluation.final_resources(buildings, self.per_node))
+            expected = collections.Counter({name: weight * n for name, n in self.touching(node).items()})
+            self.assertEqual(counters[players[0]], expected, piece_type)
+            self.assertEqual(counters[players[1]], collections.Counter())
+
+    def test_every_node_matches_its_tiles(self):
+        for node in topology.NODES:
+            row = self.per_node[topology.NODE_INDEX[node]]
+            self.assertEqual({name: int(n) for name, n in zip(evaluation.RESOURCE_NAMES, row) if n},
+                             dict(self.touching(node)), hex(node))
+
+    def test_batch_matches_each_game(self):
+        games = []
+        for seed in range(3):
+            random.seed(seed)
+            game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                        logging='off', undo='off', turns='on', max_turns=80)
+            game.start(_players())
+            rng = random.Random(seed)
+            while game.state.is_in_game():
+                legal = game.legal_actions()
+                game.apply_action(int(legal[rng.randrange(len(legal))]))
+            games.append(game)
+        batch = evaluation.evaluate_games(games)
+        for game, resources in zip(games, batch):
+            np.testing.assert_array_equal(resources, game.final_resources)
+            self.assertEqual(evaluation.as_counters(game.players, resources), game.player_to_resources)
+
+
+if __name__ == '__main__':
+    unittest.main()
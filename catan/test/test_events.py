@@ -0,0 +1,89 @@
+import random
+import threading
+import unittest
+
+from catan import boardbuilder, events
+from catan.game import Game, Player
+from catan.pieces import PieceType
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+class TestEventBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = events.EventBus()
+
+    def test_full_queue_drops_the_oldest(self):
+        sub = self.bus.subscribe(events.LogAppended, maxlen=3)
+        for i in range(5):
+            self.bus.publish(events.LogAppended, str(i))
+        self.assertEqual(sub.dropped, 2)
+        self.assertEqual(sub.poll(limit=2), [events.LogAppended('2'), events.LogAppended('3')])
+        self.bus.publish(events.LogAppended, '5')
+        self.assertEqual(sub.poll(), [events.LogAppended('4'), events.LogAppended('5')])
+        self.assertEqual(sub.dropped, 2)
+
+    def test_only_subscribed_types_are_delivered(self):
+        pieces = self.bus.subscribe(events.PiecePlaced)
+        everything = self.bus.subscribe(events.Event)
+        self.assertTrue(self.bus.subscribed(events.TurnEnded))
+        self.bus.publish(events.PiecePlaced, PieceType.road, 0x22, None)
+        self.bus.publish(events.TurnEnded, None, 3)
+        self.assertEqual(pieces.poll(), [events.PiecePlaced(PieceType.road, 0x22, None)])
+        self.assertEqual(len(everything), 2)
+        everything.close()
+        self.assertFalse(self.bus.subscribed(events.TurnEnded))
+        self.assertTrue(self.bus.subscribed(events.PiecePlaced))
+        pieces.close()
+        self.assertFalse(self.bus.subscribed(events.PiecePlaced))
+        # with no subscribers, the event is never made
+        self.bus.publish(events.LogAppended, 'unheard')
+
+    def test_handlers(self):
+        handled = list()
+        sub = self.bus.subscribe(events.LogAppended, handler=handled.append)
+        self.bus.publish(events.LogAppended, 'a')
+        self.bus.publish(events.LogAppended, 'b')
+        self.assertEqual(sub.dispatch(), 2)
+        self.assertEqual([event.text for event in handled], ['a', 'b'])
+        with self.assertRaises(ValueError):
+            self.bus.subscribe(events.LogAppended, thread=True)
+
+        done = threading.Event()
+        threaded = self.bus.subscribe(events.TurnEnded, handler=lambda event: event.turn == 9 and done.set(),
+                                      thread=True)
+        for turn in range(10):
+            self.bus.publish(events.TurnEnded, None, turn)
+        self.assertTrue(done.wait(5))
+        threaded.close(timeout=5)
+        self.assertFalse(threaded._thread.is_alive())
+
+
+class TestGameEvents(unittest.TestCase):
+
+    def test_game_publishes_pieces_and_turns(self):
+        random.seed(0)
+        game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                    logging='off', undo='off', turns='on', max_turns=40)
+        sub = game.events.subscribe(events.PiecePlaced, events.TurnEnded, maxlen=10000)
+        game.start(_players())
+        rng = random.Random(0)
+        while game.state.is_in_game():
+            legal = game.legal_actions()
+            game.apply_action(int(legal[rng.randrange(len(legal))]))
+        taken = sub.poll()
+        self.assertEqual(sub.dropped, 0)
+        self.assertEqual({type(event) for event in taken}, {events.PiecePlaced, events.TurnEnded})
+        placed = sum(piece_type != PieceType.robber for pieces in game.board.player_to_pieces.values()
+                     for _, piece_type in pieces)
+        self.assertEqual(sum(isinstance(event, events.PiecePlaced) for event in taken), placed)
+        turns = [event.turn for event in taken if isinstance(event, events.TurnEnded)]
+        self.assertEqual(turns, sorted(turns))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import random
+import unittest
+
+import numpy as np
+
+from catan import boardbuilder, snapshot
+from catan.game import Game, Player
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+class TestUndoThroughStream(unittest.TestCase):
+
+    def assertSame(self, expected, actual, message):
+        np.testing.assert_array_equal(actual.data, expected.data, message)
+        for name in snapshot._SCALARS:
+            self.assertEqual(getattr(actual, name), getattr(expected, name), '{}, {}'.format(message, name))
+
+    def assertInStep(self, game, message):
+        self.assertIs(game.stream.game, game, message)
+        self.assertSame(snapshot.GameSnapshot.from_game(game), game.stream.state_at(len(game.stream)), message)
+
+    def test_undo_redo_keep_game_and_stream_in_step(self):
+        for seed in range(4):
+            random.seed(seed)
+            game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                        logging='off', turns='on', max_turns=40, stream='on')
+            game.start(_players())
+            rng = random.Random(seed)
+            positions = [snapshot.GameSnapshot.from_game(game)]
+            while game.state.is_in_game():
+                legal = game.legal_actions()
+                game.apply_action(int(legal[rng.randrange(len(legal))]))
+                positions.append(snapshot.GameSnapshot.from_game(game))
+            self.assertEqual(len(game.stream), len(positions) - 1)
+            for step in range(len(positions) - 1, len(positions) - 31, -1):
+                game.undo()
+                message = 'seed {}, undone to {}'.format(seed, step - 1)
+                self.assertInStep(game, message)
+                self.assertSame(positions[step - 1], snapshot.GameSnapshot.from_game(game), message)
+            for step in range(len(positions) - 30, len(positions) - 20):
+                self.assertTrue(game.can_redo())
+                game.redo()
+                message = 'seed {}, redone to {}'.format(seed, step)
+                self.assertInStep(game, message)
+                self.assertSame(positions[step], snapshot.GameSnapshot.from_game(game), message)
+            # a new action forgets what was undone
+            game.undo()
+            legal = game.legal_actions()
+            game.apply_action(int(legal[-1]))
+            self.assertFalse(game.can_redo())
+            while game.state.is_in_game():
+                legal = game.legal_actions()
+                game.apply_action(int(legal[rng.randrange(len(legal))]))
+            self.assertInStep(game, 'seed {}, played on'.format(seed))
+
+    def test_undo_of_nothing(self):
+        game = Game(board=boardbuilder.build(), logging='off', stream='on')
+        game.start(_players())
+        self.assertFalse(game.can_undo())
+        with self.assertRaises(IndexError):
+            game.undo()
+        with self.assertRaises(IndexError):
+            game.redo()
+
+
+if __name__ == '__main__':
+    unittest.main()
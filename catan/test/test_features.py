@@ -0,0 +1,90 @@
+import random
+import unittest
+
+import numpy as np
+
+import hexgrid
+from catan import boardbuilder, rules, snapshot, topology
+from catan.features import FeatureExtractor, shapes
+from catan.game import Game, Player
+from catan.snapshot import GameSnapshot
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+def _game():
+    game = Game(board=boardbuilder.build({'terrain': 'preset', 'numbers': 'preset'}), logging='off', undo='off',
+                turns='on', max_turns=200)
+    game.start(_players())
+    return game
+
+
+class TestFeatures(unittest.TestCase):
+
+    def setUp(self):
+        self.extractor = FeatureExtractor(num_players=4, batch_size=8)
+
+    def test_shapes(self):
+        games = [_game() for _ in range(3)]
+        features = self.extractor.extract(games)
+        for name, shape in shapes(4):
+            self.assertEqual(features[name].shape, (3, ) + shape, name)
+            self.assertEqual(features[name].dtype, np.float32, name)
+        self.assertEqual(self.extractor.rows(3).shape, (3, self.extractor.size))
+        self.assertEqual(self.extractor.size, sum(int(np.prod(shape)) for _, shape in shapes(4)))
+        with self.assertRaises(ValueError):
+            self.extractor.extract([games[0]] * 9)
+
+    def test_default_board_at_the_start(self):
+        features = self.extractor.extract([_game()])
+        tiles = features['tiles'][0]
+        # the preset board: tile 1 is wood on a 5, tile 2 wheat on a 2, tile 3 ore on a 6,
+        # and tile 12 the desert, with the robber
+        np.testing.assert_array_equal(tiles[0], [1, 0, 0, 0, 0, 0])
+        np.testing.assert_array_equal(tiles[1], [0, 0, 1, 0, 0, 0])
+        np.testing.assert_array_equal(tiles[2], [0, 0, 0, 0, 1, 0])
+        np.testing.assert_array_equal(tiles[11], [0, 0, 0, 0, 0, 1])
+        self.assertEqual(tiles[:, 5].sum(), 1)
+        np.testing.assert_array_equal(features['pips'][0, [0, 1, 2, 11]], [4, 1, 5, 0])
+        np.testing.assert_array_equal(np.flatnonzero(features['robber'][0]), [11])
+        # tile 2's western port is 2:1 wood
+        for node in hexgrid.nodes_touching_edge(hexgrid.edge_coord_in_direction(2, 'W')):
+            np.testing.assert_array_equal(features['ports'][0, topology.NODE_INDEX[node]], [1, 0, 0, 0, 0, 0])
+        self.assertEqual(features['nodes'].sum() + features['roads'].sum() + features['hands'].sum(), 0)
+        turn = features['turn'][0]
+        states = len(snapshot.STATES)
+        np.testing.assert_array_equal(np.flatnonzero(turn[:states]), [snapshot.PREGAME_SETTLEMENT])
+        np.testing.assert_array_equal(turn[states:states + 3], [0, 0, 0])
+        np.testing.assert_array_equal(turn[states + 3:states + 6], rules.PIECE_SUPPLY)
+        np.testing.assert_array_equal(turn[states + 6:], [1, 0, 0, 0])
+
+    def test_players_rotate_to_the_current_player(self):
+        game = _game()
+        rng = random.Random(0)
+        positions = list()
+        for _ in range(160):
+            legal = game.legal_actions()
+            game.apply_action(int(legal[rng.randrange(len(legal))]))
+            positions.append(GameSnapshot.from_game(game))
+        positions = positions[-8:]
+        features = self.extractor.extract(positions)
+        self.assertGreater(len({position.cur for position in positions}), 1)
+        for i, position in enumerate(positions):
+            order = [(position.cur + k) % 4 for k in range(4)]
+            np.testing.assert_array_equal(features['hands'][i], position.hands[order])
+            np.testing.assert_array_equal(features['dev_played'][i], position.dev_played[order])
+            np.testing.assert_array_equal(features['nodes'][i, :, 1], position.buildings[order] == 2)
+            for k, p in enumerate(order):
+                np.testing.assert_array_equal(features['roads'][i, k], position.roads == p)
+            self.assertEqual(features['turn'][i, len(snapshot.STATES) + 2], position.turn)
+        # games and their snapshots give the same features
+        rows = self.extractor.rows(8).copy()
+        self.extractor.extract([positions[-1].to_game(game)])
+        np.testing.assert_array_equal(self.extractor.rows(1)[0], rows[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from catan import boardbuilder
+from catan.game import Game, Player
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+class TestPlayers(unittest.TestCase):
+
+    def test_set_players_interns_copies(self):
+        players = _players()
+        game = Game(board=boardbuilder.build(), logging='off')
+        game.set_players(players)
+        self.assertEqual(game.players, players)
+        self.assertEqual([p.id for p in game.players], [0, 1, 2, 3])
+        self.assertEqual([p.id for p in players], [None] * 4)
+        for i, player in enumerate(players):
+            self.assertIs(game.interned(player), game.players[i])
+            self.assertEqual(game.player_index(player), i)
+
+    def test_interned_players_are_shared_between_games(self):
+        first = Game(board=boardbuilder.build(), logging='off')
+        first.set_players(_players())
+        second = Game(board=boardbuilder.build(), logging='off')
+        second.set_players(first.players)
+        self.assertEqual([p is q for p, q in zip(first.players, second.players)], [True] * 4)
+
+    def test_players_reordered_get_their_own_ids(self):
+        first = Game(board=boardbuilder.build(), logging='off')
+        first.set_players(_players())
+        second = Game(board=boardbuilder.build(), logging='off')
+        second.set_players(first.players[::-1])
+        self.assertEqual([p.id for p in second.players], [0, 1, 2, 3])
+        self.assertEqual([p.id for p in first.players], [0, 1, 2, 3])
+        self.assertIs(second.interned(first.players[0]), second.players[3])
+
+    def test_hash_matches_eq(self):
+        self.assertEqual(hash(Player(1, 'ross', 'red')), hash(Player(1, 'Ross', 'Red', id=2)))
+        self.assertNotEqual(Player(1, 'ross', 'red'), Player(1, 'josh', 'blue'))
+        self.assertEqual(len({Player(1, 'ross', 'red'), Player(1, 'josh', 'blue'), Player(1, 'ross', 'red')}), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
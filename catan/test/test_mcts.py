@@ -0,0 +1,93 @@
+import random
+import unittest
+
+from catan import boardbuilder, rules, snapshot
+from catan.game import Game, Player
+from catan.mcts import MCTS
+from catan.snapshot import GameSnapshot
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+def _mid_game(seed):
+    """
+    :return: GameSnapshot of a randomly played game, after the current player has rolled
+    """
+    random.seed(seed)
+    game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                logging='off', undo='off', turns='on', max_turns=200)
+    game.start(_players())
+    rng = random.Random(seed)
+    for _ in range(60):
+        legal = game.legal_actions()
+        game.apply_action(int(legal[rng.randrange(len(legal))]))
+    while True:
+        position = GameSnapshot.from_game(game)
+        if position.state == snapshot.DURING_TURN:
+            return position
+        legal = game.legal_actions()
+        game.apply_action(int(legal[rng.randrange(len(legal))]))
+
+
+def _one_city_from_winning(seed):
+    """
+    :return: GameSnapshot where the current player has 9 points and exactly the cards for a city
+    """
+    position = _mid_game(seed)
+    p = position.cur
+    position.dev_hands[p] = 0
+    position.dev_new[p] = 0
+    position.dev_played[:, rules.VICTORY_POINT] = 0
+    position.largest_army = -1
+    position.dev_played[p, rules.VICTORY_POINT] = 9 - position.victory_points()[p]
+    position.hands[p] = [0, 0, 2, 0, 3]
+    return position
+
+
+class TestMCTS(unittest.TestCase):
+
+    def test_takes_a_forced_win(self):
+        for seed in range(3):
+            position = _one_city_from_winning(seed)
+            self.assertIn('place_city', [action[0] for action in position.legal_actions()])
+            search = MCTS(iterations=300, rng=random.Random(seed))
+            action = search.best_action(position)
+            self.assertEqual(action[0], 'place_city', 'seed {}'.format(seed))
+            won = position.apply(action)
+            self.assertEqual(won.victory_points()[position.cur], rules.VICTORY_POINTS_TO_WIN)
+            won.play(('end_turn', ))
+            self.assertFalse(won.is_in_game())
+
+    def test_tree_is_reused(self):
+        position = _mid_game(4)
+        search = MCTS(iterations=200, rng=random.Random(0))
+        action = search.search(position)[0][0]
+        child = position.apply(action)
+        node = search.table[child.position_key()]
+        earlier = node.total
+        self.assertGreater(earlier, 0)
+        stats = search.search(child)
+        self.assertIs(search.table[child.position_key()], node)
+        self.assertEqual(node.total, earlier + 200)
+        self.assertEqual(sum(n for _, n, _ in stats), node.total)
+
+    def test_table_is_pruned_to_the_latest_search(self):
+        position = _mid_game(5)
+        search = MCTS(iterations=100, max_nodes=50, rng=random.Random(0))
+        search.search(position)
+        self.assertTrue(all(node.generation == search.generation for node in search.table.values()))
+        child = position.apply(search.best_action(position))
+        search.search(child)
+        self.assertIn(child.position_key(), search.table)
+        self.assertTrue(all(node.generation == search.generation for node in search.table.values()))
+
+    def test_needs_a_budget(self):
+        with self.assertRaises(ValueError):
+            MCTS(iterations=None)
+
+
+if __name__ == '__main__':
+    unittest.main()
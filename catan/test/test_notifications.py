@@ -0,0 +1,92 @@
+import random
+import unittest
+
+from catan import boardbuilder, notifications
+from catan.game import Game, Player
+from catan.notifications import Observable
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+class Recorder(object):
+
+    def __init__(self):
+        self.seen = list()
+
+    def notify(self, observable):
+        changes = observable.changes
+        self.seen.append((set(changes.kinds), changes.count, list(changes.actions)))
+
+
+class Thing(Observable):
+
+    def __init__(self):
+        self.observers = set()
+
+    @notifications.batched
+    def move(self):
+        self.notify_observers(notifications.PIECES)
+        self.notify_observers(notifications.STATE)
+        self.notify_observers(notifications.PIECES)
+
+
+class TestBatching(unittest.TestCase):
+
+    def setUp(self):
+        self.thing = Thing()
+        self.recorder = Recorder()
+        self.thing.observers.add(self.recorder)
+
+    def test_unbatched_notifications_each_notify(self):
+        self.thing.notify_observers(notifications.LOG)
+        self.thing.notify_observers()
+        self.assertEqual(self.recorder.seen, [({notifications.LOG}, 1, []),
+                                              ({notifications.ALL}, 1, [])])
+        self.assertIn(notifications.PIECES, self.thing.changes)
+
+    def test_nested_batches_coalesce_into_one(self):
+        with self.thing.batch('turn'):
+            self.thing.move()
+            self.thing.notify_observers(notifications.LOG)
+            self.thing.move()
+            self.assertEqual(self.recorder.seen, [])
+        self.assertEqual(self.recorder.seen, [({notifications.PIECES, notifications.STATE, notifications.LOG}, 7,
+                                               ['turn', 'move', 'move'])])
+
+    def test_quiet_batches_do_not_notify(self):
+        with self.thing.batch('nothing'):
+            pass
+        self.assertEqual(self.recorder.seen, [])
+        self.thing.observers.clear()
+        self.thing.move()
+        self.assertIsNone(self.thing._pending_changes)
+        self.assertEqual(self.thing._batch_depth, 0)
+
+
+class TestGameNotifications(unittest.TestCase):
+
+    def test_one_notification_per_action(self):
+        random.seed(0)
+        game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                    logging='off', turns='on', max_turns=30)
+        recorder = Recorder()
+        game.observers.add(recorder)
+        game.start(_players())
+        rng = random.Random(0)
+        actions = coalesced = 0
+        while game.state.is_in_game():
+            recorder.seen = list()
+            legal = game.legal_actions()
+            game.apply_action(int(legal[rng.randrange(len(legal))]))
+            self.assertEqual(len(recorder.seen), 1, game.changes)
+            actions += 1
+            coalesced += recorder.seen[0][1]
+        # each action changes several things, which would each have notified unbatched
+        self.assertGreater(coalesced, 2 * actions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import random
+import unittest
+
+import numpy as np
+
+import hexgrid
+from catan import boardbuilder, topology
+from catan.board import PortType
+from catan.opening import WEIGHTS, OpeningEvaluator
+
+
+def brute_force_scores(board, buildings, player):
+    """
+    Score every node as OpeningEvaluator#node_scores documents it, one node at a time from the
+    board's tiles and ports, with None for nodes which are not open.
+    """
+    production = {node: np.zeros(topology.NUM_RESOURCES) for node in topology.NODES}
+    for tile in board.tiles:
+        if tile.terrain not in topology.RESOURCES:
+            continue
+        for node in hexgrid.nodes_touching_tile(tile.tile_id):
+            production[node][topology.RESOURCE_INDEX[tile.terrain]] += topology.DICE_PROBABILITY[tile.number.value]
+    port2 = {node: np.zeros(topology.NUM_RESOURCES) for node in topology.NODES}
+    port3 = {node: 0 for node in topology.NODES}
+    for port in board.ports:
+        for node in hexgrid.nodes_touching_edge(hexgrid.edge_coord_in_direction(port.tile_id, port.direction)):
+            if port.type == PortType.any3:
+                port3[node] = 1
+            elif port.type not in (PortType.any4, PortType.none):
+                port2[node][next(r for r, t in enumerate(topology.RESOURCES) if t.value == port.type.value)] = 1
+    taken = {topology.NODES[n] for n in np.flatnonzero(buildings.any(axis=0))}
+    own = sum((production[topology.NODES[n]] for n in np.flatnonzero(buildings[player])),
+              np.zeros(topology.NUM_RESOURCES))
+    scores = dict()
+    for node in topology.NODES:
+        neighbours = {topology.NODES[m] for m in topology.NODE_NEIGHBOURS[topology.NODE_INDEX[node]] if m >= 0}
+        if node in taken or neighbours & taken:
+            scores[node] = None
+            continue
+        made = production[node]
+        scores[node] = (WEIGHTS['production'] * made.sum() +
+                        WEIGHTS['diversity'] * (made > 0).sum() +
+                        WEIGHTS['port3'] * port3[node] +
+                        WEIGHTS['port2'] * (port2[node] * made).sum() +
+                        WEIGHTS['complement'] * made[own == 0].sum() +
+                        WEIGHTS['port2'] * (port2[node] * own).sum())
+    return scores
+
+
+class TestOpeningEvaluator(unittest.TestCase):
+
+    def test_best_placements_match_brute_force(self):
+        for seed in range(4):
+            random.seed(seed)
+            board = boardbuilder.build({'terrain': 'random', 'numbers': 'random'})
+            evaluator = OpeningEvaluator(*topology.tile_arrays(board.tiles), topology.port_arrays(board.ports))
+            rng = random.Random(seed)
+            batch = np.zeros((40, 4, topology.NUM_NODES), dtype=np.int8)
+            players = np.array([rng.randrange(4) for _ in range(40)])
+            for b in range(40):
+                for _ in range(b % 8):
+                    open_nodes = np.flatnonzero(OpeningEvaluator.open_nodes(batch[b]))
+                    batch[b, rng.randrange(4), open_nodes[rng.randrange(len(open_nodes))]] = 1
+            chosen = evaluator.best_placements(batch, players)
+            for b in range(40):
+                scores = brute_force_scores(board, batch[b], players[b])
+                best = max(score for score in scores.values() if score is not None)
+                node = topology.NODES[chosen[b]]
+                message = 'seed {}, position {}'.format(seed, b)
+                self.assertIsNotNone(scores[node], message)
+                self.assertAlmostEqual(scores[node], best, msg=message)
+                self.assertEqual(evaluator.best_placement(batch[b], players[b])[0], chosen[b], message)
+
+    def test_best_road_leads_from_the_settlement(self):
+        random.seed(1)
+        board = boardbuilder.build({'terrain': 'random', 'numbers': 'random'})
+        evaluator = OpeningEvaluator(*topology.tile_arrays(board.tiles), topology.port_arrays(board.ports))
+        buildings = np.zeros((4, topology.NUM_NODES), dtype=np.int8)
+        node, edge = evaluator.best_placement(buildings, 0)
+        self.assertIn(edge, topology.NODE_EDGES[node])
+        buildings[0, node] = 1
+        taken = [e for e in topology.NODE_EDGES[node] if e >= 0 and e != edge]
+        self.assertEqual(evaluator.best_road(buildings, 0, node, taken), edge)
+        with self.assertRaises(ValueError):
+            evaluator.best_road(buildings, 0, node, [e for e in topology.NODE_EDGES[node] if e >= 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
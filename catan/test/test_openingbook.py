@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from catan import boardbuilder, openingbook, symmetry, topology
+from catan.catalogue import CatalogueEntry
+from catan.opening import OpeningEvaluator
+from catan.openingbook import OpeningBook
+
+
+def transformed(board, s):
+    """
+    :return: a new Board, the board under symmetry s
+    """
+    entry = CatalogueEntry(None, symmetry.encode(board.tiles, board.ports, s), 0, dict(), dict())
+    result = boardbuilder.build({'board': entry.board_string()})
+    result.ports = entry.ports()
+    return result
+
+
+class TestOpeningBook(unittest.TestCase):
+
+    def setUp(self):
+        self.board = boardbuilder.build({'terrain': 'random', 'numbers': 'random'})
+        self.book = OpeningBook(':memory:')
+
+    def tearDown(self):
+        self.book.close()
+
+    def test_line_under_every_symmetry(self):
+        self.assertEqual(self.book.populate([self.board], processes=1, depth=1), 1)
+        line = self.book.line(self.board, 4)
+        self.assertEqual(len(line), 8)
+        for s in range(symmetry.NUM_SYMMETRIES):
+            nodes, edges = symmetry.node_map(s), symmetry.edge_map(s)
+            expected = [(player, topology.NODE_INDEX[nodes[topology.NODES[node]]],
+                         topology.EDGE_INDEX[edges[topology.EDGES[edge]]])
+                        for player, node, edge in line.placements]
+            self.assertEqual(self.book.line(transformed(self.board, s), 4).placements, expected, 'symmetry {}'.format(s))
+        # every rotation and reflection shares the one line
+        self.assertEqual(self.book.populate([transformed(self.board, s) for s in range(12)], processes=1), 0)
+        self.assertEqual(len(self.book), 1)
+
+    def test_line_is_the_search(self):
+        self.book.populate([self.board], processes=1, depth=1)
+        evaluator = OpeningEvaluator(*topology.tile_arrays(self.board.tiles), topology.port_arrays(self.board.ports))
+        self.assertEqual(self.book.line(self.board, 4).placements, openingbook.search(evaluator, 4, depth=1))
+
+    def test_contains_is_a_plain_lookup(self):
+        key, _ = openingbook.book_key(self.board, 4)
+        self.assertNotIn(key, self.book)
+        self.book.put(key, [])
+        self.assertIn(key, self.book)
+        self.assertEqual((self.book.hits, self.book.misses, len(self.book._cache)), (0, 0, 0))
+        self.assertIsNone(self.book.line(transformed(self.board, 0), 3))
+        self.assertEqual(self.book.misses, 1)
+
+    def test_deeper_search_is_a_legal_draft(self):
+        evaluator = OpeningEvaluator(*topology.tile_arrays(self.board.tiles), topology.port_arrays(self.board.ports))
+        line = openingbook.search(evaluator, 4, width=3, depth=2)
+        self.assertEqual([player for player, _, _ in line], openingbook.draft_order(4))
+        buildings = np.zeros((4, topology.NUM_NODES), dtype=np.int8)
+        for player, node, edge in line:
+            self.assertTrue(OpeningEvaluator.open_nodes(buildings)[node])
+            self.assertIn(edge, topology.NODE_EDGES[node])
+            buildings[player, node] = 1
+
+
+if __name__ == '__main__':
+    unittest.main()
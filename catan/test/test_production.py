@@ -0,0 +1,106 @@
+import random
+import unittest
+
+import numpy as np
+
+from catan import boardbuilder, production, topology
+from catan.board import Terrain
+from catan.game import Game, Player
+from catan.snapshot import GameSnapshot
+
+WHEAT, ORE = topology.RESOURCE_INDEX[Terrain.wheat], topology.RESOURCE_INDEX[Terrain.ore]
+
+
+class TestHandComputed(unittest.TestCase):
+    """
+    Tile 1 is wheat on a 6, tile 2 ore on an 8, and every other tile a desert. Player 0 has a
+    settlement touching both, and player 1 a city touching tile 1 alone.
+    """
+
+    def setUp(self):
+        self.tile_resource = np.zeros((topology.NUM_TILES, topology.NUM_RESOURCES), dtype=np.int8)
+        self.tile_resource[0, WHEAT] = self.tile_resource[1, ORE] = 1
+        self.tile_number = np.zeros(topology.NUM_TILES, dtype=np.int8)
+        self.tile_number[:2] = [6, 8]
+        touches = topology.NODE_TILES > 0
+        both = np.flatnonzero(touches[:, 0] & touches[:, 1])[0]
+        alone = np.flatnonzero(touches[:, 0] & ~touches[:, 1])[0]
+        self.buildings = np.zeros((2, topology.NUM_NODES), dtype=np.int8)
+        self.buildings[0, both] = 1
+        self.buildings[1, alone] = 2
+        self.per_roll = production.roll_production(self.buildings, self.tile_resource, self.tile_number)
+
+    def test_per_roll(self):
+        self.assertEqual(self.per_roll.shape, (13, 2, 5))
+        self.assertEqual(self.per_roll[6, 0, WHEAT], 1)
+        self.assertEqual(self.per_roll[8, 0, ORE], 1)
+        self.assertEqual(self.per_roll[6, 1, WHEAT], 2)
+        self.assertEqual(self.per_roll.sum(), 4)
+
+    def test_income(self):
+        p6 = 5 / 36
+        mean, variance = production.income(self.per_roll)
+        np.testing.assert_allclose(mean[0, [WHEAT, ORE]], [p6, p6])
+        np.testing.assert_allclose(mean[1, WHEAT], 2 * p6)
+        np.testing.assert_allclose(variance[0, WHEAT], p6 - p6 ** 2)
+        np.testing.assert_allclose(variance[1, WHEAT], 4 * p6 - (2 * p6) ** 2)
+        self.assertEqual(mean.sum(), 4 * p6)
+
+    def test_at_least(self):
+        p6 = 5 / 36
+        np.testing.assert_allclose(production.at_least(self.per_roll, 1, 1)[0, WHEAT], p6)
+        np.testing.assert_allclose(production.at_least(self.per_roll, 1, 2)[0, WHEAT], 1 - (1 - p6) ** 2)
+        np.testing.assert_allclose(production.at_least(self.per_roll, 2, 2)[0, WHEAT], p6 ** 2)
+        # three turns: two or more sixes, or exactly one
+        np.testing.assert_allclose(production.at_least(self.per_roll, 2, 3)[0, WHEAT],
+                                   3 * p6 ** 2 * (1 - p6) + p6 ** 3)
+        np.testing.assert_allclose(production.at_least(self.per_roll, 2, 1)[1, WHEAT], p6)
+        np.testing.assert_allclose(production.at_least(self.per_roll, 3, 2)[1, WHEAT], p6 ** 2)
+        self.assertEqual(production.at_least(self.per_roll, 1, 50)[0, 0], 0)
+        np.testing.assert_array_equal(production.at_least(self.per_roll, 0, 1), 1)
+
+    def test_robber(self):
+        p6 = 5 / 36
+        blocked = production.roll_production(self.buildings, self.tile_resource, self.tile_number, robber_tile=1)
+        self.assertEqual(blocked[:, :, WHEAT].sum(), 0)
+        self.assertEqual(blocked[8, 0, ORE], 1)
+        effects = production.robber_effects(self.buildings, self.tile_resource, self.tile_number)
+        np.testing.assert_allclose(effects[0, :, WHEAT], [-p6, -2 * p6])
+        np.testing.assert_allclose(effects[1, :, ORE], [-p6, 0])
+        self.assertEqual(np.abs(effects[2:]).sum(), 0)
+        # from tile 1 to tile 2: wheat comes back and ore stops
+        effects = production.robber_effects(self.buildings, self.tile_resource, self.tile_number, robber_tile=1)
+        np.testing.assert_allclose(effects[1, 0, [WHEAT, ORE]], [p6, -p6])
+        np.testing.assert_allclose(effects[1, 1, WHEAT], 2 * p6)
+        np.testing.assert_allclose(effects[0], 0)
+
+
+class TestAnalytics(unittest.TestCase):
+
+    def test_batch_and_cache(self):
+        random.seed(0)
+        game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                    logging='off', undo='off', turns='on', max_turns=40)
+        game.start([Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'), Player(3, 'yuri', 'orange')])
+        rng = random.Random(0)
+        positions = list()
+        while game.state.is_in_game():
+            legal = game.legal_actions()
+            game.apply_action(int(legal[rng.randrange(len(legal))]))
+            positions.append(GameSnapshot.from_game(game))
+        analytics = production.ProductionAnalytics(capacity=8)
+        results = analytics.positions(positions)
+        self.assertLess(analytics.misses, len(positions))
+        for position, result in list(zip(positions, results))[::10]:
+            per_roll = production.roll_production(position.buildings, position.tile_resource, position.tile_number,
+                                                  position.robber_tile)
+            np.testing.assert_allclose(result.per_roll, per_roll)
+            np.testing.assert_allclose(result.mean, production.income(per_roll)[0], atol=1e-6)
+        self.assertLessEqual(len(analytics), 8)
+        hits = analytics.hits
+        self.assertIs(analytics.position(game), results[-1])
+        self.assertEqual(analytics.hits, hits + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from catan import qlearning
+from catan.qlearning import QTable
+
+
+class TestQTable(unittest.TestCase):
+
+    def test_size_is_bounded(self):
+        table = QTable(capacity=64, probe=4)
+        rng = np.random.default_rng(0)
+        for key in qlearning._mix(rng.integers(0, 1 << 40, size=2000)):
+            table.update(key, 1.0, 0.5)
+            self.assertLessEqual(len(table), table.capacity)
+        self.assertEqual(len(table), table.capacity)
+        self.assertGreater(table.evictions, 0)
+        self.assertEqual(table.keys.shape, (64, ))
+        self.assertEqual(table.values.shape, (64, ))
+
+    def test_least_recently_updated_is_evicted(self):
+        table = QTable(capacity=64, probe=4, initial=0.5)
+        # every key has home slot 3
+        keys = np.array([3 + 64 * k for k in range(1, 6)], dtype=np.uint64)
+        for key in keys[:4]:
+            table.update(key, 1.0, 1.0)
+        table.update(keys[0], 0.0, 1.0)
+        table.update(keys[4], 1.0, 1.0)
+        self.assertEqual(table.evictions, 1)
+        np.testing.assert_array_equal(table.get(keys), [0.0, 0.5, 1.0, 1.0, 1.0])
+
+    def test_merge_moves_by_the_mean_delta(self):
+        table = QTable(capacity=64, initial=0.5)
+        table.merge(np.array([5, 5, 9], dtype=np.uint64), np.array([0.1, 0.3, -0.2]), np.array([1, 3, 2]))
+        np.testing.assert_allclose(table.get(np.array([5, 9, 13], dtype=np.uint64)), [0.7, 0.3, 0.5], rtol=1e-6)
+        self.assertEqual(int(table.updates[table.keys == 5][0]), 4)
+
+    def test_save_and_load(self):
+        table = QTable(capacity=128)
+        features = qlearning.random_board_features()
+        for _ in range(20):
+            qlearning.play_episode(table, features, rng=random.Random(0))
+        handle, path = tempfile.mkstemp(suffix='.npz')
+        os.close(handle)
+        try:
+            table.save(path)
+            loaded = QTable.load(path)
+        finally:
+            os.remove(path)
+        for name in ('keys', 'values', 'updates', 'stamps'):
+            np.testing.assert_array_equal(getattr(loaded, name), getattr(table, name))
+        self.assertEqual((loaded.probe, loaded.clock, loaded.evictions, loaded.initial),
+                         (table.probe, table.clock, table.evictions, table.initial))
+
+
+if __name__ == '__main__':
+    unittest.main()
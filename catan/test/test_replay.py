@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from catan.replay import ReplayBuffer
+
+
+def _transitions(first, n, feature_size=3):
+    """
+    Transitions numbered first.., each carrying its number in every field.
+    """
+    numbers = np.arange(first, first + n)
+    states = np.repeat(numbers[:, None], feature_size, axis=1).astype(np.float32)
+    return states, numbers, numbers * 0.5, states + 1, numbers % 2 == 0
+
+
+class TestReplayBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'replay')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def assertConsistent(self, batch):
+        numbers = batch['actions']
+        np.testing.assert_array_equal(batch['states'], np.repeat(numbers[:, None], 3, axis=1))
+        np.testing.assert_array_equal(batch['next_states'], batch['states'] + 1)
+        np.testing.assert_array_equal(batch['rewards'], numbers * 0.5)
+        np.testing.assert_array_equal(batch['dones'], numbers % 2 == 0)
+
+    def test_append_and_sample_across_reopen(self):
+        buffer = ReplayBuffer.create(self.path, capacity=32, feature_size=3, guard=4)
+        with self.assertRaises(ValueError):
+            buffer.sample(4)
+        buffer.append(*_transitions(0, 10))
+        buffer.flush()
+        del buffer
+
+        reader = ReplayBuffer.open(self.path)
+        self.assertEqual((reader.count, len(reader)), (10, 10))
+        batch = reader.sample(200, rng=np.random.default_rng(0))
+        self.assertConsistent(batch)
+        self.assertEqual(set(batch['actions']), set(range(10)))
+        with self.assertRaises(ValueError):
+            reader.append(*_transitions(10, 1))
+
+        # the writer comes back and wraps the ring; the reader sees it through the same files
+        writer = ReplayBuffer.open(self.path, writable=True)
+        writer.append(*_transitions(10, 40))
+        writer.flush()
+        self.assertEqual((reader.count, len(reader)), (50, 28))
+        batch = reader.sample(500, rng=np.random.default_rng(1))
+        self.assertConsistent(batch)
+        self.assertEqual(set(batch['actions']), set(range(22, 50)))
+
+    def test_prioritised_sampling(self):
+        buffer = ReplayBuffer.create(self.path, capacity=32, feature_size=3, alpha=1.0, guard=4)
+        buffer.append(*_transitions(0, 20), priorities=np.full(20, 1.0))
+        batch = buffer.sample_prioritised(40, rng=np.random.default_rng(0))
+        self.assertConsistent(batch)
+        np.testing.assert_allclose(batch['weights'], 1.0, rtol=1e-4)
+        buffer.update_priorities(np.array([7]), np.array([20.0]))
+        self.assertAlmostEqual(buffer.tree[1], buffer.tree[buffer._leaves:].sum())
+        batch = ReplayBuffer.open(self.path).sample_prioritised(40, rng=np.random.default_rng(0))
+        self.assertConsistent(batch)
+        # slot 7 holds 20 of the 39 total, and sampling is stratified
+        self.assertEqual((batch['actions'] == 7).sum(), 20)
+        # the likelier a transition, the smaller its importance sampling weight
+        np.testing.assert_allclose(batch['weights'][batch['actions'] != 7], 1.0, rtol=1e-4)
+        np.testing.assert_allclose(batch['weights'][batch['actions'] == 7], 20.0 ** -0.4, rtol=1e-4)
+
+    def test_guard_is_at_most_half(self):
+        with self.assertRaises(ValueError):
+            ReplayBuffer.create(self.path, capacity=32, feature_size=3, guard=17)
+
+
+if __name__ == '__main__':
+    unittest.main()
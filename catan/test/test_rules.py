@@ -0,0 +1,107 @@
+import os
+import random
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+from catan import boardbuilder, rules, topology
+from catan.game import Game, Player
+from catan.rules import RulesState
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+class TestConservation(unittest.TestCase):
+
+    def assertConserved(self, r, message):
+        self.assertTrue((r.hands >= 0).all() and (r.bank >= 0).all(), message)
+        np.testing.assert_array_equal(r.hands.sum(axis=0) + r.bank, [rules.RESOURCES_PER_TYPE] * 5, message)
+        undrawn = np.bincount(r.deck[r.deck_top:], minlength=len(rules.DEV_CARDS))
+        np.testing.assert_array_equal(undrawn + r.dev_hands.sum(axis=0) + r.dev_played.sum(axis=0),
+                                      rules.DEV_DECK_COUNTS, message)
+        self.assertTrue((r.dev_new <= r.dev_hands).all(), message)
+        placed = np.stack([(r.roads[None, :] == np.arange(r.num_players)[:, None]).sum(axis=1),
+                           (r.buildings == 1).sum(axis=1), (r.buildings == 2).sum(axis=1)], axis=1)
+        np.testing.assert_array_equal(r.supply + placed, np.tile(rules.PIECE_SUPPLY, (r.num_players, 1)), message)
+
+    def test_every_action_conserves_cards_and_pieces(self):
+        for seed in range(6):
+            random.seed(seed)
+            game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                        logging='off', undo='off', turns='on', max_turns=120)
+            game.start(_players())
+            rng = random.Random(seed)
+            step = 0
+            while game.state.is_in_game():
+                legal = game.legal_actions()
+                if not len(legal):
+                    break
+                game.apply_action(int(legal[rng.randrange(len(legal))]))
+                step += 1
+                self.assertConserved(game.rules, 'seed {}, step {}'.format(seed, step))
+
+
+class TestTransfers(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.board = boardbuilder.build({'terrain': 'random', 'numbers': 'random'})
+        self.r = RulesState(4, self.board.tiles)
+
+    def test_transfers_never_overdraw(self):
+        r = self.r
+        r.hands[0] = [1, 0, 0, 0, 0]
+        r.bank -= r.hands.sum(axis=0, dtype=np.int16)
+        r.pay(0, rules.SETTLEMENT)
+        np.testing.assert_array_equal(r.hands[0], [0] * 5)
+        self.assertEqual(int(r.bank.sum()), 5 * rules.RESOURCES_PER_TYPE)
+        self.assertIsNone(r.steal(1, 0))
+        r.bank[:] = 0
+        r.year_of_plenty(0, 2, 2)
+        np.testing.assert_array_equal(r.hands[0], [0] * 5)
+
+    def test_short_bank_pays_a_lone_claimant_what_is_left(self):
+        r = self.r
+        tile = next(t for t in self.board.tiles if t.terrain.value != 'desert')
+        resource = topology.RESOURCE_INDEX[tile.terrain]
+        nodes = np.flatnonzero(topology.NODE_TILES[:, tile.tile_id - 1])
+        r.buildings[0, nodes[0]] = 2
+        r.bank[resource] = 1
+        owed = r.production(tile.number.value)[0, resource]
+        self.assertGreaterEqual(owed, 2)
+        r.produce(tile.number.value)
+        self.assertEqual((r.hands[0, resource], r.bank[resource]), (1, 0))
+        # with a second claimant, nobody receives it
+        r.hands[0, resource], r.bank[resource] = 0, 1
+        r.buildings[1, nodes[3]] = 1
+        r.produce(tile.number.value)
+        self.assertEqual((r.hands[0, resource], r.hands[1, resource], r.bank[resource]), (0, 0, 1))
+
+    def test_discard_half_from_largest_piles(self):
+        r = self.r
+        r.hands[0] = [5, 0, 3, 1, 0]
+        r.hands[1] = [2, 2, 2, 1, 0]
+        r.bank -= r.hands.sum(axis=0, dtype=np.int16)
+        discarded = r.discard_half()
+        np.testing.assert_array_equal(discarded[0], [3, 0, 1, 0, 0])
+        np.testing.assert_array_equal(discarded[1], [0] * 5)
+        np.testing.assert_array_equal(r.hands.sum(axis=0) + r.bank, [rules.RESOURCES_PER_TYPE] * 5)
+
+
+class TestImports(unittest.TestCase):
+
+    def test_modules_import_on_their_own(self):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        for module in ('catan.board', 'catan.states', 'catan.rules', 'catan.topology', 'catan.game'):
+            result = subprocess.run([sys.executable, '-c', 'import {}'.format(module)], cwd=root,
+                                    capture_output=True, text=True)
+            self.assertEqual(result.returncode, 0, '{}: {}'.format(module, result.stderr))
+
+
+if __name__ == '__main__':
+    unittest.main()
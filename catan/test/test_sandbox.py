@@ -0,0 +1,112 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+
+from catan import agents, boardbuilder, topology
+from catan.game import Game, Player
+from catan.sandbox import AgentSandbox
+
+
+class CrashOnceAgent(agents.RandomAgent):
+    """
+    Ends its process on the first decision after the flag file is made, and plays at random otherwise.
+    """
+    def __init__(self, flag):
+        super().__init__()
+        self.flag = flag
+
+    def decide(self, game):
+        if os.path.exists(self.flag):
+            os.remove(self.flag)
+            os._exit(1)
+        return super().decide(game)
+
+
+class SlowAgent(agents.RandomAgent):
+
+    def decide(self, game):
+        time.sleep(5)
+        return super().decide(game)
+
+
+class IllegalAgent(agents.Agent):
+
+    def __init__(self, action):
+        self.action = action
+
+    def decide(self, game):
+        return self.action
+
+
+def _game(seed=0):
+    random.seed(seed)
+    game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}), logging='off', undo='off',
+                turns='on', max_turns=40, agent_turns='off')
+    game.start([Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'), Player(3, 'yuri', 'orange')])
+    return game
+
+
+class TestAgentSandbox(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.flag = tempfile.mkstemp()
+        os.close(handle)
+        os.remove(self.flag)
+        self.sandboxes = list()
+
+    def tearDown(self):
+        for sandbox in self.sandboxes:
+            sandbox.close()
+        if os.path.exists(self.flag):
+            os.remove(self.flag)
+
+    def sandbox(self, agent, **options):
+        sandbox = AgentSandbox(agent, **options)
+        self.sandboxes.append(sandbox)
+        return sandbox
+
+    def test_worker_restarts_after_a_crash(self):
+        sandbox = self.sandbox(CrashOnceAgent(self.flag), timeout=10)
+        games = [_game(seed) for seed in range(3)]
+        self.assertEqual(len(sandbox.decide_batch(games)), 3)
+        self.assertEqual((sandbox.requests, sandbox.fallbacks, sandbox.crashes), (1, 0, 0))
+        first = sandbox._process.pid
+
+        open(self.flag, 'w').close()
+        decided = sandbox.decide_batch(games)
+        self.assertEqual((sandbox.crashes, sandbox.restarts, sandbox.fallbacks), (1, 1, 3))
+        self.assertNotEqual(sandbox._process.pid, first)
+        for game, action in zip(games, decided):
+            self.assertIn(action, agents.legal_actions(game))
+
+        # the new worker is sent the boards afresh, and decides again
+        for _ in range(20):
+            for game in games:
+                agents.apply(game, sandbox.decide(game))
+        self.assertEqual((sandbox.crashes, sandbox.fallbacks), (1, 3))
+        self.assertEqual(sandbox.requests, 61)
+
+    def test_hang_and_illegal_actions_fall_back(self):
+        game = _game()
+        slow = self.sandbox(SlowAgent(), timeout=0.5)
+        self.assertIn(slow.decide(game), agents.legal_actions(game))
+        self.assertEqual((slow.hangs, slow.restarts, slow.fallbacks), (1, 1, 1))
+        # a city in the pregame, and a city on a coord which is not a node
+        for action in (('place_city', topology.NODES[0]), ('place_city', 0)):
+            illegal = self.sandbox(IllegalAgent(action))
+            self.assertIn(illegal.decide(game), agents.legal_actions(game))
+            self.assertEqual((illegal.requests, illegal.fallbacks, illegal.restarts), (1, 1, 0), action)
+
+    def test_max_requests_restarts_the_worker(self):
+        game = _game()
+        sandbox = self.sandbox('agent1', max_requests=2)
+        for _ in range(5):
+            agents.apply(game, sandbox.decide(game))
+        self.assertEqual((sandbox.requests, sandbox.restarts, sandbox.fallbacks), (5, 2, 0))
+        self.assertEqual(sandbox.stats()['round_trip']['count'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from catan.game import Player
+from catan.headless import HeadlessEngine
+from catan.selfplay import SelfPlayRunner, SelfPlaySummary
+
+
+def _players():
+    return [Player(1, 'agent1', 'red'), Player(2, 'agent2', 'blue'),
+            Player(3, 'agent1', 'orange'), Player(4, 'agent2', 'green')]
+
+
+class TestGameResult(unittest.TestCase):
+
+    def test_cut_off_game_has_no_winner(self):
+        engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'}, turns='on', max_turns=12)
+        result = engine.play(_players(), seed=3)
+        self.assertLess(max(result.victory_points), 10)
+        self.assertIsNone(result.winner)
+        self.assertIsNone(result.as_dict()['winner'])
+        self.assertEqual(result.as_dict()['leader'], result.leader.seat)
+
+    def test_finished_game_has_a_winner(self):
+        engine = HeadlessEngine({'terrain': 'random', 'numbers': 'random'}, turns='on', max_turns=1000)
+        result = engine.play(_players(), seed=3)
+        self.assertIsNotNone(result.winner)
+        self.assertGreaterEqual(result.victory_points[result.players.index(result.winner)], 10)
+        self.assertEqual(result.winner, result.leader)
+
+
+class TestSelfPlay(unittest.TestCase):
+
+    def test_summary_counts_draws(self):
+        summary = SelfPlaySummary([1, 2])
+        summary.add({'winner': 1, 'victory_points': {1: 10, 2: 4}, 'turns': 50})
+        summary.add({'winner': None, 'victory_points': {1: 7, 2: 8}, 'turns': 80})
+        self.assertEqual(summary.win_rates(), {1: 0.5, 2: 0.0})
+        self.assertEqual(summary.draw_rate(), 0.5)
+        self.assertEqual(summary.as_dict()['draws'], 1)
+
+    def test_results_do_not_depend_on_processes(self):
+        summaries = list()
+        for processes in (1, 2):
+            runner = SelfPlayRunner(_players(), {'terrain': 'random', 'numbers': 'random'}, processes=processes,
+                                    chunk_size=2, max_turns=60)
+            summaries.append(runner.run(6, seed=11).as_dict())
+        self.assertEqual(summaries[0], summaries[1])
+        self.assertEqual(summaries[0]['games'], 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
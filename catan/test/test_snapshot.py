@@ -0,0 +1,94 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from catan import agents, boardbuilder, snapshot
+from catan.game import Game, Player
+from catan.snapshot import GameSnapshot
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+def _positions(seed, every=5, max_turns=60):
+    """
+    :return: list((Game, GameSnapshot)), positions of a randomly played game, each a game of its own
+    """
+    random.seed(seed)
+    game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                logging='off', undo='off', turns='on', max_turns=max_turns)
+    game.start(_players())
+    rng = random.Random(seed)
+    positions = list()
+    step = 0
+    while game.state.is_in_game():
+        if step % every == 0:
+            position = GameSnapshot.from_game(game)
+            positions.append((position.to_game(game), position))
+        legal = game.legal_actions()
+        game.apply_action(int(legal[rng.randrange(len(legal))]))
+        step += 1
+    return positions
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def assertSame(self, expected, actual, message):
+        np.testing.assert_array_equal(actual.data, expected.data, message)
+        for name in snapshot._SCALARS:
+            self.assertEqual(getattr(actual, name), getattr(expected, name), '{}, {}'.format(message, name))
+
+    def test_to_game_round_trip(self):
+        for seed in range(3):
+            for i, (game, position) in enumerate(_positions(seed)):
+                message = 'seed {}, position {}'.format(seed, i)
+                self.assertSame(position, GameSnapshot.from_game(game), message)
+                self.assertEqual([position.game_action(action, game) for action in position.legal_actions()],
+                                 agents.legal_actions(game), message)
+
+    def test_actions_match_the_game(self):
+        rng = random.Random(0)
+        for i, (game, position) in enumerate(_positions(1, every=3)):
+            actions = [a for a in position.legal_actions() if a[0] not in ('roll', 'steal', 'buy_dev_card')]
+            if not actions:
+                continue
+            action = actions[rng.randrange(len(actions))]
+            child = position.apply(action)
+            self.assertSame(GameSnapshot.from_game(game), position, 'position {} changed'.format(i))
+            agents.apply(game, position.game_action(action, game))
+            self.assertSame(GameSnapshot.from_game(game), child, 'position {}, {}'.format(i, action))
+
+    def test_copies_are_independent(self):
+        _, position = _positions(2)[-3]
+        other = position.copy()
+        other.hands += 1
+        other.turn += 1
+        self.assertFalse(np.shares_memory(other.data, position.data))
+        self.assertFalse((other.hands == position.hands).any())
+        self.assertNotEqual(other.position_key(), position.position_key())
+        self.assertEqual(position.copy().position_key(), position.position_key())
+
+    def test_bytes_and_files(self):
+        positions = [position for _, position in _positions(3, every=11)]
+        for position in positions:
+            data = position.to_bytes()
+            self.assertEqual(len(data), GameSnapshot.wire_size(position.num_players))
+            self.assertSame(position, positions[0].from_bytes(data), repr(position))
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            snapshot.save(path, positions)
+            for expected, actual in zip(positions, snapshot.load(path)):
+                self.assertSame(expected, actual, repr(expected))
+                self.assertEqual(actual.legal_actions(), expected.legal_actions())
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
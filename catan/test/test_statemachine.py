@@ -0,0 +1,81 @@
+import random
+import unittest
+
+from catan import boardbuilder, rules, statemachine
+from catan.game import Game, Player
+from catan.pieces import PieceType
+
+# pairs (state, next state) of the table, whatever the event
+_TABLE = {(state, statemachine.TRANSITIONS[state * len(statemachine.EVENTS) + event])
+          for state in range(len(statemachine.STATES)) for event in range(len(statemachine.EVENTS))
+          if statemachine.TRANSITIONS[state * len(statemachine.EVENTS) + event] >= 0}
+
+_PURCHASES = {PieceType.settlement: rules.SETTLEMENT, PieceType.road: rules.ROAD, PieceType.city: rules.CITY}
+
+
+class _RecordingGame(Game):
+    """
+    A Game which records the state machine states of each transition made with #set_state.
+    """
+    def __init__(self, *args, **kwargs):
+        self.transitions = list()
+        super(_RecordingGame, self).__init__(*args, **kwargs)
+
+    def set_state(self, game_state):
+        previous = self.state
+        super(_RecordingGame, self).set_state(game_state)
+        if previous is not None:
+            self.transitions.append((statemachine.state_id(previous), statemachine.state_id(game_state)))
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+class TestStateMachine(unittest.TestCase):
+
+    def test_game_transitions_are_in_the_table(self):
+        seen = set()
+        for seed in range(12):
+            random.seed(seed)
+            game = _RecordingGame(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                                  logging='off', undo='off', turns='on', max_turns=150,
+                                  pregame='off' if seed % 4 == 0 else 'on')
+            game.start(_players())
+            rng = random.Random(seed)
+            while game.state.is_in_game():
+                caps = game.capabilities()
+                if caps & statemachine.CAN_END_TURN and rng.random() < 0.3:
+                    # as the GUI does: choose a piece, and maybe change one's mind, before placing it
+                    affordable = game.rules.affordable()[game.cur_player_index()]
+                    for piece_type in rng.sample(list(_PURCHASES), 2):
+                        if affordable[_PURCHASES[piece_type]]:
+                            game.begin_placing(piece_type)
+                legal = game.legal_actions()
+                if not len(legal):
+                    break
+                game.apply_action(int(legal[rng.randrange(len(legal))]))
+            for previous, state in game.transitions:
+                self.assertIn((previous, state), _TABLE, 'seed {}: {} -> {}'.format(
+                    seed, statemachine.STATES[previous], statemachine.STATES[state]))
+            seen.update(game.transitions)
+        self.assertGreaterEqual(len(seen), 25)
+
+    def test_machine_follows_a_turn(self):
+        machine = statemachine.StateMachine(statemachine.BEGIN_TURN)
+        self.assertTrue(machine.can(statemachine.CAN_ROLL))
+        machine.fire(statemachine.ROLL)
+        self.assertEqual(machine.state, statemachine.DURING_TURN)
+        self.assertFalse(machine.can(statemachine.CAN_ROLL))
+        self.assertTrue(machine.can(statemachine.CAN_END_TURN))
+        machine.fire(statemachine.PLAY_MONOPOLY)
+        self.assertFalse(machine.can(statemachine.CAN_PLAY_KNIGHT))
+        machine.fire(statemachine.END_TURN)
+        self.assertEqual(machine, statemachine.StateMachine(statemachine.BEGIN_TURN))
+        with self.assertRaises(ValueError):
+            machine.fire(statemachine.STEAL)
+
+
+if __name__ == '__main__':
+    unittest.main()
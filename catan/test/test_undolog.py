@@ -0,0 +1,64 @@
+import random
+import unittest
+
+import numpy as np
+
+from catan import boardbuilder
+from catan.game import Game, Player
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+def _position(game):
+    """
+    :return: what undo and redo must restore exactly: the states, the turn, the pieces on the
+             board and every array of the rules
+    """
+    state = {k: repr(v) for k, v in game.state.__dict__.items() if k != 'game'}
+    pieces = sorted((repr(k), repr(v)) for k, v in game.board.pieces.items())
+    owned = sorted((repr(k), repr(v)) for k, v in game.board.player_to_pieces.items())
+    arrays = {k: v.copy() for k, v in vars(game.rules).items() if isinstance(v, np.ndarray)}
+    return (type(game.state), state, type(game.dev_card_state), repr(game._cur_player), game._cur_turn,
+            game.robber_tile, game.last_roll, pieces, owned), arrays
+
+
+class TestUndoLog(unittest.TestCase):
+
+    def assertPosition(self, game, expected, step):
+        position, arrays = _position(game)
+        self.assertEqual(position, expected[0], 'step {}'.format(step))
+        self.assertEqual(sorted(arrays), sorted(expected[1]), 'step {}'.format(step))
+        for name, array in arrays.items():
+            np.testing.assert_array_equal(array, expected[1][name], 'step {}, rules.{}'.format(step, name))
+
+    def test_undo_redo_every_action(self):
+        for seed in range(6):
+            random.seed(seed)
+            game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                        logging='off', turns='on', max_turns=60)
+            game.start(_players())
+            rng = random.Random(seed)
+            positions = [_position(game)]
+            commands = [0] # undoable commands made by each action
+            while game.state.is_in_game():
+                legal = game.legal_actions()
+                done = len(game.undo_manager._undo_stack)
+                game.apply_action(int(legal[rng.randrange(len(legal))]))
+                commands.append(len(game.undo_manager._undo_stack) - done)
+                self.assertGreater(commands[-1], 0, 'seed {}, step {}'.format(seed, len(positions)))
+                positions.append(_position(game))
+            for step in range(len(positions) - 1, 0, -1):
+                for _ in range(commands[step]):
+                    game.undo()
+                self.assertPosition(game, positions[step - 1], step - 1)
+            for step in range(1, len(positions)):
+                for _ in range(commands[step]):
+                    game.redo()
+                self.assertPosition(game, positions[step], step)
+
+
+if __name__ == '__main__':
+    unittest.main()
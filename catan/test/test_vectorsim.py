@@ -0,0 +1,61 @@
+import random
+import unittest
+
+import numpy as np
+
+from catan import actions, agents, boardbuilder, snapshot, vectorsim
+from catan.eventstream import as_tuple
+from catan.game import Game, Player
+
+
+def _players():
+    return [Player(1, 'ross', 'red'), Player(2, 'josh', 'blue'),
+            Player(3, 'yuri', 'orange'), Player(4, 'zach', 'green')]
+
+
+class TestLockStep(unittest.TestCase):
+    """
+    Games, GameSnapshot#play and VectorSimulator#step make the same actions with the same
+    outcomes, and must stay in the same position.
+    """
+
+    def assertSame(self, expected, actual, message):
+        np.testing.assert_array_equal(actual.data, expected.data, message)
+        for name in snapshot._SCALARS:
+            self.assertEqual(getattr(actual, name), getattr(expected, name), '{}, {}'.format(message, name))
+
+    def test_lock_step(self):
+        games = list()
+        for seed in range(4):
+            random.seed(seed)
+            game = Game(board=boardbuilder.build({'terrain': 'random', 'numbers': 'random'}),
+                        logging='off', undo='off', turns='on', max_turns=80)
+            game.start(_players())
+            games.append(game)
+        starts = [snapshot.GameSnapshot.from_game(game) for game in games]
+        snapshots = [start.copy() for start in starts]
+        sim = vectorsim.VectorSimulator.from_snapshots(starts, seed=7)
+        policies = [vectorsim.random_policy] * 4
+        step = 0
+        while True:
+            playing = sim.in_game()
+            self.assertEqual(playing.tolist(), [k for k, game in enumerate(games) if game.state.is_in_game()])
+            if not len(playing):
+                break
+            mask = sim.legal_mask(playing)
+            for row, k in zip(mask, playing):
+                np.testing.assert_array_equal(row, actions.legal_mask(games[k]), 'game {}, step {}'.format(k, step))
+            chosen = sim.decide(playing, policies)
+            outcomes = sim.step(playing, chosen)
+            for k, action, outcome in zip(playing, chosen, outcomes):
+                agents.apply(games[k], actions.decode(games[k], int(action)), None if outcome < 0 else int(outcome))
+                snapshots[k].play(as_tuple(action, outcome))
+                message = 'game {}, step {}, action {}'.format(k, step, actions.describe(int(action)))
+                self.assertSame(snapshot.GameSnapshot.from_game(games[k]), snapshots[k], message)
+                self.assertSame(snapshots[k], sim.snapshot(k), message)
+            step += 1
+        self.assertGreater(step, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
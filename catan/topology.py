@@ -0,0 +1,113 @@
+"""
+module topology provides precomputed index arrays for the catan board grid.
+
+Module hexgrid names locations by hexadecimal coordinate. Array-backed models need dense
+indexes instead, so this module numbers every tile, node and edge once, at import time:
+
+- tile index t is tile_id - 1, on [0,19)
+- node index n is the position of the node coord in NODES, on [0,54)
+- edge index e is the position of the edge coord in EDGES, on [0,72)
+
+and provides incidence between them as NumPy arrays:
+
+- NODE_TILES: (54, 19) uint8, 1 where node n touches tile t
+- EDGE_NODES: (72, 2) int, the two nodes on edge e
+- NODE_EDGES: (54, 3) int, the edges touching node n, padded with -1
+- NODE_NEIGHBOURS: (54, 3) int, the nodes one edge away from node n, padded with -1
+
+Resources are indexed in the order of RESOURCES, which is the Terrain order without the desert.
+"""
+import numpy as np
+
+import hexgrid
+
+from catan.board import Terrain, HexNumber, PortType
+
+NUM_TILES = 19
+TILE_IDS = list(range(1, NUM_TILES + 1))
+
+NODES = sorted(hexgrid.legal_node_coords())
+EDGES = sorted(hexgrid.legal_edge_coords())
+NUM_NODES = len(NODES)
+NUM_EDGES = len(EDGES)
+NODE_INDEX = {coord: n for n, coord in enumerate(NODES)}
+EDGE_INDEX = {coord: e for e, coord in enumerate(EDGES)}
+
+RESOURCES = [Terrain.wood, Terrain.brick, Terrain.wheat, Terrain.sheep, Terrain.ore]
+NUM_RESOURCES = len(RESOURCES)
+RESOURCE_INDEX = {terrain: r for r, terrain in enumerate(RESOURCES)}
+
+# Probability of each dice sum on two six-sided dice, indexed by sum on [0,12]
+DICE_PROBABILITY = np.array([0, 0] + [6 - abs(7 - s) for s in range(2, 13)], dtype=np.float64) / 36
+
+
+def pips(number):
+    """
+    The number of ways two dice can roll the given number. Deserts (HexNumber.none) have none.
+
+    :param number: HexNumber
+    :return: int on [0,5]
+    """
+    if number is None:
+        return 0
+    return number.pips
+
+
+def _build_incidence():
+    node_tiles = np.zeros((NUM_NODES, NUM_TILES), dtype=np.uint8)
+    for tile_id in TILE_IDS:
+        for node in hexgrid.nodes_touching_tile(tile_id):
+            node_tiles[NODE_INDEX[node], tile_id - 1] = 1
+
+    edge_nodes = np.array([[NODE_INDEX[node] for node in sorted(hexgrid.nodes_touching_edge(edge))]
+                           for edge in EDGES], dtype=np.int64)
+
+    node_edges = np.full((NUM_NODES, 3), -1, dtype=np.int64)
+    node_neighbours = np.full((NUM_NODES, 3), -1, dtype=np.int64)
+    degree = np.zeros(NUM_NODES, dtype=np.int64)
+    for e, (a, b) in enumerate(edge_nodes):
+        node_edges[a, degree[a]], node_neighbours[a, degree[a]] = e, b
+        node_edges[b, degree[b]], node_neighbours[b, degree[b]] = e, a
+        degree[a] += 1
+        degree[b] += 1
+    return node_tiles, edge_nodes, node_edges, node_neighbours
+
+
+NODE_TILES, EDGE_NODES, NODE_EDGES, NODE_NEIGHBOURS = _build_incidence()
+
+
+def tile_arrays(tiles):
+    """
+    Dense arrays describing a board's tiles.
+
+    :param tiles: list(Tile), as in Board.tiles
+    :return: (tile_resource, tile_number) where tile_resource is (19, 5) uint8, one-hot on the tile's
+             resource (all zero for the desert), and tile_number is (19,) int, 0 for no number
+    """
+    tile_resource = np.zeros((NUM_TILES, NUM_RESOURCES), dtype=np.uint8)
+    tile_number = np.zeros(NUM_TILES, dtype=np.int64)
+    for tile in tiles:
+        if tile.terrain in RESOURCE_INDEX:
+            tile_resource[tile.tile_id - 1, RESOURCE_INDEX[tile.terrain]] = 1
+        if tile.number is not None and tile.number != HexNumber.none:
+            tile_number[tile.tile_id - 1] = tile.number.value
+    return tile_resource, tile_number
+
+
+def port_arrays(ports):
+    """
+    Which nodes give access to which trade ratios.
+
+    :param ports: list(Port), as in Board.ports
+    :return: (NUM_NODES, 6) bool, column r < 5 is a 2:1 port for resource r, column 5 is a 3:1 port
+    """
+    access = np.zeros((NUM_NODES, NUM_RESOURCES + 1), dtype=bool)
+    for port in ports:
+        if port.type in (PortType.none, PortType.any4):
+            continue
+        column = NUM_RESOURCES if port.type == PortType.any3 else RESOURCE_INDEX[Terrain(port.type.value)]
+        edge = hexgrid.edge_coord_in_direction(port.tile_id, port.direction)
+        for node in hexgrid.nodes_touching_edge(edge):
+            if node in NODE_INDEX:
+                access[NODE_INDEX[node], column] = True
+    return access
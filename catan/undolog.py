@@ -0,0 +1,202 @@
+"""
+module undolog provides undo and redo by recording what each action changed, rather than
+copying the whole game before every action.
+
+An UndoLog is a drop-in replacement for undoredo.UndoManager. Game.do hands it each
+undoredo.Command, and it has the same do, undo, redo, can_undo and can_redo methods.
+
+While a command runs, the log watches
+- the attributes of the game, its board, its state, its rules state, and its catanlog,
+- the board's pieces and player_to_pieces, which the board reports through Board.journal,
+- the cells of the rules state's arrays.
+
+When the command returns, only what changed is kept, as a Delta. Undo writes the old values
+back and redo writes the new ones, so both cost O(change), however long the game has run.
+Text appended to a string attribute (e.g. the catanlog buffer) is stored as the appended
+text only.
+
+Commands run from inside another command, e.g. an agent's placements at the end of a turn,
+are recorded as part of the outer command, and are undone and redone with it.
+"""
+import logging
+
+import numpy as np
+
+# marks an attribute or key which did not exist
+_MISSING = object()
+
+# observers and notification batches belong to the GUI, and the rest belong to the undo machinery
+_UNWATCHED = frozenset(('observers', 'changes', '_batch_depth', '_pending_changes', 'undo_manager', 'journal'))
+
+
+def _set_attr(obj, attr, value):
+    if value is _MISSING:
+        obj.__dict__.pop(attr, None)
+    else:
+        setattr(obj, attr, value)
+
+
+def _set_item(mapping, key, value):
+    if value is _MISSING:
+        mapping.pop(key, None)
+    else:
+        mapping[key] = value
+
+
+class Delta(object):
+    """
+    class Delta holds the changes made by one command, as old and new values.
+
+    :param name: name of the command's method, e.g. 'roll'
+    """
+    def __init__(self, name):
+        self.name = name
+        self.attrs = list() # (obj, attr, old, new)
+        self.appends = list() # (obj, attr, old length, appended str)
+        self.items = list() # (mapping, key, old, new)
+        self.cells = list() # (array, flat indexes, old values, new values)
+
+    def __len__(self):
+        return len(self.attrs) + len(self.appends) + len(self.items) + sum(len(c[1]) for c in self.cells)
+
+    def undo(self):
+        for obj, attr, old, _ in self.attrs:
+            _set_attr(obj, attr, old)
+        for obj, attr, length, _ in self.appends:
+            setattr(obj, attr, getattr(obj, attr)[:length])
+        for mapping, key, old, _ in self.items:
+            _set_item(mapping, key, old)
+        for array, index, old, _ in self.cells:
+            array.flat[index] = old
+
+    def redo(self):
+        for obj, attr, _, new in self.attrs:
+            _set_attr(obj, attr, new)
+        for obj, attr, _, text in self.appends:
+            setattr(obj, attr, getattr(obj, attr) + text)
+        for mapping, key, _, new in self.items:
+            _set_item(mapping, key, new)
+        for array, index, _, new in self.cells:
+            array.flat[index] = new
+
+    def __repr__(self):
+        return '<Delta {} changes={}>'.format(self.name, len(self))
+
+
+class Recording(object):
+    """
+    class Recording watches a game while one command runs, and produces its Delta on #commit.
+
+    Taking a recording copies the game's attribute dictionaries (not their values) and the bytes
+    of the rules state's arrays, which are fixed in size. Neither grows with the length of the game.
+    """
+    def __init__(self, game, name):
+        self.name = name
+        self.board = game.board
+        watched = (game, game.board, game.state, game.rules, game.catanlog)
+        self.objects = [(obj, dict(obj.__dict__)) for obj in watched if obj is not None]
+        self.arrays = list()
+        if game.rules is not None:
+            self.arrays = [(game.rules, attr, value, value.tobytes())
+                           for attr, value in game.rules.__dict__.items() if isinstance(value, np.ndarray)]
+        self.items = dict()
+        self.board.journal = self
+
+    def record_item(self, mapping, key):
+        """
+        Called before mapping[key] is set or removed.
+        """
+        if (id(mapping), key) not in self.items:
+            self.items[(id(mapping), key)] = (mapping, key, mapping.get(key, _MISSING))
+
+    def commit(self):
+        """
+        Stop recording.
+
+        :return: Delta
+        """
+        self.board.journal = None
+        delta = Delta(self.name)
+        for obj, before in self.objects:
+            after = obj.__dict__
+            for attr, new in after.items():
+                old = before.get(attr, _MISSING)
+                if old is new or attr in _UNWATCHED:
+                    continue
+                if isinstance(old, str) and isinstance(new, str) and new.startswith(old):
+                    delta.appends.append((obj, attr, len(old), new[len(old):]))
+                else:
+                    delta.attrs.append((obj, attr, old, new))
+            for attr in before.keys() - after.keys():
+                delta.attrs.append((obj, attr, before[attr], _MISSING))
+        for mapping, key, old in self.items.values():
+            new = mapping.get(key, _MISSING)
+            if old is not new:
+                delta.items.append((mapping, key, old, new))
+        for rules, attr, array, before in self.arrays:
+            if rules.__dict__.get(attr) is not array or array.tobytes() == before:
+                continue
+            before = np.frombuffer(before, dtype=array.dtype)
+            index = np.flatnonzero(array.ravel() != before)
+            delta.cells.append((array, index, before[index], array.flat[index]))
+        return delta
+
+
+class UndoLog(object):
+    """
+    class UndoLog keeps stacks of Deltas for undo and redo.
+
+    Usage, as with undoredo.UndoManager:
+        game.undo_manager = UndoLog(game)
+        game.undo_manager.do(Command(params...))
+        if game.undo_manager.can_undo():
+            game.undo_manager.undo()
+    """
+    def __init__(self, game):
+        """
+        :param game: the Game whose commands will be recorded
+        """
+        self.game = game
+        self._undo_stack = list()
+        self._redo_stack = list()
+        self._recording = None
+
+    def do(self, command):
+        """
+        Run the command and record what it changed. Commands which change nothing are not kept.
+
+        :param command: undoredo.Command
+        :return: the command's return value
+        """
+        if self._recording is not None:
+            return command.do_method(command.obj, *command.args)
+        self._recording = Recording(self.game, command.do_method.__name__)
+        try:
+            return command.do_method(command.obj, *command.args)
+        finally:
+            delta = self._recording.commit()
+            self._recording = None
+            if len(delta):
+                self._redo_stack.clear()
+                self._undo_stack.append(delta)
+            logging.debug('Recorded {}'.format(delta))
+
+    def can_undo(self):
+        return len(self._undo_stack) > 0
+
+    def can_redo(self):
+        return len(self._redo_stack) > 0
+
+    def undo(self):
+        if len(self._undo_stack) < 1:
+            raise Exception('Cannot perform undo, undo stack is empty')
+        delta = self._undo_stack.pop()
+        delta.undo()
+        self._redo_stack.append(delta)
+
+    def redo(self):
+        if len(self._redo_stack) < 1:
+            raise Exception('Cannot perform redo, redo stack is empty')
+        delta = self._redo_stack.pop()
+        delta.redo()
+        self._undo_stack.append(delta)
@@ -0,0 +1,765 @@
+"""
+module vectorsim provides VectorSimulator, which plays many games of catan at once, in lock-step,
+with the position of every game in NumPy arrays.
+
+Game holds a position as objects, and GameSnapshot as arrays, but either makes one action of one
+game at a time, so most of a simulation's time goes to the interpreter rather than to the rules.
+A VectorSimulator holds K positions as a struct of arrays, the fields of GameSnapshot stacked on
+a first axis of games:
+
+    hands (K, P, 5), bank (K, 5), deck (K, 25), dev_hands, dev_new, dev_played (K, P, 5),
+    buildings (K, P, 54), supply (K, P, 3), roads (K, 72)
+    tile_resource (K, 19, 5), tile_number (K, 19), port_access (K, 54, 6)
+    state, cur, turn, robber_tile, deck_top, largest_army, last_roller, dev_card_played,
+    last_roll, pending_node, road_builder_edge (K, )
+
+where robber_tile and last_roll are 0 for none, and road_builder_edge is the edge of the first
+road placed with a road builder being played, -1 for none.
+
+Each step, every game still in play makes one action of the integer action space of module
+actions. #legal_mask gives the actions each game's current player may take, a policy picks one
+per game, and #step makes them all. Actions are grouped by kind, so dice, production, discards,
+affordability and placements are each a few array operations over every game which needs them:
+
+    sim = VectorSimulator.random_boards(1000, max_turns=500, seed=1)
+    sim.run(['random', 'greedy', 'random', 'greedy'])
+    sim.winners()                   # (K, ) player index, -1 where nobody reached 10 points
+
+The rules are those of GameSnapshot#play, action for action: #snapshot(k) is game k as a
+GameSnapshot, and the actions #step makes, with the outcomes it returns (see
+eventstream.as_tuple), played on the GameSnapshot a game started from reach the same position.
+Games can start from real ones with #from_snapshots, e.g. to carry on many copies of one
+position.
+
+A game can be left with no legal action, as a Game can: a road builder's first road placed where
+no second one fits. #run ends such games, and marks them in stalled.
+
+Policies are functions (sim, games, mask, rng) -> actions, for the games (int array) whose
+current player they play, with their (len(games), size(P)) legal mask. POLICIES has:
+
+- random: uniform among the legal actions, as RandomAgent
+- greedy: as BestAgent, except that opening settlements go to the node with the most pips
+  rather than by module opening, and pregame roads are placed at random
+"""
+import logging
+
+import numpy as np
+
+from catan import actions, boardbuilder, rules, snapshot, topology
+
+_NUM_DEV_CARDS = sum(rules.DEV_DECK_COUNTS)
+_DECK = np.array([card for card, count in enumerate(rules.DEV_DECK_COUNTS) for _ in range(count)], dtype=np.int16)
+# the terrain and numbers boardbuilder shuffles, as resource indexes (-1 the desert) and dice totals
+_TERRAIN = np.array([-1] + [1] * 3 + [4] * 3 + [0] * 4 + [3] * 4 + [2] * 4)
+_NUMBERS = np.array([2, 3, 3, 4, 4, 5, 5, 6, 6, 8, 8, 9, 9, 10, 10, 11, 11, 12])
+
+_PIPS = np.rint(topology.DICE_PROBABILITY * 36).astype(np.int16)
+_NODE_TILES = topology.NODE_TILES.astype(np.int16)
+_TILE_NODES = topology.NODE_TILES.T.astype(bool)
+_YOP_PAIRS = np.array(actions.YEAR_OF_PLENTY_PAIRS)
+
+# action kinds, by action int up to STEAL; every action from STEAL on is a steal
+(_SETTLEMENT, _ROAD, _CITY, _ROBBER, _ROLL, _END_TURN, _BUY_DEV_CARD, _KNIGHT, _ROAD_BUILDER, _VICTORY_POINT,
+ _MONOPOLY, _YEAR_OF_PLENTY, _TRADE, _STEAL_NOBODY, _STEAL) = range(15)
+_KINDS = np.full(actions.STEAL + 1, _STEAL, dtype=np.int8)
+for _kind, _start, _stop in [(_SETTLEMENT, actions.PLACE_SETTLEMENT, actions.PLACE_ROAD),
+                             (_ROAD, actions.PLACE_ROAD, actions.PLACE_CITY),
+                             (_CITY, actions.PLACE_CITY, actions.MOVE_ROBBER),
+                             (_ROBBER, actions.MOVE_ROBBER, actions.ROLL),
+                             (_ROLL, actions.ROLL, actions.END_TURN),
+                             (_END_TURN, actions.END_TURN, actions.BUY_DEV_CARD),
+                             (_BUY_DEV_CARD, actions.BUY_DEV_CARD, actions.PLAY_KNIGHT),
+                             (_KNIGHT, actions.PLAY_KNIGHT, actions.PLAY_ROAD_BUILDER),
+                             (_ROAD_BUILDER, actions.PLAY_ROAD_BUILDER, actions.PLAY_VICTORY_POINT),
+                             (_VICTORY_POINT, actions.PLAY_VICTORY_POINT, actions.PLAY_MONOPOLY),
+                             (_MONOPOLY, actions.PLAY_MONOPOLY, actions.PLAY_YEAR_OF_PLENTY),
+                             (_YEAR_OF_PLENTY, actions.PLAY_YEAR_OF_PLENTY, actions.TRADE),
+                             (_TRADE, actions.TRADE, actions.STEAL_NOBODY),
+                             (_STEAL_NOBODY, actions.STEAL_NOBODY, actions.STEAL)]:
+    _KINDS[_start:_stop] = _kind
+
+_preset_ports = None
+
+
+def preset_port_access():
+    """
+    :return: (54, 6) bool, the port access of boardbuilder's preset ports, see topology.port_arrays
+    """
+    global _preset_ports
+    if _preset_ports is None:
+        board = boardbuilder.build({'terrain': 'empty', 'numbers': 'empty'})
+        _preset_ports = topology.port_arrays(board.ports)
+    return _preset_ports
+
+
+def _uniform(mask, rng):
+    """
+    :param mask: (n, m) bool, with a True in every row
+    :return: (n, ) column of a True per row, uniformly at random
+    """
+    pick = (rng.random(len(mask)) * mask.sum(axis=1)).astype(np.intp)
+    return (mask.cumsum(axis=1) > pick[:, None]).argmax(axis=1)
+
+
+class VectorSimulator(object):
+    """
+    class VectorSimulator represents K games with the same number of players and options, as
+    arrays with a first axis of games, see module docstring.
+    """
+    def __init__(self, tile_resource, tile_number, port_access, num_players=4, turns=True, max_turns=None,
+                 seed=None):
+        """
+        K games on the given boards, not in game. Use #random_boards or #from_snapshots for games
+        ready to play.
+
+        :param tile_resource: (K, 19, 5), see topology.tile_arrays
+        :param tile_number: (K, 19), see topology.tile_arrays
+        :param port_access: (K, 54, 6), or (54, 6) shared by every game, see topology.port_arrays
+        :param num_players: int
+        :param turns: bool, whether regular turns are played after the pregame, see Game
+        :param max_turns: int, optional, see Game
+        :param seed: seed of the generator for dice, steals and policies, optional
+        """
+        k, p = len(tile_number), num_players
+        self.num_games = k
+        self.num_players = p
+        self.turns = turns
+        self.max_turns = max_turns
+        self.rng = np.random.default_rng(seed)
+        self.tile_resource = np.asarray(tile_resource, dtype=np.int16)
+        self.tile_number = np.asarray(tile_number, dtype=np.int16)
+        port_access = np.asarray(port_access, dtype=bool)
+        if port_access.ndim == 2:
+            port_access = np.broadcast_to(port_access, (k, ) + port_access.shape)
+        self.port_access = port_access
+
+        self.hands = np.zeros((k, p, topology.NUM_RESOURCES), dtype=np.int16)
+        self.bank = np.full((k, topology.NUM_RESOURCES), rules.RESOURCES_PER_TYPE, dtype=np.int16)
+        self.deck = np.tile(_DECK, (k, 1))
+        self.dev_hands = np.zeros((k, p, len(rules.DEV_CARDS)), dtype=np.int16)
+        self.dev_new = np.zeros_like(self.dev_hands)
+        self.dev_played = np.zeros_like(self.dev_hands)
+        self.buildings = np.zeros((k, p, topology.NUM_NODES), dtype=np.int8)
+        self.supply = np.tile(np.array(rules.PIECE_SUPPLY, dtype=np.int16), (k, p, 1))
+        self.roads = np.full((k, topology.NUM_EDGES), -1, dtype=np.int8)
+
+        self.state = np.full(k, snapshot.NOT_IN_GAME, dtype=np.int8)
+        self.cur = np.zeros(k, dtype=np.intp)
+        self.turn = np.zeros(k, dtype=np.int32)
+        self.robber_tile = np.zeros(k, dtype=np.intp)
+        self.deck_top = np.zeros(k, dtype=np.intp)
+        self.largest_army = np.full(k, -1, dtype=np.intp)
+        self.last_roller = np.full(k, -1, dtype=np.intp)
+        self.dev_card_played = np.zeros(k, dtype=bool)
+        self.last_roll = np.zeros(k, dtype=np.int8)
+        self.pending_node = np.full(k, -1, dtype=np.intp)
+        self.road_builder_edge = np.full(k, -1, dtype=np.intp)
+        self.stalled = np.zeros(k, dtype=bool) # games #run ended for want of a legal action
+        self.steps = 0
+
+    @classmethod
+    def random_boards(cls, num_games, num_players=4, turns=True, max_turns=None, seed=None):
+        """
+        Games at the start of the pregame, on random boards as boardbuilder's random terrain and
+        numbers with preset ports, with shuffled dev card decks and the robber on the desert.
+
+        :param num_games: int, K
+        :param num_players: int
+        :param turns: bool, see Game
+        :param max_turns: int, optional, see Game
+        :param seed: seed for the boards, decks, dice, steals and policies, optional
+        :return: VectorSimulator
+        """
+        rng = np.random.default_rng(seed)
+        terrain = _TERRAIN[np.argsort(rng.random((num_games, topology.NUM_TILES)), axis=1)]
+        numbers = np.zeros((num_games, topology.NUM_TILES), dtype=np.int16)
+        numbers[terrain >= 0] = _NUMBERS[np.argsort(rng.random((num_games, len(_NUMBERS))), axis=1)].ravel()
+        tile_resource = (terrain[:, :, None] == np.arange(topology.NUM_RESOURCES)).astype(np.int16)
+        result = cls(tile_resource, numbers, preset_port_access(), num_players, turns, max_turns,
+                     seed=rng.integers(2 ** 63))
+        result.deck = _DECK[np.argsort(rng.random((num_games, _NUM_DEV_CARDS)), axis=1)]
+        result.robber_tile[:] = np.argmax(terrain < 0, axis=1) + 1
+        result.state[:] = snapshot.PREGAME_SETTLEMENT
+        return result
+
+    @classmethod
+    def from_snapshots(cls, positions, seed=None):
+        """
+        Games in the given positions, e.g. of real games, see GameSnapshot#from_game.
+
+        :param positions: list(GameSnapshot), with the same number of players, turns and max_turns
+        :param seed: seed for dice, steals and policies, optional
+        :return: VectorSimulator
+        """
+        first = positions[0]
+        result = cls(np.stack([s.tile_resource for s in positions]), np.stack([s.tile_number for s in positions]),
+                     np.stack([s.port_access for s in positions]), first.num_players, first.turns, first.max_turns,
+                     seed=seed)
+        for name, _, _, _ in snapshot.layout(first.num_players)[1]:
+            getattr(result, name)[:] = np.stack([getattr(s, name) for s in positions])
+        for k, s in enumerate(positions):
+            result.state[k] = s.state
+            result.cur[k] = s.cur
+            result.turn[k] = s.turn
+            result.robber_tile[k] = s.robber_tile or 0
+            result.deck_top[k] = s.deck_top
+            result.largest_army[k] = s.largest_army
+            result.last_roller[k] = s.last_roller
+            result.dev_card_played[k] = s.dev_card_played
+            result.last_roll[k] = s.last_roll or 0
+            result.pending_node[k] = s.pending_node
+            result.road_builder_edge[k] = s.road_builder_roads[0] if s.road_builder_roads else -1
+        return result
+
+    def snapshot(self, k):
+        """
+        :param k: game index
+        :return: GameSnapshot of game k, independent of the simulator
+        """
+        result = snapshot.GameSnapshot(self.num_players, self.tile_resource[k].astype(np.uint8),
+                                       self.tile_number[k].astype(np.int64), np.array(self.port_access[k]),
+                                       turns=self.turns, max_turns=self.max_turns)
+        for name, _, _, _ in snapshot.layout(self.num_players)[1]:
+            getattr(result, name)[:] = getattr(self, name)[k]
+        result.state = int(self.state[k])
+        result.cur = int(self.cur[k])
+        result.turn = int(self.turn[k])
+        result.robber_tile = int(self.robber_tile[k]) or None
+        result.deck_top = int(self.deck_top[k])
+        result.largest_army = int(self.largest_army[k])
+        result.last_roller = int(self.last_roller[k])
+        result.dev_card_played = bool(self.dev_card_played[k])
+        result.last_roll = int(self.last_roll[k]) or None
+        result.pending_node = int(self.pending_node[k])
+        result.road_builder_roads = [int(self.road_builder_edge[k])] if self.road_builder_edge[k] >= 0 else list()
+        return result
+
+    ###
+    # Queries, for the current player of each of the games given
+    ###
+
+    def in_game(self):
+        """
+        :return: int array of the games still in play
+        """
+        return np.flatnonzero(self.state != snapshot.NOT_IN_GAME)
+
+    def victory_points(self, games=slice(None)):
+        """
+        :param games: game indexes, optional, default all
+        :return: (len(games), P) int, see RulesState#victory_points
+        """
+        vp = self.buildings[games].sum(axis=2, dtype=np.int16) + self.dev_played[games][:, :, rules.VICTORY_POINT]
+        vp += 2 * (self.largest_army[games][:, None] == np.arange(self.num_players))
+        return vp
+
+    def winners(self):
+        """
+        :return: (K, ) index of the player with enough victory points to win each game, or -1
+        """
+        vp = self.victory_points()
+        best = vp.argmax(axis=1)
+        return np.where(vp.max(axis=1) >= rules.VICTORY_POINTS_TO_WIN, best, -1)
+
+    def affordable(self, games):
+        """
+        :return: (len(games), 4) bool, purchases the current player can make, see RulesState#affordable
+        """
+        p = self.cur[games]
+        result = (self.hands[games, p][:, None, :] >= rules.COSTS).all(axis=2)
+        result[:, :rules.DEV_CARD] &= self.supply[games, p] > 0
+        result[:, rules.DEV_CARD] &= self.deck_top[games] < _NUM_DEV_CARDS
+        return result
+
+    def playable_dev_cards(self, games):
+        """
+        :return: (len(games), 5) bool, dev cards the current player may play this turn
+        """
+        p = self.cur[games]
+        return (self.dev_hands[games, p] - self.dev_new[games, p] > 0) & ~self.dev_card_played[games, None]
+
+    def settlement_mask(self, games, connected=True):
+        """
+        :return: (len(games), 54) bool, see RulesState#settlement_mask
+        """
+        occupied = np.zeros((len(games), topology.NUM_NODES + 1), dtype=bool)
+        occupied[:, :-1] = self.buildings[games].any(axis=1)
+        nodes = ~(occupied[:, :-1] | occupied[:, topology.NODE_NEIGHBOURS].any(axis=2))
+        if connected:
+            nodes &= self._own_roads(games)[:, topology.NODE_EDGES].any(axis=2)
+        return nodes
+
+    def road_mask(self, games):
+        """
+        :return: (len(games), 72) bool, see RulesState#road_mask
+        """
+        buildings = self.buildings[games]
+        own = buildings[np.arange(len(games)), self.cur[games]] > 0
+        reachable = own | (~buildings.any(axis=1) & self._own_roads(games)[:, topology.NODE_EDGES].any(axis=2))
+        return (self.roads[games] < 0) & reachable[:, topology.EDGE_NODES].any(axis=2)
+
+    def _own_roads(self, games):
+        # (len(games), 73), with a last column of False for the -1 padding of NODE_EDGES
+        result = np.zeros((len(games), topology.NUM_EDGES + 1), dtype=bool)
+        result[:, :-1] = self.roads[games] == self.cur[games, None]
+        return result
+
+    def bank_ratios(self, games):
+        """
+        :return: (len(games), 5) the current player's bank trade ratio per resource given
+        """
+        own = self.buildings[games, self.cur[games]] > 0
+        access = (own[:, :, None] & self.port_access[games]).any(axis=1)
+        return np.where(access[:, :topology.NUM_RESOURCES], 2, np.where(access[:, topology.NUM_RESOURCES, None], 3, 4))
+
+    def victims(self, games):
+        """
+        :return: (len(games), P) bool, players with a building on the robber's tile, other than
+                 the current player
+        """
+        touching = _TILE_NODES[self.robber_tile[games] - 1] & (self.robber_tile[games] > 0)[:, None]
+        result = ((self.buildings[games] > 0) & touching[:, None, :]).any(axis=2)
+        result[np.arange(len(games)), self.cur[games]] = False
+        return result
+
+    def node_pips(self, games):
+        """
+        :return: (len(games), 54) int, the pips of the tiles touching each node, see topology.pips
+        """
+        return _PIPS[self.tile_number[games]] @ _NODE_TILES.T
+
+    def legal_mask(self, games):
+        """
+        The actions the current player of each game may take, as GameSnapshot#legal_actions.
+
+        :param games: int array of game indexes
+        :return: (len(games), size(P)) bool
+        """
+        n = len(games)
+        mask = np.zeros((n, actions.size(self.num_players)), dtype=bool)
+        state = self.state[games]
+
+        sel = np.flatnonzero(state == snapshot.PREGAME_SETTLEMENT)
+        if len(sel):
+            mask[sel, actions.PLACE_SETTLEMENT:actions.PLACE_ROAD] = self.settlement_mask(games[sel], connected=False)
+        sel = np.flatnonzero(state == snapshot.PREGAME_ROAD)
+        if len(sel):
+            g = games[sel]
+            touching = topology.NODE_EDGES[self.pending_node[g]]
+            free = (touching >= 0) & (self.roads[g[:, None], touching] < 0)
+            rows = np.repeat(sel, touching.shape[1])[free.ravel()]
+            mask[rows, actions.PLACE_ROAD + touching[free]] = True
+        sel = np.flatnonzero(state == snapshot.ROAD_BUILDER)
+        if len(sel):
+            mask[sel, actions.PLACE_ROAD:actions.PLACE_CITY] = self.road_mask(games[sel])
+        sel = np.flatnonzero((state == snapshot.MOVE_ROBBER) | (state == snapshot.MOVE_ROBBER_KNIGHT))
+        if len(sel):
+            mask[sel, actions.MOVE_ROBBER:actions.ROLL] = True
+            robber = self.robber_tile[games[sel]]
+            mask[sel[robber > 0], actions.MOVE_ROBBER + robber[robber > 0] - 1] = False
+        sel = np.flatnonzero((state == snapshot.STEAL) | (state == snapshot.STEAL_KNIGHT))
+        if len(sel):
+            victims = self.victims(games[sel])
+            mask[sel, actions.STEAL:] = victims
+            mask[sel, actions.STEAL_NOBODY] = ~victims.any(axis=1)
+
+        turn = (state == snapshot.BEGIN_TURN) | (state == snapshot.DURING_TURN)
+        rolled = self.last_roller[games] == self.cur[games]
+        sel = np.flatnonzero(turn & ~rolled)
+        if len(sel):
+            mask[sel, actions.ROLL] = True
+            mask[sel, actions.PLAY_KNIGHT] = self.playable_dev_cards(games[sel])[:, rules.KNIGHT]
+        sel = np.flatnonzero(turn & rolled)
+        if len(sel):
+            self._turn_mask(games[sel], mask, sel)
+        return mask
+
+    def _turn_mask(self, g, mask, sel):
+        # the actions after the roll
+        p = self.cur[g]
+        affordable = self.affordable(g)
+        playable = self.playable_dev_cards(g)
+        mask[sel, actions.END_TURN] = True
+        mask[sel, actions.PLACE_SETTLEMENT:actions.PLACE_ROAD] = (self.settlement_mask(g) &
+                                                                  affordable[:, rules.SETTLEMENT, None])
+        mask[sel, actions.PLACE_CITY:actions.MOVE_ROBBER] = (self.buildings[g, p] == 1) & affordable[:, rules.CITY, None]
+        roads = self.road_mask(g)
+        mask[sel, actions.PLACE_ROAD:actions.PLACE_CITY] = roads & affordable[:, rules.ROAD, None]
+        mask[sel, actions.BUY_DEV_CARD] = affordable[:, rules.DEV_CARD]
+        hands = self.hands[g, p]
+        trades = (hands >= self.bank_ratios(g))[:, :, None] & (self.bank[g] > 0)[:, None, :] & ~np.eye(
+            topology.NUM_RESOURCES, dtype=bool)
+        mask[sel, actions.TRADE:actions.STEAL_NOBODY] = trades.reshape(len(g), -1)
+        mask[sel, actions.PLAY_KNIGHT] = playable[:, rules.KNIGHT]
+        mask[sel, actions.PLAY_MONOPOLY:actions.PLAY_YEAR_OF_PLENTY] = playable[:, rules.MONOPOLY, None]
+        mask[sel, actions.PLAY_YEAR_OF_PLENTY:actions.TRADE] = playable[:, rules.YEAR_OF_PLENTY, None]
+        mask[sel, actions.PLAY_ROAD_BUILDER] = (playable[:, rules.ROAD_BUILDER] & (self.supply[g, p, rules.ROAD] >= 2) &
+                                                roads.any(axis=1))
+        mask[sel, actions.PLAY_VICTORY_POINT] = playable[:, rules.VICTORY_POINT]
+
+    ###
+    # Actions
+    ###
+
+    def step(self, games, chosen):
+        """
+        Make one action in each of the games given, in place. Actions are not checked for legality.
+
+        :param games: int array of game indexes, each at most once
+        :param chosen: int array of actions, one per game, see module actions
+        :return: int8 array of the outcome of each action, as in module eventstream: the dice
+                 total of a roll, the resource index taken by a steal, else -1
+        """
+        chosen = np.asarray(chosen, dtype=np.intp)
+        outcomes = np.full(len(games), -1, dtype=np.int8)
+        kinds = _KINDS[np.minimum(chosen, actions.STEAL)]
+        for kind in np.unique(kinds):
+            sel = np.flatnonzero(kinds == kind)
+            g, a = games[sel], chosen[sel]
+            if kind == _SETTLEMENT:
+                self._place_settlement(g, a - actions.PLACE_SETTLEMENT)
+            elif kind == _ROAD:
+                self._place_road(g, a - actions.PLACE_ROAD)
+            elif kind == _CITY:
+                p, n = self.cur[g], a - actions.PLACE_CITY
+                self._pay(g, rules.CITY)
+                self.buildings[g, p, n] = 2
+                self.supply[g, p, rules.CITY] -= 1
+                self.supply[g, p, rules.SETTLEMENT] += 1
+                self.state[g] = snapshot.DURING_TURN
+            elif kind == _ROBBER:
+                self.robber_tile[g] = a - actions.MOVE_ROBBER + 1
+                self.state[g] = np.where(self.state[g] == snapshot.MOVE_ROBBER_KNIGHT, snapshot.STEAL_KNIGHT,
+                                         snapshot.STEAL)
+            elif kind == _ROLL:
+                outcomes[sel] = self._roll(g)
+            elif kind == _END_TURN:
+                self._end_turn(g)
+            elif kind == _BUY_DEV_CARD:
+                p = self.cur[g]
+                self._pay(g, rules.DEV_CARD)
+                card = self.deck[g, self.deck_top[g]]
+                self.deck_top[g] += 1
+                self.dev_hands[g, p, card] += 1
+                self.dev_new[g, p, card] += 1
+            elif kind == _KNIGHT:
+                self._play_dev_card(g, rules.KNIGHT)
+                self.state[g] = snapshot.MOVE_ROBBER_KNIGHT
+            elif kind == _ROAD_BUILDER:
+                self.road_builder_edge[g] = -1
+                self.state[g] = snapshot.ROAD_BUILDER
+            elif kind == _VICTORY_POINT:
+                self._play_dev_card(g, rules.VICTORY_POINT)
+            elif kind == _MONOPOLY:
+                p, r = self.cur[g], a - actions.PLAY_MONOPOLY
+                self._play_dev_card(g, rules.MONOPOLY)
+                total = self.hands[g, :, r].sum(axis=1)
+                self.hands[g, :, r] = 0
+                self.hands[g, p, r] = total
+            elif kind == _YEAR_OF_PLENTY:
+                pairs = _YOP_PAIRS[a - actions.PLAY_YEAR_OF_PLENTY]
+                self._play_dev_card(g, rules.YEAR_OF_PLENTY)
+                wanted = np.zeros((len(g), topology.NUM_RESOURCES), dtype=np.int16)
+                np.add.at(wanted, (np.arange(len(g)), pairs[:, 0]), 1)
+                np.add.at(wanted, (np.arange(len(g)), pairs[:, 1]), 1)
+                self._take(g, wanted)
+            elif kind == _TRADE:
+                self._trade(g, (a - actions.TRADE) // topology.NUM_RESOURCES, (a - actions.TRADE) % topology.NUM_RESOURCES)
+            elif kind == _STEAL_NOBODY:
+                self.state[g] = snapshot.DURING_TURN
+            else:
+                outcomes[sel] = self._steal(g, a - actions.STEAL)
+                self.state[g] = snapshot.DURING_TURN
+        self.steps += 1
+        return outcomes
+
+    def _pay(self, g, purchase):
+        # hand to bank, never more than the hand holds, see RulesState#_transfer
+        p = self.cur[g]
+        moved = np.minimum(self.hands[g, p], rules.COSTS[purchase])
+        self.hands[g, p] -= moved
+        self.bank[g] += moved
+
+    def _take(self, g, wanted):
+        # bank to the current player's hand, never more than the bank holds
+        moved = np.minimum(self.bank[g], wanted)
+        self.bank[g] -= moved
+        self.hands[g, self.cur[g]] += moved
+
+    def _play_dev_card(self, g, card):
+        # see RulesState#play_dev_card
+        p = self.cur[g]
+        held = self.dev_hands[g, p, card] > 0
+        self.dev_hands[g[held], p[held], card] -= 1
+        self.dev_played[g, p, card] += 1
+        self.dev_card_played[g] = True
+        if card == rules.KNIGHT:
+            army = self.dev_played[g, p, rules.KNIGHT]
+            holder = self.largest_army[g]
+            held_by = self.dev_played[g, np.maximum(holder, 0), rules.KNIGHT]
+            takes = (army >= rules.LARGEST_ARMY_MIN) & ((holder < 0) | (army > held_by))
+            self.largest_army[g[takes]] = p[takes]
+
+    def _place_settlement(self, g, n):
+        p = self.cur[g]
+        pregame = self.state[g] == snapshot.PREGAME_SETTLEMENT
+        self._pay(g[~pregame], rules.SETTLEMENT)
+        self.buildings[g, p, n] = 1
+        self.supply[g, p, rules.SETTLEMENT] -= 1
+        second = pregame & (self.supply[g, p, rules.SETTLEMENT] == rules.PIECE_SUPPLY[rules.SETTLEMENT] - 2)
+        if second.any():
+            gs = g[second]
+            self._take(gs, np.einsum('gt,gtr->gr', _NODE_TILES[n[second]], self.tile_resource[gs]))
+        self.pending_node[g[pregame]] = n[pregame]
+        self.state[g] = np.where(pregame, snapshot.PREGAME_ROAD, snapshot.DURING_TURN)
+
+    def _place_road(self, g, e):
+        p, state = self.cur[g], self.state[g]
+        self.roads[g, e] = p
+        self.supply[g, p, rules.ROAD] -= 1
+        bought = (state != snapshot.PREGAME_ROAD) & (state != snapshot.ROAD_BUILDER)
+        self._pay(g[bought], rules.ROAD)
+        self.state[g[bought]] = snapshot.DURING_TURN
+
+        builder = np.flatnonzero(state == snapshot.ROAD_BUILDER)
+        first = self.road_builder_edge[g[builder]] < 0
+        self.road_builder_edge[g[builder[first]]] = e[builder[first]]
+        second = g[builder[~first]]
+        if len(second):
+            self._play_dev_card(second, rules.ROAD_BUILDER)
+            self.road_builder_edge[second] = -1
+            self.state[second] = snapshot.DURING_TURN
+
+        pregame = g[state == snapshot.PREGAME_ROAD]
+        if len(pregame):
+            self.pending_node[pregame] = -1
+            self._end_turn(pregame)
+
+    def _roll(self, g):
+        rolls = self.rng.integers(1, 7, size=(len(g), 2)).sum(axis=1)
+        self.last_roll[g] = rolls
+        self.last_roller[g] = self.cur[g]
+        seven = rolls == 7
+        if seven.any():
+            self._discard_half(g[seven])
+            self.state[g[seven]] = snapshot.MOVE_ROBBER
+        if not seven.all():
+            self._produce(g[~seven], rolls[~seven])
+            self.state[g[~seven]] = snapshot.DURING_TURN
+        return rolls
+
+    def _produce(self, g, rolls):
+        # see RulesState#produce
+        active = self.tile_number[g] == rolls[:, None]
+        robber = self.robber_tile[g]
+        active[np.flatnonzero(robber > 0), robber[robber > 0] - 1] = False
+        # float32, for BLAS: per player and tile, then per resource
+        per_tile = self.buildings[g].astype(np.float32) @ _NODE_TILES.astype(np.float32)
+        owed = (per_tile @ (self.tile_resource[g] * active[:, :, None]).astype(np.float32)).astype(np.int16)
+        bank = self.bank[g]
+        short = (owed.sum(axis=1) > bank) & ((owed > 0).sum(axis=1) > 1)
+        owed = np.minimum(np.where(short[:, None, :], 0, owed), bank[:, None, :])
+        self.hands[g] += owed
+        self.bank[g] = bank - owed.sum(axis=1, dtype=np.int16)
+
+    def _discard_half(self, g):
+        # see RulesState#discard_half: from the largest pile first, one card at a time
+        hands = self.hands[g]
+        totals = hands.sum(axis=2)
+        owed = np.where(totals > rules.DISCARD_LIMIT, totals // 2, 0)
+        left = hands.copy()
+        for _ in range(int(owed.max(initial=0))):
+            games, players = np.nonzero(owed > 0)
+            left[games, players, left[games, players].argmax(axis=1)] -= 1
+            owed[games, players] -= 1
+        self.hands[g] = left
+        self.bank[g] += (hands - left).sum(axis=1, dtype=np.int16)
+
+    def _steal(self, g, victims):
+        # a card of the victim's, at random by count
+        hands = self.hands[g, victims]
+        totals = hands.sum(axis=1)
+        pick = (self.rng.random(len(g)) * totals).astype(np.intp)
+        taken = (hands.cumsum(axis=1) > pick[:, None]).argmax(axis=1)
+        some = totals > 0
+        g, victims, taken = g[some], victims[some], taken[some]
+        self.hands[g, victims, taken] -= 1
+        self.hands[g, self.cur[g], taken] += 1
+        result = np.full(len(some), -1, dtype=np.int8)
+        result[some] = taken
+        return result
+
+    def _trade(self, g, give, get):
+        rows = np.arange(len(g))
+        p = self.cur[g]
+        giving = np.zeros((len(g), topology.NUM_RESOURCES), dtype=np.int16)
+        giving[rows, give] = self.bank_ratios(g)[rows, give]
+        moved = np.minimum(self.hands[g, p], giving)
+        self.hands[g, p] -= moved
+        self.bank[g] += moved
+        getting = np.zeros_like(giving)
+        getting[rows, get] = 1
+        self._take(g, getting)
+
+    def _end_turn(self, g):
+        # see GameSnapshot#_end_turn
+        state, p = self.state[g], self.cur[g]
+        if self.turns:
+            vp = self.victory_points(g)
+            best = vp.argmax(axis=1)
+            over = (vp.max(axis=1) >= rules.VICTORY_POINTS_TO_WIN) & (best == p)
+            if self.max_turns is not None:
+                over |= self.turn[g] + 1 >= self.max_turns
+            self.state[g[over]] = snapshot.NOT_IN_GAME
+            g, state = g[~over], state[~over]
+        n = self.num_players
+        self.dev_new[g] = 0
+        following = self.turn[g] + 1
+        pregame = ((state == snapshot.PREGAME_SETTLEMENT) | (state == snapshot.PREGAME_ROAD)) & (following < 2 * n)
+        self.cur[g] = np.where(pregame, np.where(following < n, following, 2 * n - 1 - following), following % n)
+        self.state[g] = np.where(pregame, snapshot.PREGAME_SETTLEMENT,
+                                 snapshot.BEGIN_TURN if self.turns else snapshot.NOT_IN_GAME)
+        self.turn[g] = following
+        self.dev_card_played[g] = False
+
+    ###
+    # Playing
+    ###
+
+    def run(self, policies, max_steps=None):
+        """
+        Play every game until it is over, one action per game per step.
+
+        :param policies: list, a policy per seat: a function (see module docstring), or a name in POLICIES
+        :param max_steps: int, steps after which to stop, optional
+        :return: number of steps taken
+        """
+        policies = [POLICIES[policy] if isinstance(policy, str) else policy for policy in policies]
+        taken = 0
+        while max_steps is None or taken < max_steps:
+            games = self.in_game()
+            if not len(games):
+                break
+            chosen = self.decide(games, policies)
+            stalled = chosen < 0
+            if stalled.any():
+                logging.warning('Games {} have no legal actions, ending them'.format(games[stalled].tolist()))
+                self.stalled[games[stalled]] = True
+                self.state[games[stalled]] = snapshot.NOT_IN_GAME
+            self.step(games[~stalled], chosen[~stalled])
+            taken += 1
+        logging.debug('Ran {} games for {} steps'.format(self.num_games, taken))
+        return taken
+
+    def decide(self, games, policies):
+        """
+        :param games: int array of games in play
+        :param policies: list of a policy function per seat
+        :return: int array of an action per game, from the policy of its current player's seat,
+                 -1 for a game with no legal action
+        """
+        mask = self.legal_mask(games)
+        chosen = np.full(len(games), -1, dtype=np.intp)
+        seats = self.cur[games]
+        for seat in np.unique(seats):
+            sel = np.flatnonzero((seats == seat) & mask.any(axis=1))
+            chosen[sel] = policies[seat](self, games[sel], mask[sel], self.rng)
+        return chosen
+
+    def __repr__(self):
+        return '<VectorSimulator games={}, in_game={}, steps={}>'.format(self.num_games, len(self.in_game()),
+                                                                         self.steps)
+
+
+def random_policy(sim, games, mask, rng):
+    """
+    Uniformly among the legal actions, as RandomAgent.
+    """
+    return _uniform(mask, rng)
+
+
+def greedy_policy(sim, games, mask, rng):
+    """
+    As BestAgent, see module docstring.
+    """
+    n = len(games)
+    chosen = np.full(n, -1, dtype=np.intp)
+    state = sim.state[games]
+    p = sim.cur[games]
+    rows = np.arange(n)
+
+    sel = np.flatnonzero(state == snapshot.PREGAME_SETTLEMENT)
+    if len(sel):
+        # the most pips, ties broken at random
+        score = sim.node_pips(games[sel]) + rng.random((len(sel), topology.NUM_NODES))
+        chosen[sel] = np.where(mask[sel, actions.PLACE_SETTLEMENT:actions.PLACE_ROAD], score, -1).argmax(axis=1)
+    sel = np.flatnonzero((state == snapshot.MOVE_ROBBER) | (state == snapshot.MOVE_ROBBER_KNIGHT))
+    if len(sel):
+        # where it blocks the most production of others, see BestAgent#_robber_score
+        g = games[sel]
+        on_tile = sim.buildings[g].astype(np.int16) @ _NODE_TILES
+        score = on_tile.sum(axis=1) * topology.DICE_PROBABILITY[sim.tile_number[g]]
+        score[on_tile[np.arange(len(g)), p[sel]] > 0] = -1
+        chosen[sel] = actions.MOVE_ROBBER + np.where(mask[sel, actions.MOVE_ROBBER:actions.ROLL], score, -2).argmax(axis=1)
+    sel = np.flatnonzero((state == snapshot.STEAL) | (state == snapshot.STEAL_KNIGHT))
+    if len(sel):
+        # from whoever holds the most cards
+        cards = sim.hands[games[sel]].sum(axis=2)
+        victims = mask[sel, actions.STEAL:]
+        chosen[sel] = np.where(victims.any(axis=1), actions.STEAL + np.where(victims, cards, -1).argmax(axis=1),
+                               actions.STEAL_NOBODY)
+
+    rest = np.flatnonzero(chosen < 0)
+    if not len(rest):
+        return chosen
+    g, m, q = games[rest], mask[rest], p[rest]
+    robber = sim.robber_tile[g]
+    robbed = ((sim.buildings[g, q] > 0) & _TILE_NODES[robber - 1] & (robber > 0)[:, None]).any(axis=1)
+    # only games after the roll, which may end the turn, may build or trade
+    after = np.flatnonzero(m[:, actions.END_TURN])
+    settlements = np.zeros((len(g), topology.NUM_NODES), dtype=bool)
+    useful = np.zeros((len(g), topology.NUM_RESOURCES ** 2), dtype=bool)
+    if len(after):
+        ga, qa = g[after], q[after]
+        settlements[after] = sim.settlement_mask(ga)
+        # trades which get a card the next purchase lacks, for cards it does not need
+        target = np.where((sim.buildings[ga, qa] == 1).any(axis=1) & (sim.supply[ga, qa, rules.CITY] > 0), rules.CITY,
+                          np.where(settlements[after].any(axis=1) & (sim.supply[ga, qa, rules.SETTLEMENT] > 0),
+                                   rules.SETTLEMENT, rules.DEV_CARD))
+        hands, cost = sim.hands[ga, qa], rules.COSTS[target]
+        useful[after] = ((hands - sim.bank_ratios(ga) >= cost)[:, :, None] & (hands < cost)[:, None, :]).reshape(
+            len(ga), -1)
+    groups = [
+        (actions.PLAY_KNIGHT, actions.PLAY_ROAD_BUILDER, robbed),
+        (actions.ROLL, actions.END_TURN, None),
+        (actions.PLACE_CITY, actions.MOVE_ROBBER, None),
+        (actions.PLACE_SETTLEMENT, actions.PLACE_ROAD, None),
+        (actions.BUY_DEV_CARD, actions.PLAY_KNIGHT, None),
+        (actions.PLAY_VICTORY_POINT, actions.PLAY_MONOPOLY, None),
+        (actions.PLAY_MONOPOLY, actions.PLAY_YEAR_OF_PLENTY, None),
+        (actions.PLAY_YEAR_OF_PLENTY, actions.TRADE, None),
+        (actions.PLAY_ROAD_BUILDER, actions.PLAY_VICTORY_POINT, None),
+        # save brick and wood for a settlement while there is somewhere to build one
+        (actions.PLACE_ROAD, actions.PLACE_CITY, ~settlements.any(axis=1)),
+        (actions.TRADE, actions.STEAL_NOBODY, useful),
+        (actions.END_TURN, actions.BUY_DEV_CARD, None),
+    ]
+    picked = np.full(len(g), -1, dtype=np.intp)
+    for start, stop, allowed in groups:
+        group = m[:, start:stop]
+        if allowed is not None:
+            group = group & (allowed if allowed.ndim == 2 else allowed[:, None])
+        take = np.flatnonzero((picked < 0) & group.any(axis=1))
+        if len(take):
+            picked[take] = start + _uniform(group[take], rng)
+    left = np.flatnonzero(picked < 0)
+    if len(left):
+        picked[left] = _uniform(m[left], rng)
+    chosen[rest] = picked
+    return chosen
+
+
+POLICIES = {
+    'random': random_policy,
+    'greedy': greedy_policy,
+}
@@ -48,12 +48,15 @@ class CatanLog(object):
         self._game_start_timestamp = datetime.datetime.now()
         self._latest_timestamp = copy.deepcopy(self._game_start_timestamp)
         self._players = list()
+        self.on_append = None # called with each string written to the log, optional
 
     def _log(self, content):
         """
         Write a string to the log
         """
         self._buffer += content
+        if self.on_append is not None:
+            self.on_append(content)
         if self._auto_flush:
             self.flush()
 
@@ -3,12 +3,14 @@ import pprint
 import logging
 import argparse
 from catan.board import Board
+from catan.dispatch import AgentDispatcher
 from catan.game import Game
 
 import views
 
 
 class CatanSpectator(tkinter.Frame):
+    POLL_MS = 50 # how often agents' decisions are collected, see #poll_agents
 
     def __init__(self, options=None, *args, **kwargs):
         print('\n\n\n\n*******************************************************************************************************\
@@ -33,6 +35,13 @@ class CatanSpectator(tkinter.Frame):
                       players=self.options.get('players'))
         # print('initializing game from CatanSpectator')
         self.game = Game(board=board, pregame=self.options.get('pregame'), use_stdout=self.options.get('use_stdout'))
+        # agents decide off the tkinter thread, and their actions are made by #poll_agents
+        self.dispatcher = None
+        if self.options.get('agents', 'thread') != 'off':
+            self.dispatcher = AgentDispatcher(executor=self.options.get('agents', 'thread'),
+                                              deadline=self.options.get('agent_deadline'))
+            self.dispatcher.attach(self.game)
+            self.after(self.POLL_MS, self.poll_agents)
         # print('adding observer to game')
         self.game.observers.add(self)
         # print('self.game.observers={}'.format(self.game.observers))
@@ -52,6 +61,10 @@ class CatanSpectator(tkinter.Frame):
 
         # self.lift()
 
+    def poll_agents(self):
+        self.dispatcher.poll()
+        self.after(self.POLL_MS, self.poll_agents)
+
     def notify(self, observable):
         print('notify method of catan-spectator hit')
         was_in_game = self._in_game
@@ -87,6 +100,10 @@ def main():
     parser.add_argument('--players', help='random|preset|empty|debug, default preset')
     parser.add_argument('--pregame', help='on|off, default on')
     parser.add_argument('--use_stdout', help='write to stdout', action='store_true')
+    parser.add_argument('--agents', default='thread',
+                        help='thread|process|off, where agents decide; off decides on the GUI thread, default thread')
+    parser.add_argument('--agent_deadline', type=float, default=10,
+                        help='seconds an agent may take per decision before a fast default decides, default 10')
 
     args = parser.parse_args()
     options = {
@@ -97,12 +114,16 @@ def main():
         'pieces': args.pieces,
         'players': args.players,
         'pregame': args.pregame,
-        'use_stdout': args.use_stdout
+        'use_stdout': args.use_stdout,
+        'agents': args.agents,
+        'agent_deadline': args.agent_deadline,
     }
 
     # logging.info('args=\n{}'.format(pprint.pformat(options)))
     app = CatanSpectator(options=options)
     app.mainloop()
+    if app.dispatcher is not None:
+        app.dispatcher.shutdown()
 
 
 if __name__ == "__main__":
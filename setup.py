@@ -34,5 +34,6 @@ setup(name="catan-spectator",
           'catanlog ~= 0.10',
           'hexgrid ~= 0.2',
           'undoredo ~= 0.1',
+          'numpy',
       ],
       )
\ No newline at end of file
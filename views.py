@@ -6,13 +6,12 @@ import collections
 import functools
 import catanlog
 import hexgrid
-from catan import states
+from catan import agents, events, notifications, states, statemachine
 from catan.board import PortType, HexNumber, Terrain
 from catan.game import Player
 from catan.pieces import PieceType, Piece
 import tkinterutils
 import views_trading
-from collections import Counter
 
 can_do = {
     True: tkinter.NORMAL,
@@ -34,6 +33,7 @@ class LogFrame(tkinter.Frame):
         self.master = master
         self.game = game
         self.game.observers.add(self)
+        self._appended = self.game.events.subscribe(events.LogAppended)
 
         self.log = tkinter.Text(self, width=85, height=LOG_MIN_HEIGHT, state=tkinter.NORMAL)
         self.log.insert(tkinter.END, '{} {}'.format(catanlog.__name__, catanlog.__version__))
@@ -42,9 +42,23 @@ class LogFrame(tkinter.Frame):
 
     def notify(self, observable):
         # logging.debug('LogFrame.notify called and calling LogFrame.redraw()')
-        self.redraw()
+        changes = observable.changes
+        if changes is None or notifications.ALL in changes.kinds or self._appended.dropped:
+            # e.g. undo, which takes text out of the log
+            self.redraw()
+        elif notifications.LOG in changes:
+            self.append(''.join(event.text for event in self._appended.poll()))
+
+    def append(self, text):
+        if not text:
+            return
+        self.log.insert(tkinter.END, text)
+        self.log.configure(height=max(LOG_MIN_HEIGHT, min(LOG_MAX_HEIGHT, len(self.game.catanlog.dump()))))
+        self.log.see(tkinter.END)
 
     def redraw(self):
+        self._appended.poll()
+        self._appended.dropped = 0
         self.log.delete(1.0, tkinter.END)
         logs = self.game.catanlog.dump()
         self.log.configure(height=max(LOG_MIN_HEIGHT,min(LOG_MAX_HEIGHT,len(logs))))
@@ -91,13 +105,13 @@ class BoardFrame(tkinter.Frame):
 
         # logging.debug('Piece clicked with tag={}'.format(tag))
         if piece_type == PieceType.road:
-            self.game.place_road(self._coord_from_road_tag(tag))
+            agents.apply(self.game, ('place_road', self._coord_from_road_tag(tag)))
         elif piece_type == PieceType.settlement:
-            self.game.place_settlement(self._coord_from_settlement_tag(tag))
+            agents.apply(self.game, ('place_settlement', self._coord_from_settlement_tag(tag)))
         elif piece_type == PieceType.city:
-            self.game.place_city(self._coord_from_city_tag(tag))
+            agents.apply(self.game, ('place_city', self._coord_from_city_tag(tag)))
         elif piece_type == PieceType.robber:
-            self.game.move_robber(hexgrid.tile_id_from_coord(self._coord_from_robber_tag(tag)))
+            agents.apply(self.game, ('move_robber', hexgrid.tile_id_from_coord(self._coord_from_robber_tag(tag))))
         # logging.debug('boardFrame.piece_click calling boardFrame.redraw')
         self.redraw()
 
@@ -117,7 +131,10 @@ class BoardFrame(tkinter.Frame):
 
     def notify(self, observable):
         # logging.debug('BoardFrame.notify called and calling BoardFrame.redraw()')
-        self.redraw()
+        changes = observable.changes
+        if changes is None or changes.any(notifications.STATE, notifications.PIECES, notifications.BOARD,
+                                          notifications.PLAYERS):
+            self.redraw()
 
     def draw(self, board):
         """Render the board to the canvas widget.
@@ -134,16 +151,17 @@ class BoardFrame(tkinter.Frame):
         terrain_centers = self._draw_terrain(board)
         self._draw_numbers(board, terrain_centers)
         self._draw_pieces(board, terrain_centers)
-        if self.game.state.can_place_road():
+        caps = self.game.capabilities()
+        if caps & statemachine.CAN_PLACE_ROAD:
             self._draw_piece_shadows(PieceType.road, board, terrain_centers)
-        if self.game.state.can_place_settlement():
+        if caps & statemachine.CAN_PLACE_SETTLEMENT:
             self._draw_piece_shadows(PieceType.settlement, board, terrain_centers)
-        if self.game.state.can_place_city():
+        if caps & statemachine.CAN_PLACE_CITY:
             self._draw_piece_shadows(PieceType.city, board, terrain_centers)
-        if self.game.state.can_move_robber():
+        if caps & statemachine.CAN_MOVE_ROBBER:
             self._draw_piece_shadows(PieceType.robber, board, terrain_centers)
 
-        if self.game.state.is_in_game():
+        if caps & statemachine.IN_GAME:
             self._draw_ports(board, terrain_centers)
         else:
             self._draw_port_shadows(board, terrain_centers)
@@ -584,13 +602,13 @@ class SetupGameToolbarFrame(tkinter.Frame):
 
     def on_reset_board(self):
         self.game.board.reset()
-        self.game.notify_observers()
+        self.game.notify_observers(notifications.BOARD, notifications.PIECES)
 
     def on_reset_pieces(self):
         for (hextype, coord), piece in self.game.board.pieces.copy().items():
             if piece.type != PieceType.robber:
                 self.game.board.remove_piece(piece, coord)
-        self.game.notify_observers()
+        self.game.notify_observers(notifications.PIECES)
 
     def on_move_robber(self):
         self.game.set_state(states.GameStateNotInGameMoveRobber(self.game))
@@ -620,6 +638,7 @@ class SetupGameToolbarFrame(tkinter.Frame):
         # logging.debug('views.on_start_game calling game.start with players={}'.format(players))
 
         self.game.start(players)
+        self.game.play_agent_turn()
 
 
 class StartGamePlayerOrderFrame(tkinter.Frame):
@@ -718,8 +737,8 @@ class UndoRedoFrame(tkinter.Frame):
         self.set_states()
 
     def set_states(self):
-        self.undo.configure(state=can_do[self.game.undo_manager.can_undo()])
-        self.redo.configure(state=can_do[self.game.undo_manager.can_redo()])
+        self.undo.configure(state=can_do[self.game.can_undo()])
+        self.redo.configure(state=can_do[self.game.can_redo()])
 
     def on_undo(self):
         self.game.undo()
@@ -792,21 +811,22 @@ class RollFrame(tkinter.Frame):
         self.set_states()
 
     def set_states(self):
-        self.two.configure(state=can_do[self.game.state.can_roll()])
-        self.three.configure(state=can_do[self.game.state.can_roll()])
-        self.four.configure(state=can_do[self.game.state.can_roll()])
-        self.five.configure(state=can_do[self.game.state.can_roll()])
-        self.six.configure(state=can_do[self.game.state.can_roll()])
-        self.seven.configure(state=can_do[self.game.state.can_roll()])
-        self.eight.configure(state=can_do[self.game.state.can_roll()])
-        self.nine.configure(state=can_do[self.game.state.can_roll()])
-        self.ten.configure(state=can_do[self.game.state.can_roll()])
-        self.eleven.configure(state=can_do[self.game.state.can_roll()])
-        self.twelve.configure(state=can_do[self.game.state.can_roll()])
+        state = can_do[bool(self.game.capabilities() & statemachine.CAN_ROLL)]
+        self.two.configure(state=state)
+        self.three.configure(state=state)
+        self.four.configure(state=state)
+        self.five.configure(state=state)
+        self.six.configure(state=state)
+        self.seven.configure(state=state)
+        self.eight.configure(state=state)
+        self.nine.configure(state=state)
+        self.ten.configure(state=state)
+        self.eleven.configure(state=state)
+        self.twelve.configure(state=state)
 
 
     def on_roll(self, roll):
-        self.game.roll(roll)
+        agents.apply(self.game, ('roll', ), roll)
         self.set_states()
 
 
@@ -864,7 +884,7 @@ class RobberFrame(tkinter.Frame):
             if victim_str == str(player):
                 victim = player
         # logging.debug('in view, stealing from victim={} (victim_str={})'.format(victim, victim_str))
-        self.game.steal(victim)
+        agents.apply(self.game, ('steal', victim))
 
     def _other_player_strs(self):
         cur_str = str(self.game.get_cur_player())
@@ -903,10 +923,11 @@ class BuildFrame(tkinter.Frame):
         self.set_states()
 
     def set_states(self):
-        self.road.configure(state=can_do[self.game.state.can_buy_road()])
-        self.settlement.configure(state=can_do[self.game.state.can_buy_settlement()])
-        self.city.configure(state=can_do[self.game.state.can_buy_city()])
-        self.dev_card.configure(state=can_do[self.game.state.can_buy_dev_card()])
+        caps = self.game.capabilities()
+        self.road.configure(state=can_do[bool(caps & statemachine.CAN_BUY_ROAD)])
+        self.settlement.configure(state=can_do[bool(caps & statemachine.CAN_BUY_SETTLEMENT)])
+        self.city.configure(state=can_do[bool(caps & statemachine.CAN_BUY_CITY)])
+        self.dev_card.configure(state=can_do[bool(caps & statemachine.CAN_BUY_DEV_CARD)])
 
     def on_buy_road(self):
         # actual road purchase and catanlog happens in the piece onclick in BoardFrame
@@ -921,7 +942,7 @@ class BuildFrame(tkinter.Frame):
         self.game.begin_placing(PieceType.city)
 
     def on_buy_dev_card(self):
-        self.game.buy_dev_card()
+        agents.apply(self.game, ('buy_dev_card', ))
 
 
 class PlayDevCardFrame(tkinter.Frame):
@@ -981,38 +1002,39 @@ class PlayDevCardFrame(tkinter.Frame):
         self.set_states()
 
     def set_states(self):
-        self.knight.configure(state=can_do[self.game.state.can_play_knight()])
-        self.monopoly.configure(state=can_do[self.game.state.can_play_monopoly()])
-        self.monopoly_picker.configure(state=can_do[self.game.state.can_play_monopoly()])
-        self.year_of_plenty.configure(state=can_do[self.game.state.can_play_year_of_plenty()])
-        self.year_of_plenty_picker1.configure(state=can_do[self.game.state.can_play_year_of_plenty()])
-        self.year_of_plenty_picker2.configure(state=can_do[self.game.state.can_play_year_of_plenty()])
-        self.road_builder.configure(state=can_do[self.game.state.can_play_road_builder()])
-        self.victory_point.configure(state=can_do[self.game.state.can_play_victory_point()])
+        caps = self.game.capabilities()
+        self.knight.configure(state=can_do[bool(caps & statemachine.CAN_PLAY_KNIGHT)])
+        self.monopoly.configure(state=can_do[bool(caps & statemachine.CAN_PLAY_MONOPOLY)])
+        self.monopoly_picker.configure(state=can_do[bool(caps & statemachine.CAN_PLAY_MONOPOLY)])
+        self.year_of_plenty.configure(state=can_do[bool(caps & statemachine.CAN_PLAY_YEAR_OF_PLENTY)])
+        self.year_of_plenty_picker1.configure(state=can_do[bool(caps & statemachine.CAN_PLAY_YEAR_OF_PLENTY)])
+        self.year_of_plenty_picker2.configure(state=can_do[bool(caps & statemachine.CAN_PLAY_YEAR_OF_PLENTY)])
+        self.road_builder.configure(state=can_do[bool(caps & statemachine.CAN_PLAY_ROAD_BUILDER)])
+        self.victory_point.configure(state=can_do[bool(caps & statemachine.CAN_PLAY_VICTORY_POINT)])
 
     def on_knight(self):
         # logging.debug('play dev card: knight clicked')
-        self.game.play_knight()
+        agents.apply(self.game, ('play_knight', ))
 
     def on_monopoly(self):
         # logging.debug('play dev card: monopoly clicked, resource={}'.format(self.monopoly_choice.get()))
-        self.game.play_monopoly(Terrain(self.monopoly_choice.get()))
+        agents.apply(self.game, ('play_monopoly', Terrain(self.monopoly_choice.get())))
 
     def on_year_of_plenty(self):
         # logging.debug('play dev card: year of plenty clicked, resources=({} and {})'.format(
             # self.year_of_plenty_choice1.get(),
             # self.year_of_plenty_choice2.get()
         # ))
-        self.game.play_year_of_plenty(Terrain(self.year_of_plenty_choice1.get()),
-                                      Terrain(self.year_of_plenty_choice2.get()))
+        agents.apply(self.game, ('play_year_of_plenty', Terrain(self.year_of_plenty_choice1.get()),
+                                 Terrain(self.year_of_plenty_choice2.get())))
 
     def on_road_builder(self):
         # logging.debug('play dev card: road builder clicked')
-        self.game.set_state(states.GameStatePlacingRoadBuilderPieces(self.game))
+        agents.apply(self.game, ('play_road_builder', ))
 
     def on_victory_point(self):
         # logging.debug('play dev card: victory point clicked')
-        self.game.play_victory_point()
+        agents.apply(self.game, ('play_victory_point', ))
 
 
 class EndTurnFrame(tkinter.Frame):
@@ -1045,7 +1067,7 @@ class EndTurnFrame(tkinter.Frame):
 
     def on_end_turn(self, event=None):
         if self.game.state.can_end_turn():
-            self.game.end_turn()
+            agents.apply(self.game, ('end_turn', ))
 
 
 class EndGameFrame(tkinter.Frame):
@@ -1064,13 +1086,7 @@ class EndGameFrame(tkinter.Frame):
         d = self.game.player_to_resources
         print('d={}'.format(d))
 
-        temp = {k: {} for k in d.keys()}
-        for k in d.keys():
-            lst2 = [l[0] for l in d[k]]
-            temp[k] = Counter(lst2)
-        print('returning temp={}'.format(temp)) 
-
-        for k, v in temp.items():
+        for k, v in d.items():
             res = ''
             for k1, v1 in v.items():
                 res = res + str(v1) + ' ' + str(k1) + ', '
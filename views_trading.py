@@ -1,6 +1,7 @@
 import functools
 import logging
 import tkinter as tk
+from catan import agents
 from catan.board import PortType, Terrain, Port
 from catan.trading import CatanTrade
 
@@ -71,7 +72,15 @@ class TradeFrame(tk.Frame):
                                                        self.trade.giving(),
                                                        self.trade.getter(),
                                                        self.trade.getting()))
-        self.game.trade(self.trade)
+        action = agents.trade_action(self.game, self.trade)
+        if action is not None:
+            agents.apply(self.game, action)
+        elif self.game.stream is not None:
+            # the event stream records actions only, see module eventstream
+            logging.warning('Trade={} is not an action, and cannot be made in a game with an event stream'.format(
+                self.trade))
+        else:
+            self.game.trade(self.trade)
 
         self.on_cancel()
         self.game.notify(None)